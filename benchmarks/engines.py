@@ -0,0 +1,125 @@
+"""
+Compare the pandas and DuckDB engines on the crowd-level target and opening-hour queries.
+
+Builds a large synthetic database (defaults give ~10.8M readings), exports it
+to Parquet, then times each engine/backend pair and checks every result
+against the pandas-over-SQLite baseline.
+
+    python benchmarks/engines.py --parks 10 --rides 40 --years 3
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import tempfile
+from datetime import datetime
+
+_benchmarks_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, _benchmarks_dir)
+
+from run import _model_dir, git_commit, load_scraping_module, time_call
+from synthetic import generate_queue_database, get_open_dates
+
+if _model_dir not in sys.path:
+    sys.path.insert(0, _model_dir)
+
+def run_engines(args):
+    """
+    Returns:
+        dict: Results keyed by '<query>_<engine>_<backend>'.
+    """
+    from utils.analytics import connect_readings, query_recorded_opening_hours, query_training_targets
+    from utils.opening import get_recorded_opening_hours
+    from utils.preprocess import _generate_training_targets_pandas
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix='tpqm-engines-')
+    os.makedirs(workdir, exist_ok=True)
+    os.chdir(workdir)
+    os.environ['PIPELINE_REPORT_DIR'] = ''
+
+    db_path = os.path.join('data', 'queue_data.db')
+    parquet_dir = os.path.join('data', 'queue_parquet')
+    results = {}
+
+    timing, summary = time_call(lambda: generate_queue_database(
+        db_path, n_parks=args.parks, n_rides=args.rides, n_years=args.years, seed=args.seed
+    ), repeat=1)
+    results['generate_synthetic_database'] = {**timing, 'rows': summary['n_rows']}
+    timing, _ = time_call(lambda: load_scraping_module('parquet_export').export_database(
+        db_path, logging.getLogger('benchmark'), parquet_dir
+    ), repeat=1)
+    results['export_parquet'] = timing
+
+    dates = [d.strftime('%Y-%m-%d') for d in get_open_dates('2022-04-01', args.years)]
+    park_id = summary['park_ids'][0]
+
+    def sort_targets(df):
+        df = df.assign(date=df['date'].astype('datetime64[ns]'), park_id=df['park_id'].astype('int32'))
+        return df.sort_values(['date', 'park_id']).reset_index(drop=True)[['date', 'park_id', 'crowd_level']]
+
+    baseline_targets = baseline_hours = None
+    for backend in ('sqlite', 'parquet'):
+        storage = {'backend': backend, 'db_path': db_path, 'parquet_dir': parquet_dir}
+
+        timing, targets = time_call(lambda: _generate_training_targets_pandas(None, storage), args.repeat)
+        targets = sort_targets(targets)
+        baseline_targets = targets if baseline_targets is None else baseline_targets
+        results[f'training_targets_pandas_{backend}'] = {**timing, 'rows_out': len(targets), 'matches_baseline': targets.equals(baseline_targets)}
+
+        timing, hours = time_call(lambda: get_recorded_opening_hours(park_id, dates, storage), args.repeat)
+        baseline_hours = hours if baseline_hours is None else baseline_hours
+        results[f'opening_hours_pandas_{backend}'] = {**timing, 'dates': len(hours), 'matches_baseline': hours == baseline_hours}
+
+        try:
+            conn = connect_readings(backend, db_path=db_path, parquet_dir=parquet_dir)
+        except Exception as e:
+            # The SQLite attach needs DuckDB's sqlite extension, which is downloaded on first use.
+            print(f'Skipping duckdb/{backend}: {e}')
+            continue
+        timing, targets = time_call(lambda: query_training_targets(conn), args.repeat)
+        targets = sort_targets(targets)
+        results[f'training_targets_duckdb_{backend}'] = {**timing, 'rows_out': len(targets), 'matches_baseline': targets.equals(baseline_targets)}
+
+        timing, hours = time_call(lambda: query_recorded_opening_hours(conn, park_id, dates), args.repeat)
+        results[f'opening_hours_duckdb_{backend}'] = {**timing, 'dates': len(hours), 'matches_baseline': hours == baseline_hours}
+        conn.close()
+
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark the pandas and DuckDB query engines.')
+    parser.add_argument('--parks', type=int, default=10)
+    parser.add_argument('--rides', type=int, default=40)
+    parser.add_argument('--years', type=float, default=3.0)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--workdir', default=None, help='Directory for the synthetic workspace (temporary if omitted).')
+    parser.add_argument('--output', default=None, help='Results JSON path. Defaults to benchmarks/results/engines-<timestamp>.json.')
+    args = parser.parse_args()
+
+    for attr in ('workdir', 'output'):
+        if getattr(args, attr):
+            setattr(args, attr, os.path.abspath(getattr(args, attr)))
+
+    started_at = datetime.now()
+    results = run_engines(args)
+
+    output = args.output or os.path.join(_benchmarks_dir, 'results', f"engines-{started_at.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, 'w') as file:
+        json.dump({
+            'meta': {
+                'started_at': started_at.isoformat(timespec='seconds'),
+                'git_commit': git_commit(),
+                'scale': {'parks': args.parks, 'rides': args.rides, 'years': args.years, 'seed': args.seed},
+            },
+            'results': results,
+        }, file, indent=2)
+
+    print('\nEngine results:')
+    for name, result in results.items():
+        parity = '' if 'matches_baseline' not in result else ('  parity ok' if result['matches_baseline'] else '  PARITY MISMATCH')
+        print(f"  {name:36s} median {result['wall_s_median']:.4f}s{parity}")
+    print(f'Wrote results to {output}')
@@ -0,0 +1,245 @@
+"""
+Local stand-in for every external API the crowd-level pipeline calls.
+
+Serves the deterministic fixtures from stubs.py over HTTP, each source under
+its own path prefix, so the real request code paths (requests, Meteostat's
+bulk CSV loader, the google-genai client) run unchanged with no network:
+
+    /queue-times/parks.json
+    /queue-times/parks/<id>/queue_times.json
+    /themeparks-wiki/v1/destinations
+    /themeparks-wiki/v1/entity/<id>/schedule/<year>/<month>
+    /nager-date/api/v3/PublicHolidays/<year>/<country>
+    /open-meteo/v1/forecast?start_date=...&end_date=...
+    /meteostat/stations/slim.csv.gz
+    /meteostat/daily/<station>.csv.gz
+    /gemini/<version>/models/<model>:generateContent  (POST)
+
+Point the pipeline at it with SOURCE_BASE_URL (see utils/endpoints.py):
+
+    python benchmarks/fake_server.py --parks 3 --latency-ms 40 --error-rate 0.05
+    SOURCE_BASE_URL=http://127.0.0.1:8765 python models/crowd-level/train.py
+
+Latency and injected errors are drawn from a seeded generator, so the same
+request sequence sees the same delays and failures on every run.
+"""
+
+import argparse
+import gzip
+import io
+import json
+import re
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+import numpy as np
+
+from stubs import (
+    daily_weather, destinations_catalogue, live_queue_times, month_schedule, parks_catalogue,
+    public_holidays, school_holiday_periods, weather_forecast, weather_stations,
+)
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+
+def gzip_csv(df, **kwargs):
+    """
+    Encode a DataFrame as a headerless gzipped CSV, the format of Meteostat's bulk files.
+    """
+    buffer = io.BytesIO()
+    with gzip.GzipFile(fileobj=buffer, mode='wb') as file:
+        file.write(df.to_csv(header=False, **kwargs).encode())
+    return buffer.getvalue()
+
+def meteostat_daily_csv():
+    """
+    Daily bulk file for any synthetic station: the stub series over 1990 to a year from now.
+    """
+    end = datetime.now() + timedelta(days=365)
+    data = daily_weather('1990-01-01', end.strftime('%Y-%m-%d'))
+    for column in ('tmin', 'tmax', 'snow', 'wdir', 'wpgt', 'pres', 'tsun'):
+        data[column] = np.nan
+    data = data[['tavg', 'tmin', 'tmax', 'prcp', 'snow', 'wdir', 'wspd', 'wpgt', 'pres', 'tsun']].round(1)
+    return gzip_csv(data, date_format='%Y-%m-%d')
+
+def gemini_response(request_body):
+    """
+    generateContent response answering the school holiday prompt with stub periods.
+    """
+    prompt = ' '.join(
+        part.get('text', '')
+        for content in request_body.get('contents', [])
+        for part in content.get('parts', [])
+    )
+    years = [int(y) for y in re.findall(r'\b(\d{4})\b', prompt)] or [datetime.now().year]
+    text = json.dumps(school_holiday_periods(min(years), max(years)))
+    return {'candidates': [{
+        'content': {'parts': [{'text': text}], 'role': 'model'},
+        'finishReason': 'STOP',
+        'index': 0,
+    }]}
+
+class FaultInjector:
+    """
+    Seeded per-request latency and error decisions, shared by the server's handler threads.
+    """
+    def __init__(self, latency_ms=0.0, jitter_ms=0.0, error_rate=0.0, error_status=503, seed=0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.rng = np.random.default_rng(seed)
+        self.lock = threading.Lock()
+        self.counts = {'requests': 0, 'errors': 0}
+
+    def next(self):
+        """
+        Returns:
+            tuple[float, int | None]: Delay in seconds and an error status to return, or None.
+        """
+        with self.lock:
+            self.counts['requests'] += 1
+            delay = max(0.0, self.latency_ms + self.rng.normal(0, self.jitter_ms)) / 1000 if self.jitter_ms else self.latency_ms / 1000
+            fail = self.error_rate > 0 and self.rng.random() < self.error_rate
+            if fail:
+                self.counts['errors'] += 1
+        return delay, self.error_status if fail else None
+
+def make_handler(park_ids, faults, quiet=False):
+    """
+    Build a request handler class bound to the synthetic parks and fault settings.
+    """
+    daily_csv = meteostat_daily_csv()
+    stations_csv = gzip_csv(weather_stations(park_ids), index=False)
+
+    def route(method, path, query, body):
+        """
+        Returns:
+            tuple[int, str, bytes]: Status, content type and body.
+        """
+        source, _, rest = path.lstrip('/').partition('/')
+        rest = '/' + rest
+
+        if method == 'POST':
+            if source == 'gemini' and rest.endswith(':generateContent'):
+                return 200, 'application/json', json.dumps(gemini_response(json.loads(body or b'{}'))).encode()
+            return 404, 'application/json', b'{"error": "not found"}'
+
+        payload = None
+        if source == 'queue-times':
+            match = re.fullmatch(r'/parks/(\d+)/queue_times\.json', rest)
+            if rest == '/parks.json':
+                payload = parks_catalogue(park_ids)
+            elif match and int(match.group(1)) in park_ids:
+                payload = live_queue_times(match.group(1))
+        elif source == 'themeparks-wiki':
+            match = re.fullmatch(r'/v1/entity/[^/]+/schedule/(\d{4})/(\d{1,2})', rest)
+            if rest == '/v1/destinations':
+                payload = destinations_catalogue(park_ids)
+            elif match:
+                payload = month_schedule(*match.groups())
+        elif source == 'nager-date':
+            match = re.fullmatch(r'/api/v3/PublicHolidays/(\d{4})/\w+', rest)
+            if match:
+                payload = public_holidays(match.group(1))
+        elif source == 'open-meteo' and rest == '/v1/forecast':
+            if 'start_date' not in query or 'end_date' not in query:
+                return 400, 'application/json', b'{"error": true, "reason": "start_date and end_date are required"}'
+            payload = weather_forecast(query['start_date'][0], query['end_date'][0])
+        elif source == 'meteostat':
+            if rest == '/stations/slim.csv.gz':
+                return 200, 'application/gzip', stations_csv
+            if re.fullmatch(r'/daily/SYN\d+\.csv\.gz', rest):
+                return 200, 'application/gzip', daily_csv
+
+        if payload is None:
+            return 404, 'application/json', json.dumps({'error': f'no fixture for {path}'}).encode()
+        return 200, 'application/json', json.dumps(payload).encode()
+
+    class FakeSourceHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def _respond(self, method):
+            url = urlsplit(self.path)
+            length = int(self.headers.get('Content-Length') or 0)
+            body = self.rfile.read(length) if length else b''
+
+            delay, error_status = faults.next()
+            if delay:
+                time.sleep(delay)
+            if error_status is not None:
+                status, content_type, data = error_status, 'application/json', b'{"error": "injected failure"}'
+            else:
+                status, content_type, data = route(method, url.path, parse_qs(url.query), body)
+
+            self.send_response(status)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            self._respond('GET')
+
+        def do_POST(self):
+            self._respond('POST')
+
+        def log_message(self, format, *args):
+            if not quiet:
+                super().log_message(format, *args)
+
+    return FakeSourceHandler
+
+def start_fake_server(park_ids, host=DEFAULT_HOST, port=0, latency_ms=0.0, jitter_ms=0.0,
+                      error_rate=0.0, error_status=503, seed=0, quiet=True):
+    """
+    Start the fake source server on a background thread.
+
+    Args:
+        park_ids (list[int]): Synthetic park IDs to serve.
+        host (str): Interface to bind.
+        port (int): Port to bind; 0 picks a free port.
+        latency_ms (float): Mean added latency per request.
+        jitter_ms (float): Standard deviation of the added latency.
+        error_rate (float): Fraction of requests answered with error_status.
+        error_status (int): HTTP status for injected failures.
+        seed (int): Seed for latency and error draws.
+        quiet (bool): Suppress per-request logging.
+
+    Returns:
+        tuple[ThreadingHTTPServer, str]: The running server (call shutdown() to stop) and its base URL.
+    """
+    faults = FaultInjector(latency_ms, jitter_ms, error_rate, error_status, seed)
+    server = ThreadingHTTPServer((host, port), make_handler(park_ids, faults, quiet))
+    server.daemon_threads = True
+    server.faults = faults
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://{host}:{server.server_address[1]}'
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Serve deterministic fixtures for every external source.')
+    parser.add_argument('--parks', type=int, default=3, help='Serve synthetic parks 1..N.')
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--latency-ms', type=float, default=0.0)
+    parser.add_argument('--jitter-ms', type=float, default=0.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--error-status', type=int, default=503)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--quiet', action='store_true')
+    args = parser.parse_args()
+
+    faults = FaultInjector(args.latency_ms, args.jitter_ms, args.error_rate, args.error_status, args.seed)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(list(range(1, args.parks + 1)), faults, args.quiet))
+    server.daemon_threads = True
+    print(f'Serving fake external sources on http://{args.host}:{args.port}')
+    print(f'Use SOURCE_BASE_URL=http://{args.host}:{args.port} to point the pipeline at it.')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(f"Served {faults.counts['requests']} requests ({faults.counts['errors']} injected errors)")
+        server.server_close()
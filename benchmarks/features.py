@@ -0,0 +1,168 @@
+"""
+Compare the queue model's vectorised lag/rolling engine with a pandas groupby baseline.
+
+Builds a synthetic database, then for each park computes the same ride-level
+lags, rolling means, same-slot day means and last-open carry-forward two
+ways: models/queues/preprocessing.lag_features over the (ride, day, slot)
+tensor, and per-ride pandas shift/rolling over a complete slot grid. Every
+engine result is checked against the baseline.
+
+    python benchmarks/features.py --parks 3 --rides 30 --years 2
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+from datetime import datetime
+
+_benchmarks_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, _benchmarks_dir)
+
+from run import _model_dir, _project_root, git_commit, time_call
+from synthetic import generate_queue_database
+
+_queues_dir = os.path.join(_project_root, 'models', 'queues')
+for path in (_model_dir, _queues_dir):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+import numpy as np
+import pandas as pd
+
+LAGS = {'lag_15m': 1, 'lag_60m': 4, 'lag_1d': 96, 'lag_7d': 7 * 96}
+WINDOWS = {'mean_60m': 4, 'mean_180m': 12}
+DAY_WINDOWS = {'same_slot_mean_7d': 7}
+LAST_OPEN = ('last_open', 'slots_since_open')
+
+def engine_features(queue_data):
+    """
+    Tensor build plus lag_features, as models/queues/pipeline.py runs them.
+    """
+    from preprocessing import build_ride_tensor, lag_features
+
+    tensor = build_ride_tensor(queue_data)
+    return dict(lag_features(tensor['queue'], LAGS, WINDOWS, DAY_WINDOWS, LAST_OPEN))
+
+def pandas_features(queue_data):
+    """
+    The same features with per-ride groupby shift/rolling on a long frame.
+
+    Readings are reindexed onto every slot of every day so that shifts mean
+    the same thing as in the tensor, and closed readings are NaN.
+    """
+    from preprocessing import SLOT_MINUTES, SLOTS_PER_DAY
+
+    day = queue_data['date'].to_numpy().astype('datetime64[D]').astype(np.int64)
+    first_day, last_day = day.min(), day.max()
+    frame = pd.DataFrame({
+        'ride_id': queue_data['ride_id'].to_numpy(),
+        't': (day - first_day) * SLOTS_PER_DAY + queue_data['minute_of_day'].to_numpy() // SLOT_MINUTES,
+        'value': queue_data['queue_time'].where(~queue_data['is_closed']).astype('float64').to_numpy(),
+    })
+    grid = pd.MultiIndex.from_product(
+        [np.unique(frame['ride_id']), np.arange((last_day - first_day + 1) * SLOTS_PER_DAY)], names=['ride_id', 't']
+    )
+    series = frame.set_index(['ride_id', 't'])['value'].reindex(grid)
+    by_ride = series.groupby(level='ride_id')
+
+    features = {}
+    for name, n in LAGS.items():
+        features[name] = by_ride.shift(n)
+    previous = by_ride.shift(1)
+    for name, n in WINDOWS.items():
+        features[name] = previous.groupby(level='ride_id').transform(lambda s: s.rolling(n, min_periods=1).mean())
+    slot = grid.get_level_values('t') % SLOTS_PER_DAY
+    by_ride_slot = series.groupby([grid.get_level_values('ride_id'), slot])
+    previous_day = by_ride_slot.shift(1)
+    for name, n in DAY_WINDOWS.items():
+        features[name] = previous_day.groupby([grid.get_level_values('ride_id'), slot]).transform(
+            lambda s: s.rolling(n, min_periods=1).mean()
+        )
+    t = pd.Series(grid.get_level_values('t'), index=grid, dtype='float64')
+    features[LAST_OPEN[0]] = previous.groupby(level='ride_id').ffill()
+    seen = t.where(series.notna()).groupby(level='ride_id').shift(1).groupby(level='ride_id').ffill()
+    features[LAST_OPEN[1]] = t - seen
+    return features
+
+def compare(engine, baseline):
+    """
+    True if every engine feature matches the baseline (float32 tolerance, NaN positions equal).
+    """
+    return all(
+        np.allclose(engine[name].ravel(), baseline[name].to_numpy(), rtol=1e-5, atol=1e-4, equal_nan=True)
+        for name in baseline
+    )
+
+def run_features(args):
+    """
+    Returns:
+        dict: Results keyed by '<method>_park_<id>', plus totals.
+    """
+    from utils.helpers import load_queue_data_typed
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix='tpqm-features-')
+    os.makedirs(workdir, exist_ok=True)
+    os.chdir(workdir)
+    os.environ['PIPELINE_REPORT_DIR'] = ''
+
+    db_path = os.path.join('data', 'queue_data.db')
+    timing, summary = time_call(lambda: generate_queue_database(
+        db_path, n_parks=args.parks, n_rides=args.rides, n_years=args.years, seed=args.seed
+    ), repeat=1)
+    results = {'generate_synthetic_database': {**timing, 'rows': summary['n_rows']}}
+
+    totals = {'engine': 0.0, 'pandas': 0.0}
+    for park_id in summary['park_ids']:
+        queue_data = load_queue_data_typed(db_path, park_ids=[park_id])
+
+        timing, engine = time_call(lambda: engine_features(queue_data), args.repeat)
+        results[f'engine_park_{park_id}'] = {**timing, 'rows': len(queue_data)}
+        totals['engine'] += timing['wall_s_median']
+
+        timing, baseline = time_call(lambda: pandas_features(queue_data), args.repeat)
+        results[f'pandas_park_{park_id}'] = {**timing, 'rows': len(queue_data), 'matches_engine': compare(engine, baseline)}
+        totals['pandas'] += timing['wall_s_median']
+
+    results['speedup'] = round(totals['pandas'] / totals['engine'], 1) if totals['engine'] else None
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark the vectorised lag/rolling feature engine against pandas groupby.')
+    parser.add_argument('--parks', type=int, default=3)
+    parser.add_argument('--rides', type=int, default=30)
+    parser.add_argument('--years', type=float, default=2.0)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--workdir', default=None, help='Directory for the synthetic workspace (temporary if omitted).')
+    parser.add_argument('--output', default=None, help='Results JSON path. Defaults to benchmarks/results/features-<timestamp>.json.')
+    args = parser.parse_args()
+
+    for attr in ('workdir', 'output'):
+        if getattr(args, attr):
+            setattr(args, attr, os.path.abspath(getattr(args, attr)))
+
+    started_at = datetime.now()
+    results = run_features(args)
+
+    output = args.output or os.path.join(_benchmarks_dir, 'results', f"features-{started_at.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, 'w') as file:
+        json.dump({
+            'meta': {
+                'started_at': started_at.isoformat(timespec='seconds'),
+                'git_commit': git_commit(),
+                'scale': {'parks': args.parks, 'rides': args.rides, 'years': args.years, 'seed': args.seed},
+            },
+            'results': results,
+        }, file, indent=2)
+
+    print('\nFeature engine results:')
+    for name, result in results.items():
+        if not isinstance(result, dict):
+            continue
+        parity = '' if 'matches_engine' not in result else ('  parity ok' if result['matches_engine'] else '  PARITY MISMATCH')
+        print(f"  {name:36s} median {result['wall_s_median']:.4f}s{parity}")
+    print(f"  speedup over pandas groupby: {results['speedup']}x")
+    print(f'Wrote results to {output}')
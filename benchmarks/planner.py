@@ -0,0 +1,141 @@
+"""
+Benchmark the queue model's ride order planner on synthetic parks of increasing size.
+
+Each park gets random ride queue curves (a midday peak scaled by the ride's
+popularity, with some rides opening late) and lands for walking times.
+models/queues/planner.plan_rides is timed at width 1 (greedy), at the
+configured beam width and latency budget, and, for small parks, with an
+unbounded width, which makes it an exhaustive DP to measure the beam's gap
+against.
+
+    python benchmarks/planner.py --sizes 10 20 30 45 60
+"""
+
+import argparse
+import json
+import os
+import sys
+from datetime import datetime
+
+_benchmarks_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, _benchmarks_dir)
+
+from run import _model_dir, _project_root, git_commit, time_call
+
+_queues_dir = os.path.join(_project_root, 'models', 'queues')
+for path in (_model_dir, _queues_dir):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+import numpy as np
+
+PARK_OPEN, PARK_CLOSE = 9 * 60, 22 * 60
+RIDES_PER_LAND = 6
+
+def generate_park(n_rides, rng):
+    """
+    Queue curves and walking times for a synthetic park.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: (n_rides, SLOTS_PER_DAY) queue minutes,
+            NaN while closed, and the planner's walking time matrix.
+    """
+    from planner import walking_times
+    from preprocessing import SLOT_MINUTES, SLOTS_PER_DAY
+
+    slots = np.arange(SLOTS_PER_DAY)
+    popularity = rng.gamma(2.0, 15.0, n_rides)
+    peak = rng.uniform(12 * 60, 16 * 60, n_rides) / SLOT_MINUTES
+    curves = popularity[:, None] * np.exp(-((slots[None, :] - peak[:, None]) / 12) ** 2) + rng.uniform(0, 5, (n_rides, 1))
+    curves[:, slots < PARK_OPEN // SLOT_MINUTES] = np.nan
+    curves[:, slots >= PARK_CLOSE // SLOT_MINUTES] = np.nan
+    opens_late = rng.random(n_rides) < 0.15
+    curves[np.ix_(opens_late, slots < (PARK_OPEN + 120) // SLOT_MINUTES)] = np.nan
+    lands = rng.integers(0, max(n_rides // RIDES_PER_LAND, 1), n_rides)
+    return curves, walking_times(lands, 4, 10)
+
+def run_planner(args):
+    """
+    Returns:
+        dict: Results keyed by 'rides_<n>'.
+    """
+    from planner import get_planner_config, plan_rides
+
+    settings = get_planner_config()
+    rng = np.random.default_rng(args.seed)
+    results = {}
+    for n_rides in args.sizes:
+        curves, walk = generate_park(n_rides, rng)
+        runs = {
+            'greedy': {'beam_width': 1},
+            'beam': {'beam_width': settings['beam_width'], 'time_budget_ms': settings['time_budget_ms']},
+        }
+        if n_rides <= args.exact_max:
+            runs['exact'] = {'beam_width': 2 ** 62, 'time_budget_ms': float('inf')}
+
+        result = {}
+        for name, options in runs.items():
+            timing, plan = time_call(lambda: plan_rides(curves, walk, settings['ride_minutes'], PARK_OPEN, **options), args.repeat)
+            result[name] = {
+                **timing,
+                'rides_planned': len(plan['order']),
+                'plan_minutes': round(plan['finish'] - PARK_OPEN, 1),
+                'wait_minutes': round(plan['total_wait'], 1),
+                'states': plan['states'],
+            }
+
+        def gap(name):
+            # Longer plans with the same rides, as a share of the better plan; None if they cover different rides.
+            if result[name]['rides_planned'] != result['beam']['rides_planned']:
+                return None
+            return round((result[name]['plan_minutes'] - result['beam']['plan_minutes']) / result['beam']['plan_minutes'] * 100, 2)
+
+        result['beam_saves_vs_greedy_pct'] = gap('greedy')
+        if 'exact' in result:
+            exact_gap = gap('exact')
+            result['beam_gap_vs_exact_pct'] = -exact_gap if exact_gap is not None else None
+        result['within_budget'] = result['beam']['wall_s_median'] * 1000 <= settings['time_budget_ms']
+        results[f'rides_{n_rides}'] = result
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark the ride order planner on synthetic parks.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 20, 30, 45, 60], help='Rides per park.')
+    parser.add_argument('--exact-max', type=int, default=12, help='Largest park to also solve exhaustively.')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--output', default=None, help='Results JSON path. Defaults to benchmarks/results/planner-<timestamp>.json.')
+    args = parser.parse_args()
+
+    started_at = datetime.now()
+    results = run_planner(args)
+
+    output = os.path.abspath(args.output) if args.output else os.path.join(
+        _benchmarks_dir, 'results', f"planner-{started_at.strftime('%Y%m%d-%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, 'w') as file:
+        json.dump({
+            'meta': {
+                'started_at': started_at.isoformat(timespec='seconds'),
+                'git_commit': git_commit(),
+                'scale': {'sizes': args.sizes, 'exact_max': args.exact_max, 'seed': args.seed},
+            },
+            'results': results,
+        }, file, indent=2)
+
+    print('\nPlanner results (rides planned, plan length in minutes, median time):')
+    for name, result in results.items():
+        line = f"  {name:10s}"
+        for method in ('greedy', 'beam', 'exact'):
+            if method in result:
+                line += (f"  {method} {result[method]['rides_planned']} rides in {result[method]['plan_minutes']:6.1f}"
+                         f" ({result[method]['wall_s_median'] * 1000:6.1f} ms)")
+        if result['beam_saves_vs_greedy_pct'] is not None:
+            line += f"  beam saves {result['beam_saves_vs_greedy_pct']}% vs greedy"
+        if result.get('beam_gap_vs_exact_pct') is not None:
+            line += f", {result['beam_gap_vs_exact_pct']}% over exact"
+        if not result['within_budget']:
+            line += '  OVER BUDGET'
+        print(line)
+    print(f'Wrote results to {output}')
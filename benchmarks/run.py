@@ -0,0 +1,371 @@
+"""
+Reproducible benchmark suite for the scraper, crowd-level pipeline and models.
+
+Runs against a synthetic queue database and stubbed external sources, so
+results are comparable run to run and machine to machine. Each run writes a
+JSON results file; pass --compare with an earlier file to see regressions.
+
+By default the external sources are patched in-process. --fake-server serves
+the same fixtures over local HTTP instead (benchmarks/fake_server.py), so the
+real request paths are timed, optionally with added latency and errors.
+
+    python benchmarks/run.py --parks 3 --rides 30 --years 2
+    python benchmarks/run.py --fake-server --latency-ms 30 --error-rate 0.02
+    python benchmarks/run.py --compare benchmarks/results/<earlier>.json
+"""
+
+import argparse
+import importlib.util
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import nullcontext
+from datetime import datetime
+
+_benchmarks_dir = os.path.dirname(os.path.abspath(__file__))
+_project_root = os.path.abspath(os.path.join(_benchmarks_dir, '..'))
+_model_dir = os.path.join(_project_root, 'models', 'crowd-level')
+_scraping_dir = os.path.join(_project_root, 'scraping')
+
+if _model_dir not in sys.path:
+    sys.path.insert(0, _model_dir)
+if _benchmarks_dir not in sys.path:
+    sys.path.insert(0, _benchmarks_dir)
+
+import numpy as np
+import pandas as pd
+import yaml
+
+from synthetic import generate_queue_database, generate_raw_scrape, get_open_dates
+from stubs import stub_external_sources
+from fake_server import start_fake_server
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+def load_scraping_module(name):
+    """
+    Import a module from scraping/ under a private name.
+
+    scraping/utils.py would otherwise shadow the crowd-level utils package.
+    scraping/ goes at the end of sys.path so its modules can still import
+    their siblings (e.g. database) without shadowing anything.
+    """
+    if _scraping_dir not in sys.path:
+        sys.path.append(_scraping_dir)
+    spec = importlib.util.spec_from_file_location(f'scraping_{name}', os.path.join(_scraping_dir, f'{name}.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+def time_call(func, repeat=3):
+    """
+    Run func `repeat` times and summarise wall time, CPU time and peak RSS growth.
+
+    Returns:
+        tuple[dict, object]: Timing summary and the result of the last call.
+    """
+    walls, cpus = [], []
+    rss_start = peak_rss_mb()
+    result = None
+    for _ in range(repeat):
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        result = func()
+        walls.append(time.perf_counter() - wall_start)
+        cpus.append(time.process_time() - cpu_start)
+    rss_end = peak_rss_mb()
+    return {
+        'repeat': repeat,
+        'wall_s_min': round(min(walls), 5),
+        'wall_s_median': round(float(np.median(walls)), 5),
+        'cpu_s_median': round(float(np.median(cpus)), 5),
+        'peak_rss_delta_mb': round(rss_end - rss_start, 1) if rss_start is not None else None,
+    }, result
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=_project_root,
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def parse_importtime(stderr):
+    """
+    Parse `python -X importtime` output into (module, self_us, cumulative_us, depth) rows.
+    """
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        rows.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return rows
+
+def measure_import_time(module, repeat=3, top=8):
+    """
+    Time a cold import of a crowd-level module in a fresh interpreter with -X importtime.
+
+    Returns:
+        dict: Median cumulative import time of the module, plus the top-level
+            packages it pulls in that take longest to import.
+    """
+    totals, heaviest = [], {}
+    for _ in range(repeat):
+        completed = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+            cwd=_model_dir, capture_output=True, text=True, check=True
+        )
+        rows = parse_importtime(completed.stderr)
+        totals.append(next(c for name, _, c, depth in rows if name == module and depth == 0) / 1e6)
+        # Top-level packages are imported once, wherever they first appear in the tree.
+        for name, _, cumulative_us, depth in rows:
+            if depth > 0 and '.' not in name:
+                heaviest.setdefault(name, []).append(cumulative_us / 1e6)
+    slowest = sorted(((n, float(np.median(t))) for n, t in heaviest.items()), key=lambda x: -x[1])[:top]
+    return {
+        'repeat': repeat,
+        'wall_s_min': round(min(totals), 5),
+        'wall_s_median': round(float(np.median(totals)), 5),
+        'cpu_s_median': None,
+        'slowest_dependencies_s': {name: round(t, 4) for name, t in slowest},
+    }
+
+def write_workspace_config(workdir, park_ids):
+    """
+    Write a config.yml for the synthetic workspace; the pipeline reads it from the working directory.
+    """
+    config = {
+        'scraper': {'park_ids': park_ids, 'exclude_months': [12, 1, 2]},
+        'models': {'crowd-level': {
+            'train': {'model_name': 'benchmark-model', 'include_park_ids': None},
+            'inference': {'model_name': 'benchmark-model', 'park_id': park_ids[0], 'horizon_days': 30},
+        }},
+    }
+    with open(os.path.join(workdir, 'config.yml'), 'w') as file:
+        yaml.safe_dump(config, file)
+
+def run_benchmarks(args):
+    """
+    Build the synthetic workspace and run every benchmark.
+
+    Returns:
+        dict: Results keyed by benchmark name.
+    """
+    results = {}
+    logger = logging.getLogger('benchmark')
+    logger.setLevel(logging.WARNING)
+
+    # ── Startup ──────────────────────────────────────────────────────────────
+    for module in ('utils.preprocess', 'inference'):
+        results[f'import_{module}'] = measure_import_time(module, args.repeat)
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix='tpqm-bench-')
+    os.makedirs(workdir, exist_ok=True)
+    os.chdir(workdir)
+    # Stage reports from the pipeline's own instrumentation are not needed here.
+    os.environ['PIPELINE_REPORT_DIR'] = ''
+
+    db_path = os.path.join('data', 'queue_data.db')
+    timing, summary = time_call(lambda: generate_queue_database(
+        db_path, n_parks=args.parks, n_rides=args.rides, n_years=args.years, seed=args.seed
+    ), repeat=1)
+    results['generate_synthetic_database'] = {**timing, 'rows': summary['n_rows']}
+    park_ids = summary['park_ids']
+    write_workspace_config(workdir, park_ids)
+
+    scraping_utils = load_scraping_module('utils')
+    scraping_database = load_scraping_module('database')
+    parquet_export = load_scraping_module('parquet_export')
+    from utils.helpers import load_all_data, load_queue_data_typed
+    from utils.preprocess import generate_training
+    from utils.opening import get_opening_hours
+    from utils.pipeline import model_pipeline
+    from utils.quantile import build_leaf_index
+    from inference import predict_parks
+    from sklearn.ensemble import RandomForestRegressor
+
+    rng = np.random.default_rng(args.seed)
+
+    # ── Scraper ──────────────────────────────────────────────────────────────
+    raw = generate_raw_scrape(park_ids[0], args.rides, '2024/06/15', rng)
+    timing, filtered = time_call(lambda: scraping_utils.filter_data_to_intervals(raw, '2024/06/15', logger), args.repeat)
+    results['filter_data_to_intervals'] = {**timing, 'rides': len(raw), 'raw_points': sum(len(r['data_points']) for r in raw)}
+
+    store_db = os.path.join('data', 'store_benchmark.db')
+
+    def store_once():
+        if os.path.exists(store_db):
+            os.remove(store_db)
+        import sqlite3
+        conn = sqlite3.connect(store_db)
+        conn.execute("""
+            CREATE TABLE queue_data (
+                id INTEGER PRIMARY KEY AUTOINCREMENT, date TEXT, ride_id TEXT,
+                time_of_day TEXT, queue_time INTEGER, is_closed INTEGER
+            )
+        """)
+        scraping_database.create_ride_info_table(conn.cursor())
+        scraping_database.store_data(conn, '2024/06/15', filtered, logger)
+        conn.close()
+
+    timing, _ = time_call(store_once, args.repeat)
+    results['store_data'] = {**timing, 'rows': sum(len(r['data_points']) for r in filtered)}
+
+    if args.fake_server:
+        server, base_url = start_fake_server(
+            park_ids, latency_ms=args.latency_ms, error_rate=args.error_rate, seed=args.seed
+        )
+        os.environ['SOURCE_BASE_URL'] = base_url
+        os.environ['GOOGLE_AI_API_KEY'] = 'fake-server'
+        sources = nullcontext()
+    else:
+        server = None
+        sources = stub_external_sources(park_ids)
+
+    # ── Loading ──────────────────────────────────────────────────────────────
+    def mb_per_million_rows(df):
+        return round(df.memory_usage(deep=True).sum() / len(df) * 1e6 / 2**20, 1)
+
+    timing, queue_data = time_call(lambda: load_all_data(db_path)['queue_data'], args.repeat)
+    results['load_all_data'] = {**timing, 'rows': len(queue_data), 'mb_per_million_rows': mb_per_million_rows(queue_data)}
+    timing, queue_data = time_call(lambda: load_queue_data_typed(db_path), args.repeat)
+    results['load_queue_data_typed'] = {**timing, 'rows': len(queue_data), 'mb_per_million_rows': mb_per_million_rows(queue_data)}
+
+    parquet_dir = os.path.join('data', 'queue_parquet')
+    timing, n_rows = time_call(lambda: parquet_export.export_database(db_path, logger, parquet_dir), repeat=1)
+    results['export_parquet'] = {**timing, 'rows': n_rows}
+    timing, queue_data = time_call(lambda: load_all_data(backend='parquet', parquet_dir=parquet_dir)['queue_data'], args.repeat)
+    results['load_all_data_parquet'] = {**timing, 'rows': len(queue_data)}
+    timing, queue_data = time_call(lambda: load_queue_data_typed(backend='parquet', parquet_dir=parquet_dir), args.repeat)
+    results['load_queue_data_typed_parquet'] = {**timing, 'rows': len(queue_data)}
+    del queue_data
+
+    with sources:
+        # ── Crowd-level preprocessing ────────────────────────────────────────
+        timing, training_targets = time_call(lambda: generate_training(None), args.repeat)
+        results['generate_training'] = {**timing, 'rows_out': len(training_targets)}
+
+        dates = [d.strftime('%Y-%m-%d') for d in get_open_dates('2022-04-01', args.years)][-60:]
+        timing, _ = time_call(lambda: get_opening_hours(park_ids[0], dates), args.repeat)
+        results['get_opening_hours'] = {**timing, 'dates': len(dates)}
+
+        timing, training_data = time_call(lambda: model_pipeline(is_training=True), args.repeat)
+        results['model_pipeline_training'] = {**timing, 'rows_out': len(training_data)}
+
+        # ── Training ─────────────────────────────────────────────────────────
+        X = training_data.drop('crowd_level', axis=1)
+        y = training_data['crowd_level']
+
+        def fit():
+            model = RandomForestRegressor(n_estimators=200, max_depth=20, max_features='sqrt', random_state=42, n_jobs=-1)
+            return model.fit(X, y)
+
+        timing, model = time_call(fit, repeat=1)
+        results['train_random_forest'] = {**timing, 'rows': len(X), 'features': X.shape[1]}
+
+        timing, leaf_index = time_call(lambda: build_leaf_index(model, X, y), repeat=1)
+        results['build_leaf_index'] = timing
+
+        # ── Dashboard-style inference ────────────────────────────────────────
+        feature_columns = X.columns.tolist()
+        horizon = pd.date_range(pd.Timestamp.today().normalize(), periods=30)
+        timing, predictions = time_call(
+            lambda: predict_parks(model, feature_columns, [park_ids[0]], horizon, leaf_index), args.repeat
+        )
+        results['inference_single_park_30d'] = {**timing, 'rows_out': len(predictions)}
+
+        horizon = pd.date_range(pd.Timestamp.today().normalize(), periods=365)
+        timing, predictions = time_call(
+            lambda: predict_parks(model, feature_columns, park_ids, horizon, leaf_index), repeat=1
+        )
+        results['inference_all_parks_365d'] = {**timing, 'rows_out': len(predictions)}
+
+    if server is not None:
+        server.shutdown()
+        print(f"Fake server answered {server.faults.counts['requests']} requests ({server.faults.counts['errors']} injected errors)")
+
+    return results
+
+def compare(results, previous_path):
+    """
+    Print the median wall time ratio of each benchmark against an earlier results file.
+    """
+    with open(previous_path) as file:
+        previous = json.load(file)['results']
+    print(f'\nComparison against {previous_path} (ratio > 1 is slower):')
+    for name, current in results.items():
+        if name not in previous:
+            continue
+        before = previous[name]['wall_s_median']
+        after = current['wall_s_median']
+        ratio = after / before if before else float('nan')
+        flag = '  <-- regression' if ratio > 1.1 else ''
+        print(f'  {name:32s} {before:10.4f}s -> {after:10.4f}s  x{ratio:.2f}{flag}')
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Run the benchmark suite against synthetic data.')
+    parser.add_argument('--parks', type=int, default=3)
+    parser.add_argument('--rides', type=int, default=30)
+    parser.add_argument('--years', type=float, default=2.0)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--workdir', default=None, help='Directory for the synthetic workspace (temporary if omitted).')
+    parser.add_argument('--output', default=None, help='Results JSON path. Defaults to benchmarks/results/<timestamp>.json.')
+    parser.add_argument('--compare', default=None, help='Earlier results JSON to compare against.')
+    parser.add_argument('--fake-server', action='store_true', help='Serve external sources over local HTTP instead of patching them.')
+    parser.add_argument('--latency-ms', type=float, default=0.0, help='Added latency per fake server request.')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of fake server requests that fail.')
+    args = parser.parse_args()
+
+    # The suite changes into the synthetic workspace, so pin user paths first.
+    for attr in ('workdir', 'output', 'compare'):
+        if getattr(args, attr):
+            setattr(args, attr, os.path.abspath(getattr(args, attr)))
+
+    started_at = datetime.now()
+    results = run_benchmarks(args)
+
+    output = args.output or os.path.join(_benchmarks_dir, 'results', f"{started_at.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, 'w') as file:
+        json.dump({
+            'meta': {
+                'started_at': started_at.isoformat(timespec='seconds'),
+                'git_commit': git_commit(),
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'numpy': np.__version__,
+                'pandas': pd.__version__,
+                'scale': {'parks': args.parks, 'rides': args.rides, 'years': args.years, 'seed': args.seed},
+                'sources': (
+                    {'mode': 'fake-server', 'latency_ms': args.latency_ms, 'error_rate': args.error_rate}
+                    if args.fake_server else {'mode': 'in-process'}
+                ),
+            },
+            'results': results,
+        }, file, indent=2)
+
+    print('\nBenchmark results:')
+    for name, result in results.items():
+        cpu = f"{result['cpu_s_median']:.4f}s" if result['cpu_s_median'] is not None else '-'
+        print(f"  {name:32s} median {result['wall_s_median']:.4f}s  cpu {cpu}")
+    print(f'Wrote results to {output}')
+
+    if args.compare:
+        compare(results, args.compare)
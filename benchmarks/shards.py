@@ -0,0 +1,164 @@
+"""
+Compare per-park (or per-country) crowd level model shards with the global model.
+
+Builds a synthetic workspace with stubbed external sources, runs the training
+pipeline once, and splits it as train.py does. The global forest and the
+shards are then trained on the same rows and scored on the same held-out
+rows: accuracy per shard and overall, training wall time, and model latency
+for a whole batch and for a single park's 30-day request, with and without
+quantiles. Hyperparameters are fixed by default so runs are comparable;
+--search runs train.py's Bayesian search for each model instead.
+
+    python benchmarks/shards.py --parks 6 --rides 20 --years 2
+    python benchmarks/shards.py --shard-by country --workers 2
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+from datetime import datetime
+
+_benchmarks_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, _benchmarks_dir)
+
+from run import _model_dir, git_commit, time_call, write_workspace_config
+from stubs import stub_external_sources
+from synthetic import generate_queue_database
+
+if _model_dir not in sys.path:
+    sys.path.insert(0, _model_dir)
+
+import numpy as np
+
+# Same forest as run.py's train_random_forest benchmark.
+FIXED_PARAMS = {'n_estimators': 200, 'max_depth': 20, 'max_features': 'sqrt'}
+
+def model_latency(model, X, leaf_index, repeat):
+    """
+    Time predict and quantile predictions over X.
+    """
+    from utils.quantile import predict_quantiles
+
+    timing, _ = time_call(lambda: model.predict(X), repeat)
+    result = {'predict_ms': round(timing['wall_s_median'] * 1000, 2)}
+    if leaf_index is not None:
+        timing, _ = time_call(lambda: predict_quantiles(model, leaf_index, X), repeat)
+        result['quantiles_ms'] = round(timing['wall_s_median'] * 1000, 2)
+    return result
+
+def run_shards(args):
+    """
+    Returns:
+        dict: 'global' and 'sharded' training and latency results, and 'accuracy' per shard.
+    """
+    workdir = args.workdir or tempfile.mkdtemp(prefix='tpqm-shards-')
+    os.makedirs(workdir, exist_ok=True)
+    os.chdir(workdir)
+    os.environ['PIPELINE_REPORT_DIR'] = ''
+
+    db_path = os.path.join('data', 'queue_data.db')
+    _, summary = time_call(lambda: generate_queue_database(
+        db_path, n_parks=args.parks, n_rides=args.rides, n_years=args.years, seed=args.seed
+    ), repeat=1)
+    park_ids = summary['park_ids']
+    write_workspace_config(workdir, park_ids)
+
+    from sklearn.model_selection import train_test_split
+    from train import train_shard, train_shards
+    from utils.pipeline import model_pipeline
+    from utils.shards import ShardedModel, row_park_ids, shard_report
+
+    params = None if args.search else FIXED_PARAMS
+    with stub_external_sources(park_ids):
+        training_data = model_pipeline(is_training=True)
+        X = training_data.drop('crowd_level', axis=1)
+        y = training_data['crowd_level']
+        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, shuffle=True, random_state=104)
+
+        timing, trained = time_call(lambda: train_shard('global', X_train, y_train, n_iter=args.n_iter, params=params), repeat=1)
+        results = {'global': {'train_s': timing['wall_s_median'], 'rows': len(X_train), 'features': X_train.shape[1]}}
+        global_model, global_leaves = trained['model'], trained['leaf_index']
+
+        timing, (routes, shards) = time_call(
+            lambda: train_shards(X_train, y_train, args.shard_by, workers=args.workers, n_iter=args.n_iter, params=params), repeat=1
+        )
+        results['sharded'] = {
+            'train_s': timing['wall_s_median'],
+            'shards': {name: {'parks': s['parks'], 'rows': s['rows'], 'train_s': s['train_s']} for name, s in shards.items()},
+        }
+
+    sharded = ShardedModel(
+        {'shard_by': args.shard_by, 'routes': routes, 'shards': {name: {'rows': s['rows']} for name, s in shards.items()}},
+        {name: s['model'] for name, s in shards.items()},
+        {name: s['columns'] for name, s in shards.items()},
+        {name: s['leaf_index'] for name, s in shards.items()},
+    )
+
+    # Latency on the whole held-out set, and on one park's first 30 held-out rows (a dashboard request).
+    X_global = X_test.reindex(columns=X_train.columns, fill_value=0)
+    X_sharded = X_test.reindex(columns=sharded.feature_columns, fill_value=0)
+    one_park = np.flatnonzero(row_park_ids(X_test) == park_ids[0])[:30]
+    for name, model, X_model, leaves in (
+        ('global', global_model, X_global, global_leaves),
+        ('sharded', sharded, X_sharded, sharded.leaf_indexes),
+    ):
+        results[name]['batch'] = {'rows': len(X_model), **model_latency(model, X_model, leaves, args.repeat)}
+        results[name]['single_park_30d'] = model_latency(model, X_model.iloc[one_park], leaves, args.repeat)
+
+    shard_of_row = sharded.route(X_sharded)
+    accuracy = shard_report(shard_of_row, y_test, sharded.predict(X_sharded)).join(
+        shard_report(shard_of_row, y_test, global_model.predict(X_global)).add_prefix('global_').drop(columns='global_rows')
+    )
+    results['accuracy'] = accuracy.reset_index().to_dict(orient='records')
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark crowd level model shards against the global model.')
+    parser.add_argument('--parks', type=int, default=6)
+    parser.add_argument('--rides', type=int, default=20)
+    parser.add_argument('--years', type=float, default=2.0)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--shard-by', choices=['park', 'country'], default='park')
+    parser.add_argument('--workers', type=int, default=None, help='Shard training processes (default: one per shard up to the CPU count).')
+    parser.add_argument('--search', action='store_true', help="Tune every model with train.py's Bayesian search (needs scikit-optimize).")
+    parser.add_argument('--n-iter', type=int, default=20, help='Search iterations per model with --search.')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--workdir', default=None, help='Directory for the synthetic workspace (temporary if omitted).')
+    parser.add_argument('--output', default=None, help='Results JSON path. Defaults to benchmarks/results/shards-<timestamp>.json.')
+    args = parser.parse_args()
+
+    for attr in ('workdir', 'output'):
+        if getattr(args, attr):
+            setattr(args, attr, os.path.abspath(getattr(args, attr)))
+
+    started_at = datetime.now()
+    results = run_shards(args)
+
+    output = args.output or os.path.join(_benchmarks_dir, 'results', f"shards-{started_at.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, 'w') as file:
+        json.dump({
+            'meta': {
+                'started_at': started_at.isoformat(timespec='seconds'),
+                'git_commit': git_commit(),
+                'scale': {'parks': args.parks, 'rides': args.rides, 'years': args.years, 'seed': args.seed},
+                'shard_by': args.shard_by,
+                'search': args.search,
+            },
+            'results': results,
+        }, file, indent=2, default=str)
+
+    print('\nShards vs global model:')
+    for name in ('global', 'sharded'):
+        result = results[name]
+        print(f"  {name:8s} trained in {result['train_s']:.1f}s; "
+              f"batch of {result['batch']['rows']} rows {result['batch']['predict_ms']} ms "
+              f"({result['batch'].get('quantiles_ms')} ms with quantiles); "
+              f"single park 30 days {result['single_park_30d']['predict_ms']} ms "
+              f"({result['single_park_30d'].get('quantiles_ms')} ms with quantiles)")
+    print(f"  {'shard':16s} {'rows':>6s} {'MAE':>7s} {'global':>7s} {'RMSE':>7s} {'global':>7s}")
+    for row in results['accuracy']:
+        print(f"  {row['shard']:16s} {row['rows']:6d} {row['mae']:7.3f} {row['global_mae']:7.3f} {row['rmse']:7.3f} {row['global_rmse']:7.3f}")
+    print(f'Wrote results to {output}')
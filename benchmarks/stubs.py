@@ -0,0 +1,225 @@
+"""Deterministic stand-ins for every external source the crowd-level pipeline calls."""
+
+import json
+import re
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from unittest import mock
+import numpy as np
+import pandas as pd
+
+COUNTRIES = ['United Kingdom', 'United States', 'Germany', 'France', 'Netherlands']
+
+def park_name(park_id):
+    return f'Synthetic Park {park_id}'
+
+def parks_catalogue(park_ids):
+    """
+    queue-times.com/parks.json payload for the synthetic parks.
+    """
+    return [{
+        'id': 1,
+        'name': 'Synthetic Parks Group',
+        'parks': [
+            {
+                'id': park_id,
+                'name': park_name(park_id),
+                'country': COUNTRIES[(park_id - 1) % len(COUNTRIES)],
+                'latitude': f'{50 + park_id * 0.1:.4f}',
+                'longitude': f'{-1 + park_id * 0.1:.4f}',
+                'timezone': 'Europe/London',
+            }
+            for park_id in park_ids
+        ],
+    }]
+
+def live_queue_times(park_id, now=None, n_rides=10):
+    """
+    queue-times.com/parks/<id>/queue_times.json payload: each ride updated on the last 5-minute mark.
+
+    Waits are a deterministic function of ride and update time; about 1 in 20 readings is closed.
+    """
+    now = now or datetime.now(timezone.utc)
+    updated = now.replace(minute=now.minute - now.minute % 5, second=0, microsecond=0)
+    step = int(updated.timestamp()) // 300
+    rides = []
+    for r in range(n_rides):
+        ride_id = int(park_id) * 1000 + r
+        closed = (step + r) % 20 == 0
+        rides.append({
+            'id': ride_id,
+            'name': f'Ride {r}',
+            'is_open': not closed,
+            'wait_time': 0 if closed else 5 * ((step * 7 + r * 13) % 12),
+            'last_updated': updated.strftime('%Y-%m-%dT%H:%M:%S.000Z'),
+        })
+    return {'lands': [{'id': int(park_id), 'name': 'Main Land', 'rides': rides}], 'rides': []}
+
+def destinations_catalogue(park_ids):
+    """
+    api.themeparks.wiki/v1/destinations payload for the synthetic parks.
+    """
+    return {'destinations': [{'parks': [{'name': park_name(p), 'id': f'tp-{p}'} for p in park_ids]}]}
+
+def month_schedule(year, month):
+    """
+    themeparks.wiki monthly schedule with 10:00-18:00 opening every day.
+    """
+    start = datetime(int(year), int(month), 1)
+    days = []
+    day = start
+    while day.month == start.month:
+        days.append({
+            'date': day.strftime('%Y-%m-%d'),
+            'openingTime': day.strftime('%Y-%m-%dT10:00:00Z'),
+            'closingTime': day.strftime('%Y-%m-%dT18:00:00Z'),
+        })
+        day += timedelta(days=1)
+    return {'schedule': days}
+
+def public_holidays(year):
+    """
+    Nager.Date public holiday payload with a fixed set of dates.
+    """
+    return [{'date': f'{year}-{md}'} for md in ('01-01', '04-18', '05-05', '08-25', '12-25', '12-26')]
+
+def weather_forecast(start_date, end_date):
+    """
+    Open-Meteo daily forecast payload for a date range.
+    """
+    dates = pd.date_range(start_date, end_date)
+    doy = dates.dayofyear.to_numpy()
+    return {'daily': {
+        'time': dates.strftime('%Y-%m-%d').tolist(),
+        'temperature_2m_mean': (12 + 8 * np.sin((doy - 100) / 365 * 2 * np.pi)).round(1).tolist(),
+        'precipitation_sum': ((doy * 7) % 5 * 0.8).round(1).tolist(),
+        'windspeed_10m_mean': (10 + (doy % 7)).astype(float).tolist(),
+    }}
+
+def weather_stations(park_ids):
+    """
+    Meteostat stations/slim.csv rows: one station at each synthetic park with a long daily inventory.
+    """
+    parks = parks_catalogue(park_ids)[0]['parks']
+    return pd.DataFrame({
+        'id': [f'SYN{p["id"]:02d}' for p in parks],
+        'name': [f'{p["name"]} Weather' for p in parks],
+        'country': 'GB',
+        'region': None,
+        'wmo': None,
+        'icao': None,
+        'latitude': [float(p['latitude']) for p in parks],
+        'longitude': [float(p['longitude']) for p in parks],
+        'elevation': 50.0,
+        'timezone': 'Europe/London',
+        'hourly_start': None,
+        'hourly_end': None,
+        'daily_start': '1990-01-01',
+        'daily_end': '2099-12-31',
+        'monthly_start': None,
+        'monthly_end': None,
+    })
+
+def daily_weather(start_date, end_date):
+    """
+    Smooth seasonal daily series with Meteostat's tavg/prcp/wspd columns, indexed by date.
+    """
+    dates = pd.date_range(start_date, end_date)
+    doy = dates.dayofyear.to_numpy()
+    return pd.DataFrame({
+        'tavg': 12 + 8 * np.sin((doy - 100) / 365 * 2 * np.pi),
+        'prcp': (doy * 7) % 5 * 0.8,
+        'wspd': 10.0 + (doy % 7),
+    }, index=dates)
+
+def school_holiday_periods(start_year, end_year):
+    """
+    Gemini-style JSON array of school holiday periods.
+    """
+    periods = []
+    for year in range(start_year, end_year + 1):
+        periods += [
+            {'holiday_name': 'Easter', 'start_date': f'{year}-04-01', 'end_date': f'{year}-04-14'},
+            {'holiday_name': 'Summer', 'start_date': f'{year}-07-20', 'end_date': f'{year}-09-01'},
+            {'holiday_name': 'October half term', 'start_date': f'{year}-10-24', 'end_date': f'{year}-11-01'},
+        ]
+    return periods
+
+class FakeResponse:
+    def __init__(self, payload, status_code=200):
+        self.status_code = status_code
+        self._payload = payload
+        self.text = json.dumps(payload)
+
+    def json(self):
+        return self._payload
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            import requests
+            raise requests.HTTPError(f'{self.status_code} error', response=self)
+
+def route_request(url, params, park_ids):
+    """
+    Answer a requests.get call against the synthetic fixtures.
+    """
+    if url.endswith('/parks.json'):
+        return FakeResponse(parks_catalogue(park_ids))
+    if url.endswith('/v1/destinations'):
+        return FakeResponse(destinations_catalogue(park_ids))
+    match = re.search(r'/schedule/(\d{4})/(\d{1,2})$', url)
+    if match:
+        return FakeResponse(month_schedule(*match.groups()))
+    match = re.search(r'/PublicHolidays/(\d{4})/', url)
+    if match:
+        return FakeResponse(public_holidays(match.group(1)))
+    if 'open-meteo' in url:
+        return FakeResponse(weather_forecast(params['start_date'], params['end_date']))
+    return FakeResponse({'error': f'no stub for {url}'}, status_code=404)
+
+class FakeDaily:
+    """
+    Stand-in for meteostat.Daily returning a smooth seasonal series.
+    """
+    def __init__(self, location, start, end):
+        self.start, self.end = start, end
+
+    def fetch(self):
+        return daily_weather(self.start, self.end)
+
+class FakeGenaiClient:
+    """
+    Stand-in for google.genai.Client answering the school holiday prompt.
+    """
+    def __init__(self, api_key=None, **kwargs):
+        self.models = self
+
+    def generate_content(self, model, contents, config=None):
+        years = [int(y) for y in re.findall(r'\b(\d{4})\b', contents)]
+        return mock.Mock(text=json.dumps(school_holiday_periods(min(years), max(years))))
+
+@contextmanager
+def stub_external_sources(park_ids):
+    """
+    Patch every external source used by the crowd-level pipeline with deterministic fixtures.
+
+    Covers queue-times.com, themeparks.wiki, Nager.Date and Open-Meteo (all via
+    requests.get), Meteostat and Gemini. Must be entered after utils.* is importable.
+
+    Args:
+        park_ids (list[int]): Parks present in the synthetic database.
+    """
+    # The pipeline imports these on first use, so patching the modules themselves covers it.
+    import meteostat
+    import requests
+    from google import genai
+    from utils import helpers
+
+    helpers._json_cache.clear()
+    with mock.patch.object(requests, 'get', lambda url, params=None, **kw: route_request(url, params, park_ids)), \
+         mock.patch.object(meteostat, 'Daily', FakeDaily), \
+         mock.patch.object(meteostat, 'Point', lambda lat, lon: (lat, lon)), \
+         mock.patch.object(genai, 'Client', FakeGenaiClient), \
+         mock.patch.dict('os.environ', {'GOOGLE_AI_API_KEY': 'stub'}):
+        yield
+    helpers._json_cache.clear()
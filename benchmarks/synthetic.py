@@ -0,0 +1,230 @@
+"""Synthetic queue_data/park_info databases for benchmarking without scraped data."""
+
+import importlib.util
+import logging
+import os
+import sqlite3
+from datetime import datetime, timedelta
+import numpy as np
+
+_scraping_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'scraping')
+
+# Same schema the scraper creates in scraping/database.py.
+QUEUE_DATA_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS queue_data (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        date TEXT,
+        ride_id TEXT,
+        time_of_day TEXT,
+        queue_time INTEGER,
+        is_closed INTEGER  -- 0 for False, 1 for True
+    )
+"""
+PARK_INFO_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS park_info (
+        ride_id TEXT,
+        park_id TEXT,
+        ride_name TEXT,
+        PRIMARY KEY (ride_id, park_id)
+    )
+"""
+# Same indexes as INDEXES in scraping/database.py, built after the bulk insert.
+INDEX_STATEMENTS = [
+    "CREATE INDEX IF NOT EXISTS idx_queue_data_ride_date ON queue_data (ride_id, date)",
+    "CREATE INDEX IF NOT EXISTS idx_queue_data_date ON queue_data (date)",
+    "CREATE INDEX IF NOT EXISTS idx_park_info_park ON park_info (park_id)",
+    "CREATE INDEX IF NOT EXISTS idx_ride_info_park_seen ON ride_info (park_id, last_seen, first_seen)",
+]
+
+def _scraping_database():
+    """
+    scraping/database.py, for the ride_info schema and rebuild the scraper uses.
+    """
+    spec = importlib.util.spec_from_file_location('scraping_database', os.path.join(_scraping_dir, 'database.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+SLOT_MINUTES = 15
+
+def get_open_dates(start_date, n_years, exclude_months=(12, 1, 2)):
+    """
+    Get every date in the synthetic history, skipping excluded (closed season) months.
+
+    Args:
+        start_date (str): First date in YYYY-MM-DD format.
+        n_years (float): Length of the history in years.
+        exclude_months (tuple[int]): Months with no data, matching config.yml's exclude_months.
+
+    Returns:
+        list[datetime]: Dates the parks are open.
+    """
+    start = datetime.strptime(start_date, '%Y-%m-%d')
+    n_days = int(round(365 * n_years))
+    return [
+        start + timedelta(days=i)
+        for i in range(n_days)
+        if (start + timedelta(days=i)).month not in exclude_months
+    ]
+
+def ride_id_for(park_id, ride_index):
+    return str(park_id * 1000 + ride_index)
+
+def generate_park_rows(park_id, n_rides, dates, rng, open_hour=10, close_hour=18, retired_share=0.0):
+    """
+    Generate 15-minute queue readings for every ride in one park.
+
+    Daily busyness follows a summer peak, a weekend uplift and noise; each
+    ride has its own popularity and an intraday curve peaking early afternoon.
+    About 3% of readings are closures (queue_time 0, is_closed 1), as the
+    scraper records them. A retired_share of the rides close for good at a
+    random point in the first half of the history and are reported closed
+    from then on, as the feed keeps listing removed rides.
+
+    Args:
+        park_id (int): Park ID.
+        n_rides (int): Number of rides in the park.
+        dates (list[datetime]): Dates to generate.
+        rng (np.random.Generator): Random generator.
+        open_hour (int): First reading hour.
+        close_hour (int): Last reading hour.
+        retired_share (float): Share of rides retired part way through.
+
+    Returns:
+        tuple[np.ndarray, ...]: Parallel arrays of date strings, ride IDs, times, queue times and closed flags.
+    """
+    n_days = len(dates)
+    n_slots = (close_hour - open_hour) * 60 // SLOT_MINUTES + 1
+
+    day_of_year = np.array([d.timetuple().tm_yday for d in dates])
+    weekend = np.array([d.weekday() >= 5 for d in dates])
+    crowd = (
+        1.0
+        + 0.4 * np.sin((day_of_year - 100) / 365 * 2 * np.pi)
+        + 0.3 * weekend
+        + rng.normal(0, 0.15, n_days)
+    ).clip(0.2)
+
+    popularity = rng.gamma(2.0, 12.0, n_rides)
+    slot_hours = open_hour + np.arange(n_slots) * SLOT_MINUTES / 60
+    intraday = np.exp(-((slot_hours - 14) ** 2) / 12)
+
+    queue = crowd[:, None, None] * popularity[None, :, None] * (0.3 + intraday[None, None, :])
+    queue = queue + rng.normal(0, 3, queue.shape)
+    queue = (np.round(queue.clip(0) / 5) * 5).astype(np.int64)
+    closed = rng.random(queue.shape) < 0.03
+    retired = rng.random(n_rides) < retired_share
+    retired_from = rng.integers(0, max(n_days // 2, 1), n_rides)
+    closed |= (retired[None, :] & (np.arange(n_days)[:, None] >= retired_from[None, :]))[:, :, None]
+    queue[closed] = 0
+
+    date_strs = np.array([d.strftime('%Y/%m/%d') for d in dates])
+    ride_ids = np.array([ride_id_for(park_id, r) for r in range(n_rides)])
+    times = np.array([
+        f'{open_hour + (s * SLOT_MINUTES) // 60:02d}:{(s * SLOT_MINUTES) % 60:02d}'
+        for s in range(n_slots)
+    ])
+
+    shape = queue.shape
+    return (
+        np.broadcast_to(date_strs[:, None, None], shape).ravel(),
+        np.broadcast_to(ride_ids[None, :, None], shape).ravel(),
+        np.broadcast_to(times[None, None, :], shape).ravel(),
+        queue.ravel(),
+        closed.astype(np.int64).ravel(),
+    )
+
+def generate_queue_database(db_path, n_parks=3, n_rides=30, n_years=2.0, start_date='2022-04-01', seed=42,
+                            retired_share=0.0):
+    """
+    Create a queue_data/park_info database of N parks x M rides x Y years of 15-minute readings.
+
+    Park IDs are 1..n_parks and ride IDs are park_id * 1000 + ride index.
+    ride_info is built from the readings as the scraper would for an
+    existing database.
+
+    Args:
+        db_path (str): Path of the SQLite database to create (replaced if it exists).
+        n_parks (int): Number of parks.
+        n_rides (int): Rides per park.
+        n_years (float): Years of history.
+        start_date (str): First date in YYYY-MM-DD format.
+        seed (int): Random seed, so the same parameters always produce the same database.
+        retired_share (float): Share of rides retired part way through (see generate_park_rows).
+
+    Returns:
+        dict: Summary with park_ids, number of dates and rows written.
+    """
+    os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+    if os.path.exists(db_path):
+        os.remove(db_path)
+
+    rng = np.random.default_rng(seed)
+    dates = get_open_dates(start_date, n_years)
+    park_ids = list(range(1, n_parks + 1))
+
+    conn = sqlite3.connect(db_path)
+    conn.execute(QUEUE_DATA_SCHEMA)
+    conn.execute(PARK_INFO_SCHEMA)
+    database = _scraping_database()
+    database.create_ride_info_table(conn.cursor())
+
+    n_rows = 0
+    for park_id in park_ids:
+        conn.executemany(
+            "INSERT INTO park_info (ride_id, park_id, ride_name) VALUES (?, ?, ?)",
+            [(ride_id_for(park_id, r), str(park_id), f'Ride {r}') for r in range(n_rides)]
+        )
+        columns = generate_park_rows(park_id, n_rides, dates, rng, retired_share=retired_share)
+        conn.executemany(
+            "INSERT INTO queue_data (date, ride_id, time_of_day, queue_time, is_closed) VALUES (?, ?, ?, ?, ?)",
+            zip(*(c.tolist() for c in columns))
+        )
+        n_rows += len(columns[0])
+    conn.commit()
+    database.rebuild_ride_info(conn, logging.getLogger(__name__))
+    for statement in INDEX_STATEMENTS:
+        conn.execute(statement)
+    conn.commit()
+    conn.close()
+
+    print(f'Generated {n_rows} queue readings for {n_parks} parks x {n_rides} rides over {len(dates)} days at {db_path}')
+    return {'park_ids': park_ids, 'n_dates': len(dates), 'n_rows': n_rows}
+
+def generate_raw_scrape(park_id, n_rides, date, rng, reading_minutes=5):
+    """
+    Generate one day of raw scraped chart data, as extract_data returns it.
+
+    Readings are every reading_minutes with a few seconds of jitter, so
+    filter_data_to_intervals has real alignment work to do.
+
+    Args:
+        park_id (int): Park ID.
+        n_rides (int): Number of rides.
+        date (str): Date in YYYY/MM/DD format.
+        rng (np.random.Generator): Random generator.
+        reading_minutes (int): Minutes between raw readings.
+
+    Returns:
+        list[dict]: Ride dicts with ride_id, ride_name, park_id and data_points.
+    """
+    day = datetime.strptime(date, '%Y/%m/%d').replace(hour=9, minute=58)
+    n_points = 9 * 60 // reading_minutes
+    data = []
+    for r in range(n_rides):
+        offsets = np.arange(n_points) * reading_minutes * 60 + rng.integers(0, 90, n_points)
+        queue = (rng.gamma(2.0, 10.0, n_points) // 5 * 5).astype(int)
+        data.append({
+            'ride_id': ride_id_for(park_id, r),
+            'ride_name': f'Ride {r}',
+            'park_id': str(park_id),
+            'data_points': [
+                {
+                    'time_of_day': (day + timedelta(seconds=int(o))).strftime('%Y-%m-%d %H:%M:%S'),
+                    'queue_time': int(q),
+                    'is_closed': int(q == 0),
+                }
+                for o, q in zip(offsets, queue)
+            ],
+        })
+    return data
@@ -7,17 +7,20 @@ from typing import Optional
 
 # Resolve project root and point Python at the crowd-level model package
 # before any local imports are attempted. All relative file paths in the
-# pipeline (config.yml, data/queue_Data.db) are anchored to the project root.
+# pipeline (config.yml, data/queue_data.db) are anchored to the project root.
 _dashboard_dir = os.path.dirname(os.path.abspath(__file__))
 _project_root = os.path.abspath(os.path.join(_dashboard_dir, ".."))
 _model_dir = os.path.join(_project_root, "models", "crowd-level")
+_queues_dir = os.path.join(_project_root, "models", "queues")
 
 os.chdir(_project_root)
 
 if _model_dir not in sys.path:
     sys.path.insert(0, _model_dir)
+# Appended, so the crowd-level scripts keep priority over the queue model's.
+if _queues_dir not in sys.path:
+    sys.path.append(_queues_dir)
 
-import joblib
 import numpy as np
 import pandas as pd
 import plotly.express as px
@@ -26,6 +29,12 @@ import streamlit as st
 import yaml
 
 from utils.pipeline import model_pipeline
+from utils.quantile import predict_quantiles
+from utils.forecasts import load_predictions
+from utils.registry import HotModel, exports_dir
+from inference import get_inference_model_name, load_hot_model
+from pipeline import get_queue_config
+from profiles import load_ride_profiles, lookup_ride_profiles
 
 # ─── Page config ──────────────────────────────────────────────────────────────
 
@@ -39,34 +48,66 @@ st.set_page_config(
 
 
 @st.cache_resource(show_spinner="Loading model…")
+def get_hot_model() -> HotModel:
+    """
+    The registry's current crowd level model, shared by every session.
+
+    With shard_by set in config, this follows the per-park (or per-country)
+    shards, which predict through the same interface. A newly published
+    version is loaded in the background and used from the next rerun after
+    it is ready, so the app never restarts or waits on it.
+
+    Returns:
+        HotModel for the inference model name.
+    """
+    return load_hot_model()
+
+
+def load_current_model() -> Optional[dict]:
+    """
+    The model to predict with, as a single snapshot of model, columns and leaf index.
+
+    Returns:
+        Dict with version (None for exports saved before the registry), model,
+        feature_columns and leaf_index, or None if no model has been exported.
+    """
+    return get_hot_model().get()
+
+
 def load_model_and_columns() -> tuple:
     """
-    Load the trained RandomForest model and feature columns from disk.
+    Load the trained RandomForest model and feature columns.
 
     Returns:
         Tuple of (model, feature_columns, error_message). On success,
         error_message is None. On failure, model and feature_columns are None.
     """
-    with open("config.yml") as f:
-        config = yaml.safe_load(f)
+    exported = load_current_model()
+    if exported is None:
+        return None, None, f"No exported model named {get_inference_model_name()} in {exports_dir()}"
+    return exported["model"], exported["feature_columns"], None
 
-    model_name = (
-        config.get("models", {})
-        .get("crowd-level", {})
-        .get("inference", {})
-        .get("model_name", "crowd-level-model")
-    )
-    model_path = os.path.join(_model_dir, "model-exports", f"{model_name}.pkl")
-    columns_path = os.path.join(_model_dir, "model-exports", f"{model_name}_columns.pkl")
 
-    if not os.path.exists(model_path):
-        return None, None, f"Model file not found: {model_path}"
-    if not os.path.exists(columns_path):
-        return None, None, f"Columns file not found: {columns_path}"
+def load_leaf_index() -> Optional[dict]:
+    """
+    Load the training leaf index used for quantile predictions.
+
+    Returns:
+        Leaf index dict, or None if the model was exported without one.
+    """
+    exported = load_current_model()
+    return exported["leaf_index"] if exported is not None else None
+
 
-    model = joblib.load(model_path)
-    feature_columns = joblib.load(columns_path)
-    return model, feature_columns, None
+@st.cache_resource(show_spinner="Loading ride profiles…")
+def load_ride_profile_index() -> Optional[dict]:
+    """
+    Load the ride profile index built by models/queues/profiles.py.
+
+    Returns:
+        Profile index dict, or None if it hasn't been built.
+    """
+    return load_ride_profiles(get_queue_config()["profiles_path"])
 
 
 @st.cache_data(show_spinner=False)
@@ -94,47 +135,133 @@ def fetch_park_names(park_ids: tuple) -> dict:
 
 
 @st.cache_data(show_spinner="Running inference pipeline — this may take a minute on first run…")
-def run_inference(park_id: int, start_date: str, end_date: str) -> Optional[pd.DataFrame]:
+def run_inference(park_id: int, dates: tuple, model_version: Optional[str], _exported: Optional[dict]) -> Optional[pd.DataFrame]:
     """
-    Run the full crowd-level inference pipeline for a park and date range.
+    Run the full crowd-level inference pipeline for a park and set of dates.
 
-    Predictions include a ±1σ confidence interval derived from the variance
-    across individual RandomForest trees.
+    Predictions include a p10–p90 interval from the quantile regression
+    forest leaf index. Models exported without a leaf index fall back to a
+    ±1σ band derived from the variance across individual RandomForest trees.
 
     Args:
         park_id: Queue Times park ID.
-        start_date: ISO date string (YYYY-MM-DD) for the range start.
-        end_date: ISO date string (YYYY-MM-DD) for the range end.
+        dates: Tuple of ISO date strings (YYYY-MM-DD) to predict.
+        model_version: Registry version of _exported, the cache key for it.
+        _exported: The export to predict with (see load_current_model). Not
+            hashed by Streamlit, so it must be the export model_version names;
+            a background reload between the two would otherwise cache the new
+            model's predictions under the old version.
 
     Returns:
         DataFrame with columns: date, crowd_level, ci_lower, ci_upper.
         Returns None if the model could not be loaded.
     """
-    model, feature_columns, err = load_model_and_columns()
-    if err:
+    if _exported is None:
         return None
+    model, feature_columns, leaf_index = _exported["model"], _exported["feature_columns"], _exported["leaf_index"]
 
-    dates = pd.date_range(start=start_date, end=end_date)
-    day_df = pd.DataFrame({"date": dates, "park_id": str(park_id)})
+    day_df = pd.DataFrame({"date": pd.to_datetime(list(dates)), "park_id": str(park_id)})
 
     processed = model_pipeline(is_training=False, day_df=day_df)
     meta_df = processed[["date"]].copy()
 
     X = processed.reindex(columns=feature_columns, fill_value=0)
 
-    # Collect per-tree predictions to produce a rough uncertainty estimate.
-    tree_preds = np.array([tree.predict(X) for tree in model.estimators_])
-    mean_pred = tree_preds.mean(axis=0)
-    std_pred = tree_preds.std(axis=0)
+    if leaf_index is not None:
+        mean_pred = model.predict(X)
+        lower, upper = predict_quantiles(model, leaf_index, X, quantiles=(0.1, 0.9)).T
+    else:
+        # Collect per-tree predictions to produce a rough uncertainty estimate.
+        tree_preds = np.array([tree.predict(X) for tree in model.estimators_])
+        mean_pred = tree_preds.mean(axis=0)
+        std_pred = tree_preds.std(axis=0)
+        lower, upper = mean_pred - std_pred, mean_pred + std_pred
 
     return pd.DataFrame(
         {
             "date": meta_df["date"].values,
             "crowd_level": mean_pred.round().astype(int),
-            "ci_lower": np.clip(mean_pred - std_pred, 0, 100).round().astype(int),
-            "ci_upper": np.clip(mean_pred + std_pred, 0, 100).round().astype(int),
+            "ci_lower": np.clip(lower, 0, 100).round().astype(int),
+            "ci_upper": np.clip(upper, 0, 100).round().astype(int),
+        }
+    )
+
+
+@st.cache_data(ttl=300, show_spinner=False)
+def load_stored_forecast(park_id: int, start_date: str, end_date: str) -> tuple:
+    """
+    Read precomputed forecasts for a park and date range from the predictions table.
+
+    Cached for five minutes so a refreshed forecast job is picked up without
+    restarting the app.
+
+    Args:
+        park_id: Queue Times park ID.
+        start_date: ISO date string (YYYY-MM-DD) for the range start.
+        end_date: ISO date string (YYYY-MM-DD) for the range end.
+
+    Returns:
+        Tuple of (DataFrame with date, crowd_level, ci_lower, ci_upper columns,
+        set of covered ISO date strings, latest generation timestamp or None).
+    """
+    with open("config.yml") as f:
+        config = yaml.safe_load(f)
+    db_path = (
+        config.get("models", {})
+        .get("crowd-level", {})
+        .get("inference", {})
+        .get("predictions_db", "data/predictions.db")
+    )
+
+    stored, covered = load_predictions(park_id, start_date, end_date, db_path=db_path)
+    crowd_level = stored["crowd_level_prediction"].astype(int)
+    forecast = pd.DataFrame(
+        {
+            "date": stored["date"],
+            "crowd_level": crowd_level,
+            # Rows generated without a leaf index have no interval.
+            "ci_lower": stored["p10"].fillna(crowd_level).astype(int),
+            "ci_upper": stored["p90"].fillna(crowd_level).astype(int),
         }
     )
+    generated_at = stored["generated_at"].max() if not stored.empty else None
+    return forecast, covered, generated_at
+
+
+def get_predictions(park_id: int, start_date: str, end_date: str) -> tuple:
+    """
+    Combine precomputed forecasts with live inference for uncovered dates.
+
+    Args:
+        park_id: Queue Times park ID.
+        start_date: ISO date string (YYYY-MM-DD) for the range start.
+        end_date: ISO date string (YYYY-MM-DD) for the range end.
+
+    Returns:
+        Tuple of (DataFrame with date, crowd_level, ci_lower, ci_upper columns,
+        or None if live inference was needed and the model could not be loaded;
+        latest forecast generation timestamp or None).
+    """
+    forecast, covered, generated_at = load_stored_forecast(park_id, start_date, end_date)
+
+    requested = pd.date_range(start=start_date, end=end_date).strftime("%Y-%m-%d")
+    missing = tuple(d for d in requested if d not in covered)
+    if not missing:
+        return forecast, generated_at
+
+    exported = load_current_model()
+    live = run_inference(
+        park_id=park_id,
+        dates=missing,
+        model_version=exported["version"] if exported else None,
+        _exported=exported,
+    )
+    if live is None:
+        return None, generated_at
+
+    combined = pd.concat([forecast, live], ignore_index=True)
+    combined["date"] = pd.to_datetime(combined["date"])
+    return combined.sort_values("date").reset_index(drop=True), generated_at
 
 
 def build_importance_df(model, feature_columns: list, top_n: int) -> pd.DataFrame:
@@ -174,6 +301,9 @@ with open("config.yml") as f:
 
 _park_ids: list = _config.get("scraper", {}).get("park_ids", [2])
 
+# Small enough to hold for the life of the app; per-ride waits are then a lookup.
+_ride_profiles = load_ride_profile_index()
+
 with st.sidebar:
     st.title("🎢 Crowd Level Explorer")
     st.divider()
@@ -190,13 +320,17 @@ with st.sidebar:
 
     st.divider()
     run_button = st.button("Run Predictions", type="primary", use_container_width=True)
-    st.caption("Results are cached — re-running the same park/dates is instant.")
+    st.caption(
+        "Dates covered by the scheduled forecast job load instantly; "
+        "anything else runs live inference and is then cached."
+    )
 
 # ─── Session state initialisation ─────────────────────────────────────────────
 
 if "results" not in st.session_state:
     st.session_state["results"] = None
     st.session_state["run_park_id"] = None
+    st.session_state["generated_at"] = None
 
 # ─── Run inference on button press ────────────────────────────────────────────
 
@@ -205,7 +339,7 @@ if run_button:
         st.sidebar.error("Start date must be before end date.")
         st.stop()
 
-    results = run_inference(
+    results, generated_at = get_predictions(
         park_id=selected_park_id,
         start_date=start_date.strftime("%Y-%m-%d"),
         end_date=end_date.strftime("%Y-%m-%d"),
@@ -225,6 +359,7 @@ if run_button:
 
     st.session_state["results"] = results
     st.session_state["run_park_id"] = selected_park_id
+    st.session_state["generated_at"] = generated_at
 
 # ─── Main content ─────────────────────────────────────────────────────────────
 
@@ -266,6 +401,8 @@ if results is None:
 else:
     park_label = park_names.get(run_park_id, f"Park {run_park_id}")
     st.title(f"🎢 {park_label}")
+    if st.session_state["generated_at"]:
+        st.caption(f"Precomputed forecast generated {st.session_state['generated_at']}.")
 
     # ── Summary metrics ────────────────────────────────────────────────────────
     mean_level = int(results["crowd_level"].mean())
@@ -282,14 +419,14 @@ else:
     st.divider()
 
     # ── Tabs ──────────────────────────────────────────────────────────────────
-    tab_predictions, tab_importance, tab_data = st.tabs(
-        ["📈 Predictions", "🔍 Feature Importance", "📋 Raw Data"]
+    tab_predictions, tab_rides, tab_importance, tab_data = st.tabs(
+        ["📈 Predictions", "🎠 Ride Waits", "🔍 Feature Importance", "📋 Raw Data"]
     )
 
     with tab_predictions:
         fig = go.Figure()
 
-        # CI band (±1σ across RF trees)
+        # CI band (p10–p90 quantile forest, or ±1σ across RF trees)
         ci_x = list(results["date"]) + list(results["date"])[::-1]
         ci_y = list(results["ci_upper"]) + list(results["ci_lower"])[::-1]
         fig.add_trace(
@@ -300,7 +437,7 @@ else:
                 fillcolor="rgba(99, 110, 250, 0.15)",
                 line=dict(color="rgba(0,0,0,0)"),
                 hoverinfo="skip",
-                name="±1σ range",
+                name="p10–p90 range" if load_leaf_index() is not None else "±1σ range",
                 showlegend=True,
             )
         )
@@ -359,9 +496,47 @@ else:
 
         st.caption(
             "Crowd level is a percentile rank (0–100) of average queue time for that park. "
-            "Shaded band shows ±1 standard deviation across Random Forest trees."
+            + (
+                "Shaded band shows the 10th–90th percentile from the quantile regression forest."
+                if load_leaf_index() is not None
+                else "Shaded band shows ±1 standard deviation across Random Forest trees."
+            )
         )
 
+    with tab_rides:
+        if _ride_profiles is None or run_park_id not in _ride_profiles["parks"]:
+            st.info(
+                "No ride profiles for this park yet. Build them with "
+                "`python models/queues/profiles.py`."
+            )
+        else:
+            ride_date = st.selectbox(
+                "Date",
+                options=list(results["date"]),
+                format_func=lambda d: pd.Timestamp(d).strftime("%a %d %b %Y"),
+            )
+            ride_level = int(results.loc[results["date"] == ride_date, "crowd_level"].iloc[0])
+            profile = lookup_ride_profiles(_ride_profiles, run_park_id, ride_date, ride_level)
+            waits = profile.set_index("ride_name").dropna(axis=1, how="all")
+
+            fig_rides = px.imshow(
+                waits,
+                aspect="auto",
+                color_continuous_scale="RdYlGn_r",
+                labels={"x": "Time", "y": "Ride", "color": "Minutes"},
+            )
+            fig_rides.update_layout(
+                height=max(400, len(waits) * 22),
+                margin=dict(l=10, r=20, t=20, b=40),
+            )
+            st.plotly_chart(fig_rides, use_container_width=True)
+            st.caption(
+                f"Typical 15-minute waits on past {pd.Timestamp(ride_date).strftime('%B')} "
+                f"{'weekends' if pd.Timestamp(ride_date).dayofweek >= 5 else 'weekdays'} "
+                f"with a crowd level of {ride_level // 10 * 10}–{ride_level // 10 * 10 + 9}. "
+                f"Profiles built {_ride_profiles['built_at']}."
+            )
+
     with tab_importance:
         model, feature_columns, err = load_model_and_columns()
         if model is not None:
@@ -400,7 +575,7 @@ else:
         display["busy_label"] = display["crowd_level"].apply(_label_crowd_level)
         display["date"] = pd.to_datetime(display["date"]).dt.strftime("%Y-%m-%d")
         display = display[["date", "day", "crowd_level", "ci_lower", "ci_upper", "busy_label"]]
-        display.columns = ["Date", "Day", "Crowd Level", "CI Lower (−1σ)", "CI Upper (+1σ)", "Category"]
+        display.columns = ["Date", "Day", "Crowd Level", "CI Lower", "CI Upper", "Category"]
 
         st.dataframe(
             display,
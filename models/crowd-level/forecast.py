@@ -0,0 +1,83 @@
+from inference import (
+    load_model,
+    load_feature_columns,
+    load_leaf_index,
+    get_trained_park_ids,
+    get_horizon_dates,
+    predict_parks
+)
+from utils.forecasts import save_predictions, record_forecast_run
+import argparse
+import time
+from datetime import datetime
+import yaml
+
+def get_forecast_park_ids(feature_columns, config_path='config.yml'):
+    """
+    Get the parks to precompute forecasts for.
+
+    Uses the scraper's park_ids (the parks the dashboard offers), limited to
+    parks the model was trained on — the rest would only get an all-zero
+    park encoding.
+
+    Args:
+        feature_columns (list[str]): Ordered list of feature column names.
+        config_path (str): Path to the configuration file.
+
+    Returns:
+        list[int]: Park IDs to forecast.
+    """
+    with open(config_path, 'r') as file:
+        config = yaml.safe_load(file)
+    configured = [int(x) for x in config.get('scraper', {}).get('park_ids', [])]
+    trained = set(get_trained_park_ids(feature_columns))
+
+    skipped = [park_id for park_id in configured if park_id not in trained]
+    if skipped:
+        print(f'Skipping parks not in the trained model: {skipped}')
+    return [park_id for park_id in configured if park_id in trained]
+
+def run_forecast_job(config_path='config.yml'):
+    """
+    Precompute forecasts for every configured park over the full horizon.
+
+    Args:
+        config_path (str): Path to the configuration file.
+    """
+    with open(config_path, 'r') as file:
+        config = yaml.safe_load(file)
+    inference_config = config.get('models', {}).get('crowd-level', {}).get('inference', {})
+    db_path = inference_config.get('predictions_db', 'data/predictions.db')
+
+    feature_columns = load_feature_columns(config_path)
+    model = load_model(config_path)
+    leaf_index = load_leaf_index(config_path)
+
+    park_ids = get_forecast_park_ids(feature_columns, config_path)
+    dates = get_horizon_dates(inference_config.get('horizon_days', 14))
+    print(f'Precomputing forecasts for parks {park_ids} from {dates[0]:%Y-%m-%d} to {dates[-1]:%Y-%m-%d}')
+
+    results_df = predict_parks(model, feature_columns, park_ids, dates, leaf_index)
+    save_predictions(results_df, db_path)
+    record_forecast_run(park_ids, dates[0].strftime('%Y-%m-%d'), dates[-1].strftime('%Y-%m-%d'), db_path)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Precompute crowd level forecasts for the dashboard.')
+    parser.add_argument('--interval-hours', type=float, default=None,
+                        help='Keep running and refresh forecasts at this interval. Runs once if omitted.')
+    args = parser.parse_args()
+
+    while True:
+        started = time.monotonic()
+        print(f'Starting forecast job at {datetime.now():%Y-%m-%d %H:%M:%S}')
+        try:
+            run_forecast_job()
+        except Exception as e:
+            # Keep the scheduler alive; the dashboard falls back to live inference.
+            if args.interval_hours is None:
+                raise
+            print(f'Forecast job failed: {e}')
+
+        if args.interval_hours is None:
+            break
+        time.sleep(max(0.0, args.interval_hours * 3600 - (time.monotonic() - started)))
@@ -1,28 +1,85 @@
 from utils.pipeline import model_pipeline
+from utils.quantile import predict_quantiles
+from utils.forecasts import save_predictions
+from utils.registry import HotModel, get_registry_config, load_version
+from utils.shards import get_shard_config, load_sharded_export, load_sharded_model, shard_registry_name
+import argparse
 import pandas as pd
 import yaml
-import os
-import joblib
 
-def load_model(config_path='config.yml'):
-    # Load the configuration file
+def get_inference_model_name(config_path='config.yml'):
+    """
+    Model name used for inference, from the config file.
+    """
     with open(config_path, 'r') as file:
         config = yaml.safe_load(file)
-    
-    # Get the model name from the config
-    model_name = config.get('models', {}).get('crowd-level', {}).get('inference', {}).get('model_name', 'crowd-level-model')
-    
-    # Get the current directory
-    current_dir = os.path.dirname(os.path.abspath(__file__))
-    
-    # Construct the path to the model file
-    model_path = os.path.join(current_dir, 'model-exports', f"{model_name}.pkl")
-    
-    # Load and return the model
-    with open(model_path, 'rb') as file:
-        model = joblib.load(file)
-    
-    return model
+    return config.get('models', {}).get('crowd-level', {}).get('inference', {}).get('model_name', 'crowd-level-model')
+
+def load_sharded(config_path='config.yml'):
+    """
+    Load the sharded model for the inference model name, if shard_by is set in config.
+
+    Args:
+        config_path (str): Path to the configuration file.
+
+    Returns:
+        ShardedModel | None: None when the model isn't sharded, or no shards have been trained under that name.
+    """
+    if get_shard_config(config_path)['shard_by'] is None:
+        return None
+    model_name = get_inference_model_name(config_path)
+    sharded = load_sharded_model(model_name)
+    if sharded is None:
+        print(f'No shards found for {model_name} — using the global model.')
+    return sharded
+
+def load_hot_model(config_path='config.yml'):
+    """
+    The inference model for long-running processes (serve.py, the dashboard), reloaded when a new version is published.
+
+    Follows the model's shards when shard_by is set in config and shards
+    have been trained, and the global model otherwise.
+
+    Args:
+        config_path (str): Path to the configuration file.
+
+    Returns:
+        HotModel: Its get() is None until a model has been exported.
+    """
+    model_name = get_inference_model_name(config_path)
+    check_interval_s = get_registry_config(config_path)['reload_check_s']
+    if get_shard_config(config_path)['shard_by'] is not None:
+        hot_model = HotModel(model_name, check_interval_s, loader=load_sharded_export,
+                             registry_name=shard_registry_name(model_name))
+        if hot_model.get() is not None:
+            return hot_model
+        print(f'No shards found for {model_name} — using the global model.')
+    return HotModel(model_name, check_interval_s)
+
+def load_exported(config_path='config.yml'):
+    """
+    Load the current registry version of the inference model (see utils.registry).
+
+    Args:
+        config_path (str): Path to the configuration file.
+
+    Returns:
+        dict: 'version', 'model', 'feature_columns', 'leaf_index' and 'metadata'.
+
+    Raises:
+        FileNotFoundError: If the model has never been exported.
+    """
+    model_name = get_inference_model_name(config_path)
+    exported = load_version(model_name)
+    if exported is None:
+        raise FileNotFoundError(f'No exported model named {model_name}; run train.py first.')
+    return exported
+
+def load_model(config_path='config.yml'):
+    sharded = load_sharded(config_path)
+    if sharded is not None:
+        return sharded
+    return load_exported(config_path)['model']
 
 def load_feature_columns(config_path='config.yml'):
     """
@@ -37,44 +94,95 @@ def load_feature_columns(config_path='config.yml'):
     Returns:
         list[str]: Ordered list of feature column names.
     """
-    with open(config_path, 'r') as file:
-        config = yaml.safe_load(file)
-    model_name = config.get('models', {}).get('crowd-level', {}).get('inference', {}).get('model_name', 'crowd-level-model')
-    current_dir = os.path.dirname(os.path.abspath(__file__))
-    columns_path = os.path.join(current_dir, 'model-exports', f'{model_name}_columns.pkl')
-    with open(columns_path, 'rb') as file:
-        return joblib.load(file)
+    sharded = load_sharded(config_path)
+    if sharded is not None:
+        return sharded.feature_columns
+    return load_exported(config_path)['feature_columns']
 
-if __name__ == "__main__":
-    with open('config.yml', 'r') as f:
-        _config = yaml.safe_load(f)
-    park_id = _config.get('models', {}).get('crowd-level', {}).get('inference', {}).get('park_id', 2)
+def load_leaf_index(config_path='config.yml'):
+    """
+    Load the training leaf index used for quantile predictions.
 
-    horizon_days = _config.get('models', {}).get('crowd-level', {}).get('inference', {}).get('horizon_days', 14)
+    Older exports were saved without one, so a missing index is not an error.
 
-    todays_date = pd.to_datetime('today').strftime('%Y-%m-%d')
-    future_date = (pd.to_datetime('today') + pd.Timedelta(days=horizon_days)).strftime('%Y-%m-%d')
-    dates_list = pd.date_range(start=todays_date, end=future_date).strftime('%Y-%m-%d').tolist()
+    Args:
+        config_path (str): Path to the configuration file.
 
-    dates_df = pd.DataFrame({
-        'date': pd.to_datetime(dates_list),
-        'park_id': str(park_id)
-    })
+    Returns:
+        dict | None: Leaf index from utils.quantile.build_leaf_index (per shard
+            for a sharded model), or None if not exported.
+    """
+    sharded = load_sharded(config_path)
+    if sharded is not None:
+        return sharded.leaf_indexes
 
-    feature_columns = load_feature_columns()
-    model = load_model()
+    exported = load_exported(config_path)
+    if exported['leaf_index'] is None:
+        print(f"No leaf index exported with {get_inference_model_name(config_path)} — quantile predictions unavailable.")
+    return exported['leaf_index']
+
+def get_trained_park_ids(feature_columns):
+    """
+    Get the park IDs the model was trained on from its one-hot park columns.
+
+    Args:
+        feature_columns (list[str]): Ordered list of feature column names.
+
+    Returns:
+        list[int]: Park IDs with a park_* column in the training data.
+    """
+    return sorted(int(col[len('park_'):]) for col in feature_columns if col.startswith('park_'))
+
+def get_horizon_dates(horizon_days):
+    """
+    Get every date from today up to and including today + horizon_days.
+
+    Args:
+        horizon_days (int): Number of days ahead to forecast.
+
+    Returns:
+        pd.DatetimeIndex: Dates to predict.
+    """
+    today = pd.to_datetime('today').normalize()
+    return pd.date_range(start=today, end=today + pd.Timedelta(days=horizon_days))
+
+def predict_parks(model, feature_columns, park_ids, dates, leaf_index=None):
+    """
+    Predict crowd levels for several parks over the same dates in one pass.
+
+    All (park, date) rows go through a single pipeline run, so holiday lookups
+    are shared by country and the park catalogues are fetched once, and the
+    model is called once on the combined feature matrix.
+
+    Args:
+        model: The trained model.
+        feature_columns (list[str]): Ordered list of feature column names.
+        park_ids (list[int]): Park IDs to predict for.
+        dates (list | pd.DatetimeIndex): Dates to predict for.
+        leaf_index (dict | None): Leaf index for p10/p50/p90 quantile columns.
+
+    Returns:
+        pd.DataFrame: Predictions with date, park_id, crowd_level_prediction and,
+            if a leaf index is given, p10/p50/p90 columns.
+    """
+    dates = pd.to_datetime(pd.Series(dates)).tolist()
+    day_df = pd.DataFrame(
+        [(date, str(park_id)) for park_id in park_ids for date in dates],
+        columns=['date', 'park_id']
+    )
 
-    dates_df = model_pipeline(is_training=False, day_df=dates_df)
+    processed = model_pipeline(is_training=False, day_df=day_df)
 
-    # Build display metadata after the pipeline so it reflects any rows dropped
-    # (e.g. dates with no opening hours data).
+    # park_id is one-hot encoded by the pipeline, so recover it from the dummy
+    # columns. This reflects any rows dropped (e.g. dates with no opening hours).
+    park_cols = [col for col in processed.columns if col.startswith('park_')]
     meta_df = pd.DataFrame({
-        'date': dates_df['date'],
-        'park_id': str(park_id)
+        'date': processed['date'],
+        'park_id': processed[park_cols].idxmax(axis=1).astype(str).str[len('park_'):]
     })
 
     # Align to training columns — fills any missing park columns with 0.
-    inference_data = dates_df.reindex(columns=feature_columns, fill_value=0)
+    inference_data = processed.reindex(columns=feature_columns, fill_value=0)
 
     predictions = model.predict(inference_data)
 
@@ -84,5 +192,43 @@ if __name__ == "__main__":
         'crowd_level_prediction': predictions.round().astype(int)
     })
 
+    if leaf_index is not None:
+        quantile_preds = predict_quantiles(model, leaf_index, inference_data)
+        results_df['p10'] = quantile_preds[:, 0].round().astype(int)
+        results_df['p50'] = quantile_preds[:, 1].round().astype(int)
+        results_df['p90'] = quantile_preds[:, 2].round().astype(int)
+
+    return results_df.sort_values(by=['park_id', 'date']).reset_index(drop=True)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Predict crowd levels for future dates.')
+    parser.add_argument('--batch', action='store_true',
+                        help='Predict for several parks in one run and write to the predictions table.')
+    parser.add_argument('--parks', type=int, nargs='+', default=None,
+                        help='Park IDs for batch mode. Defaults to batch_park_ids in config, then every trained park.')
+    parser.add_argument('--horizon-days', type=int, default=None,
+                        help='Days ahead to forecast. Defaults to horizon_days in config.')
+    args = parser.parse_args()
+
+    with open('config.yml', 'r') as f:
+        _config = yaml.safe_load(f)
+    inference_config = _config.get('models', {}).get('crowd-level', {}).get('inference', {})
+
+    horizon_days = args.horizon_days if args.horizon_days is not None else inference_config.get('horizon_days', 14)
+    dates = get_horizon_dates(horizon_days)
+
+    feature_columns = load_feature_columns()
+    model = load_model()
+    leaf_index = load_leaf_index()
+
+    if args.batch:
+        park_ids = args.parks or inference_config.get('batch_park_ids') or get_trained_park_ids(feature_columns)
+        print(f'Batch predicting {len(dates)} days for parks: {park_ids}')
+        results_df = predict_parks(model, feature_columns, park_ids, dates, leaf_index)
+        save_predictions(results_df, inference_config.get('predictions_db', 'data/predictions.db'))
+    else:
+        park_id = inference_config.get('park_id', 2)
+        results_df = predict_parks(model, feature_columns, [park_id], dates, leaf_index)
+
     print('Predicted Crowd Levels:')
-    print(results_df)
\ No newline at end of file
+    print(results_df)
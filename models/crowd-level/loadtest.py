@@ -0,0 +1,75 @@
+import argparse
+import asyncio
+import json
+import random
+import time
+import numpy as np
+import pandas as pd
+
+async def fetch(host, port, path):
+    """
+    Send a GET request to the prediction service and return (status, body).
+    """
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(f'GET {path} HTTP/1.1\r\nHost: {host}\r\nConnection: close\r\n\r\n'.encode('latin-1'))
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    await writer.wait_closed()
+
+    head, _, body = response.partition(b'\r\n\r\n')
+    status = int(head.split(b' ', 2)[1])
+    return status, json.loads(body) if body else None
+
+async def run_client(host, port, park_ids, max_days, deadline, latencies, errors):
+    """
+    Issue back-to-back random /predict requests until the deadline.
+    """
+    today = pd.Timestamp.today().normalize()
+    while time.perf_counter() < deadline:
+        start = today + pd.Timedelta(days=random.randint(0, 30))
+        end = start + pd.Timedelta(days=random.randint(0, max_days - 1))
+        path = f'/predict?park_id={random.choice(park_ids)}&start={start:%Y-%m-%d}&end={end:%Y-%m-%d}'
+
+        started = time.perf_counter()
+        try:
+            status, _ = await fetch(host, port, path)
+        except OSError:
+            status = None
+        latencies.append((time.perf_counter() - started) * 1000)
+        if status != 200:
+            errors.append(status)
+
+async def main(host, port, park_ids, concurrency, duration_s, max_days):
+    latencies: list = []
+    errors: list = []
+    deadline = time.perf_counter() + duration_s
+
+    started = time.perf_counter()
+    await asyncio.gather(*[
+        run_client(host, port, park_ids, max_days, deadline, latencies, errors)
+        for _ in range(concurrency)
+    ])
+    elapsed = time.perf_counter() - started
+
+    lat = np.array(latencies)
+    print(f'Requests: {len(lat)} in {elapsed:.1f}s ({len(lat) / elapsed:.1f} req/s), errors: {len(errors)}')
+    if len(lat):
+        print(f'Latency ms — p50: {np.percentile(lat, 50):.1f}, p90: {np.percentile(lat, 90):.1f}, '
+              f'p99: {np.percentile(lat, 99):.1f}, max: {lat.max():.1f}')
+
+    _, metrics = await fetch(host, port, '/metrics')
+    print('Server metrics:')
+    print(json.dumps(metrics, indent=2))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Load test the local crowd level prediction service.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8008)
+    parser.add_argument('--parks', type=int, nargs='+', default=[2])
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--duration', type=float, default=30.0, help='Seconds to run for.')
+    parser.add_argument('--max-days', type=int, default=14, help='Longest date range per request.')
+    args = parser.parse_args()
+
+    asyncio.run(main(args.host, args.port, args.parks, args.concurrency, args.duration, args.max_days))
@@ -0,0 +1,373 @@
+from inference import get_inference_model_name, load_hot_model
+from utils.pipeline import model_pipeline
+from utils.quantile import predict_quantiles
+from utils.shards import ShardedModel
+from urllib.parse import urlsplit, parse_qs
+import argparse
+import asyncio
+import bisect
+import json
+import os
+import time
+import numpy as np
+import pandas as pd
+import yaml
+
+# Upper bounds (ms) of the latency histogram buckets; the last bucket is open-ended.
+LATENCY_BUCKETS_MS = [5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000]
+
+class LatencyHistogram:
+    """
+    Fixed-bucket latency histogram, cheap enough to update on every request.
+    """
+    def __init__(self, buckets_ms=LATENCY_BUCKETS_MS):
+        self.buckets_ms = list(buckets_ms)
+        self.counts = [0] * (len(self.buckets_ms) + 1)
+        self.total = 0
+        self.sum_ms = 0.0
+
+    def observe(self, latency_ms):
+        self.counts[bisect.bisect_left(self.buckets_ms, latency_ms)] += 1
+        self.total += 1
+        self.sum_ms += latency_ms
+
+    def to_dict(self):
+        labels = [f'<={b}' for b in self.buckets_ms] + [f'>{self.buckets_ms[-1]}']
+        return {
+            'count': self.total,
+            'mean_ms': round(self.sum_ms / self.total, 3) if self.total else None,
+            'buckets_ms': dict(zip(labels, self.counts)),
+        }
+
+class PredictionService:
+    """
+    Keeps the model and processed feature rows warm and answers predictions in micro-batches.
+
+    Concurrent requests are queued and collected for up to batch_window_ms.
+    Every (park, date) pair in the batch that isn't already cached goes
+    through one pipeline run, then every requested row is predicted in a
+    single model call.
+
+    A new current version in the model registry, of the global model or of
+    its shards, is loaded in the background and swapped in between
+    micro-batches, so the service never restarts or waits on an unpickle.
+    """
+    def __init__(self, batch_window_ms=20, max_batch_requests=64, feature_cache_ttl_hours=6,
+                 max_cache_entries=100000, max_range_days=365, config_path='config.yml'):
+        self.hot_model = load_hot_model(config_path)
+        if self.hot_model.get() is None:
+            raise FileNotFoundError(f'No exported model named {get_inference_model_name(config_path)}; run train.py first.')
+        self.exported = self.current_export()
+        self.feature_columns = self.exported['feature_columns']
+
+        self.batch_window = batch_window_ms / 1000
+        self.max_batch_requests = max_batch_requests
+        self.feature_cache_ttl = feature_cache_ttl_hours * 3600
+        self.max_cache_entries = max_cache_entries
+        self.max_range_days = max_range_days
+
+        # (park_id, 'YYYY-MM-DD') -> (cached_at, feature row or None if the
+        # pipeline dropped the date, e.g. no opening hours). Kept in the order
+        # rows were cached, so the oldest entries are evicted from the front.
+        self.feature_cache: dict = {}
+        self.queue: asyncio.Queue = asyncio.Queue()
+
+        self.request_latency = LatencyHistogram()
+        self.batch_latency = LatencyHistogram()
+        self.batch_sizes: dict = {}
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    async def predict(self, park_id, dates):
+        """
+        Queue a prediction request and wait for its micro-batch to complete.
+
+        Args:
+            park_id (int): Queue Times park ID.
+            dates (list[str]): Dates (YYYY-MM-DD) to predict.
+
+        Returns:
+            list[dict]: One prediction per date the pipeline could produce features for.
+        """
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((park_id, dates, future))
+        return await future
+
+    async def run_batcher(self):
+        """
+        Collect queued requests into micro-batches and predict each batch in a worker thread.
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.batch_window
+            while len(batch) < self.max_batch_requests:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            self.batch_sizes[len(batch)] = self.batch_sizes.get(len(batch), 0) + 1
+            started = time.perf_counter()
+            try:
+                results = await loop.run_in_executor(None, self.predict_batch, [(p, d) for p, d, _ in batch])
+                for (_, _, future), result in zip(batch, results):
+                    if not future.done():
+                        future.set_result(result)
+            except Exception as e:
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+            self.batch_latency.observe((time.perf_counter() - started) * 1000)
+
+    def current_export(self):
+        """
+        The model to predict with: the registry's current version (global or sharded) once loaded.
+
+        Returns:
+            dict: 'version', 'model', 'feature_columns', 'leaf_index' and 'metadata'.
+        """
+        return self.hot_model.get()
+
+    def predict_batch(self, requests):
+        """
+        Predict every request in a micro-batch with one pipeline run and one model call.
+
+        Args:
+            requests (list[tuple[int, list[str]]]): (park_id, dates) pairs.
+
+        Returns:
+            list[list[dict]]: Predictions for each request, in order.
+        """
+        exported = self.current_export()
+        if exported['feature_columns'] != self.feature_columns:
+            # Cached rows are aligned to the previous model's columns.
+            self.feature_cache.clear()
+        self.exported, self.feature_columns = exported, exported['feature_columns']
+        model, leaf_index = exported['model'], exported['leaf_index']
+
+        now = time.time()
+        # Evict before this batch's rows are added, so none of them can be dropped mid-batch.
+        self.evict_features(now)
+        missing = sorted({
+            (park_id, date)
+            for park_id, dates in requests
+            for date in dates
+            if now - self.feature_cache.get((park_id, date), (-np.inf, None))[0] > self.feature_cache_ttl
+        })
+        self.cache_misses += len(missing)
+        self.cache_hits += sum(len(dates) for _, dates in requests) - len(missing)
+
+        if missing:
+            self.refresh_features(missing, now)
+
+        keys = []
+        rows = []
+        for park_id, dates in requests:
+            for date in dates:
+                row = self.feature_cache[(park_id, date)][1]
+                if row is not None:
+                    keys.append((park_id, date))
+                    rows.append(row)
+
+        predictions = {}
+        if rows:
+            X = pd.DataFrame(np.vstack(rows), columns=self.feature_columns)
+            point = model.predict(X)
+            quantiles = predict_quantiles(model, leaf_index, X) if leaf_index is not None else None
+            for i, key in enumerate(keys):
+                prediction = {'date': key[1], 'crowd_level': int(round(point[i]))}
+                if quantiles is not None:
+                    prediction.update({
+                        'p10': int(round(quantiles[i, 0])),
+                        'p50': int(round(quantiles[i, 1])),
+                        'p90': int(round(quantiles[i, 2])),
+                    })
+                predictions[key] = prediction
+
+        return [
+            [predictions[(park_id, date)] for date in dates if (park_id, date) in predictions]
+            for park_id, dates in requests
+        ]
+
+    def refresh_features(self, keys, now):
+        """
+        Run the preprocessing pipeline once for a set of (park, date) pairs and cache the rows.
+
+        Args:
+            keys (list[tuple[int, str]]): (park_id, date) pairs to process.
+            now (float): Timestamp to store the rows under.
+        """
+        day_df = pd.DataFrame({
+            'date': pd.to_datetime([date for _, date in keys]),
+            'park_id': [str(park_id) for park_id, _ in keys]
+        })
+        processed = model_pipeline(is_training=False, day_df=day_df)
+
+        park_cols = [col for col in processed.columns if col.startswith('park_')]
+        processed_parks = processed[park_cols].idxmax(axis=1).astype(str).str[len('park_'):].astype(int)
+        processed_dates = processed['date'].dt.strftime('%Y-%m-%d')
+        X = processed.reindex(columns=self.feature_columns, fill_value=0).to_numpy(dtype=np.float64)
+
+        rows = dict.fromkeys(keys)
+        rows.update(zip(zip(processed_parks, processed_dates), X))
+        for key, row in rows.items():
+            # Re-insert so the entry moves to the back of the eviction order.
+            self.feature_cache.pop(key, None)
+            self.feature_cache[key] = (now, row)
+
+    def evict_features(self, now):
+        """
+        Drop expired feature rows, then the oldest ones beyond max_cache_entries.
+
+        Runs before each batch, so the cache may briefly exceed the bound by one batch's rows.
+
+        Entries are in caching order, so this only visits the rows it drops.
+
+        Args:
+            now (float): Current timestamp.
+        """
+        for key in list(self.feature_cache):
+            cached_at = self.feature_cache[key][0]
+            if now - cached_at <= self.feature_cache_ttl and len(self.feature_cache) <= self.max_cache_entries:
+                break
+            del self.feature_cache[key]
+
+    def metrics(self):
+        return {
+            'request_latency': self.request_latency.to_dict(),
+            'batch_latency': self.batch_latency.to_dict(),
+            'batch_sizes': {str(k): v for k, v in sorted(self.batch_sizes.items())},
+            'feature_cache': {
+                'entries': len(self.feature_cache),
+                'hits': self.cache_hits,
+                'misses': self.cache_misses,
+            },
+            'model': {**self.hot_model.status(), 'sharded': isinstance(self.exported['model'], ShardedModel)},
+        }
+
+def parse_predict_query(query, max_range_days=None):
+    """
+    Validate /predict query parameters.
+
+    Args:
+        query (str): Raw query string.
+        max_range_days (int | None): How many days after start end may be, e.g. the forecast horizon.
+
+    Returns:
+        tuple[int, list[str]]: Park ID and the dates from start to end inclusive.
+
+    Raises:
+        ValueError: If a parameter is missing or malformed.
+    """
+    params = parse_qs(query)
+    try:
+        park_id = int(params['park_id'][0])
+        start = pd.Timestamp(params['start'][0])
+        end = pd.Timestamp(params['end'][0])
+    except (KeyError, IndexError, ValueError) as e:
+        raise ValueError('park_id, start and end (YYYY-MM-DD) are required') from e
+    if start > end:
+        raise ValueError('start must not be after end')
+    if max_range_days is not None and (end - start).days > max_range_days:
+        raise ValueError(f'end must be at most {max_range_days} days after start')
+    return park_id, pd.date_range(start, end).strftime('%Y-%m-%d').tolist()
+
+async def handle_connection(service, reader, writer):
+    """
+    Serve a single HTTP/1.1 GET request and close the connection.
+    """
+    started = time.perf_counter()
+    status, body = 500, {'error': 'internal error'}
+    try:
+        request_line = (await reader.readline()).decode('latin-1').strip()
+        # Drain headers; GET requests have no body.
+        while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+            pass
+
+        method, target, _ = request_line.split(' ', 2)
+        url = urlsplit(target)
+        if method != 'GET':
+            status, body = 405, {'error': 'only GET is supported'}
+        elif url.path == '/predict':
+            try:
+                park_id, dates = parse_predict_query(url.query, service.max_range_days)
+            except ValueError as e:
+                status, body = 400, {'error': str(e)}
+            else:
+                predictions = await service.predict(park_id, dates)
+                status, body = 200, {'park_id': park_id, 'predictions': predictions}
+        elif url.path == '/metrics':
+            status, body = 200, service.metrics()
+        elif url.path == '/health':
+            status, body = 200, {'status': 'ok'}
+        else:
+            status, body = 404, {'error': f'unknown path {url.path}'}
+    except Exception as e:
+        print(f'Error handling request: {e}')
+        status, body = 500, {'error': str(e)}
+    finally:
+        payload = json.dumps(body).encode('utf-8')
+        reason = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed'}.get(status, 'Internal Server Error')
+        writer.write(
+            f'HTTP/1.1 {status} {reason}\r\n'
+            f'Content-Type: application/json\r\n'
+            f'Content-Length: {len(payload)}\r\n'
+            f'Connection: close\r\n\r\n'.encode('latin-1') + payload
+        )
+        try:
+            await writer.drain()
+        finally:
+            writer.close()
+        service.request_latency.observe((time.perf_counter() - started) * 1000)
+
+async def serve(host, port, service):
+    """
+    Start the batcher and accept connections until cancelled.
+    """
+    batcher = asyncio.create_task(service.run_batcher())
+    server = await asyncio.start_server(lambda r, w: handle_connection(service, r, w), host, port)
+    print(f'Serving crowd level predictions on http://{host}:{port} (/predict, /metrics, /health)')
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        batcher.cancel()
+
+if __name__ == "__main__":
+    # A timing report per micro-batch would flood data/perf; opt in by setting
+    # PIPELINE_REPORT_DIR explicitly.
+    os.environ.setdefault('PIPELINE_REPORT_DIR', '')
+
+    with open('config.yml', 'r') as f:
+        _config = yaml.safe_load(f)
+    serve_config = _config.get('models', {}).get('crowd-level', {}).get('serve', {})
+    inference_config = _config.get('models', {}).get('crowd-level', {}).get('inference', {})
+
+    parser = argparse.ArgumentParser(description='Local HTTP service for crowd level predictions.')
+    parser.add_argument('--host', default=serve_config.get('host', '127.0.0.1'))
+    parser.add_argument('--port', type=int, default=serve_config.get('port', 8008))
+    parser.add_argument('--batch-window-ms', type=float, default=serve_config.get('batch_window_ms', 20))
+    parser.add_argument('--max-batch-requests', type=int, default=serve_config.get('max_batch_requests', 64))
+    parser.add_argument('--feature-cache-ttl-hours', type=float, default=serve_config.get('feature_cache_ttl_hours', 6))
+    parser.add_argument('--max-cache-entries', type=int, default=serve_config.get('max_cache_entries', 100000))
+    max_range_days = serve_config.get('max_range_days')
+    if max_range_days is None:
+        max_range_days = inference_config.get('horizon_days', 365)
+    parser.add_argument('--max-range-days', type=int, default=max_range_days)
+    args = parser.parse_args()
+
+    service = PredictionService(
+        batch_window_ms=args.batch_window_ms,
+        max_batch_requests=args.max_batch_requests,
+        feature_cache_ttl_hours=args.feature_cache_ttl_hours,
+        max_cache_entries=args.max_cache_entries,
+        max_range_days=args.max_range_days
+    )
+    try:
+        asyncio.run(serve(args.host, args.port, service))
+    except KeyboardInterrupt:
+        print('Server stopped.')
@@ -1,14 +1,25 @@
 from utils.pipeline import model_pipeline
+from utils.quantile import build_leaf_index
+from utils.registry import get_registry_config, load_version, publish_version, registry_dir, version_metadata
+from utils.shards import (
+    ShardedModel,
+    assign_shards,
+    get_shard_config,
+    row_park_ids,
+    save_sharded_model,
+    shard_columns,
+    shard_report,
+)
+from concurrent.futures import ProcessPoolExecutor
 import pandas as pd
 import numpy as np
 from sklearn.model_selection import train_test_split, TimeSeriesSplit
 from sklearn.ensemble import RandomForestRegressor
 from sklearn.metrics import mean_squared_error, r2_score, mean_absolute_error
-from skopt import BayesSearchCV
-from skopt.space import Integer
-import joblib
+import argparse
 import yaml
 import os
+import time
 
 def load_and_split_data():
     """
@@ -19,13 +30,19 @@ def load_and_split_data():
         X_test: Test features.
         y_train: Training labels.
         y_test: Test labels.
+        trained_through: Latest date in the training data, as 'YYYY-MM-DD'.
     """
-    training_data = model_pipeline(is_training=True)
-    X = training_data.drop('crowd_level', axis=1)
+    training_data = model_pipeline(is_training=True, keep_date=True)
+    trained_through = pd.Timestamp(training_data['date'].max()).strftime('%Y-%m-%d')
+    X = training_data.drop(['crowd_level', 'date'], axis=1)
     y = training_data['crowd_level']
-    return train_test_split(X, y, test_size=0.2, shuffle=True, random_state=104)
+    return (*train_test_split(X, y, test_size=0.2, shuffle=True, random_state=104), trained_through)
 
-def optimize_random_forest(X_train, y_train):
+# Hyperparameters optimize_random_forest searches, recorded per shard and
+# reused by fit_global_baseline.
+TUNED_PARAMS = ('n_estimators', 'max_depth', 'min_samples_split', 'min_samples_leaf', 'max_features')
+
+def optimize_random_forest(X_train, y_train, n_iter=20, n_jobs=-1):
     """
     Perform Bayesian optimisation to find best Random Forest parameters.
 
@@ -35,10 +52,15 @@ def optimize_random_forest(X_train, y_train):
     Args:
         X_train: Training features.
         y_train: Training labels.
+        n_iter (int): Parameter settings to try.
+        n_jobs (int): Parallel jobs for the search (-1: every CPU).
 
     Returns:
         model: The optimised Random Forest model.
     """
+    from skopt import BayesSearchCV
+    from skopt.space import Integer
+
     rf_search_space = {
         'n_estimators': Integer(50, 300),
         'max_depth': Integer(5, 30),
@@ -51,9 +73,9 @@ def optimize_random_forest(X_train, y_train):
     rf_bayes = BayesSearchCV(
         RandomForestRegressor(random_state=42),
         rf_search_space,
-        n_iter=20,
+        n_iter=n_iter,
         cv=TimeSeriesSplit(n_splits=5),
-        n_jobs=-1,
+        n_jobs=n_jobs,
         scoring='neg_mean_squared_error',
         random_state=104
     )
@@ -105,41 +127,249 @@ def display_feature_importance(model, X):
     print("\nFeature importance:")
     print(feature_importance.head(10))
 
-def save_model(model, feature_columns=None, config_path='config.yml'):
+def get_model_name(config_path='config.yml'):
+    """
+    Get the name the trained model is exported under from the config file.
+    """
+    with open(config_path, 'r') as file:
+        config = yaml.safe_load(file)
+    return config.get('models', {}).get('crowd-level', {}).get('train', {}).get('model_name', 'crowd-level-model')
+
+def save_model(model, feature_columns=None, leaf_index=None, config_path='config.yml', metadata=None):
     """
-    Save the trained model to the model-exports folder.
+    Save the trained model as a new version in the model registry and make it current.
 
-    Also saves feature column names as a separate file so the inference pipeline
-    can align its one-hot encoded columns to what the model expects.
+    The version holds the model, its feature column names (so the inference
+    pipeline can align its one-hot encoded columns to what the model
+    expects), the training leaf index used for quantile predictions if one
+    is provided, and the training metadata. Versions live under
+    model-exports/{model_name}-versions; see utils.registry.
 
     Args:
         model: The trained model to save.
         feature_columns (list[str] | None): Ordered list of feature column names.
+        leaf_index (dict | None): Leaf index from utils.quantile.build_leaf_index.
         config_path (str): Path to the configuration file.
+        metadata (dict | None): Training details, e.g. trained_through (latest
+            training date) for update.py, params and metrics.
+
+    Returns:
+        str: The new version.
     """
-    with open(config_path, 'r') as file:
-        config = yaml.safe_load(file)
-    model_name = config.get('models', {}).get('crowd-level', {}).get('train', {}).get('model_name', 'crowd-level-model')
+    model_name = get_model_name(config_path)
+    if feature_columns is None:
+        feature_columns = list(model.feature_names_in_)
+    version = publish_version(
+        model_name, model, feature_columns, leaf_index=leaf_index, metadata=metadata,
+        keep_versions=get_registry_config(config_path)['keep_versions'],
+    )
+    print(f'Saved {model_name} {version} ({len(feature_columns)} features'
+          f"{', with leaf index' if leaf_index is not None else ''}) to {registry_dir(model_name)}")
+    return version
+
+def train_shard(name, X_train, y_train, n_jobs=-1, n_iter=20, params=None):
+    """
+    Fit one shard's forest and its leaf index.
+
+    Module-level so it can run in a worker process.
 
-    current_dir = os.path.dirname(os.path.abspath(__file__))
-    models_dir = os.path.join(current_dir, 'model-exports')
-    os.makedirs(models_dir, exist_ok=True)
+    Args:
+        name (str): Shard name.
+        X_train (pd.DataFrame): The shard's training features (see utils.shards.shard_columns).
+        y_train (pd.Series): Its training labels.
+        n_jobs (int): Parallel jobs within the shard.
+        n_iter (int): Bayesian search iterations (ignored with params).
+        params (dict | None): Fixed RandomForestRegressor parameters instead of a search.
 
-    model_path = os.path.join(models_dir, f'{model_name}.pkl')
-    if os.path.exists(model_path):
-        print(f'Model {model_name}.pkl already exists. Overwriting...')
+    Returns:
+        dict: 'model', 'columns', 'leaf_index', 'params', 'rows' and 'train_s'.
+    """
+    started = time.perf_counter()
+    if params is None:
+        model = optimize_random_forest(X_train, y_train, n_iter=n_iter, n_jobs=n_jobs)
     else:
-        print(f'Saving model as {model_name}.pkl in model-exports folder...')
-    joblib.dump(model, model_path)
+        model = RandomForestRegressor(random_state=42, n_jobs=n_jobs, **params).fit(X_train, y_train)
+    leaf_index = build_leaf_index(model, X_train, y_train)
+    train_s = time.perf_counter() - started
+    print(f'Trained shard {name} on {len(X_train)} rows in {train_s:.1f}s')
+    return {
+        'model': model,
+        'columns': X_train.columns.tolist(),
+        'leaf_index': leaf_index,
+        'params': {k: v for k, v in model.get_params().items() if k in TUNED_PARAMS},
+        'rows': len(X_train),
+        'train_s': round(train_s, 2),
+    }
+
+def train_shards(X_train, y_train, shard_by, workers=None, n_iter=20, params=None):
+    """
+    Train one forest per park or per country, in parallel processes.
+
+    Each shard sees only its parks' rows. A one-park shard drops the park_*
+    columns, which are constant for it; a country shard keeps its own. The
+    CPUs are split between the worker processes, so the searches inside
+    them don't oversubscribe the machine.
+
+    Args:
+        X_train (pd.DataFrame): Training features from the global pipeline (with park_* columns).
+        y_train (pd.Series): Training labels.
+        shard_by (str): 'park' or 'country'.
+        workers (int | None): Worker processes. One per shard, up to the CPU count, if None.
+        n_iter (int): Bayesian search iterations per shard.
+        params (dict | None): Fixed RandomForestRegressor parameters instead of a search.
+
+    Returns:
+        tuple[dict, dict]: Park ID to shard name, and shard name to the output of train_shard.
+    """
+    parks = row_park_ids(X_train)
+    routes = assign_shards(sorted(set(parks.tolist()) - {-1}), shard_by)
+    members = {}
+    for park_id, shard in routes.items():
+        members.setdefault(shard, []).append(park_id)
+
+    cpus = os.cpu_count() or 1
+    workers = min(workers or cpus, len(members))
+    n_jobs = max(1, cpus // workers)
+    print(f'Training {len(members)} {shard_by} shards in {workers} processes ({n_jobs} jobs each)...')
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {}
+        for shard, shard_parks in members.items():
+            rows = np.isin(parks, shard_parks)
+            columns = shard_columns(X_train.columns, shard_parks)
+            futures[shard] = pool.submit(train_shard, shard, X_train.loc[rows, columns], y_train[rows], n_jobs, n_iter, params)
+        shards = {shard: future.result() for shard, future in futures.items()}
+    for shard, shard_parks in members.items():
+        shards[shard]['parks'] = sorted(shard_parks)
+    return routes, shards
+
+def compare_with_global(sharded, X_test, y_test, global_model=None, global_columns=None):
+    """
+    Print the sharded model's accuracy and inference latency next to the global model's.
+
+    Both predict the same held-out rows, so the global model must have been
+    fitted on the same split (see fit_global_baseline); a published export
+    may have trained on some of X_test. Latency is timed for the whole test
+    set and for single-park batches of 30 rows, the dashboard's usual request.
+
+    Args:
+        sharded (ShardedModel): The sharded model.
+        X_test (pd.DataFrame): Held-out features from the global pipeline.
+        y_test (pd.Series): Held-out labels.
+        global_model: A global model fitted on the shards' training rows, or None to report the shards alone.
+        global_columns (list[str] | None): The global model's feature columns.
+
+    Returns:
+        pd.DataFrame: MAE/RMSE per shard and overall, with global_* columns when a global model was given.
+    """
+    def latency(model, columns):
+        X = X_test.reindex(columns=columns, fill_value=0)
+        started = time.perf_counter()
+        predictions = model.predict(X)
+        batch_ms = (time.perf_counter() - started) * 1000
+        park = row_park_ids(X_test)
+        single = []
+        for park_id in np.unique(park)[:5]:
+            rows = X.iloc[np.flatnonzero(park == park_id)[:30]]
+            started = time.perf_counter()
+            model.predict(rows)
+            single.append((time.perf_counter() - started) * 1000)
+        return predictions, batch_ms, float(np.median(single))
+
+    shards = sharded.route(X_test.reindex(columns=sharded.feature_columns, fill_value=0))
+    predictions, batch_ms, single_ms = latency(sharded, sharded.feature_columns)
+    report = shard_report(shards, y_test, predictions)
+    print(f'\nSharded: {len(X_test)} rows in {batch_ms:.1f} ms, 30-day single park request {single_ms:.1f} ms')
+
+    if global_model is not None:
+        global_predictions, batch_ms, single_ms = latency(global_model, global_columns)
+        report = report.join(shard_report(shards, y_test, global_predictions).add_prefix('global_').drop(columns='global_rows'))
+        print(f'Global:  {len(X_test)} rows in {batch_ms:.1f} ms, 30-day single park request {single_ms:.1f} ms')
+    print(report.to_string())
+    return report
+
+def load_model_metadata(config_path='config.yml'):
+    """
+    Training metadata of the current global model version, or {} for exports saved before the registry.
+    """
+    return version_metadata(get_model_name(config_path))
+
+def load_global_model(config_path='config.yml'):
+    """
+    The global model and feature columns exported under the training model name, or (None, None).
+    """
+    exported = load_version(get_model_name(config_path))
+    if exported is None:
+        return None, None
+    return exported['model'], exported['feature_columns']
 
-    if feature_columns is not None:
-        columns_path = os.path.join(models_dir, f'{model_name}_columns.pkl')
-        joblib.dump(list(feature_columns), columns_path)
-        print(f'Saved feature columns ({len(feature_columns)} features) to {model_name}_columns.pkl')
+def fit_global_baseline(X_train, y_train, config_path='config.yml'):
+    """
+    Fit a global model on the same training rows as the shards, for compare_with_global.
+
+    Uses the current global version's hyperparameters when one is published,
+    so no search is needed; otherwise runs the usual search.
+
+    Args:
+        X_train (pd.DataFrame): Training features from the global pipeline.
+        y_train (pd.Series): Training labels.
+        config_path (str): Path to the configuration file.
+
+    Returns:
+        tuple: The fitted model and its feature columns.
+    """
+    params = load_model_metadata(config_path).get('params')
+    started = time.perf_counter()
+    if params:
+        params = {k: v for k, v in params.items() if k in TUNED_PARAMS}
+        model = RandomForestRegressor(random_state=42, n_jobs=-1, **params).fit(X_train, y_train)
+    else:
+        model = optimize_random_forest(X_train, y_train)
+    print(f'Trained global baseline on {len(X_train)} rows in {time.perf_counter() - started:.1f}s')
+    return model, X_train.columns.tolist()
 
 if __name__ == "__main__":
-    X_train, X_test, y_train, y_test = load_and_split_data()
-    rf_model = optimize_random_forest(X_train, y_train)
-    rf_pred = evaluate_model(rf_model, X_test, y_test)
-    display_feature_importance(rf_model, X_train)
-    save_model(rf_model, feature_columns=X_train.columns.tolist())
\ No newline at end of file
+    shard_config = get_shard_config()
+
+    parser = argparse.ArgumentParser(description='Train the crowd level model.')
+    parser.add_argument('--shard-by', choices=['park', 'country'], default=shard_config['shard_by'],
+                        help='Train one model per park or per country instead of one global model (default: shard_by in config).')
+    parser.add_argument('--workers', type=int, default=shard_config['workers'], help='Parallel shard training processes.')
+    args = parser.parse_args()
+
+    X_train, X_test, y_train, y_test, trained_through = load_and_split_data()
+
+    if args.shard_by:
+        started = time.perf_counter()
+        routes, shards = train_shards(X_train, y_train, args.shard_by, workers=args.workers)
+        print(f'Trained {len(shards)} shards in {time.perf_counter() - started:.1f}s')
+
+        sharded = ShardedModel(
+            {'shard_by': args.shard_by, 'routes': routes, 'shards': {name: {'rows': s['rows']} for name, s in shards.items()}},
+            {name: s['model'] for name, s in shards.items()},
+            {name: s['columns'] for name, s in shards.items()},
+            {name: s['leaf_index'] for name, s in shards.items()},
+        )
+        report = compare_with_global(sharded, X_test, y_test, *fit_global_baseline(X_train, y_train))
+        for name in shards:
+            shards[name]['metrics'] = report.loc[name].to_dict() if name in report.index else {}
+
+        save_sharded_model(get_model_name(), args.shard_by, routes, shards,
+                           keep_versions=get_registry_config()['keep_versions'],
+                           metadata={'trained_through': trained_through})
+    else:
+        rf_model = optimize_random_forest(X_train, y_train)
+        rf_pred = evaluate_model(rf_model, X_test, y_test)
+        display_feature_importance(rf_model, X_train)
+        leaf_index = build_leaf_index(rf_model, X_train, y_train)
+        save_model(rf_model, feature_columns=X_train.columns.tolist(), leaf_index=leaf_index, metadata={
+            'trained_through': trained_through,
+            'method': 'search',
+            'params': rf_model.get_params(),
+            'rows': len(X_train),
+            'metrics': {
+                'mae': round(mean_absolute_error(y_test, rf_pred), 3),
+                'rmse': round(float(np.sqrt(mean_squared_error(y_test, rf_pred))), 3),
+                'r2': round(r2_score(y_test, rf_pred), 3),
+            },
+        })
\ No newline at end of file
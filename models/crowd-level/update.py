@@ -0,0 +1,195 @@
+from train import get_model_name, load_global_model, load_model_metadata, save_model
+from utils.pipeline import model_pipeline
+from utils.quantile import build_leaf_index
+from utils.shards import get_shard_config
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.metrics import mean_absolute_error
+import argparse
+import copy
+import time
+import pandas as pd
+import yaml
+
+STRATEGIES = ('refit', 'warm')
+
+def get_update_config(config_path='config.yml'):
+    """
+    Get the incremental update settings from the config file.
+
+    Args:
+        config_path (str): Path to the configuration file.
+
+    Returns:
+        dict: strategy ('refit' or 'warm'), new_trees (trees replaced per
+            warm update), holdout_days (latest days held out for the
+            comparison) and tolerance (how much worse, as a fraction of the
+            current model's holdout MAE, the update may be and still be swapped in).
+    """
+    try:
+        with open(config_path, 'r') as file:
+            config = yaml.safe_load(file) or {}
+    except FileNotFoundError:
+        config = {}
+    update = ((config.get('models', {}) or {}).get('crowd-level', {}) or {}).get('update', {}) or {}
+    return {
+        'strategy': update.get('strategy', 'refit'),
+        'new_trees': update.get('new_trees', 50),
+        'holdout_days': update.get('holdout_days', 28),
+        'tolerance': update.get('tolerance', 0.0),
+    }
+
+def split_latest_days(training_data, holdout_days, after=None):
+    """
+    Split pipeline output into the rows before the latest holdout_days dates and the rows on them.
+
+    Args:
+        training_data (pd.DataFrame): Output of model_pipeline(is_training=True, keep_date=True).
+        holdout_days (int): Number of latest distinct dates to hold out.
+        after (str | None): Only hold out dates after this one, e.g. the
+            current model's trained_through, so it is compared on days it has not seen.
+
+    Returns:
+        tuple[pd.DataFrame, pd.DataFrame]: Earlier rows and held-out rows, both without the date column.
+    """
+    dates = pd.to_datetime(training_data['date'])
+    candidates = dates.drop_duplicates()
+    if after is not None:
+        candidates = candidates[candidates > pd.Timestamp(after)]
+    held_out = dates.isin(candidates.nlargest(holdout_days)).to_numpy()
+    training_data = training_data.drop(columns=['date'])
+    return training_data[~held_out], training_data[held_out]
+
+def update_forest(model, X, y, strategy, new_trees):
+    """
+    Fit an updated copy of a forest without a hyperparameter search.
+
+    'refit' fits a fresh forest with the current model's hyperparameters.
+    'warm' adds new_trees trees fitted on X with warm_start and drops the
+    same number of the oldest trees, so the forest keeps its size and is
+    fully renewed after n_estimators / new_trees updates. A warm update
+    needs the same feature columns as the current model; otherwise (e.g.
+    a new park) it falls back to a refit.
+
+    Fitting uses every CPU; the forest keeps the current model's n_jobs for prediction.
+
+    Args:
+        model: Current RandomForestRegressor.
+        X (pd.DataFrame): Training features.
+        y (pd.Series): Training labels.
+        strategy (str): 'refit' or 'warm'.
+        new_trees (int): Trees replaced by a warm update.
+
+    Returns:
+        RandomForestRegressor: The updated forest; model itself is left unchanged.
+    """
+    columns = list(getattr(model, 'feature_names_in_', []))
+    n_jobs = model.get_params()['n_jobs']
+    if strategy == 'warm' and set(columns) == set(X.columns):
+        updated = copy.deepcopy(model)
+        n_trees = len(updated.estimators_)
+        new_trees = min(new_trees, n_trees)
+        updated.set_params(warm_start=True, n_estimators=n_trees + new_trees, n_jobs=-1)
+        updated.fit(X[columns], y)
+        updated.estimators_ = updated.estimators_[new_trees:]
+        updated.set_params(warm_start=False, n_estimators=n_trees, n_jobs=n_jobs)
+        return updated
+    if strategy == 'warm':
+        print('Feature columns changed since the last training run — refitting instead of warm starting.')
+    updated = RandomForestRegressor(**{**model.get_params(), 'n_jobs': -1}).fit(X, y)
+    return updated.set_params(n_jobs=n_jobs)
+
+def run_update(strategy=None, dry_run=False, config_path='config.yml'):
+    """
+    Update the exported crowd level model with newly scraped days, without a hyperparameter search.
+
+    The training pipeline is run once. The days scraped since the current
+    export's trained_through (at most the latest holdout_days of them) are
+    held out; a candidate update is fitted on every other day and compared
+    with the current export on the held-out days, which neither has seen.
+    Exports saved without metadata are compared on the latest holdout_days
+    days instead, which they may have trained on. If the candidate's MAE is
+    no worse (within tolerance), the update is fitted again on every day, its
+    leaf index rebuilt, and it is published as the current registry version;
+    running servers pick it up without a restart.
+
+    Args:
+        strategy (str | None): 'refit' or 'warm'. From config if None.
+        dry_run (bool): Compare only; never replace the export.
+        config_path (str): Path to the configuration file.
+
+    Returns:
+        dict: Holdout MAE of the current and updated model, whether it was
+            swapped in, and seconds per phase.
+    """
+    settings = get_update_config(config_path)
+    strategy = strategy or settings['strategy']
+    if strategy not in STRATEGIES:
+        raise ValueError(f'Unknown update strategy: {strategy} (expected one of {STRATEGIES})')
+    if get_shard_config(config_path)['shard_by'] is not None:
+        print('Incremental updates cover the global model only; retrain shards with train.py.')
+
+    model, feature_columns = load_global_model(config_path)
+    if model is None:
+        raise FileNotFoundError(f'No exported model named {get_model_name(config_path)} to update; run train.py first.')
+
+    timings = {}
+    started = time.perf_counter()
+    training_data = model_pipeline(is_training=True, keep_date=True)
+    timings['pipeline_s'] = time.perf_counter() - started
+
+    trained_through = load_model_metadata(config_path).get('trained_through')
+    latest = pd.Timestamp(training_data['date'].max()).strftime('%Y-%m-%d')
+    if trained_through is None:
+        print('The current model has no training metadata; it may have trained on the held-out days.')
+    elif latest <= trained_through:
+        print(f'Nothing new since {trained_through} — the current model is up to date.')
+        return {'strategy': strategy, 'trained_through': trained_through, 'swapped': False}
+
+    earlier, held_out = split_latest_days(training_data, settings['holdout_days'], after=trained_through)
+    X_fit, y_fit = earlier.drop(columns=['crowd_level']), earlier['crowd_level']
+    X_holdout, y_holdout = held_out.drop(columns=['crowd_level']), held_out['crowd_level']
+    print(f"Holding out {len(held_out)} of {len(training_data)} rows, up to the latest {settings['holdout_days']} days"
+          f"{f' after {trained_through}' if trained_through else ''}")
+
+    started = time.perf_counter()
+    candidate = update_forest(model, X_fit, y_fit, strategy, settings['new_trees'])
+    timings['candidate_fit_s'] = time.perf_counter() - started
+
+    current_mae = mean_absolute_error(y_holdout, model.predict(X_holdout.reindex(columns=feature_columns, fill_value=0)))
+    updated_mae = mean_absolute_error(y_holdout, candidate.predict(X_holdout[candidate.feature_names_in_]))
+    accept = updated_mae <= current_mae * (1 + settings['tolerance'])
+    print(f'Holdout MAE: current {current_mae:.3f}, {strategy} update {updated_mae:.3f}')
+
+    result = {'strategy': strategy, 'current_mae': round(current_mae, 3), 'updated_mae': round(updated_mae, 3), 'swapped': False}
+    if not accept:
+        print('The update is worse on the holdout — keeping the current model.')
+    elif dry_run:
+        print('The update is no worse on the holdout (dry run, not saved).')
+    else:
+        started = time.perf_counter()
+        X_all = pd.concat([X_fit, X_holdout])
+        y_all = pd.concat([y_fit, y_holdout])
+        final = update_forest(model, X_all, y_all, strategy, settings['new_trees'])
+        leaf_index = build_leaf_index(final, X_all[final.feature_names_in_], y_all)
+        timings['final_fit_s'] = time.perf_counter() - started
+        result['version'] = save_model(final, feature_columns=list(final.feature_names_in_), leaf_index=leaf_index, config_path=config_path, metadata={
+            'trained_through': latest,
+            'method': strategy,
+            'params': final.get_params(),
+            'rows': len(X_all),
+            'metrics': {'holdout_mae': result['updated_mae'], 'previous_holdout_mae': result['current_mae']},
+        })
+        result['swapped'] = True
+
+    result.update({name: round(seconds, 2) for name, seconds in timings.items()})
+    print(f"Update finished: {', '.join(f'{name} {seconds:.1f}s' for name, seconds in timings.items())}")
+    return result
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Update the crowd level model with newly scraped days, without a hyperparameter search.')
+    parser.add_argument('--strategy', choices=STRATEGIES, default=None,
+                        help='refit: fresh forest with the current hyperparameters; warm: replace the oldest trees (default: update.strategy in config).')
+    parser.add_argument('--dry-run', action='store_true', help='Compare on the holdout without replacing the model.')
+    args = parser.parse_args()
+
+    run_update(args.strategy, args.dry_run)
@@ -0,0 +1,190 @@
+import os
+from .columnar import DEFAULT_PARQUET_DIR, RIDE_INFO_FILE
+from .db import DEFAULT_DB_PATH
+from .instrument import record_external_call
+
+# Optional DuckDB engine for the aggregate queries behind the training target
+# and recorded opening hours. Enable with storage.engine: "duckdb" in
+# config.yml; results match the pandas path in utils/preprocess.py and
+# utils/opening.py. Reading the SQLite file needs DuckDB's sqlite extension,
+# which DuckDB downloads on first use; the Parquet dataset needs nothing extra.
+
+# Per-ride daily statistics over raw readings, matching the queue_daily rollup.
+RIDE_DAY_SELECT = """
+    SELECT
+        park_id, ride_id, date,
+        COUNT(*) AS n_readings,
+        COUNT(*) FILTER (WHERE NOT is_closed) AS n_open,
+        COALESCE(SUM(queue_time) FILTER (WHERE NOT is_closed), 0) AS sum_queue_time,
+        MIN(minute_of_day) AS first_minute,
+        MAX(minute_of_day) AS last_minute
+    FROM readings
+    GROUP BY park_id, ride_id, date
+"""
+
+def connect_readings(backend='sqlite', db_path=DEFAULT_DB_PATH, parquet_dir=DEFAULT_PARQUET_DIR):
+    """
+    Open an in-memory DuckDB connection with typed views over the queue data.
+
+    `readings` has park_id, ride_id (INTEGER), date (DATE), minute_of_day,
+    queue_time and is_closed (BOOLEAN), whichever backend it reads.
+    `ride_days` has the per-ride daily statistics of the queue_daily rollup;
+    with the sqlite backend it includes days already compacted out of the
+    raw table. Like the pandas path (active_only), both skip readings outside
+    their ride's open lifecycle when ride_info (or its snapshot) exists.
+
+    Args:
+        backend (str): 'sqlite' to attach the SQLite file, or 'parquet' to scan the Parquet dataset.
+        db_path (str): Path to the SQLite database file.
+        parquet_dir (str): Root directory of the Parquet dataset.
+
+    Returns:
+        duckdb.DuckDBPyConnection: Connection with the readings view defined.
+    """
+    try:
+        import duckdb
+    except ImportError as e:
+        raise ImportError("storage.engine 'duckdb' requires the duckdb package (pip install duckdb).") from e
+
+    conn = duckdb.connect()
+    if backend == 'parquet':
+        pattern = os.path.join(parquet_dir, 'park_id=*', 'year=*', 'month=*', '*.parquet').replace("'", "''")
+        ride_info = os.path.join(parquet_dir, RIDE_INFO_FILE)
+        lifecycle = f"""
+            JOIN read_parquet('{ride_info.replace("'", "''")}') ri
+                ON ri.ride_id = r.ride_id AND r.date BETWEEN ri.first_seen AND ri.last_seen
+        """ if os.path.exists(ride_info) else ''
+        conn.execute(f"""
+            CREATE VIEW readings AS
+            SELECT CAST(r.park_id AS INTEGER) AS park_id, r.ride_id, r.date, r.minute_of_day, r.queue_time, r.is_closed
+            FROM read_parquet('{pattern}', hive_partitioning = true) r
+            {lifecycle}
+        """)
+        conn.execute(f"CREATE VIEW ride_days AS {RIDE_DAY_SELECT}")
+    elif backend == 'sqlite':
+        conn.execute("INSTALL sqlite")
+        conn.execute("LOAD sqlite")
+        conn.execute(f"ATTACH '{db_path.replace(chr(39), chr(39) * 2)}' AS src (TYPE sqlite, READ_ONLY)")
+        has_ride_info = conn.execute(
+            "SELECT COUNT(*) FROM duckdb_tables() WHERE database_name = 'src' AND table_name = 'ride_info'"
+        ).fetchone()[0]
+        # ride_info carries park_id too, so it replaces park_info when present.
+        rides = (
+            "src.ride_info p ON p.ride_id = {t}.ride_id AND {t}.date BETWEEN p.first_seen AND p.last_seen"
+            if has_ride_info else "src.park_info p ON p.ride_id = {t}.ride_id"
+        )
+        conn.execute(f"""
+            CREATE VIEW readings AS
+            SELECT
+                TRY_CAST(p.park_id AS INTEGER) AS park_id,
+                TRY_CAST(q.ride_id AS INTEGER) AS ride_id,
+                CAST(strptime(q.date, '%Y/%m/%d') AS DATE) AS date,
+                CAST(substr(q.time_of_day, 1, 2) AS INTEGER) * 60 + CAST(substr(q.time_of_day, 4, 2) AS INTEGER) AS minute_of_day,
+                q.queue_time,
+                q.is_closed <> 0 AS is_closed
+            FROM src.queue_data q
+            JOIN {rides.format(t='q')}
+        """)
+        has_daily = conn.execute(
+            "SELECT COUNT(*) FROM duckdb_tables() WHERE database_name = 'src' AND table_name = 'queue_daily'"
+        ).fetchone()[0]
+        if has_daily:
+            conn.execute(f"""
+                CREATE VIEW ride_days AS
+                SELECT
+                    park_id, ride_id, date,
+                    SUM(n_readings) AS n_readings, SUM(n_open) AS n_open, SUM(sum_queue_time) AS sum_queue_time,
+                    MIN(first_minute) AS first_minute, MAX(last_minute) AS last_minute
+                FROM (
+                    {RIDE_DAY_SELECT}
+                    UNION ALL
+                    SELECT
+                        TRY_CAST(p.park_id AS INTEGER), TRY_CAST(d.ride_id AS INTEGER),
+                        CAST(strptime(d.date, '%Y/%m/%d') AS DATE),
+                        d.n_readings, d.n_open, d.sum_queue_time,
+                        CAST(substr(d.first_time_of_day, 1, 2) AS INTEGER) * 60 + CAST(substr(d.first_time_of_day, 4, 2) AS INTEGER),
+                        CAST(substr(d.last_time_of_day, 1, 2) AS INTEGER) * 60 + CAST(substr(d.last_time_of_day, 4, 2) AS INTEGER)
+                    FROM src.queue_daily d
+                    JOIN {rides.format(t='d')}
+                )
+                GROUP BY park_id, ride_id, date
+            """)
+        else:
+            conn.execute(f"CREATE VIEW ride_days AS {RIDE_DAY_SELECT}")
+    else:
+        raise ValueError(f'Unknown queue data backend: {backend}')
+    return conn
+
+def query_training_targets(conn, include_park_ids=None):
+    """
+    Compute the crowd-level target in SQL: per-park percentile rank of the daily mean of ride means.
+
+    Mirrors generate_training: closed readings are excluded, ties share their
+    average rank (pandas' rank(method='average', pct=True)), and the score is
+    rounded half to even like Series.round().
+
+    Args:
+        conn (duckdb.DuckDBPyConnection): Connection from connect_readings.
+        include_park_ids (list[int] | None): Park IDs to include. Uses all parks if None.
+
+    Returns:
+        pd.DataFrame: date, park_id and crowd_level, ordered by date then park.
+    """
+    park_filter = ''
+    params = []
+    if include_park_ids is not None:
+        park_filter = f"AND park_id IN ({', '.join('?' for _ in include_park_ids)})"
+        params = [int(p) for p in include_park_ids]
+
+    record_external_call('duckdb')
+    return conn.execute(f"""
+        WITH park_days AS (
+            SELECT date, park_id, AVG(sum_queue_time / n_open) AS avg_queue_time
+            FROM ride_days
+            WHERE n_open > 0 AND park_id IS NOT NULL {park_filter}
+            GROUP BY date, park_id
+        ),
+        ranked AS (
+            SELECT
+                date,
+                park_id,
+                RANK() OVER (PARTITION BY park_id ORDER BY avg_queue_time)
+                    + (COUNT(*) OVER (PARTITION BY park_id, avg_queue_time) - 1) / 2.0 AS avg_rank,
+                COUNT(*) OVER (PARTITION BY park_id) AS n_days
+            FROM park_days
+        )
+        SELECT date, park_id, CAST(round_even(avg_rank / n_days * 100, 0) AS BIGINT) AS crowd_level
+        FROM ranked
+        ORDER BY date, park_id
+    """, params).df()
+
+def query_recorded_opening_hours(conn, park_id, dates):
+    """
+    First and last recorded reading time for a park on each of the given dates.
+
+    Args:
+        conn (duckdb.DuckDBPyConnection): Connection from connect_readings.
+        park_id (int): The ID of the park.
+        dates (list[str]): Dates in YYYY-MM-DD format.
+
+    Returns:
+        dict: Date string to {'opening_time', 'closing_time'} as 'HH:MM', for dates with readings only.
+    """
+    record_external_call('duckdb')
+    hours = conn.execute("""
+        SELECT
+            strftime(date, '%Y-%m-%d') AS day,
+            MIN(first_minute) AS first_minute,
+            MAX(last_minute) AS last_minute
+        FROM ride_days
+        WHERE park_id = ? AND date IN (SELECT CAST(UNNEST(?) AS DATE))
+        GROUP BY day
+    """, [int(park_id), list(dates)]).fetchall()
+
+    return {
+        date: {
+            'opening_time': f'{first // 60:02d}:{first % 60:02d}',
+            'closing_time': f'{last // 60:02d}:{last % 60:02d}',
+        }
+        for date, first, last in hours
+    }
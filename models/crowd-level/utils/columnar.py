@@ -0,0 +1,209 @@
+import os
+import numpy as np
+import pandas as pd
+import yaml
+from .db import DEFAULT_DB_PATH
+from .instrument import record_external_call
+
+# Partitioned Parquet copy of queue_data written by scraping/parquet_export.py:
+# <parquet_dir>/park_id=<id>/year=<yyyy>/month=<m>/part.parquet, with typed
+# columns ride_id (int32), date (date32), minute_of_day, queue_time (int16)
+# and is_closed (bool).
+DEFAULT_PARQUET_DIR = 'data/queue_parquet'
+PARK_INFO_FILE = '_park_info.parquet'
+RIDE_INFO_FILE = '_ride_info.parquet'
+
+def get_storage_config(config_path='config.yml'):
+    """
+    Get the queue data backend settings from the config file.
+
+    Args:
+        config_path (str): Path to the configuration file.
+
+    Returns:
+        dict: 'backend' ('sqlite' or 'parquet'), 'db_path', 'parquet_dir' and 'engine' ('pandas' or 'duckdb').
+    """
+    try:
+        with open(config_path, 'r') as file:
+            config = yaml.safe_load(file) or {}
+    except FileNotFoundError:
+        config = {}
+    storage = config.get('storage', {}) or {}
+    return {
+        'backend': storage.get('backend', 'sqlite'),
+        'db_path': storage.get('db_path', DEFAULT_DB_PATH),
+        'parquet_dir': storage.get('parquet_dir', DEFAULT_PARQUET_DIR),
+        'engine': storage.get('engine', 'pandas'),
+    }
+
+def _queue_dataset(parquet_dir):
+    import pyarrow.dataset as ds
+
+    return ds.dataset(parquet_dir, format='parquet', partitioning='hive', exclude_invalid_files=True)
+
+def _to_date(value):
+    return pd.Timestamp(str(value).replace('/', '-')).date() if isinstance(value, str) else pd.Timestamp(value).date()
+
+def _and(expression, condition):
+    return condition if expression is None else expression & condition
+
+def _month_at_or_after(date):
+    import pyarrow.dataset as ds
+
+    return (ds.field('year') > date.year) | ((ds.field('year') == date.year) & (ds.field('month') >= date.month))
+
+def _month_at_or_before(date):
+    import pyarrow.dataset as ds
+
+    return (ds.field('year') < date.year) | ((ds.field('year') == date.year) & (ds.field('month') <= date.month))
+
+def _queue_filter(park_ids=None, include_closed=True, start_date=None, end_date=None, dates=None):
+    """
+    Build a dataset filter. Conditions on park_id, year and month prune whole
+    partitions; the date and is_closed conditions are applied to the rows read.
+    """
+    import pyarrow.dataset as ds
+
+    expression = None
+    if park_ids is not None:
+        expression = ds.field('park_id').isin([int(p) for p in park_ids])
+    if start_date is not None:
+        start_date = _to_date(start_date)
+        expression = _and(expression, _month_at_or_after(start_date) & (ds.field('date') >= start_date))
+    if end_date is not None:
+        end_date = _to_date(end_date)
+        expression = _and(expression, _month_at_or_before(end_date) & (ds.field('date') <= end_date))
+    if dates is not None:
+        dates = sorted({_to_date(d) for d in dates})
+        months = sorted({(d.year, d.month) for d in dates})
+        in_months = ds.field('year') < 0
+        for year, month in months:
+            in_months = in_months | ((ds.field('year') == year) & (ds.field('month') == month))
+        expression = _and(expression, in_months & ds.field('date').isin(dates))
+    if not include_closed:
+        expression = _and(expression, ds.field('is_closed') == False)  # noqa: E712 (Arrow expression, not a Python comparison)
+    return expression
+
+def _to_pandas(table):
+    # Numeric and temporal columns convert without copying; split_blocks
+    # keeps them as separate arrays rather than consolidating into a block.
+    return table.to_pandas(split_blocks=True, self_destruct=True, coerce_temporal_nanoseconds=False)
+
+def iter_queue_parquet_typed(parquet_dir=DEFAULT_PARQUET_DIR, park_ids=None, include_closed=True, chunksize=1_000_000,
+                             start_date=None, end_date=None, dates=None):
+    """
+    Iterate over the Parquet dataset as typed DataFrames matching iter_queue_data_typed.
+
+    Only the partitions for park_ids and the requested months are opened,
+    and closed readings can be dropped during the scan.
+
+    Args:
+        parquet_dir (str): Root directory of the Parquet dataset.
+        park_ids (list[int] | None): Parks to read. Reads all parks if None.
+        include_closed (bool): Whether to keep readings flagged is_closed.
+        chunksize (int | None): Maximum rows per chunk. None yields one frame.
+        start_date: First date to read (inclusive), e.g. 'YYYY-MM-DD'.
+        end_date: Last date to read (inclusive).
+        dates (list | None): Only read these dates.
+
+    Yields:
+        pd.DataFrame: park_id, ride_id, date, minute_of_day, queue_time, is_closed.
+    """
+    import pyarrow as pa
+
+    dataset = _queue_dataset(parquet_dir)
+    columns = ['park_id', 'ride_id', 'date', 'minute_of_day', 'queue_time', 'is_closed']
+    scan_filter = _queue_filter(park_ids, include_closed, start_date, end_date, dates)
+
+    record_external_call('parquet')
+    if chunksize is None:
+        batches = [dataset.to_table(columns=columns, filter=scan_filter)]
+    else:
+        batches = (pa.Table.from_batches([b]) for b in dataset.to_batches(columns=columns, filter=scan_filter, batch_size=chunksize))
+
+    for table in batches:
+        if table.num_rows == 0 and chunksize is not None:
+            continue
+        table = table.set_column(0, 'park_id', table['park_id'].cast('int32'))
+        table = table.set_column(2, 'date', table['date'].cast('timestamp[s]'))
+        yield _to_pandas(table)
+
+def load_queue_parquet(parquet_dir=DEFAULT_PARQUET_DIR, columns=None, park_ids=None, include_closed=True,
+                       start_date=None, end_date=None, dates=None):
+    """
+    Load the Parquet dataset in load_all_data's queue_data format.
+
+    Only the requested columns are read. ride_id and time_of_day are rebuilt
+    as strings from the typed columns, converting each distinct value once.
+
+    Args:
+        parquet_dir (str): Root directory of the Parquet dataset.
+        columns (list[str] | None): Columns among date, ride_id, time_of_day,
+            queue_time, is_closed and park_id. All of them if None.
+        park_ids (list[int] | None): Parks to read. Reads all parks if None.
+        include_closed (bool): Whether to keep readings flagged is_closed.
+        start_date: First date to read (inclusive), e.g. 'YYYY-MM-DD'.
+        end_date: Last date to read (inclusive).
+        dates (list | None): Only read these dates.
+
+    Returns:
+        pd.DataFrame: Queue data with the requested columns.
+    """
+    columns = columns or ['date', 'ride_id', 'time_of_day', 'queue_time', 'is_closed', 'park_id']
+    source_columns = list(dict.fromkeys('minute_of_day' if c == 'time_of_day' else c for c in columns))
+
+    dataset = _queue_dataset(parquet_dir)
+    record_external_call('parquet')
+    table = dataset.to_table(columns=source_columns, filter=_queue_filter(park_ids, include_closed, start_date, end_date, dates))
+    frame = _to_pandas(table)
+
+    queue_data = pd.DataFrame(index=frame.index)
+    for column in columns:
+        if column == 'time_of_day':
+            codes, minutes = pd.factorize(frame['minute_of_day'])
+            labels = np.array([f'{m // 60:02d}:{m % 60:02d}' for m in minutes], dtype=object)
+            queue_data[column] = labels[codes]
+        elif column in ('ride_id', 'park_id'):
+            codes, ids = pd.factorize(frame[column])
+            queue_data[column] = ids.astype(str).to_numpy(dtype=object)[codes]
+        elif column in ('queue_time', 'is_closed'):
+            queue_data[column] = frame[column].astype('int64')
+        elif column == 'date':
+            queue_data[column] = frame[column].astype('datetime64[ns]')
+        else:
+            queue_data[column] = frame[column]
+    return queue_data
+
+def load_park_info_parquet(parquet_dir=DEFAULT_PARQUET_DIR):
+    """
+    Load the park_info snapshot written next to the queue partitions.
+
+    Args:
+        parquet_dir (str): Root directory of the Parquet dataset.
+
+    Returns:
+        pd.DataFrame: ride_id, park_id and ride_name as strings.
+    """
+    import pyarrow.parquet as pq
+
+    record_external_call('parquet')
+    return pq.read_table(os.path.join(parquet_dir, PARK_INFO_FILE)).to_pandas()
+
+def load_ride_info_parquet(parquet_dir=DEFAULT_PARQUET_DIR):
+    """
+    Load the ride_info snapshot written next to the queue partitions.
+
+    Args:
+        parquet_dir (str): Root directory of the Parquet dataset.
+
+    Returns:
+        pd.DataFrame | None: Columns of RIDE_INFO_COLUMNS (see utils/helpers.py),
+            or None if the dataset was exported before ride_info existed.
+    """
+    import pyarrow.parquet as pq
+
+    path = os.path.join(parquet_dir, RIDE_INFO_FILE)
+    if not os.path.exists(path):
+        return None
+    record_external_call('parquet')
+    return _to_pandas(pq.read_table(path))
@@ -0,0 +1,79 @@
+import os
+import sqlite3
+import threading
+
+# The scraper writes data/queue_data.db (scraping/database.py); everything on
+# the model side reads it through get_connection.
+DEFAULT_DB_PATH = 'data/queue_data.db'
+
+# Applied to every connection, the scraper's included (scraping/database.py
+# loads this module for PRAGMAS and apply_profile). WAL lets readers
+# (training, dashboard, serve) run while the scraper or compaction writes,
+# and synchronous=NORMAL is durable under WAL except for the last commits
+# before a power loss. busy_timeout makes a second writer wait for the lock
+# instead of failing with "database is locked".
+BUSY_TIMEOUT_S = 30
+PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': BUSY_TIMEOUT_S * 1000,
+    'cache_size': -64 * 1024,  # KiB, i.e. 64 MB
+    'mmap_size': 256 * 1024 * 1024,
+    'temp_store': 'MEMORY',
+}
+
+_local = threading.local()
+
+def apply_profile(conn):
+    """
+    Apply the connection profile in PRAGMAS.
+
+    Args:
+        conn (sqlite3.Connection): Connection to configure.
+
+    Returns:
+        sqlite3.Connection: The same connection.
+    """
+    for name, value in PRAGMAS.items():
+        conn.execute(f'PRAGMA {name} = {value}')
+    return conn
+
+def get_connection(db_path=DEFAULT_DB_PATH, create=False):
+    """
+    Get this thread's connection to a SQLite database, opening it on first use.
+
+    Connections are reused for the life of the process, one per thread
+    (sqlite3 connections can't be shared across threads), so repeated loads
+    such as per-park opening hours don't reopen the file. After a fork the
+    child opens its own.
+
+    Args:
+        db_path (str): Path to the database file.
+        create (bool): Create the file if missing. Otherwise a missing
+            database raises rather than being silently created empty.
+
+    Returns:
+        sqlite3.Connection: Open connection with the PRAGMAS profile applied.
+    """
+    key = os.path.abspath(db_path)
+    if getattr(_local, 'pid', None) != os.getpid():
+        _local.pid = os.getpid()
+        _local.connections = {}
+
+    conn = _local.connections.get(key)
+    if conn is None:
+        if not create and not os.path.exists(db_path):
+            raise FileNotFoundError(f'SQLite database not found: {db_path}')
+        if create:
+            os.makedirs(os.path.dirname(key), exist_ok=True)
+        conn = apply_profile(sqlite3.connect(db_path, timeout=BUSY_TIMEOUT_S))
+        _local.connections[key] = conn
+    return conn
+
+def close_connections():
+    """
+    Close this thread's cached connections.
+    """
+    for conn in getattr(_local, 'connections', {}).values():
+        conn.close()
+    _local.connections = {}
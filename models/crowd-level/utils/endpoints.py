@@ -0,0 +1,80 @@
+import os
+import yaml
+
+# Base URLs of every external source the pipeline calls. Override per source
+# under `endpoints:` in config.yml, or point them all at one local stand-in
+# (see benchmarks/fake_server.py) with SOURCE_BASE_URL, where each source is
+# served under its own path prefix, e.g. http://127.0.0.1:8765/open-meteo.
+DEFAULT_ENDPOINTS = {
+    'queue-times': 'https://queue-times.com',
+    'themeparks-wiki': 'https://api.themeparks.wiki',
+    'nager-date': 'https://date.nager.at',
+    'open-meteo': 'https://api.open-meteo.com',
+    'meteostat': 'https://bulk.meteostat.net/v2',
+    'gemini': None,  # google-genai SDK default
+}
+
+SOURCE_BASE_URL_ENV = 'SOURCE_BASE_URL'
+
+_config_endpoints: dict = {}
+
+def _load_config_endpoints(config_path):
+    if config_path not in _config_endpoints:
+        try:
+            with open(config_path, 'r') as file:
+                config = yaml.safe_load(file) or {}
+        except FileNotFoundError:
+            config = {}
+        _config_endpoints[config_path] = config.get('endpoints', {}) or {}
+    return _config_endpoints[config_path]
+
+def get_endpoint(source, config_path='config.yml'):
+    """
+    Get the base URL for an external source.
+
+    Resolution order: SOURCE_BASE_URL (all sources), then config.yml's
+    endpoints section, then the public default.
+
+    Args:
+        source (str): Source name, one of DEFAULT_ENDPOINTS.
+        config_path (str): Path to the configuration file.
+
+    Returns:
+        str | None: Base URL without a trailing slash, or None to use the SDK default.
+    """
+    if source not in DEFAULT_ENDPOINTS:
+        raise ValueError(f'Unknown external source: {source}')
+
+    base_url = os.environ.get(SOURCE_BASE_URL_ENV)
+    if base_url:
+        return f"{base_url.rstrip('/')}/{source}"
+
+    endpoint = _load_config_endpoints(config_path).get(source, DEFAULT_ENDPOINTS[source])
+    return endpoint.rstrip('/') if endpoint else None
+
+def endpoint_url(source, path):
+    """
+    Build a full URL for a path on an external source.
+
+    Args:
+        source (str): Source name, one of DEFAULT_ENDPOINTS.
+        path (str): Path starting with '/'.
+
+    Returns:
+        str: Full URL.
+    """
+    return f'{get_endpoint(source)}{path}'
+
+def configure_meteostat():
+    """
+    Point Meteostat's bulk data interface at the configured endpoint.
+
+    When a non-default endpoint is used, Meteostat's on-disk cache is turned
+    off so stand-in data never mixes with real cached station files.
+    """
+    from meteostat.interface.base import Base
+
+    endpoint = get_endpoint('meteostat')
+    Base.endpoint = f'{endpoint}/'
+    if endpoint != DEFAULT_ENDPOINTS['meteostat']:
+        Base.max_age = 0
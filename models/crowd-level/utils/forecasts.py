@@ -0,0 +1,163 @@
+import os
+from datetime import datetime
+import pandas as pd
+from .db import get_connection
+
+def setup_predictions_table(conn):
+    """
+    Create the predictions table if it doesn't exist.
+
+    One row per (park_id, date); re-running a forecast replaces the previous
+    prediction for that day rather than appending a duplicate.
+
+    Args:
+        conn (sqlite3.Connection): Connection to the predictions database.
+    """
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS predictions (
+            park_id TEXT,
+            date TEXT,  -- YYYY-MM-DD
+            crowd_level_prediction INTEGER,
+            p10 INTEGER,
+            p50 INTEGER,
+            p90 INTEGER,
+            generated_at TEXT,
+            PRIMARY KEY (park_id, date)
+        )
+    """)
+    # Dates a forecast run covered, including ones it could not predict (e.g. no
+    # published opening hours), so readers don't retry them with live inference.
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS forecast_runs (
+            park_id TEXT,
+            start_date TEXT,
+            end_date TEXT,
+            generated_at TEXT
+        )
+    """)
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_forecast_runs_park
+        ON forecast_runs (park_id, start_date, end_date)
+    """)
+    conn.commit()
+
+def save_predictions(results_df, db_path='data/predictions.db'):
+    """
+    Write crowd level predictions to the predictions table.
+
+    Args:
+        results_df (pd.DataFrame): Predictions with date, park_id and crowd_level_prediction
+            columns, plus optional p10/p50/p90 quantile columns.
+        db_path (str): Path to the SQLite predictions database.
+
+    Returns:
+        int: Number of rows written.
+    """
+    generated_at = datetime.now().isoformat(timespec='seconds')
+
+    def column_or_none(name):
+        if name in results_df.columns:
+            return [int(v) for v in results_df[name]]
+        return [None] * len(results_df)
+
+    rows = list(zip(
+        results_df['park_id'].astype(str),
+        results_df['date'].dt.strftime('%Y-%m-%d'),
+        column_or_none('crowd_level_prediction'),
+        column_or_none('p10'),
+        column_or_none('p50'),
+        column_or_none('p90'),
+        [generated_at] * len(results_df)
+    ))
+
+    conn = get_connection(db_path, create=True)
+    setup_predictions_table(conn)
+    conn.executemany("""
+        INSERT OR REPLACE INTO predictions
+            (park_id, date, crowd_level_prediction, p10, p50, p90, generated_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    """, rows)
+    conn.commit()
+
+    print(f'Saved {len(rows)} predictions to {db_path}')
+    return len(rows)
+
+def record_forecast_run(park_ids, start_date, end_date, db_path='data/predictions.db', retention_days=30):
+    """
+    Record that a forecast run covered a date range for the given parks.
+
+    Runs whose range the new one covers are replaced, and runs that ended more
+    than retention_days ago are deleted, so a forecast job on an interval keeps
+    the table small.
+
+    Args:
+        park_ids (list[int]): Parks the run predicted for.
+        start_date (str): First date covered (YYYY-MM-DD).
+        end_date (str): Last date covered (YYYY-MM-DD).
+        db_path (str): Path to the SQLite predictions database.
+        retention_days (int): Days after its end date that a run is kept.
+    """
+    generated_at = datetime.now().isoformat(timespec='seconds')
+    cutoff = (pd.Timestamp.today().normalize() - pd.Timedelta(days=retention_days)).strftime('%Y-%m-%d')
+    parks = [str(park_id) for park_id in park_ids]
+
+    conn = get_connection(db_path, create=True)
+    setup_predictions_table(conn)
+    conn.executemany("""
+        DELETE FROM forecast_runs
+        WHERE park_id = ? AND start_date >= ? AND end_date <= ?
+    """, [(park_id, start_date, end_date) for park_id in parks])
+    conn.execute("DELETE FROM forecast_runs WHERE end_date < ?", (cutoff,))
+    conn.executemany("""
+        INSERT INTO forecast_runs (park_id, start_date, end_date, generated_at)
+        VALUES (?, ?, ?, ?)
+    """, [(park_id, start_date, end_date, generated_at) for park_id in parks])
+    conn.commit()
+
+def load_predictions(park_id, start_date, end_date, db_path='data/predictions.db'):
+    """
+    Load stored predictions for a park and date range.
+
+    The range query is served by the (park_id, date) primary key index.
+
+    Args:
+        park_id (int): Queue Times park ID.
+        start_date (str): First date (YYYY-MM-DD).
+        end_date (str): Last date (YYYY-MM-DD), inclusive.
+        db_path (str): Path to the SQLite predictions database.
+
+    Returns:
+        tuple[pd.DataFrame, set[str]]: Stored predictions for the range, and the set of
+            dates (YYYY-MM-DD) a forecast run has covered, whether or not it produced a row.
+    """
+    empty = pd.DataFrame(columns=['date', 'crowd_level_prediction', 'p10', 'p50', 'p90', 'generated_at'])
+    if not os.path.exists(db_path):
+        return empty, set()
+
+    # Read-only: the tables are created by the forecast job's writes, so a
+    # database it hasn't written to yet has nothing stored.
+    conn = get_connection(db_path)
+    tables = {name for (name,) in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name IN ('predictions', 'forecast_runs')"
+    )}
+    if 'predictions' not in tables:
+        return empty, set()
+    predictions = pd.read_sql_query("""
+        SELECT date, crowd_level_prediction, p10, p50, p90, generated_at
+        FROM predictions
+        WHERE park_id = ? AND date BETWEEN ? AND ?
+        ORDER BY date
+    """, conn, params=(str(park_id), start_date, end_date))
+    runs = conn.execute("""
+        SELECT start_date, end_date
+        FROM forecast_runs
+        WHERE park_id = ? AND start_date <= ? AND end_date >= ?
+    """, (str(park_id), end_date, start_date)).fetchall() if 'forecast_runs' in tables else []
+
+    covered: set = set(predictions['date'])
+    for run_start, run_end in runs:
+        run_dates = pd.date_range(max(run_start, start_date), min(run_end, end_date))
+        covered.update(run_dates.strftime('%Y-%m-%d'))
+
+    predictions['date'] = pd.to_datetime(predictions['date'])
+    return predictions, covered
@@ -1,24 +1,71 @@
 from datetime import datetime, timedelta
+from contextlib import contextmanager
 import calendar
+import io
 import re
+import threading
 import warnings
-from meteostat import Point, Daily
 import pandas as pd
-import requests
-# ----- Fix SSL Error -----
-import ssl
-import certifi
-import os
+from .endpoints import configure_meteostat, endpoint_url
+from .helpers import fetch_json
+from .instrument import record_external_call
 
-# Set environment variables
-os.environ['SSL_CERT_FILE'] = certifi.where()
-os.environ['REQUESTS_CA_BUNDLE'] = certifi.where()
-os.environ['CURL_CA_BUNDLE'] = certifi.where()
-# ------------------------
+# meteostat and requests are imported on first use: neither is needed to
+# import the pipeline, and meteostat alone adds noticeably to startup.
 
-# Create and set default SSL context
-ssl_context = ssl.create_default_context(cafile=certifi.where())
-ssl._create_default_https_context = lambda: ssl_context
+def _meteostat_load_handler(endpoint, path, columns, types, parse_dates, coerce_dates=False):
+    """
+    meteostat.core.loader.load_handler, downloading through requests instead of urllib.
+
+    Meteostat reads its bulk CSVs with pd.read_csv(url), i.e. urllib, which
+    on some Python installs (notably macOS) has no CA bundle. requests
+    verifies against certifi's, like every other fetch in the pipeline.
+    """
+    import requests
+    from meteostat.core.warn import warn
+
+    response = requests.get(endpoint + path)
+    if response.status_code != 200:
+        warn(f'Cannot load {path} from {endpoint}')
+        return pd.DataFrame(columns=[*types])
+
+    df = pd.read_csv(io.BytesIO(response.content), compression='gzip', names=columns,
+                     dtype=types, parse_dates=parse_dates)
+    if coerce_dates:
+        df.iloc[:, parse_dates] = df.iloc[:, parse_dates].apply(pd.to_datetime, errors='coerce')
+    return df
+
+_meteostat_loader_lock = threading.Lock()
+
+def _install_meteostat_loader():
+    """
+    Route Meteostat's downloads through _meteostat_load_handler.
+
+    The interface modules bind load_handler by name at import, so it is
+    replaced there. Done once per process and never undone, so concurrent
+    fetches (serve.py's executor, dashboard sessions) all see the same
+    loader, and nothing outside Meteostat is affected.
+    """
+    from meteostat.interface import meteodata, stations, timeseries
+
+    with _meteostat_loader_lock:
+        for module in (meteodata, stations, timeseries):
+            module.load_handler = _meteostat_load_handler
+
+@contextmanager
+def meteostat_client():
+    """
+    Configure Meteostat for a fetch: the configured endpoint, with downloads
+    verified against certifi's CA bundle (see _meteostat_load_handler).
+
+    Yields:
+        tuple: meteostat's (Point, Daily) classes.
+    """
+    from meteostat import Point, Daily
+
+    configure_meteostat()
+    _install_meteostat_loader()
+    yield Point, Daily
 
 
 def get_historical_monthly_averages(latitude, longitude, months_needed, years_back=5):
@@ -41,22 +88,24 @@ def get_historical_monthly_averages(latitude, longitude, months_needed, years_ba
     """
     try:
         today = datetime.now()
-        location = Point(latitude, longitude)
 
         all_frames = []
-        for year_offset in range(1, years_back + 1):
-            year = today.year - year_offset
-            for month in months_needed:
-                _, last_day = calendar.monthrange(year, month)
-                period_start = datetime(year, month, 1)
-                period_end = datetime(year, month, last_day)
-                with warnings.catch_warnings():
-                    warnings.filterwarnings('ignore', category=FutureWarning)
-                    data = Daily(location, period_start, period_end).fetch()
-                if not data.empty:
-                    data = data[['tavg', 'prcp', 'wspd']].copy()
-                    data['month'] = month
-                    all_frames.append(data)
+        with meteostat_client() as (Point, Daily):
+            location = Point(latitude, longitude)
+            for year_offset in range(1, years_back + 1):
+                year = today.year - year_offset
+                for month in months_needed:
+                    _, last_day = calendar.monthrange(year, month)
+                    period_start = datetime(year, month, 1)
+                    period_end = datetime(year, month, last_day)
+                    record_external_call('meteostat')
+                    with warnings.catch_warnings():
+                        warnings.filterwarnings('ignore', category=FutureWarning)
+                        data = Daily(location, period_start, period_end).fetch()
+                    if not data.empty:
+                        data = data[['tavg', 'prcp', 'wspd']].copy()
+                        data['month'] = month
+                        all_frames.append(data)
 
         if not all_frames:
             print('No historical data retrieved for monthly average calculation.')
@@ -79,7 +128,7 @@ def get_historical_monthly_averages(latitude, longitude, months_needed, years_ba
         return {}
 
 
-def get_lat_long(park_id, api_url='https://queue-times.com/parks.json'):
+def get_lat_long(park_id, api_url=None):
     """Use the park_id to get the longitude and latitude of the park from the park_locations.jsomn file.
     
     Args:
@@ -89,15 +138,19 @@ def get_lat_long(park_id, api_url='https://queue-times.com/parks.json'):
         tuple: A tuple containing the longitude and latitude of the park.
     """
 
+    import requests
+
     try:
         park_id = int(park_id)
     except:
         pass
 
     try:
-        response = requests.get(api_url)
-        response.raise_for_status()
-        parks_data = response.json()
+        api_url = api_url or endpoint_url('queue-times', '/parks.json')
+        parks_data = fetch_json(api_url)
+        if parks_data is None:
+            print(f"Error fetching park data from {api_url}")
+            return ()
 
         for company in parks_data:
             for park in company.get("parks", []):
@@ -152,9 +205,10 @@ def get_weather_data(start_date, end_date, latitude, longitude, is_model_trainin
                 raise ValueError("End date must be before the current date.")
             
             print(f"Fetching weather data for {latitude}, {longitude} between {start_date} and {end_date}")
-            location = Point(latitude, longitude)
-            with warnings.catch_warnings():
+            record_external_call('meteostat')
+            with meteostat_client() as (Point, Daily), warnings.catch_warnings():
                 warnings.filterwarnings('ignore', category=FutureWarning)
+                location = Point(latitude, longitude)
                 data = Daily(location, start_date, end_date)
                 data = data.fetch()
             print(f"Data fetched for {latitude}, {longitude} between {start_date} and {end_date}")
@@ -202,6 +256,8 @@ def get_weather_data(start_date, end_date, latitude, longitude, is_model_trainin
         Returns:
             dict: Date string → weather value dict for every date in the range.
         """
+        import requests
+
         FORECAST_HORIZON_DAYS = 16
 
         try:
@@ -218,7 +274,7 @@ def get_weather_data(start_date, end_date, latitude, longitude, is_model_trainin
         actual_forecast_end = None
 
         def _fetch_open_meteo(req_end):
-            url = "https://api.open-meteo.com/v1/forecast"
+            url = endpoint_url('open-meteo', '/v1/forecast')
             params = {
                 "latitude": latitude,
                 "longitude": longitude,
@@ -227,6 +283,7 @@ def get_weather_data(start_date, end_date, latitude, longitude, is_model_trainin
                 "end_date": req_end.strftime("%Y-%m-%d"),
                 "timezone": "auto"
             }
+            record_external_call('open-meteo')
             resp = requests.get(url, params=params)
             resp.raise_for_status()
             return resp.json()
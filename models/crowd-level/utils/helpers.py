@@ -1,53 +1,494 @@
-import sqlite3
+import numpy as np
 import pandas as pd
-import requests
+from urllib.parse import urlsplit
+from .columnar import (
+    DEFAULT_PARQUET_DIR,
+    iter_queue_parquet_typed,
+    load_park_info_parquet,
+    load_queue_parquet,
+    load_ride_info_parquet,
+)
+from .db import DEFAULT_DB_PATH, get_connection
+from .endpoints import endpoint_url
+from .query import (
+    ACTIVE_GRACE_DAYS,
+    TABLE_COLUMNS,
+    active_rides_query,
+    build_queue_query,
+    park_info_query,
+    ride_info_query,
+)
+from .instrument import record_external_call
 
-def load_all_data(db_path='data/queue_Data.db', statements={}):
+# Park and destination catalogues are static for the life of a process, so
+# they are fetched once and shared by every park in a batch.
+_json_cache: dict = {}
+
+def fetch_json(url):
     """
-    Load all data from the SQLite database into pandas DataFrames.
-    
+    Fetch a JSON document, caching successful responses for the rest of the process.
+
+    Args:
+        url (str): URL of the JSON endpoint.
+
+    Returns:
+        dict | list | None: Parsed JSON, or None if the request did not return 200.
+    """
+    if url in _json_cache:
+        return _json_cache[url]
+
+    import requests
+
+    record_external_call(urlsplit(url).netloc)
+    response = requests.get(url)
+    if response.status_code != 200:
+        return None
+
+    _json_cache[url] = response.json()
+    return _json_cache[url]
+
+def _read_sql(conn, query, chunksize=None):
+    """
+    Run a compiled (sql, params) query into a DataFrame, or an iterator of chunks.
+    """
+    sql, params = query
+    record_external_call('sqlite')
+    return pd.read_sql_query(sql, conn, params=params, chunksize=chunksize)
+
+def load_all_data(db_path=DEFAULT_DB_PATH, columns=None, park_ids=None, start_date=None, end_date=None,
+                  dates=None, include_closed=True, backend='sqlite', parquet_dir=DEFAULT_PARQUET_DIR):
+    """
+    Load queue readings and park info into pandas DataFrames.
+
+    Filters are applied while reading (in SQL, or as Parquet partition and
+    row filters), so only the requested columns and rows are loaded.
+
     Args:
         db_path (str): Path to the SQLite database file.
-        statements (dict): SQL statements for filtering data.
-    
+        columns (list[str] | None): Queue columns among date, ride_id, time_of_day,
+            queue_time, is_closed and park_id. Defaults to all but park_id.
+        park_ids (list[int] | None): Only load these parks.
+        start_date: First date to load (inclusive), e.g. 'YYYY-MM-DD'.
+        end_date: Last date to load (inclusive).
+        dates (list | None): Only load these dates.
+        include_closed (bool): Whether to keep readings flagged is_closed.
+        backend (str): 'sqlite' or 'parquet'.
+        parquet_dir (str): Root directory of the Parquet dataset.
+
     Returns:
         dict: A dictionary containing the queue data and park info DataFrames.
     """
-    conn = sqlite3.connect(db_path)
-    
-    queue_where = statements.get('queue_where', None)
-    queue_select = statements.get('queue_select', '*')
-    park_where = statements.get('park_where', None)
-    park_select = statements.get('park_select', '*')
-
-    # Load queue data into a pandas DataFrame
-    if queue_where:
-        queue_data = pd.read_sql_query(f"SELECT {queue_select} FROM queue_data WHERE {queue_where}", conn)
-    else:
-        queue_data = pd.read_sql_query(f"SELECT {queue_select} FROM queue_data", conn)
-    
-    # Load park info into a pandas DataFrame
-    if park_where:
-        park_info = pd.read_sql_query(f"SELECT {park_select} FROM park_info WHERE {park_where}", conn)
-    else:
-        park_info = pd.read_sql_query(f"SELECT {park_select} FROM park_info", conn)
-    
-    conn.close()
+    columns = columns or ['date', 'ride_id', 'time_of_day', 'queue_time', 'is_closed']
+    filters = {'start_date': start_date, 'end_date': end_date, 'dates': dates, 'include_closed': include_closed}
+
+    if backend == 'parquet':
+        queue_data = load_queue_parquet(parquet_dir, columns=columns, park_ids=park_ids, **filters)
+        park_info = load_park_info_parquet(parquet_dir)
+        if park_ids is not None:
+            park_info = park_info[park_info['park_id'].isin([str(int(p)) for p in park_ids])].reset_index(drop=True)
+        return {
+            'queue_data': queue_data,
+            'park_info': park_info
+        }
+    if backend != 'sqlite':
+        raise ValueError(f'Unknown queue data backend: {backend}')
+
+    conn = get_connection(db_path)
+    queue_data = _read_sql(conn, build_queue_query('queue_data', columns, park_ids, **filters))
+    park_info = _read_sql(conn, park_info_query(park_ids))
 
-    queue_data['date'] = pd.to_datetime(queue_data['date'])
+    if 'date' in queue_data.columns:
+        queue_data['date'] = pd.to_datetime(queue_data['date'], format='%Y/%m/%d')
 
     return {
         'queue_data': queue_data,
         'park_info': park_info
     }
 
-def get_name_from_queuetimes_id(park_id, api_url='https://queue-times.com/parks.json'):
+# Typed queue_data columns: ~20 MB per million rows, against ~150 MB for the
+# object-dtype frame load_all_data returns. pandas has no day unit, so the
+# day-resolution date is held as datetime64[s] (8 of the 21 bytes per row).
+TYPED_QUEUE_COLUMNS = {
+    'park_id': 'int32',
+    'ride_id': 'int32',
+    'date': 'datetime64[s]',
+    'minute_of_day': 'int16',
+    'queue_time': 'int16',
+    'is_closed': 'bool',
+}
+
+def _convert_repeated(values, convert):
+    """
+    Apply convert to the distinct values only and broadcast the result back.
+
+    Dates, times of day and ride IDs repeat thousands of times each, so
+    parsing the uniques is far cheaper than parsing every row.
+    """
+    codes, uniques = pd.factorize(values, use_na_sentinel=False)
+    return np.asarray(convert(pd.Index(uniques)))[codes]
+
+def _to_ids(ids):
+    return pd.to_numeric(ids, errors='coerce').fillna(-1).astype('int32')
+
+def _to_minutes(times):
+    return (times.str[:2].astype(int) * 60 + times.str[3:5].astype(int)).astype('int16')
+
+def _to_days(dates):
+    return pd.to_datetime(dates, format='%Y/%m/%d').to_numpy().astype('datetime64[D]')
+
+def iter_queue_data_typed(db_path=DEFAULT_DB_PATH, chunksize=1_000_000, include_closed=True, backend='sqlite',
+                          parquet_dir=DEFAULT_PARQUET_DIR, park_ids=None, start_date=None, end_date=None, dates=None,
+                          active_only=False):
+    """
+    Iterate over queue_data as compact, typed DataFrames.
+
+    Ride and park IDs become int32 (park_id joined from park_info in SQL),
+    the YYYY/MM/DD date a day-resolution datetime64, time_of_day an int16
+    minute of day, queue_time int16 and is_closed bool. Readings for rides
+    missing from park_info are dropped, as generate_training would drop them.
+
+    With backend='parquet' the columns are already stored typed and are
+    read from the Parquet dataset without conversion.
+
+    With active_only, readings outside their ride's open lifecycle in
+    ride_info (before it first opened, or after it last opened) are skipped;
+    in SQLite the lifecycle bounds the index range, so a retired ride's
+    later history is never read.
+
+    Args:
+        db_path (str): Path to the SQLite database file.
+        chunksize (int | None): Rows per chunk. None yields the whole table as one frame.
+        include_closed (bool): Whether to keep readings flagged is_closed.
+        backend (str): 'sqlite' or 'parquet'.
+        parquet_dir (str): Root directory of the Parquet dataset.
+        park_ids (list[int] | None): Only read these parks. Reads all parks if None.
+        start_date: First date to read (inclusive), e.g. 'YYYY-MM-DD'.
+        end_date: Last date to read (inclusive).
+        dates (list | None): Only read these dates.
+        active_only (bool): Skip readings outside their ride's lifecycle (see has_ride_info).
+
+    Yields:
+        pd.DataFrame: Chunks with the columns and dtypes of TYPED_QUEUE_COLUMNS.
+    """
+    filters = {'park_ids': park_ids, 'start_date': start_date, 'end_date': end_date, 'dates': dates, 'include_closed': include_closed}
+    active_only = active_only and has_ride_info(db_path, backend, parquet_dir)
+    if backend == 'parquet':
+        ride_info = load_ride_info(db_path, backend=backend, parquet_dir=parquet_dir) if active_only else None
+        for chunk in iter_queue_parquet_typed(parquet_dir, chunksize=chunksize, **filters):
+            yield chunk if ride_info is None else chunk[in_lifecycle(chunk, ride_info)].reset_index(drop=True)
+        return
+    if backend != 'sqlite':
+        raise ValueError(f'Unknown queue data backend: {backend}')
+
+    columns = ['park_id', 'ride_id', 'date', 'time_of_day', 'queue_time', 'is_closed']
+    query = build_queue_query('queue_data', columns, active_only=active_only, **filters)
+    chunks = _read_sql(get_connection(db_path), query, chunksize)
+    for raw in [chunks] if chunksize is None else chunks:
+        park_id = _convert_repeated(raw['park_id'], _to_ids)
+        keep = park_id >= 0
+
+        chunk = pd.DataFrame({
+            'park_id': park_id[keep],
+            'ride_id': _convert_repeated(raw['ride_id'].to_numpy()[keep], _to_ids),
+            'date': _convert_repeated(raw['date'].to_numpy()[keep], _to_days),
+            'minute_of_day': _convert_repeated(raw['time_of_day'].to_numpy()[keep], _to_minutes),
+            'queue_time': raw['queue_time'].to_numpy()[keep].astype('int16'),
+            'is_closed': raw['is_closed'].to_numpy()[keep].astype(bool),
+        })
+        yield chunk
+
+def load_queue_data_typed(db_path=DEFAULT_DB_PATH, include_closed=True, backend='sqlite',
+                          parquet_dir=DEFAULT_PARQUET_DIR, park_ids=None, start_date=None, end_date=None, dates=None,
+                          active_only=False):
+    """
+    Load queue_data as one compact, typed DataFrame (see iter_queue_data_typed).
+
+    Args:
+        db_path (str): Path to the SQLite database file.
+        include_closed (bool): Whether to keep readings flagged is_closed.
+        backend (str): 'sqlite' or 'parquet'.
+        parquet_dir (str): Root directory of the Parquet dataset.
+        park_ids (list[int] | None): Only read these parks. Reads all parks if None.
+        start_date: First date to read (inclusive), e.g. 'YYYY-MM-DD'.
+        end_date: Last date to read (inclusive).
+        dates (list | None): Only read these dates.
+        active_only (bool): Skip readings outside their ride's lifecycle.
+
+    Returns:
+        pd.DataFrame: Columns and dtypes of TYPED_QUEUE_COLUMNS.
+    """
+    return next(iter_queue_data_typed(db_path, None, include_closed, backend, parquet_dir,
+                                      park_ids, start_date, end_date, dates, active_only))
+
+# Rollup tiers written by scraping/compact.py. Raw readings older than the
+# retention age only survive as these per-ride aggregates.
+ROLLUP_TABLES = {'day': 'queue_daily', 'hour': 'queue_hourly'}
+ROLLUP_STATS = ['n_readings', 'n_open', 'sum_queue_time', 'max_queue_time', 'first_minute', 'last_minute']
+
+def _rollup_keys(granularity):
+    if granularity not in ROLLUP_TABLES:
+        raise ValueError(f'Unknown rollup granularity: {granularity}')
+    return ['park_id', 'ride_id', 'date'] + (['hour'] if granularity == 'hour' else [])
+
+def _rollup_readings(queue_data, granularity):
+    """
+    Aggregate typed raw readings to rollup statistics.
+    """
+    keys = _rollup_keys(granularity)
+    is_open = ~queue_data['is_closed']
+    frame = queue_data[['park_id', 'ride_id', 'date', 'minute_of_day']].assign(
+        is_open=is_open,
+        open_queue_time=queue_data['queue_time'].where(is_open),
+    )
+    if granularity == 'hour':
+        frame['hour'] = (frame['minute_of_day'] // 60).astype('int8')
+    return frame.groupby(keys, sort=False).agg(
+        n_readings=('minute_of_day', 'size'),
+        n_open=('is_open', 'sum'),
+        sum_queue_time=('open_queue_time', 'sum'),
+        max_queue_time=('open_queue_time', 'max'),
+        first_minute=('minute_of_day', 'min'),
+        last_minute=('minute_of_day', 'max'),
+    ).reset_index()
+
+def _combine_rollups(frames, granularity):
+    """
+    Merge partial rollups of the same rides and periods, e.g. from separate chunks or tiers.
+    """
+    keys = _rollup_keys(granularity)
+    frames = [f for f in frames if len(f)]
+    if not frames:
+        return pd.DataFrame(columns=keys + ROLLUP_STATS)
+    rollup = pd.concat(frames, ignore_index=True)
+    if len(frames) > 1:
+        rollup = rollup.groupby(keys, sort=False).agg({
+            'n_readings': 'sum', 'n_open': 'sum', 'sum_queue_time': 'sum',
+            'max_queue_time': 'max', 'first_minute': 'min', 'last_minute': 'max',
+        }).reset_index()
+    return rollup.astype({
+        'n_readings': 'int32', 'n_open': 'int32', 'sum_queue_time': 'int64',
+        'max_queue_time': 'float32', 'first_minute': 'int16', 'last_minute': 'int16',
+    })
+
+def _has_table(conn, table):
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)).fetchone() is not None
+
+def _load_rollup_table(conn, granularity, **filters):
+    """
+    Read a rollup table as typed frame, or None if the database has never been compacted.
+    """
+    table = ROLLUP_TABLES[granularity]
+    if not _has_table(conn, table):
+        return None
+
+    columns = ['park_id'] + TABLE_COLUMNS[table]
+    raw = _read_sql(conn, build_queue_query(table, columns, **filters))
+
+    park_id = _convert_repeated(raw['park_id'], _to_ids)
+    keep = park_id >= 0
+    rollup = pd.DataFrame({
+        'park_id': park_id[keep],
+        'ride_id': _convert_repeated(raw['ride_id'].to_numpy()[keep], _to_ids),
+        'date': _convert_repeated(raw['date'].to_numpy()[keep], _to_days),
+    })
+    if granularity == 'hour':
+        rollup['hour'] = raw['hour'].to_numpy()[keep].astype('int8')
+    for column in ('n_readings', 'n_open', 'sum_queue_time', 'max_queue_time'):
+        rollup[column] = raw[column].to_numpy()[keep]
+    rollup['first_minute'] = _convert_repeated(raw['first_time_of_day'].to_numpy()[keep], _to_minutes)
+    rollup['last_minute'] = _convert_repeated(raw['last_time_of_day'].to_numpy()[keep], _to_minutes)
+    return rollup
+
+def load_queue_rollup(granularity='day', db_path=DEFAULT_DB_PATH, park_ids=None, start_date=None, end_date=None,
+                      dates=None, backend='sqlite', parquet_dir=DEFAULT_PARQUET_DIR, chunksize=1_000_000,
+                      active_only=False):
+    """
+    Per-ride queue statistics by day or hour, across every retention tier.
+
+    Raw readings still in queue_data are aggregated chunk by chunk and
+    combined with the compacted history in queue_daily / queue_hourly, so
+    callers see one continuous history however much has been rolled up.
+    The Parquet dataset keeps full raw history and is aggregated directly.
+
+    Args:
+        granularity (str): 'day' or 'hour'.
+        db_path (str): Path to the SQLite database file.
+        park_ids (list[int] | None): Only include these parks. All parks if None.
+        start_date: First date to include (inclusive), e.g. 'YYYY-MM-DD'.
+        end_date: Last date to include (inclusive).
+        dates (list | None): Only include these dates.
+        backend (str): 'sqlite' or 'parquet'.
+        parquet_dir (str): Root directory of the Parquet dataset.
+        chunksize (int): Raw rows aggregated at a time.
+        active_only (bool): Skip ride-days outside their ride's lifecycle (see iter_queue_data_typed).
+
+    Returns:
+        pd.DataFrame: park_id, ride_id, date (plus hour, for 'hour'), n_readings,
+            n_open, sum_queue_time and max_queue_time (open readings only; NaN
+            when none were open), first_minute and last_minute (all readings).
+    """
+    _rollup_keys(granularity)
+    filters = {'park_ids': park_ids, 'start_date': start_date, 'end_date': end_date, 'dates': dates}
+    active_only = active_only and has_ride_info(db_path, backend, parquet_dir)
+    partials = [
+        _rollup_readings(chunk, granularity)
+        for chunk in iter_queue_data_typed(db_path, chunksize=chunksize, backend=backend,
+                                           parquet_dir=parquet_dir, active_only=active_only, **filters)
+    ]
+    if backend == 'sqlite':
+        compacted = _load_rollup_table(get_connection(db_path), granularity, active_only=active_only, **filters)
+        if compacted is not None:
+            partials.append(compacted)
+    return _combine_rollups(partials, granularity)
+
+# Typed ride_info columns. Dates are NaT and typical minutes NaN for rides
+# that have never been seen open.
+RIDE_INFO_COLUMNS = {
+    'ride_id': 'int32',
+    'park_id': 'int32',
+    'ride_name': 'object',
+    'category': 'object',
+    'first_seen': 'datetime64[s]',
+    'last_seen': 'datetime64[s]',
+    'last_reported': 'datetime64[s]',
+    'active_days': 'int32',
+    'typical_open_minute': 'float32',
+    'typical_close_minute': 'float32',
+}
+
+def has_ride_info(db_path=DEFAULT_DB_PATH, backend='sqlite', parquet_dir=DEFAULT_PARQUET_DIR):
+    """
+    Whether the ride_info dimension exists: the table, or its Parquet snapshot.
+
+    Databases scraped before it existed get it the next time the scraper
+    sets up the database. Until then, active-ride filters read everything.
+    """
+    if backend == 'parquet':
+        return load_ride_info_parquet(parquet_dir) is not None
+    available = _has_table(get_connection(db_path), 'ride_info')
+    if not available:
+        print('No ride_info table yet (run the scraper once to build it); not filtering inactive rides.')
+    return available
+
+def _typed_ride_info(raw):
+    ride_info = pd.DataFrame({
+        'ride_id': _to_ids(raw['ride_id']).to_numpy(),
+        'park_id': _to_ids(raw['park_id']).to_numpy(),
+        'ride_name': raw['ride_name'].to_numpy(),
+        'category': raw['category'].to_numpy(),
+    })
+    for column in ('first_seen', 'last_seen', 'last_reported'):
+        values = raw[column]
+        if values.dtype == object:
+            values = values.astype(str).str.replace('/', '-').where(values.notna())
+        ride_info[column] = pd.to_datetime(values).to_numpy().astype('datetime64[s]')
+    for column in ('active_days', 'typical_open_minute', 'typical_close_minute'):
+        ride_info[column] = pd.to_numeric(raw[column]).to_numpy()
+    return ride_info.astype(RIDE_INFO_COLUMNS)
+
+def load_ride_info(db_path=DEFAULT_DB_PATH, park_ids=None, backend='sqlite', parquet_dir=DEFAULT_PARQUET_DIR):
+    """
+    Load the ride dimension maintained by the scraper.
+
+    Args:
+        db_path (str): Path to the SQLite database file.
+        park_ids (list[int] | None): Only these parks. All parks if None.
+        backend (str): 'sqlite' or 'parquet'.
+        parquet_dir (str): Root directory of the Parquet dataset.
+
+    Returns:
+        pd.DataFrame | None: Columns and dtypes of RIDE_INFO_COLUMNS, or None if there is no ride_info.
+    """
+    if backend == 'parquet':
+        raw = load_ride_info_parquet(parquet_dir)
+        if raw is None:
+            return None
+        if park_ids is not None:
+            raw = raw[raw['park_id'].isin([int(p) for p in park_ids])]
+        return _typed_ride_info(raw.reset_index(drop=True))
+    if backend != 'sqlite':
+        raise ValueError(f'Unknown queue data backend: {backend}')
+
+    conn = get_connection(db_path)
+    if not _has_table(conn, 'ride_info'):
+        return None
+    return _typed_ride_info(_read_sql(conn, ride_info_query(park_ids)))
+
+def active_mask(park_id, first_seen, last_seen, date, grace_days=ACTIVE_GRACE_DAYS):
+    """
+    Which rides are active on a date, by the rule of active_rides_query, over arrays.
+
+    Args:
+        park_id (np.ndarray): Park of each ride.
+        first_seen (np.ndarray): datetime64 first open date of each ride (NaT if never).
+        last_seen (np.ndarray): datetime64 last open date of each ride.
+        date: The date.
+        grace_days (int): Days after a ride's last open reading it still counts as active.
+
+    Returns:
+        np.ndarray: bool per ride.
+    """
+    day = np.datetime64(pd.Timestamp(date).date(), 'D')
+    first_seen = np.asarray(first_seen).astype('datetime64[D]')
+    last_seen = np.asarray(last_seen).astype('datetime64[D]')
+    park_latest = pd.Series(last_seen).groupby(np.asarray(park_id)).transform('max').to_numpy().astype('datetime64[D]')
+    since = np.minimum(day, park_latest) - np.timedelta64(grace_days, 'D')
+    return (first_seen <= day) & (last_seen >= since)
+
+def in_lifecycle(queue_data, ride_info):
+    """
+    Which typed readings fall inside their ride's first_seen..last_seen lifecycle.
+    """
+    ride_info = ride_info.sort_values('ride_id')
+    ride_ids = ride_info['ride_id'].to_numpy()
+    position = np.searchsorted(ride_ids, queue_data['ride_id'].to_numpy()).clip(0, max(len(ride_ids) - 1, 0))
+    if not len(ride_ids):
+        return np.zeros(len(queue_data), dtype=bool)
+    known = ride_ids[position] == queue_data['ride_id'].to_numpy()
+    date = queue_data['date'].to_numpy()
+    return known & (date >= ride_info['first_seen'].to_numpy()[position]) & (date <= ride_info['last_seen'].to_numpy()[position])
+
+def load_active_rides(date, park_ids=None, db_path=DEFAULT_DB_PATH, backend='sqlite', parquet_dir=DEFAULT_PARQUET_DIR,
+                      grace_days=ACTIVE_GRACE_DAYS):
+    """
+    Rides active on a date: opened by then and seen open within grace_days before it.
+
+    For dates past the park's latest data, e.g. forecasts, the grace period
+    runs back from the park's latest open reading instead. In SQLite this is
+    one query over the (park_id, last_seen) index of ride_info.
+
+    Args:
+        date: The date, e.g. 'YYYY-MM-DD'.
+        park_ids (list[int] | None): Only these parks. All parks if None.
+        db_path (str): Path to the SQLite database file.
+        backend (str): 'sqlite' or 'parquet'.
+        parquet_dir (str): Root directory of the Parquet dataset.
+        grace_days (int): Days after a ride's last open reading it still counts as active.
+
+    Returns:
+        pd.DataFrame | None: Active rides' ride_info rows (RIDE_INFO_COLUMNS), or None if there is no ride_info.
+    """
+    if backend == 'parquet':
+        ride_info = load_ride_info(db_path, park_ids, backend, parquet_dir)
+        if ride_info is None:
+            return None
+        active = active_mask(ride_info['park_id'], ride_info['first_seen'], ride_info['last_seen'], date, grace_days)
+        return ride_info[active].reset_index(drop=True)
+    if backend != 'sqlite':
+        raise ValueError(f'Unknown queue data backend: {backend}')
+
+    conn = get_connection(db_path)
+    if not _has_table(conn, 'ride_info'):
+        return None
+    return _typed_ride_info(_read_sql(conn, active_rides_query(date, park_ids, grace_days)))
+
+def get_name_from_queuetimes_id(park_id, api_url=None):
     """
     Get the name of the park from the park_id using the Queue Times API.
     
     Args:
         park_id (int): The ID of the park.
-        api_url (str): URL of the Queue Times API.
+        api_url (str | None): URL of the Queue Times API. Defaults to the configured endpoint.
         
     Returns:
         str: The name of the park.
@@ -60,41 +501,39 @@ def get_name_from_queuetimes_id(park_id, api_url='https://queue-times.com/parks.
         return None
     
     # Fetch park data from the API
-    response = requests.get(api_url)
-    if response.status_code == 200:
-        parks_data = response.json()
+    parks_data = fetch_json(api_url or endpoint_url('queue-times', '/parks.json'))
+    if parks_data is not None:
         for company in parks_data:
             for park in company.get('parks', []):
                 if park['id'] == park_id:
                     return park['name']
     return None
 
-def get_themeparks_id_from_queuetimes_id(name, api_url='https://api.themeparks.wiki/v1/destinations'):
+def get_themeparks_id_from_queuetimes_id(name, api_url=None):
     """
     Get the theme park ID from the park name using the Theme Parks API.
     
     Args:
         name (str): The name of the park.
-        api_url (str): URL of the Theme Parks API.
+        api_url (str | None): URL of the Theme Parks API. Defaults to the configured endpoint.
     
     Returns:
         str: The theme park ID.
     """
-    response = requests.get(api_url)
-    if response.status_code == 200:
-        destinations_data = response.json()
+    destinations_data = fetch_json(api_url or endpoint_url('themeparks-wiki', '/v1/destinations'))
+    if destinations_data is not None:
         for destination in destinations_data.get('destinations', []):
             for park in destination.get('parks', []):
                 if park['name'].lower() == name.lower():
                     return park['id']
     return None
 
-def get_country_from_park_id(park_id, url='https://queue-times.com/parks.json'):
+def get_country_from_park_id(park_id, url=None):
     """
     Get the country of the park from the park_id using the Queue Times API.
     Args:
         park_id (int): The ID of the park.
-        url (str): URL of the Queue Times API.
+        url (str | None): URL of the Queue Times API. Defaults to the configured endpoint.
     Returns:
         str: The country of the park.
     """ 
@@ -105,9 +544,8 @@ def get_country_from_park_id(park_id, url='https://queue-times.com/parks.json'):
         print("Error: Park ID must be an integer.")
         return None
 
-    response = requests.get(url)
-    if response.status_code == 200:
-        parks_data = response.json()
+    parks_data = fetch_json(url or endpoint_url('queue-times', '/parks.json'))
+    if parks_data is not None:
         for company in parks_data:
             for park in company.get('parks', []):
                 if park['id'] == park_id:
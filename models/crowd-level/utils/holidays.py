@@ -1,11 +1,8 @@
 import json
 import os
-import requests
-import pycountry
 from datetime import datetime, timedelta
-from dotenv import load_dotenv
-from google import genai
-from google.genai import types
+from .endpoints import endpoint_url, get_endpoint
+from .instrument import record_external_call
 
 def get_bank_holidays(year, country_name):
     """
@@ -29,6 +26,8 @@ def get_bank_holidays(year, country_name):
             str: The country code.
         """
         country_name = country_name.lower()
+        import pycountry
+
         try:
             country = pycountry.countries.search_fuzzy(country_name)[0]
             return country.alpha_2
@@ -36,9 +35,12 @@ def get_bank_holidays(year, country_name):
             print(f"Error retrieving country code for {country_name}: {e}")
             return None
         
+    import requests
+
     country_code = get_country_code(country_name)
     try:
-        api_url = f"https://date.nager.at/api/v3/PublicHolidays/{year}/{country_code}"
+        api_url = endpoint_url('nager-date', f'/api/v3/PublicHolidays/{year}/{country_code}')
+        record_external_call('nager-date')
         response = requests.get(api_url)
         if response.status_code == 200:
             results = response.json()
@@ -70,6 +72,8 @@ def get_school_holidays(start_year, end_year, location):
     Returns:
         set[str]: All individual dates (YYYY-MM-DD) that fall within a school holiday.
     """
+    from dotenv import load_dotenv
+
     load_dotenv()
     api_key = os.environ.get('GOOGLE_AI_API_KEY')
     model_name = os.environ.get('GOOGLE_AI_MODEL', 'gemini-2.0-flash')
@@ -88,7 +92,14 @@ def get_school_holidays(start_year, end_year, location):
     )
 
     try:
-        client = genai.Client(api_key=api_key)
+        # google-genai is slow to import, so it loads only when school holidays are requested.
+        from google import genai
+        from google.genai import types
+
+        record_external_call('gemini')
+        gemini_url = get_endpoint('gemini')
+        http_options = types.HttpOptions(base_url=gemini_url) if gemini_url else None
+        client = genai.Client(api_key=api_key, http_options=http_options)
         response = client.models.generate_content(
             model=model_name,
             contents=prompt,
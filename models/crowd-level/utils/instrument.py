@@ -0,0 +1,207 @@
+import functools
+import json
+import os
+import sys
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+import pandas as pd
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Set PIPELINE_PROFILE=cprofile or PIPELINE_PROFILE=pyinstrument to dump a
+# profile of each run next to its JSON report. Setting PIPELINE_REPORT_DIR to
+# an empty string disables reports (e.g. for the long-running HTTP service).
+PROFILE_ENV = 'PIPELINE_PROFILE'
+REPORT_DIR_ENV = 'PIPELINE_REPORT_DIR'
+DEFAULT_REPORT_DIR = 'data/perf'
+
+# The active run, per thread (and per asyncio task), so concurrent pipelines
+# in serve.py's worker threads or dashboard sessions keep separate reports.
+_current_run: ContextVar = ContextVar('pipeline_run', default=None)
+
+def _peak_rss_mb():
+    """
+    Peak resident set size of this process so far, in MB (None if unavailable).
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is kilobytes on Linux but bytes on macOS.
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+class RunReport:
+    """
+    Per-stage timing, memory, row and external call records for one pipeline run.
+    """
+    def __init__(self, name):
+        self.name = name
+        self.started_at = datetime.now()
+        self.stages = []
+        self.stack = []
+        self.external_calls: dict = {}
+        self.wall_start = time.perf_counter()
+        self.cpu_start = time.process_time()
+        self.peak_rss_start = _peak_rss_mb()
+
+    def to_dict(self):
+        peak_rss = _peak_rss_mb()
+        return {
+            'run': self.name,
+            'started_at': self.started_at.isoformat(timespec='seconds'),
+            'wall_s': round(time.perf_counter() - self.wall_start, 4),
+            'cpu_s': round(time.process_time() - self.cpu_start, 4),
+            'peak_rss_mb': round(peak_rss, 1) if peak_rss is not None else None,
+            'peak_rss_delta_mb': round(peak_rss - self.peak_rss_start, 1) if peak_rss is not None else None,
+            'external_calls': dict(self.external_calls),
+            'stages': self.stages,
+        }
+
+@contextmanager
+def pipeline_run(name):
+    """
+    Record every stage executed inside the block and write a JSON report at the end.
+
+    Nested runs are folded into the outermost one, so model_pipeline called
+    from train.py and the benchmark suite produce one report each.
+
+    Args:
+        name (str): Run name, used in the report file name.
+
+    Yields:
+        RunReport: The active run.
+    """
+    active = _current_run.get()
+    if active is not None:
+        with stage(name):
+            yield active
+        return
+
+    run = RunReport(name)
+    token = _current_run.set(run)
+    profiler = _start_profiler()
+    try:
+        yield run
+    finally:
+        _current_run.reset(token)
+        report_dir = os.environ.get(REPORT_DIR_ENV, DEFAULT_REPORT_DIR)
+        if not report_dir:
+            _stop_profiler(profiler, None)
+            return
+        os.makedirs(report_dir, exist_ok=True)
+        base_path = os.path.join(report_dir, f"{name}-{run.started_at.strftime('%Y%m%d-%H%M%S')}")
+        _stop_profiler(profiler, base_path)
+
+        with open(f'{base_path}.json', 'w') as file:
+            json.dump(run.to_dict(), file, indent=2)
+        print(f'Wrote pipeline timing report to {base_path}.json')
+
+@contextmanager
+def stage(name, rows_in=None):
+    """
+    Time a pipeline stage. A no-op when no run is active.
+
+    Args:
+        name (str): Stage name.
+        rows_in (int | None): Input row count, if known.
+
+    Yields:
+        dict: The stage record; set record['rows_out'] to report output rows.
+    """
+    run = _current_run.get()
+    if run is None:
+        yield {}
+        return
+
+    record = {
+        'stage': name,
+        'depth': len(run.stack),
+        'rows_in': rows_in,
+        'rows_out': None,
+        'external_calls': {},
+    }
+    run.stages.append(record)
+    run.stack.append(record)
+
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    peak_rss_start = _peak_rss_mb()
+    try:
+        yield record
+    finally:
+        run.stack.pop()
+        peak_rss = _peak_rss_mb()
+        record['wall_s'] = round(time.perf_counter() - wall_start, 4)
+        record['cpu_s'] = round(time.process_time() - cpu_start, 4)
+        record['peak_rss_delta_mb'] = round(peak_rss - peak_rss_start, 1) if peak_rss is not None else None
+
+def instrumented(func):
+    """
+    Decorator recording a DataFrame-in, DataFrame-out step as a stage.
+
+    Rows in are taken from the first DataFrame argument and rows out from the
+    return value when it is a DataFrame.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        df_in = next((a for a in list(args) + list(kwargs.values()) if isinstance(a, pd.DataFrame)), None)
+        with stage(func.__name__, rows_in=len(df_in) if df_in is not None else None) as record:
+            result = func(*args, **kwargs)
+            if isinstance(result, pd.DataFrame):
+                record['rows_out'] = len(result)
+            return result
+    return wrapper
+
+def record_external_call(source):
+    """
+    Count a call to an external source against the innermost active stage.
+
+    Args:
+        source (str): Short source name, e.g. 'open-meteo' or 'sqlite'.
+    """
+    run = _current_run.get()
+    if run is None:
+        return
+    run.external_calls[source] = run.external_calls.get(source, 0) + 1
+    if run.stack:
+        calls = run.stack[-1]['external_calls']
+        calls[source] = calls.get(source, 0) + 1
+
+def _start_profiler():
+    mode = os.environ.get(PROFILE_ENV, '').lower()
+    if mode == 'cprofile':
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+        return ('cprofile', profiler)
+    if mode == 'pyinstrument':
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            print(f'{PROFILE_ENV}=pyinstrument set but pyinstrument is not installed — skipping profile.')
+            return None
+        profiler = Profiler()
+        profiler.start()
+        return ('pyinstrument', profiler)
+    return None
+
+def _stop_profiler(profiler, base_path):
+    if profiler is None:
+        return
+    mode, prof = profiler
+    if mode == 'cprofile':
+        prof.disable()
+        if base_path is not None:
+            prof.dump_stats(f'{base_path}.prof')
+            print(f'Wrote cProfile dump to {base_path}.prof')
+    else:
+        prof.stop()
+        if base_path is None:
+            return
+        with open(f'{base_path}.html', 'w') as file:
+            file.write(prof.output_html())
+        print(f'Wrote pyinstrument profile to {base_path}.html')
@@ -1,8 +1,38 @@
-import requests
-import pandas as pd
-from .helpers import load_all_data, get_name_from_queuetimes_id, get_themeparks_id_from_queuetimes_id
+from .analytics import connect_readings, query_recorded_opening_hours
+from .columnar import get_storage_config
+from .helpers import load_queue_rollup, get_name_from_queuetimes_id, get_themeparks_id_from_queuetimes_id
+from .endpoints import endpoint_url
+from .instrument import record_external_call
 from datetime import datetime
 
+def get_recorded_opening_hours(park_id, dates, storage):
+    """
+    First and last recorded reading time for a park on each of the given dates.
+
+    Args:
+        park_id (int): The ID of the park.
+        dates (list): List of dates in YYYY-MM-DD format.
+        storage (dict): Backend settings from get_storage_config.
+
+    Returns:
+        dict: Date string to {'opening_time', 'closing_time'}, for dates with readings only.
+    """
+    # The daily tier keeps first/last reading times, so this also covers compacted history.
+    # Retired rides the feed still lists as closed all day would stretch the hours, so they're skipped.
+    ride_days = load_queue_rollup(
+        'day', db_path=storage['db_path'], park_ids=[park_id], dates=dates,
+        backend=storage['backend'], parquet_dir=storage['parquet_dir'], active_only=True
+    )
+    hours = ride_days.groupby('date').agg(first=('first_minute', 'min'), last=('last_minute', 'max'))
+
+    return {
+        date.strftime('%Y-%m-%d'): {
+            'opening_time': f"{row['first'] // 60:02d}:{row['first'] % 60:02d}",
+            'closing_time': f"{row['last'] // 60:02d}:{row['last'] % 60:02d}",
+        }
+        for date, row in hours.iterrows()
+    }
+
 def get_opening_hours(park_id, dates):
     """
     Get the opening hours for a given park on a given date.
@@ -17,17 +47,15 @@ def get_opening_hours(park_id, dates):
     park_id = str(park_id)
 
     try:
-        statements = {
-            'queue_select': 'date, time_of_day',
-            'park_where': f'park_id = {park_id}',
-        }
-        queue_data = load_all_data(statements=statements)['queue_data']
-        
-        # Sort queue data by date then time_of_day
-        queue_data.sort_values(by=['date', 'time_of_day'], inplace=True)
-
-        # List of the unique dates in the queue data
-        unique_dates = queue_data['date'].unique()
+        storage = get_storage_config()
+        if storage['engine'] == 'duckdb':
+            conn = connect_readings(storage['backend'], db_path=storage['db_path'], parquet_dir=storage['parquet_dir'])
+            try:
+                recorded_hours = query_recorded_opening_hours(conn, park_id, dates)
+            finally:
+                conn.close()
+        else:
+            recorded_hours = get_recorded_opening_hours(park_id, dates, storage)
 
         # Initialize the return dictionary
         all_dates_opening_hours = {}
@@ -35,13 +63,8 @@ def get_opening_hours(park_id, dates):
         # Track dates not found in queue data
         unfound_dates = []
         for date in dates:
-            if date in unique_dates:
-                date_data = queue_data[queue_data['date'] == date]
-                time_of_day = date_data['time_of_day'].values
-                all_dates_opening_hours[date] = {
-                    'opening_time': time_of_day[0],
-                    'closing_time': time_of_day[-1]
-                }
+            if date in recorded_hours:
+                all_dates_opening_hours[date] = recorded_hours[date]
             else:
                 unfound_dates.append(date)
                 all_dates_opening_hours[date] = {
@@ -110,8 +133,11 @@ def get_themeparks_schedule(themeparks_id, year, month, day=None):
             timestamp = timestamp[:-1] + '+00:00'
         return timestamp
     
-    api_url = f'https://api.themeparks.wiki/v1/entity/{themeparks_id}/schedule/{year}/{month}'
+    import requests
+
+    api_url = endpoint_url('themeparks-wiki', f'/v1/entity/{themeparks_id}/schedule/{year}/{month}')
     try:
+        record_external_call('themeparks-wiki')
         response = requests.get(api_url)
         response.raise_for_status()
         schedule_data = response.json()
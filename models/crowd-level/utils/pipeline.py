@@ -9,14 +9,20 @@ from .preprocess import (
     add_weather_data,
     fill_missing_values_with_median
 )
+from .instrument import pipeline_run, stage
 
-def model_pipeline(is_training=True, day_df=None):
+# Bump when a change to the pipeline changes the features a trained model
+# expects; model registry versions record it and loading a mismatch warns.
+PIPELINE_VERSION = 1
+
+def model_pipeline(is_training=True, day_df=None, keep_date=False):
     """
     Complete the model preprocessing pipeline for training or inference.
     
     Args:
         is_training (bool): Flag to indicate if the pipeline is for training or inference.
         day_df (pd.DataFrame): DataFrame containing the data for inference.
+        keep_date (bool): Keep the date column in training data (e.g. to hold out the latest days).
     
     Returns:
         pd.DataFrame: Preprocessed DataFrame for training or inference.
@@ -28,32 +34,36 @@ def model_pipeline(is_training=True, day_df=None):
         Returns:
             pd.DataFrame: Preprocessed training DataFrame.
         """
-        print('Running model training pipeline...')
-        park_ids = get_train_include_park_ids()
-        queue_data = generate_training(park_ids)
-        target_cols = queue_data[['date', 'park_id', 'crowd_level']].copy()
-
-        queue_data = queue_data.drop(columns=['crowd_level'])
-        queue_data = extract_features_from_date(queue_data)
-        queue_data = add_bank_holidays(queue_data)
-        queue_data = add_school_holidays(queue_data)
-        queue_data = add_opening_hours(queue_data)
-        queue_data = add_weather_data(queue_data)
-        queue_data = fill_missing_values_with_median(queue_data)
-
-        # Merge crowd_level while date and park_id are still raw columns.
-        # One-hot encoding happens after so park_id is available for the join.
-        queue_data = queue_data.merge(
-            target_cols[['date', 'park_id', 'crowd_level']],
-            on=['date', 'park_id'],
-            how='left'
-        )
-
-        # One-hot encode park_id so the model learns park-specific baselines
-        # without treating park_id as a continuous ordinal variable.
-        queue_data = pd.get_dummies(queue_data, columns=['park_id'], prefix='park', dtype=int)
-
-        queue_data = queue_data.drop(columns=['date'])
+        with pipeline_run('training'):
+            print('Running model training pipeline...')
+            park_ids = get_train_include_park_ids()
+            queue_data = generate_training(park_ids)
+            target_cols = queue_data[['date', 'park_id', 'crowd_level']].copy()
+
+            queue_data = queue_data.drop(columns=['crowd_level'])
+            queue_data = extract_features_from_date(queue_data)
+            queue_data = add_bank_holidays(queue_data)
+            queue_data = add_school_holidays(queue_data)
+            queue_data = add_opening_hours(queue_data)
+            queue_data = add_weather_data(queue_data)
+            queue_data = fill_missing_values_with_median(queue_data)
+
+            with stage('merge_target_and_encode', rows_in=len(queue_data)) as record:
+                # Merge crowd_level while date and park_id are still raw columns.
+                # One-hot encoding happens after so park_id is available for the join.
+                queue_data = queue_data.merge(
+                    target_cols[['date', 'park_id', 'crowd_level']],
+                    on=['date', 'park_id'],
+                    how='left'
+                )
+
+                # One-hot encode park_id so the model learns park-specific baselines
+                # without treating park_id as a continuous ordinal variable.
+                queue_data = pd.get_dummies(queue_data, columns=['park_id'], prefix='park', dtype=int)
+
+                if not keep_date:
+                    queue_data = queue_data.drop(columns=['date'])
+                record['rows_out'] = len(queue_data)
 
         print('Training data prepared successfully.')
         print('--' * 50)
@@ -74,22 +84,25 @@ def model_pipeline(is_training=True, day_df=None):
         if 'park_id' not in day_df.columns:
             raise ValueError("day_df must contain a 'park_id' column for inference.")
 
-        print('Running model inference pipeline...')
-        queue_data = day_df.copy()
-
-        # Ensure park_id is a string to match training dtype.
-        queue_data['park_id'] = queue_data['park_id'].astype(str)
-
-        queue_data = extract_features_from_date(queue_data)
-        queue_data = add_bank_holidays(queue_data)
-        queue_data = add_school_holidays(queue_data)
-        queue_data = add_opening_hours(queue_data)
-        queue_data = add_weather_data(queue_data, is_training=False)
-        queue_data = fill_missing_values_with_median(queue_data)
-
-        # One-hot encode park_id. Column alignment against training columns
-        # is handled in inference.py using the saved feature column list.
-        queue_data = pd.get_dummies(queue_data, columns=['park_id'], prefix='park', dtype=int)
+        with pipeline_run('inference'):
+            print('Running model inference pipeline...')
+            queue_data = day_df.copy()
+
+            # Ensure park_id is a string to match training dtype.
+            queue_data['park_id'] = queue_data['park_id'].astype(str)
+
+            queue_data = extract_features_from_date(queue_data)
+            queue_data = add_bank_holidays(queue_data)
+            queue_data = add_school_holidays(queue_data)
+            queue_data = add_opening_hours(queue_data)
+            queue_data = add_weather_data(queue_data, is_training=False)
+            queue_data = fill_missing_values_with_median(queue_data)
+
+            with stage('encode_park_id', rows_in=len(queue_data)) as record:
+                # One-hot encode park_id. Column alignment against training columns
+                # is handled in inference.py using the saved feature column list.
+                queue_data = pd.get_dummies(queue_data, columns=['park_id'], prefix='park', dtype=int)
+                record['rows_out'] = len(queue_data)
 
         print('Inference data pipeline completed successfully.')
         print('--' * 50)
@@ -1,7 +1,10 @@
-from .helpers import load_all_data, get_country_from_park_id
+from .analytics import connect_readings, query_training_targets
+from .columnar import get_storage_config
+from .helpers import load_queue_rollup, get_country_from_park_id
 from .holidays import get_bank_holidays, get_school_holidays
 from .opening import get_opening_hours
 from .geo import get_lat_long, get_weather_data
+from .instrument import instrumented
 import yaml
 import pandas as pd
 
@@ -32,47 +35,25 @@ def get_train_include_park_ids(config_path='config.yml'):
     print(f'Retrieved park_ids from config: {return_val}')
     return return_val
 
-def generate_training(include_park_ids=None):
+def _generate_training_targets_pandas(include_park_ids, storage):
     """
-    Generate training data for the crowd level model.
-
-    Args:
-        include_park_ids (list[int] | None): Park IDs to include. Uses all parks if None.
-
-    Returns:
-        pd.DataFrame: DataFrame with columns: date, park_id (str), crowd_level.
+    Compute date, park_id (int) and crowd_level from per-ride daily rollups with pandas.
     """
-    statements = {
-        'queue_select': '*',
-        'queue_where': 'is_closed = 0',
-        'park_select': '*'
-    }
-    sql_tables = load_all_data(statements=statements)
-
-    queue_data = sql_tables['queue_data']
-    park_info = sql_tables['park_info']
-
-    queue_data['park_id'] = queue_data['ride_id'].map(park_info.set_index('ride_id')['park_id'])
-
-    # SQLite has no enforced types, so park_id may come back as str or float.
-    # Normalise to int before filtering to guarantee isin matches.
-    queue_data['park_id'] = pd.to_numeric(queue_data['park_id'], errors='coerce')
-    queue_data = queue_data.dropna(subset=['park_id'])
-    queue_data['park_id'] = queue_data['park_id'].astype(int)
-
-    if include_park_ids is not None:
-        if isinstance(include_park_ids, (int, str)):
-            include_park_ids = [int(include_park_ids)]
-        queue_data = queue_data[queue_data['park_id'].isin([int(x) for x in include_park_ids])]
-
-    try:
-        queue_data = queue_data.drop(columns=['id'])
-    except KeyError:
-        pass
+    # Daily tier: raw readings are aggregated as they load and compacted
+    # days come straight from queue_daily, with typed int IDs throughout.
+    # Rides outside their open lifecycle (ride_info) are never read.
+    queue_data = load_queue_rollup(
+        'day', db_path=storage['db_path'], park_ids=include_park_ids,
+        backend=storage['backend'], parquet_dir=storage['parquet_dir'], active_only=True
+    )
 
-    # Average per ride per day, then average across all rides per park per day.
-    queue_data = queue_data.groupby(['date', 'park_id', 'ride_id']).agg({'queue_time': 'mean'}).reset_index()
-    queue_data = queue_data.rename(columns={'queue_time': 'avg_queue_time'})
+    # Average per ride per day (open readings only), then average across all rides per park per day.
+    queue_data = queue_data[queue_data['n_open'] > 0]
+    queue_data = pd.DataFrame({
+        'date': queue_data['date'].astype('datetime64[ns]'),
+        'park_id': queue_data['park_id'],
+        'avg_queue_time': queue_data['sum_queue_time'] / queue_data['n_open'],
+    })
     queue_data = queue_data.groupby(['date', 'park_id']).agg({'avg_queue_time': 'mean'}).reset_index()
 
     # Per-park percentile rank: a score of 70 means busier than 70% of historical days
@@ -82,7 +63,32 @@ def generate_training(include_park_ids=None):
         .rank(pct=True) * 100
     ).round().astype(int)
 
-    queue_data = queue_data.drop(columns=['avg_queue_time'])
+    return queue_data.drop(columns=['avg_queue_time'])
+
+@instrumented
+def generate_training(include_park_ids=None):
+    """
+    Generate training data for the crowd level model.
+
+    Args:
+        include_park_ids (list[int] | None): Park IDs to include. Uses all parks if None.
+
+    Returns:
+        pd.DataFrame: DataFrame with columns: date, park_id (str), crowd_level.
+    """
+    if isinstance(include_park_ids, (int, str)):
+        include_park_ids = [int(include_park_ids)]
+
+    storage = get_storage_config()
+    if storage['engine'] == 'duckdb':
+        conn = connect_readings(storage['backend'], db_path=storage['db_path'], parquet_dir=storage['parquet_dir'])
+        try:
+            queue_data = query_training_targets(conn, include_park_ids)
+        finally:
+            conn.close()
+        queue_data['date'] = queue_data['date'].astype('datetime64[ns]')
+    else:
+        queue_data = _generate_training_targets_pandas(include_park_ids, storage)
 
     # Store park_id as string so median imputation doesn't corrupt it.
     queue_data['park_id'] = queue_data['park_id'].astype(str)
@@ -94,6 +100,7 @@ def generate_training(include_park_ids=None):
 
     return queue_data
 
+@instrumented
 def extract_features_from_date(df):
     """
     Extract features from the date column of the DataFrame.
@@ -117,6 +124,7 @@ def extract_features_from_date(df):
 
     return df
 
+@instrumented
 def add_bank_holidays(df):
     """
     Add a bank holiday flag to the DataFrame.
@@ -161,6 +169,7 @@ def add_bank_holidays(df):
     print('Successfully added bank holidays to the DataFrame.')
     return df
 
+@instrumented
 def add_school_holidays(df):
     """
     Add a school holiday flag to the DataFrame.
@@ -194,6 +203,7 @@ def add_school_holidays(df):
     print('Successfully added school holidays to the DataFrame.')
     return df
 
+@instrumented
 def add_opening_hours(df):
     """
     Adds park opening hours to the DataFrame.
@@ -237,6 +247,7 @@ def add_opening_hours(df):
     df = df.dropna(subset=['opening_hr', 'closing_hr', 'hours_open_for'])
     return df
 
+@instrumented
 def add_weather_data(df, is_training=True):
     """
     Adds weather data to the DataFrame.
@@ -277,6 +288,7 @@ def add_weather_data(df, is_training=True):
     print('Successfully added weather data to the DataFrame.')
     return df
 
+@instrumented
 def fill_missing_values_with_median(df):
     """
     Fill missing values in the DataFrame with the median for numerical columns.
@@ -0,0 +1,113 @@
+import numpy as np
+
+DEFAULT_QUANTILES = (0.1, 0.5, 0.9)
+
+def build_leaf_index(model, X_train, y_train):
+    """
+    Record which training samples land in each leaf of a fitted random forest.
+
+    The index is stored in CSR form across all trees: every (tree, node) pair
+    gets a global id, and `indptr[id]:indptr[id + 1]` slices `indices` to the
+    training samples in that leaf. Samples are referenced by their rank in
+    `y_sorted` so quantiles can be read straight off a cumulative weight sum.
+
+    Args:
+        model: Fitted RandomForestRegressor.
+        X_train (pd.DataFrame): Features the model was fitted on.
+        y_train (pd.Series): Targets the model was fitted on.
+
+    Returns:
+        dict: Leaf index with keys y_sorted, node_offsets, indptr and indices.
+    """
+    y = np.asarray(y_train, dtype=np.float32)
+    order = np.argsort(y, kind='stable')
+    y_sorted = y[order]
+
+    # rank[i] is the position of training sample i in y_sorted.
+    rank = np.empty(len(y), dtype=np.int32)
+    rank[order] = np.arange(len(y), dtype=np.int32)
+
+    node_counts = np.array([est.tree_.node_count for est in model.estimators_], dtype=np.int64)
+    node_offsets = np.concatenate([[0], np.cumsum(node_counts)[:-1]])
+
+    leaves = model.apply(X_train) + node_offsets
+    n_trees = leaves.shape[1]
+
+    # Group (tree, sample) pairs by global leaf id; sorting by leaf then rank
+    # keeps each leaf's samples ordered by target value.
+    global_leaf = leaves.T.ravel()
+    sample_rank = np.tile(rank, n_trees)
+    sort_idx = np.lexsort((sample_rank, global_leaf))
+
+    counts = np.bincount(global_leaf, minlength=int(node_counts.sum()))
+    indptr = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+
+    print(f'Built leaf index over {n_trees} trees and {len(y)} training samples.')
+    return {
+        'y_sorted': y_sorted,
+        'node_offsets': node_offsets,
+        'indptr': indptr,
+        'indices': sample_rank[sort_idx].astype(np.int32),
+    }
+
+def predict_quantiles(model, leaf_index, X, quantiles=DEFAULT_QUANTILES, chunk_size=256):
+    """
+    Predict conditional quantiles with a quantile regression forest.
+
+    Each training sample is weighted by how often it shares a leaf with the
+    query row, normalised by leaf size and averaged over trees (Meinshausen,
+    2006). Weights are accumulated for a chunk of rows at a time so memory is
+    bounded by chunk_size x n_train regardless of the number of rows.
+
+    Args:
+        model: Fitted RandomForestRegressor the leaf index was built from.
+        leaf_index (dict): Output of build_leaf_index.
+        X (pd.DataFrame): Features aligned to the training columns.
+        quantiles (tuple[float]): Quantiles to predict, each in [0, 1].
+        chunk_size (int): Rows processed per weight matrix.
+
+    Returns:
+        np.ndarray: Array of shape (len(X), len(quantiles)).
+    """
+    if hasattr(model, 'predict_quantiles'):
+        # Sharded models (utils.shards) route each row to its shard's forest and leaf index.
+        return model.predict_quantiles(X, quantiles, chunk_size)
+
+    y_sorted = leaf_index['y_sorted']
+    indptr = leaf_index['indptr']
+    indices = leaf_index['indices']
+    n_train = len(y_sorted)
+    quantiles = np.asarray(quantiles, dtype=np.float64)
+
+    leaves = model.apply(X) + leaf_index['node_offsets']
+    n_rows, n_trees = leaves.shape
+    result = np.empty((n_rows, len(quantiles)), dtype=np.float64)
+
+    for start in range(0, n_rows, chunk_size):
+        chunk = leaves[start:start + chunk_size]
+        n_chunk = len(chunk)
+
+        flat_leaf = chunk.ravel()
+        starts = indptr[flat_leaf]
+        counts = indptr[flat_leaf + 1] - starts
+
+        # Expand every (row, tree) leaf into its member samples without a
+        # Python loop: positions within each leaf are offsets from its start.
+        total = int(counts.sum())
+        run_starts = np.repeat(np.cumsum(counts) - counts, counts)
+        members = indices[np.repeat(starts, counts) + np.arange(total) - run_starts]
+        rows = np.repeat(np.repeat(np.arange(n_chunk), n_trees), counts)
+        leaf_weight = np.repeat(1.0 / (counts * n_trees), counts)
+
+        weights = np.bincount(
+            rows * n_train + members,
+            weights=leaf_weight,
+            minlength=n_chunk * n_train
+        ).reshape(n_chunk, n_train)
+
+        cdf = np.cumsum(weights, axis=1)
+        # First sorted target whose cumulative weight reaches each quantile.
+        positions = (cdf[:, :, None] < quantiles[None, None, :] - 1e-9).sum(axis=1)
+        result[start:start + n_chunk] = y_sorted[np.minimum(positions, n_train - 1)]
+
+    return result
@@ -0,0 +1,166 @@
+import pandas as pd
+
+# Queue tables the builder can read, with their selectable columns. Columns
+# from park_info (park_id, ride_name) are joined in SQL when selected or
+# filtered on.
+TABLE_COLUMNS = {
+    'queue_data': ['date', 'ride_id', 'time_of_day', 'queue_time', 'is_closed'],
+    'queue_daily': [
+        'date', 'ride_id', 'n_readings', 'n_open', 'sum_queue_time', 'max_queue_time',
+        'first_time_of_day', 'last_time_of_day',
+    ],
+    'queue_hourly': [
+        'date', 'ride_id', 'hour', 'n_readings', 'n_open', 'sum_queue_time', 'max_queue_time',
+        'first_time_of_day', 'last_time_of_day',
+    ],
+}
+PARK_COLUMNS = ['park_id', 'ride_name']
+
+# A ride still counts as active this many days after its last open reading,
+# so a short closure (or the gap before a future date) doesn't drop it.
+ACTIVE_GRACE_DAYS = 30
+
+# ride_info columns as loaded by load_ride_info, with the typical first and
+# last open minute of day averaged in SQL. The mean is taken in floating point
+# and rounded to a whole minute, so SQLite (integer division) and DuckDB
+# (float division) agree, as does the int16 column in the Parquet export.
+RIDE_INFO_SELECT = """
+    SELECT ride_id, park_id, ride_name, category, first_seen, last_seen, last_reported, active_days,
+           CAST(ROUND((open_minute_total + last_day_open_minute) * 1.0 / active_days) AS INTEGER) AS typical_open_minute,
+           CAST(ROUND((close_minute_total + last_day_close_minute) * 1.0 / active_days) AS INTEGER) AS typical_close_minute
+    FROM ride_info ri
+"""
+
+def to_db_date(value):
+    """
+    Convert a date to the database's 'YYYY/MM/DD' text form.
+
+    Args:
+        value (str | datetime.date | pd.Timestamp): 'YYYY-MM-DD' or 'YYYY/MM/DD' string, or a date.
+
+    Returns:
+        str: Date as 'YYYY/MM/DD'.
+    """
+    if isinstance(value, str):
+        return pd.Timestamp(value.replace('/', '-')).strftime('%Y/%m/%d')
+    return pd.Timestamp(value).strftime('%Y/%m/%d')
+
+def build_queue_query(table='queue_data', columns=None, park_ids=None, start_date=None, end_date=None,
+                      dates=None, include_closed=True, active_only=False):
+    """
+    Compile a parameterised SELECT over a queue table.
+
+    Every value is a bound parameter. Park filters compare park_info.park_id
+    as stored (text), and date filters compare the stored 'YYYY/MM/DD' text
+    directly, so SQLite can use the indexes created by scraping/database.py
+    (ride_id, date) for park and date range queries.
+
+    With active_only, rides come from ride_info instead of park_info and each
+    ride's rows are limited to its first_seen..last_seen open lifecycle. The
+    lifecycle bounds become part of the (ride_id, date) index range, so the
+    closed-only history of retired rides is never read.
+
+    Args:
+        table (str): 'queue_data', 'queue_daily' or 'queue_hourly'.
+        columns (list[str] | None): Columns to select, from the table and PARK_COLUMNS.
+            Defaults to every table column plus park_id.
+        park_ids (list[int] | None): Only rows for rides in these parks.
+        start_date: First date to include (inclusive), in any form to_db_date accepts.
+        end_date: Last date to include (inclusive).
+        dates (list | None): Only these dates.
+        include_closed (bool): Whether to keep readings flagged is_closed (queue_data only).
+        active_only (bool): Only rows inside their ride's lifecycle in ride_info.
+
+    Returns:
+        tuple[str, list]: SQL and its parameters.
+    """
+    if table not in TABLE_COLUMNS:
+        raise ValueError(f'Unknown queue table: {table}')
+    columns = columns or TABLE_COLUMNS[table] + ['park_id']
+    unknown = [c for c in columns if c not in TABLE_COLUMNS[table] + PARK_COLUMNS]
+    if unknown:
+        raise ValueError(f'Unknown columns for {table}: {unknown}')
+
+    park = 'ri' if active_only else 'pi'
+    select = ', '.join(f'{park}.{c}' if c in PARK_COLUMNS else f't.{c}' for c in columns)
+    conditions, params = [], []
+    if park_ids is not None:
+        conditions.append(f"{park}.park_id IN ({', '.join('?' for _ in park_ids)})")
+        params += [str(int(p)) for p in park_ids]
+    if start_date is not None:
+        conditions.append('t.date >= ?')
+        params.append(to_db_date(start_date))
+    if end_date is not None:
+        conditions.append('t.date <= ?')
+        params.append(to_db_date(end_date))
+    if dates is not None:
+        conditions.append(f"t.date IN ({', '.join('?' for _ in dates)})")
+        params += [to_db_date(d) for d in dates]
+    if not include_closed:
+        if table != 'queue_data':
+            raise ValueError(f'{table} has no is_closed column; use n_open.')
+        conditions.append('t.is_closed = 0')
+
+    join_park = park_ids is not None or any(c in PARK_COLUMNS for c in columns)
+    if active_only:
+        join = 'JOIN ride_info ri ON ri.ride_id = t.ride_id AND t.date BETWEEN ri.first_seen AND ri.last_seen'
+    else:
+        join = 'JOIN park_info pi ON pi.ride_id = t.ride_id' if join_park else ''
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+    return f'SELECT {select} FROM {table} t {join} {where}', params
+
+def park_info_query(park_ids=None):
+    """
+    Compile a parameterised SELECT of park_info, optionally for some parks only.
+
+    Returns:
+        tuple[str, list]: SQL and its parameters.
+    """
+    if park_ids is None:
+        return 'SELECT ride_id, park_id, ride_name FROM park_info', []
+    placeholders = ', '.join('?' for _ in park_ids)
+    return f'SELECT ride_id, park_id, ride_name FROM park_info WHERE park_id IN ({placeholders})', [str(int(p)) for p in park_ids]
+
+def ride_info_query(park_ids=None):
+    """
+    Compile a parameterised SELECT of ride_info (see RIDE_INFO_SELECT), optionally for some parks only.
+
+    Returns:
+        tuple[str, list]: SQL and its parameters.
+    """
+    if park_ids is None:
+        return RIDE_INFO_SELECT, []
+    placeholders = ', '.join('?' for _ in park_ids)
+    return f'{RIDE_INFO_SELECT} WHERE ri.park_id IN ({placeholders})', [str(int(p)) for p in park_ids]
+
+def active_rides_query(date, park_ids=None, grace_days=ACTIVE_GRACE_DAYS):
+    """
+    Compile a SELECT of the ride_info rows for rides active on a date.
+
+    A ride is active on a date if it had opened by then and was seen open
+    within grace_days before it. Dates after the park's latest open reading,
+    such as forecast dates, are measured from that reading instead, so the
+    rides running when data ends stay active. Both conditions range over
+    the (park_id, last_seen) index.
+
+    Args:
+        date: The date, in any form to_db_date accepts.
+        park_ids (list[int] | None): Only rides in these parks.
+        grace_days (int): Days after a ride's last open reading it still counts as active.
+
+    Returns:
+        tuple[str, list]: SQL and its parameters.
+    """
+    day = pd.Timestamp(to_db_date(date).replace('/', '-'))
+    conditions = [
+        'ri.first_seen <= ?',
+        """ri.last_seen >= MIN(?, (
+            SELECT replace(date(replace(MAX(latest.last_seen), '/', '-'), ?), '-', '/')
+            FROM ride_info latest WHERE latest.park_id = ri.park_id
+        ))""",
+    ]
+    params = [to_db_date(day), to_db_date(day - pd.Timedelta(days=grace_days)), f'-{int(grace_days)} days']
+    if park_ids is not None:
+        conditions.append(f"ri.park_id IN ({', '.join('?' for _ in park_ids)})")
+        params += [str(int(p)) for p in park_ids]
+    return f"{RIDE_INFO_SELECT} WHERE {' AND '.join(conditions)}", params
@@ -0,0 +1,323 @@
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+from datetime import datetime
+import joblib
+import yaml
+from .pipeline import PIPELINE_VERSION
+
+CURRENT_FILE = 'CURRENT'
+METADATA_FILE = 'meta.json'
+VERSION_PATTERN = re.compile(r'^v(\d+)$')
+
+# Loaded exports by model name, with the version (or flat export mtime) they were read at.
+_loaded = {}
+_loaded_lock = threading.Lock()
+
+def get_registry_config(config_path='config.yml'):
+    """
+    Get the model registry settings from the config file.
+
+    Args:
+        config_path (str): Path to the configuration file.
+
+    Returns:
+        dict: keep_versions (versions kept on disk, the current one always
+            included) and reload_check_s (how often long-running processes
+            check for a new current version).
+    """
+    try:
+        with open(config_path, 'r') as file:
+            config = yaml.safe_load(file) or {}
+    except FileNotFoundError:
+        config = {}
+    registry = ((config.get('models', {}) or {}).get('crowd-level', {}) or {}).get('registry', {}) or {}
+    return {
+        'keep_versions': registry.get('keep_versions', 5),
+        'reload_check_s': registry.get('reload_check_s', 10),
+    }
+
+def exports_dir():
+    """
+    The model-exports folder.
+    """
+    return os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'model-exports')
+
+def registry_dir(model_name):
+    """
+    Directory holding a model's versions and its CURRENT pointer.
+    """
+    return os.path.join(exports_dir(), f'{model_name}-versions')
+
+def list_versions(model_name):
+    """
+    A model's published versions, oldest first.
+    """
+    directory = registry_dir(model_name)
+    if not os.path.isdir(directory):
+        return []
+    versions = [name for name in os.listdir(directory) if VERSION_PATTERN.match(name)]
+    return sorted(versions, key=lambda name: int(VERSION_PATTERN.match(name).group(1)))
+
+def current_version(model_name):
+    """
+    The version CURRENT points to: one small file read, cheap enough to call per request.
+
+    Returns:
+        str | None: e.g. 'v0003', or None if no version has been published.
+    """
+    try:
+        with open(os.path.join(registry_dir(model_name), CURRENT_FILE), 'r') as file:
+            return file.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+def set_current(model_name, version):
+    """
+    Point CURRENT at a published version, e.g. to roll back.
+
+    The pointer is written beside the target and renamed over it, so
+    readers see either the old version or the new one.
+    """
+    directory = registry_dir(model_name)
+    if not os.path.isdir(os.path.join(directory, version)):
+        raise ValueError(f'{model_name} has no version {version} (published: {list_versions(model_name)})')
+    pointer = os.path.join(directory, CURRENT_FILE)
+    with open(f'{pointer}.tmp', 'w') as file:
+        file.write(version)
+    os.replace(f'{pointer}.tmp', pointer)
+
+def publish(model_name, write, keep_versions=5):
+    """
+    Publish a new version of a model whose files write(directory) creates, and make it current.
+
+    Every file is written to a staging directory first, which is renamed to
+    the version name once complete; CURRENT moves only after that. A process
+    reading the current version therefore never sees a partly written model.
+    Versions beyond the newest keep_versions are deleted.
+
+    Args:
+        model_name (str): Name the versions are kept under (see registry_dir).
+        write (callable): Writes the version's files into the directory it is given.
+        keep_versions (int): Published versions to keep on disk.
+
+    Returns:
+        str: The new version.
+    """
+    directory = registry_dir(model_name)
+    os.makedirs(directory, exist_ok=True)
+    staging = tempfile.mkdtemp(prefix='.staging-', dir=directory)
+    try:
+        write(staging)
+
+        # Renaming onto an existing (non-empty) version fails, so concurrent publishers get distinct numbers.
+        versions = list_versions(model_name)
+        number = int(VERSION_PATTERN.match(versions[-1]).group(1)) + 1 if versions else 1
+        while True:
+            version = f'v{number:04d}'
+            try:
+                os.rename(staging, os.path.join(directory, version))
+                break
+            except OSError:
+                if not os.path.exists(os.path.join(directory, version)):
+                    raise
+                number += 1
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+    set_current(model_name, version)
+    for old in list_versions(model_name)[:-keep_versions]:
+        if old != version:
+            shutil.rmtree(os.path.join(directory, old), ignore_errors=True)
+    return version
+
+def publish_version(model_name, model, feature_columns, leaf_index=None, metadata=None, keep_versions=5):
+    """
+    Save a model as a new version in its registry and make it current (see publish).
+
+    Args:
+        model_name (str): Model name from config.
+        model: The trained model.
+        feature_columns (list[str]): Ordered feature column names.
+        leaf_index (dict | None): Leaf index from utils.quantile.build_leaf_index.
+        metadata (dict | None): Training details (e.g. trained_through,
+            params, metrics), saved in meta.json with the pipeline version.
+        keep_versions (int): Published versions to keep on disk.
+
+    Returns:
+        str: The new version.
+    """
+    def write(directory):
+        joblib.dump(model, os.path.join(directory, 'model.pkl'))
+        joblib.dump(list(feature_columns), os.path.join(directory, 'columns.pkl'))
+        if leaf_index is not None:
+            joblib.dump(leaf_index, os.path.join(directory, 'leaves.pkl'))
+        with open(os.path.join(directory, METADATA_FILE), 'w') as file:
+            json.dump({
+                **(metadata or {}),
+                'pipeline_version': PIPELINE_VERSION,
+                'features': len(feature_columns),
+                'saved_at': datetime.now().isoformat(timespec='seconds'),
+            }, file, indent=2, default=str)
+
+    return publish(model_name, write, keep_versions)
+
+def version_metadata(model_name, version=None):
+    """
+    meta.json of a version (the current one by default), without loading the model.
+
+    Returns:
+        dict: The metadata, or {} for a model with no published version.
+    """
+    version = version or current_version(model_name)
+    if version is None:
+        return {}
+    with open(os.path.join(registry_dir(model_name), version, METADATA_FILE), 'r') as file:
+        return json.load(file)
+
+def _load_flat_export(model_name):
+    """
+    The {model_name}.pkl / _columns.pkl / _leaves.pkl files saved before the registry.
+    """
+    model_path = os.path.join(exports_dir(), f'{model_name}.pkl')
+    columns_path = os.path.join(exports_dir(), f'{model_name}_columns.pkl')
+    if not (os.path.exists(model_path) and os.path.exists(columns_path)):
+        return None
+    leaves_path = os.path.join(exports_dir(), f'{model_name}_leaves.pkl')
+    return {
+        'version': None,
+        'model': joblib.load(model_path),
+        'feature_columns': joblib.load(columns_path),
+        'leaf_index': joblib.load(leaves_path) if os.path.exists(leaves_path) else None,
+        'metadata': {},
+    }
+
+def load_version(model_name, version=None):
+    """
+    Load a model version from the registry.
+
+    Models trained before the registry existed are read from their flat
+    export files when no version has been published. The last export
+    loaded per model is kept in memory, so the separate model, column and
+    leaf index loads in inference.py unpickle it once.
+
+    Args:
+        model_name (str): Model name from config.
+        version (str | None): Version to load; the current one if None.
+
+    Returns:
+        dict | None: 'version' (None for a flat export), 'model',
+            'feature_columns', 'leaf_index' (None if exported without one)
+            and 'metadata'; None if the model has never been exported.
+    """
+    version = version or current_version(model_name)
+    if version is None:
+        model_path = os.path.join(exports_dir(), f'{model_name}.pkl')
+        key = ('flat', os.path.getmtime(model_path)) if os.path.exists(model_path) else None
+    else:
+        key = ('version', version)
+    with _loaded_lock:
+        cached = _loaded.get(model_name)
+    if key is not None and cached is not None and cached[0] == key:
+        return cached[1]
+
+    if version is None:
+        exported = _load_flat_export(model_name)
+        if exported is None:
+            return None
+    else:
+        directory = os.path.join(registry_dir(model_name), version)
+        leaves_path = os.path.join(directory, 'leaves.pkl')
+        exported = {
+            'version': version,
+            'model': joblib.load(os.path.join(directory, 'model.pkl')),
+            'feature_columns': joblib.load(os.path.join(directory, 'columns.pkl')),
+            'leaf_index': joblib.load(leaves_path) if os.path.exists(leaves_path) else None,
+            'metadata': version_metadata(model_name, version),
+        }
+        pipeline_version = exported['metadata'].get('pipeline_version')
+        if pipeline_version != PIPELINE_VERSION:
+            print(f'Warning: {model_name} {version} was trained with feature pipeline version '
+                  f'{pipeline_version}, but the pipeline is now version {PIPELINE_VERSION}. Retrain it.')
+    with _loaded_lock:
+        _loaded[model_name] = (key, exported)
+    return exported
+
+class HotModel:
+    """
+    The current version of a model, for long-running processes such as serve.py and the dashboard.
+
+    get() checks CURRENT at most every check_interval_s seconds. When it
+    has moved, the new version is unpickled in a background thread while
+    get() keeps returning the loaded one, which is then replaced in a single
+    reference swap. Only the very first load blocks. Sharded models are
+    followed the same way, through their own registry and loader (see
+    utils.shards.load_sharded_export).
+    """
+    def __init__(self, model_name, check_interval_s=10, loader=load_version, registry_name=None):
+        """
+        Args:
+            model_name (str): Model name from config.
+            check_interval_s (float): Minimum seconds between CURRENT checks.
+            loader (callable): loader(model_name, version) returning an export
+                in the form of load_version, the current version if version is None.
+            registry_name (str | None): Name the versions are published under,
+                if not model_name.
+        """
+        self.model_name = model_name
+        self.registry_name = registry_name or model_name
+        self.check_interval_s = check_interval_s
+        self.loader = loader
+        self.loaded = loader(model_name, None)
+        self.checked_at = time.monotonic()
+        self.reloads = 0
+        self.failed_version = None
+        self._loader = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        """
+        The loaded export (see load_version), starting a background reload if CURRENT has moved.
+
+        Returns:
+            dict | None: The export, or None until a model has been exported.
+        """
+        with self._lock:
+            now = time.monotonic()
+            if now - self.checked_at >= self.check_interval_s and not (self._loader and self._loader.is_alive()):
+                self.checked_at = now
+                version = current_version(self.registry_name)
+                loaded_version = self.loaded['version'] if self.loaded is not None else None
+                if version is not None and version not in (loaded_version, self.failed_version):
+                    self._loader = threading.Thread(target=self._reload, args=(version,), daemon=True)
+                    self._loader.start()
+        return self.loaded
+
+    def _reload(self, version):
+        started = time.perf_counter()
+        try:
+            loaded = self.loader(self.model_name, version)
+        except Exception as e:
+            self.failed_version = version
+            print(f'Could not load {self.registry_name} {version}: {e} — keeping the loaded model.')
+            return
+        self.loaded = loaded
+        self.reloads += 1
+        print(f'Loaded {self.registry_name} {version} in {time.perf_counter() - started:.1f}s')
+
+    def status(self):
+        """
+        Loaded version and reload counts, for metrics endpoints.
+        """
+        loaded = self.loaded
+        return {
+            'version': loaded['version'] if loaded is not None else None,
+            'trained_through': loaded['metadata'].get('trained_through') if loaded is not None else None,
+            'reloads': self.reloads,
+            'failed_version': self.failed_version,
+        }
@@ -0,0 +1,322 @@
+import json
+import os
+import re
+import threading
+from datetime import datetime
+import joblib
+import numpy as np
+import pandas as pd
+import yaml
+from .pipeline import PIPELINE_VERSION
+from .quantile import DEFAULT_QUANTILES, predict_quantiles
+from .registry import current_version, exports_dir, publish, registry_dir
+
+SHARD_BY = ('park', 'country')
+REGISTRY_FILE = 'registry.json'
+
+# Loaded sharded models by model name, with the version (or unversioned registry mtime) they were read at.
+_loaded = {}
+_loaded_lock = threading.Lock()
+
+def get_shard_config(config_path='config.yml'):
+    """
+    Get the model sharding settings from the config file.
+
+    Args:
+        config_path (str): Path to the configuration file.
+
+    Returns:
+        dict: 'shard_by' (None for one global model, 'park' or 'country') and
+            'workers' (parallel training processes, None for one per shard up to the CPU count).
+    """
+    try:
+        with open(config_path, 'r') as file:
+            config = yaml.safe_load(file) or {}
+    except FileNotFoundError:
+        config = {}
+    crowd_level = (config.get('models', {}) or {}).get('crowd-level', {}) or {}
+    shard_by = crowd_level.get('shard_by')
+    if shard_by is not None and shard_by not in SHARD_BY:
+        raise ValueError(f'Unknown shard_by: {shard_by} (expected one of {SHARD_BY})')
+    return {'shard_by': shard_by, 'workers': crowd_level.get('shard_workers')}
+
+def shard_registry_name(model_name):
+    """
+    Name a model's shard versions are published under in utils.registry.
+    """
+    return f'{model_name}-shards'
+
+def shards_dir(model_name):
+    """
+    Directory of shards saved before they were versioned.
+    """
+    return os.path.join(exports_dir(), f'{model_name}-shards')
+
+def row_park_ids(X):
+    """
+    Park ID of each row of a feature matrix, read from its one-hot park_* columns.
+
+    Returns:
+        np.ndarray: int64 park IDs, -1 for rows with no park column set.
+    """
+    park_cols = [col for col in X.columns if col.startswith('park_')]
+    if not park_cols:
+        return np.full(len(X), -1, dtype=np.int64)
+    ids = np.array([int(col[len('park_'):]) for col in park_cols], dtype=np.int64)
+    onehot = X[park_cols].to_numpy()
+    return np.where(onehot.any(axis=1), ids[onehot.argmax(axis=1)], -1)
+
+def assign_shards(park_ids, shard_by):
+    """
+    Route each park to a shard.
+
+    Args:
+        park_ids (list[int]): Parks in the training data.
+        shard_by (str): 'park' for one shard per park, 'country' for one per
+            country (looked up through the Queue Times API; parks it can't
+            place get a shard of their own).
+
+    Returns:
+        dict[int, str]: Park ID to shard name.
+    """
+    if shard_by == 'park':
+        return {int(p): f'park-{int(p)}' for p in park_ids}
+    from .helpers import get_country_from_park_id
+
+    routes = {}
+    for park_id in park_ids:
+        country = get_country_from_park_id(park_id)
+        slug = re.sub(r'[^a-z0-9]+', '-', country.lower()).strip('-') if country else ''
+        routes[int(park_id)] = f'country-{slug}' if slug else f'park-{int(park_id)}'
+    return routes
+
+def shard_columns(feature_columns, parks):
+    """
+    The feature columns a shard trains on: every non-park column, plus the
+    park_* columns of its own parks when it has more than one.
+    """
+    keep = {f'park_{p}' for p in parks} if len(parks) > 1 else set()
+    return [col for col in feature_columns if not col.startswith('park_') or col in keep]
+
+class ShardedModel:
+    """
+    One forest per shard of parks, behind the predict interface of a single model.
+
+    Rows are routed by the park_* columns of the full feature matrix, so
+    inference builds features exactly as for the global model. A park no
+    shard was trained on goes to the shard with the most training rows, as
+    the global model would give it an all-zero park encoding. version is the
+    published version it was loaded from (see load_sharded_model).
+    """
+    def __init__(self, registry, models, columns, leaf_indexes):
+        """
+        Args:
+            registry (dict): Contents of registry.json ('shard_by', 'routes', 'shards').
+            models (dict): Shard name to fitted RandomForestRegressor.
+            columns (dict): Shard name to its ordered feature columns.
+            leaf_indexes (dict): Shard name to its leaf index (utils.quantile), or None.
+        """
+        self.registry = registry
+        self.version = None
+        self.shard_by = registry['shard_by']
+        self.routes = {int(p): shard for p, shard in registry['routes'].items()}
+        self.shards = models
+        self.columns = columns
+        self.leaf_indexes = leaf_indexes
+        self.fallback = max(registry['shards'], key=lambda shard: registry['shards'][shard]['rows'])
+
+        parks = sorted(self.routes)
+        features = [col for shard in models for col in columns[shard] if not col.startswith('park_')]
+        self.feature_columns = list(dict.fromkeys(features)) + [f'park_{p}' for p in parks]
+
+    def route(self, X):
+        """
+        Shard name of each row of a feature matrix aligned to feature_columns.
+        """
+        return np.array([self.routes.get(int(p), self.fallback) for p in row_park_ids(X)], dtype=object)
+
+    def _by_shard(self, X, predict):
+        shards = self.route(X)
+        result = None
+        for shard in np.unique(shards):
+            rows = np.flatnonzero(shards == shard)
+            values = np.asarray(predict(shard, X.iloc[rows].reindex(columns=self.columns[shard], fill_value=0)))
+            if result is None:
+                result = np.empty((len(X),) + values.shape[1:], dtype=np.float64)
+            result[rows] = values
+        return result if result is not None else np.empty(0)
+
+    def predict(self, X):
+        """
+        Predict each row with its park's shard.
+
+        Args:
+            X (pd.DataFrame): Features aligned to feature_columns.
+
+        Returns:
+            np.ndarray: Predictions, in row order.
+        """
+        return self._by_shard(X, lambda shard, rows: self.shards[shard].predict(rows))
+
+    def predict_quantiles(self, X, quantiles=DEFAULT_QUANTILES, chunk_size=256):
+        """
+        utils.quantile.predict_quantiles, with each row's shard and its own leaf index.
+        """
+        return self._by_shard(
+            X, lambda shard, rows: predict_quantiles(self.shards[shard], self.leaf_indexes[shard], rows, quantiles, chunk_size)
+        )
+
+    @property
+    def feature_importances_(self):
+        """
+        Shard importances over feature_columns, weighted by each shard's training rows.
+        """
+        total = np.zeros(len(self.feature_columns))
+        position = {col: i for i, col in enumerate(self.feature_columns)}
+        weights = {shard: self.registry['shards'][shard]['rows'] for shard in self.shards}
+        for shard, model in self.shards.items():
+            idx = [position[col] for col in self.columns[shard]]
+            total[idx] += model.feature_importances_ * weights[shard]
+        return total / max(sum(weights.values()), 1)
+
+def save_sharded_model(model_name, shard_by, routes, shards, keep_versions=5, metadata=None):
+    """
+    Publish trained shards and their routing registry as a new version (see utils.registry.publish).
+
+    Every shard and registry.json are written to a fresh version directory
+    under model-exports/{model_name}-shards-versions, and CURRENT moves to it
+    once complete, so a reader never pairs files from two trainings.
+
+    Args:
+        model_name (str): Model name from config.
+        shard_by (str): 'park' or 'country'.
+        routes (dict[int, str]): Park ID to shard name.
+        shards (dict): Shard name to a dict with 'model', 'columns',
+            'leaf_index' and registry details ('parks', 'rows', 'params',
+            'metrics', 'train_s').
+        keep_versions (int): Published versions to keep on disk.
+        metadata (dict | None): Training details (e.g. trained_through), saved in registry.json.
+
+    Returns:
+        str: The new version.
+    """
+    registry = {
+        **(metadata or {}),
+        'shard_by': shard_by,
+        'routes': {str(p): s for p, s in sorted(routes.items())},
+        'shards': {},
+        'pipeline_version': PIPELINE_VERSION,
+        'saved_at': datetime.now().isoformat(timespec='seconds'),
+    }
+
+    def write(directory):
+        for name, shard in shards.items():
+            joblib.dump(shard['model'], os.path.join(directory, f'{name}.pkl'))
+            joblib.dump(list(shard['columns']), os.path.join(directory, f'{name}_columns.pkl'))
+            if shard.get('leaf_index') is not None:
+                joblib.dump(shard['leaf_index'], os.path.join(directory, f'{name}_leaves.pkl'))
+            registry['shards'][name] = {
+                key: shard[key] for key in ('parks', 'rows', 'params', 'metrics', 'train_s') if key in shard
+            }
+        with open(os.path.join(directory, REGISTRY_FILE), 'w') as file:
+            json.dump(registry, file, indent=2, default=str)
+
+    registry_name = shard_registry_name(model_name)
+    version = publish(registry_name, write, keep_versions)
+    print(f"Saved {len(shards)} {shard_by} shards for {len(routes)} parks as {version} in {registry_dir(registry_name)}")
+    return version
+
+def _read_shards(directory):
+    with open(os.path.join(directory, REGISTRY_FILE), 'r') as file:
+        registry = json.load(file)
+    models, columns, leaf_indexes = {}, {}, {}
+    for name in registry['shards']:
+        models[name] = joblib.load(os.path.join(directory, f'{name}.pkl'))
+        columns[name] = joblib.load(os.path.join(directory, f'{name}_columns.pkl'))
+        leaves_path = os.path.join(directory, f'{name}_leaves.pkl')
+        leaf_indexes[name] = joblib.load(leaves_path) if os.path.exists(leaves_path) else None
+    if any(index is None for index in leaf_indexes.values()):
+        leaf_indexes = None
+    return ShardedModel(registry, models, columns, leaf_indexes)
+
+def load_sharded_model(model_name, version=None):
+    """
+    Load a sharded model published by save_sharded_model.
+
+    Shards saved before they were versioned are read from
+    model-exports/{model_name}-shards when no version has been published.
+    The last load per model is kept in memory, so the separate model,
+    column and leaf index loads in inference.py read the shards once.
+
+    Args:
+        model_name (str): Model name from config.
+        version (str | None): Version to load; the current one if None.
+
+    Returns:
+        ShardedModel | None: With its version set (None for unversioned
+            shards); None if the model has no shards.
+    """
+    registry_name = shard_registry_name(model_name)
+    version = version or current_version(registry_name)
+    if version is None:
+        directory = shards_dir(model_name)
+        registry_path = os.path.join(directory, REGISTRY_FILE)
+        if not os.path.exists(registry_path):
+            return None
+        key = ('unversioned', os.path.getmtime(registry_path))
+    else:
+        directory = os.path.join(registry_dir(registry_name), version)
+        key = ('version', version)
+    with _loaded_lock:
+        cached = _loaded.get(model_name)
+    if cached is not None and cached[0] == key:
+        return cached[1]
+
+    model = _read_shards(directory)
+    model.version = version
+    pipeline_version = model.registry.get('pipeline_version')
+    if version is not None and pipeline_version != PIPELINE_VERSION:
+        print(f'Warning: {model_name} shards {version} were trained with feature pipeline version '
+              f'{pipeline_version}, but the pipeline is now version {PIPELINE_VERSION}. Retrain them.')
+    with _loaded_lock:
+        _loaded[model_name] = (key, model)
+    return model
+
+def load_sharded_export(model_name, version=None):
+    """
+    load_sharded_model in the form of utils.registry.load_version, for HotModel.
+
+    Returns:
+        dict | None: 'version', 'model' (the ShardedModel), 'feature_columns',
+            'leaf_index' (per shard) and 'metadata' (registry.json without the
+            routes and shards); None if the model has no shards.
+    """
+    sharded = load_sharded_model(model_name, version)
+    if sharded is None:
+        return None
+    return {
+        'version': sharded.version,
+        'model': sharded,
+        'feature_columns': sharded.feature_columns,
+        'leaf_index': sharded.leaf_indexes,
+        'metadata': {key: value for key, value in sharded.registry.items() if key not in ('routes', 'shards')},
+    }
+
+def shard_report(shards, y_test, predictions):
+    """
+    Summary rows per shard and overall, for comparing with the global model.
+
+    Args:
+        shards (np.ndarray): Shard name of each test row.
+        y_test (pd.Series): True crowd levels.
+        predictions (np.ndarray): Predictions for the same rows.
+
+    Returns:
+        pd.DataFrame: rows, MAE and RMSE per shard and 'all'.
+    """
+    errors = pd.DataFrame({'shard': shards, 'error': np.asarray(predictions) - np.asarray(y_test)})
+    groups = list(errors.groupby('shard')['error']) + [('all', errors['error'])]
+    return pd.DataFrame([
+        {'shard': name, 'rows': len(e), 'mae': round(float(e.abs().mean()), 3), 'rmse': round(float(np.sqrt((e ** 2).mean())), 3)}
+        for name, e in groups
+    ]).set_index('shard')
@@ -0,0 +1,102 @@
+import argparse
+import os
+import joblib
+import numpy as np
+import pandas as pd
+from pipeline import FEATURE_COLUMNS, day_features, get_queue_config
+from preprocessing import SLOTS_PER_DAY, build_ride_tensor, slot_labels
+from train import encode_features, get_train_config, select_features
+from utils.columnar import get_storage_config
+from utils.helpers import load_active_rides, load_queue_data_typed
+
+# Days of history the features look back over (same_slot_mean_28d is the longest).
+LOOKBACK_DAYS = 28
+
+def load_queue_model(model_name):
+    """
+    Load a queue model saved by train.save_model.
+
+    Args:
+        model_name (str): File name stem in model-exports.
+
+    Returns:
+        dict: 'model', 'feature_columns', 'bin_edges', 'ride_ids', 'horizon' and 'cutoff'.
+    """
+    models_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'model-exports')
+    bundle = joblib.load(os.path.join(models_dir, f'{model_name}_encoding.pkl'))
+    # Models saved before the horizon setting used every feature.
+    bundle.setdefault('horizon', 'same_day')
+    bundle['model'] = joblib.load(os.path.join(models_dir, f'{model_name}.pkl'))
+    bundle['feature_columns'] = joblib.load(os.path.join(models_dir, f'{model_name}_columns.pkl'))
+    return bundle
+
+def predict_day(bundle, park_id, date, storage=None, day_ahead=False):
+    """
+    Predict every ride's queue time in every slot of one day.
+
+    Features are built from the LOOKBACK_DAYS before the date (and readings
+    earlier the same day, if any), exactly as for training; lags that aren't
+    available yet, e.g. for a future date, are left missing for the model to
+    handle. Only rides active on the date (load_active_rides) are predicted.
+    When the park already has readings that day, slots outside its
+    first-to-last reading window are NaN. With day_ahead=True the day's own
+    readings are ignored, giving the forecast as it stood before opening;
+    that needs a model trained with horizon 'day_ahead', which only uses
+    features known before opening.
+
+    Args:
+        bundle (dict): Output of load_queue_model.
+        park_id (int): Park to predict.
+        date (str): Date in YYYY-MM-DD format.
+        storage (dict | None): Backend settings from get_storage_config. Read from config.yml if None.
+        day_ahead (bool): Ignore readings from the date itself.
+
+    Returns:
+        pd.DataFrame: Predicted queue minutes, one row per ride_id and one column per 'HH:MM' slot.
+    """
+    storage = storage or get_storage_config()
+    if day_ahead and bundle['horizon'] != 'day_ahead':
+        print("Warning: day-ahead forecast from a model trained on same-day features; retrain with horizon 'day_ahead'.")
+    day = np.datetime64(date, 'D')
+    start = day - np.timedelta64(LOOKBACK_DAYS, 'D')
+    queue_data = load_queue_data_typed(
+        db_path=storage['db_path'], backend=storage['backend'], parquet_dir=storage['parquet_dir'],
+        park_ids=[park_id], start_date=str(start), end_date=str(day - 1 if day_ahead else day), active_only=True
+    )
+    rides = bundle['ride_ids']
+    active = load_active_rides(
+        str(day), [park_id], db_path=storage['db_path'], backend=storage['backend'], parquet_dir=storage['parquet_dir']
+    )
+    if active is not None:
+        rides = np.intersect1d(rides, active['ride_id'].to_numpy())
+    queue_data = queue_data[np.isin(queue_data['ride_id'].to_numpy(), rides)]
+    if queue_data.empty:
+        print(f'No recent readings for rides the model knows in park {park_id}')
+        return pd.DataFrame(columns=slot_labels(), dtype='float32')
+
+    tensor = build_ride_tensor(queue_data, first_date=start, last_date=day)
+    day_index = len(tensor['dates']) - 1
+    X = select_features(day_features(tensor, day_index), bundle['feature_columns'], FEATURE_COLUMNS)
+    ride_ids = np.repeat(tensor['ride_ids'], SLOTS_PER_DAY)
+    predictions = bundle['model'].predict(encode_features(X, ride_ids, bundle['bin_edges'], bundle['ride_ids']))
+    predictions = predictions.clip(0).reshape(len(tensor['ride_ids']), SLOTS_PER_DAY).astype(np.float32)
+
+    reporting = (~np.isnan(tensor['queue'][:, day_index]) | tensor['closed'][:, day_index]).any(axis=0)
+    if reporting.any():
+        slots = np.arange(SLOTS_PER_DAY)
+        outside = (slots < reporting.argmax()) | (slots > SLOTS_PER_DAY - 1 - reporting[::-1].argmax())
+        predictions[:, outside] = np.nan
+
+    return pd.DataFrame(predictions, index=pd.Index(tensor['ride_ids'], name='ride_id'), columns=slot_labels())
+
+if __name__ == "__main__":
+    settings = get_train_config()
+
+    parser = argparse.ArgumentParser(description='Predict ride queue times for every slot of a day.')
+    parser.add_argument('--park', type=int, default=(get_queue_config()['park_ids'] or [None])[0])
+    parser.add_argument('--date', required=True, help='YYYY-MM-DD')
+    args = parser.parse_args()
+
+    bundle = load_queue_model(settings['model_name'])
+    predictions = predict_day(bundle, args.park, args.date)
+    print(predictions.dropna(axis=1, how='all').round(0).to_string())
@@ -0,0 +1,249 @@
+import argparse
+import math
+import time
+import numpy as np
+import pandas as pd
+import yaml
+from inference import load_queue_model, predict_day
+from preprocessing import SLOT_MINUTES, SLOTS_PER_DAY
+from train import get_train_config
+from utils.columnar import get_storage_config
+from utils.helpers import load_queue_data_typed
+
+# Nowcast horizons, in slots ahead of the latest reading.
+HORIZONS = {'30m': 2, '60m': 4, '90m': 6}
+
+# Readings kept per ride, for the fallback when the day-ahead forecast has no value.
+RECENT_SLOTS = 8
+
+def get_nowcast_config(config_path='config.yml'):
+    """
+    Get the nowcaster settings from the config file.
+
+    Args:
+        config_path (str): Path to the configuration file.
+
+    Returns:
+        dict: ride_alpha and park_alpha (weights of each new reading in the
+            ride residual and park busyness averages), ride_decay and
+            park_decay (how much of each carries over per slot ahead).
+    """
+    try:
+        with open(config_path, 'r') as file:
+            config = yaml.safe_load(file) or {}
+    except FileNotFoundError:
+        config = {}
+    nowcast = ((config.get('models', {}) or {}).get('queues', {}) or {}).get('nowcast', {}) or {}
+    return {
+        'ride_alpha': nowcast.get('ride_alpha', 0.5),
+        'park_alpha': nowcast.get('park_alpha', 0.05),
+        'ride_decay': nowcast.get('ride_decay', 0.85),
+        'park_decay': nowcast.get('park_decay', 0.98),
+    }
+
+class RideNowcaster:
+    """
+    Live queue state for one park-day: the day-ahead forecast corrected by the readings so far.
+
+    Each ride keeps its last few readings and an exponentially weighted
+    residual against the forecast. The park keeps one busyness signal, an
+    exponentially weighted log ratio of observed to forecast queues across
+    all its rides. update() touches one ride's state and the park signal,
+    so it costs the same however many readings came before. predict()
+    nowcasts every ride in one vectorised pass:
+
+        forecast[t + h] * exp(park_signal * park_decay**h) + residual * ride_decay**(age + h)
+
+    where age is how many slots ago the ride last reported, so a stale
+    correction fades back to the park-adjusted forecast.
+    """
+    def __init__(self, ride_ids, forecast, settings):
+        """
+        Args:
+            ride_ids (np.ndarray): Park's ride IDs, one per forecast row.
+            forecast (np.ndarray): Day-ahead forecast, (n_rides, SLOTS_PER_DAY), NaN where unknown.
+            settings (dict): Output of get_nowcast_config.
+        """
+        self.ride_ids = np.asarray(ride_ids)
+        self.index = {int(ride_id): i for i, ride_id in enumerate(self.ride_ids)}
+        self.forecast = np.asarray(forecast, dtype=np.float64)
+        self.settings = settings
+
+        n_rides = len(self.ride_ids)
+        self.recent = np.full((n_rides, RECENT_SLOTS), np.nan)
+        self.n_seen = np.zeros(n_rides, dtype=np.int64)
+        self.last_slot = np.full(n_rides, -1, dtype=np.int64)
+        self.closed = np.zeros(n_rides, dtype=bool)
+        self.residual = np.zeros(n_rides)
+        self.park_signal = 0.0
+
+    def update(self, ride_id, slot, queue_time, is_closed=False):
+        """
+        Fold one reading into the ride's state and the park signal.
+
+        Args:
+            ride_id (int): Ride the reading is for.
+            slot (int): Slot of day (minute of day // SLOT_MINUTES).
+            queue_time (float): Queue minutes.
+            is_closed (bool): Whether the ride was reported closed.
+
+        Returns:
+            bool: False if the ride is unknown or the reading is not newer than its last one.
+        """
+        i = self.index.get(int(ride_id))
+        if i is None or slot <= self.last_slot[i]:
+            return False
+
+        age = slot - self.last_slot[i] if self.last_slot[i] >= 0 else 0
+        self.last_slot[i] = slot
+        self.closed[i] = is_closed
+        if is_closed:
+            return True
+
+        self.recent[i, self.n_seen[i] % RECENT_SLOTS] = queue_time
+        self.n_seen[i] += 1
+
+        expected = self.forecast[i, slot]
+        if expected == expected:  # not NaN
+            settings = self.settings
+            self.park_signal += settings['park_alpha'] * (math.log((queue_time + 1) / (expected + 1)) - self.park_signal)
+            carried = self.residual[i] * settings['ride_decay'] ** age
+            error = queue_time - expected * math.exp(self.park_signal)
+            self.residual[i] = carried + settings['ride_alpha'] * (error - carried)
+        return True
+
+    def update_many(self, readings):
+        """
+        Apply update() to each (ride_id, slot, queue_time, is_closed) reading, in order.
+
+        Returns:
+            int: Number of readings applied.
+        """
+        return sum(self.update(*reading) for reading in readings)
+
+    def predict(self, now_slot, horizons=HORIZONS):
+        """
+        Nowcast every ride at each horizon after now_slot.
+
+        Rides the forecast has no value for fall back to the mean of their
+        recent readings. Rides last reported closed, or past the end of the
+        day, are NaN.
+
+        Args:
+            now_slot (int): Current slot of day.
+            horizons (dict): Label to slots ahead.
+
+        Returns:
+            pd.DataFrame: Predicted queue minutes, one row per ride_id and one column per horizon.
+        """
+        settings = self.settings
+        seen = self.last_slot >= 0
+        age = np.where(seen, now_slot - self.last_slot, 0)
+        n_recent = np.minimum(self.n_seen, RECENT_SLOTS)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            recent_mean = np.where(n_recent > 0, np.nansum(self.recent, axis=1) / n_recent, np.nan)
+
+        predictions = {}
+        for label, h in horizons.items():
+            target = now_slot + h
+            if target >= SLOTS_PER_DAY:
+                predictions[label] = np.full(len(self.ride_ids), np.nan)
+                continue
+            base = self.forecast[:, target] * math.exp(self.park_signal * settings['park_decay'] ** h)
+            nowcast = base + self.residual * settings['ride_decay'] ** (age + h)
+            nowcast = np.where(np.isnan(base), recent_mean, nowcast)
+            predictions[label] = np.where(self.closed, np.nan, np.maximum(nowcast, 0))
+        return pd.DataFrame(predictions, index=pd.Index(self.ride_ids, name='ride_id'))
+
+def start_nowcaster(bundle, park_id, date, storage=None, settings=None):
+    """
+    Nowcaster for a park-day, seeded with the queue model's day-ahead forecast.
+
+    Args:
+        bundle (dict): Output of load_queue_model.
+        park_id (int): Park.
+        date (str): Date in YYYY-MM-DD format.
+        storage (dict | None): Backend settings from get_storage_config.
+        settings (dict | None): Output of get_nowcast_config. Read from config.yml if None.
+
+    Returns:
+        RideNowcaster: Empty state for the day.
+    """
+    forecast = predict_day(bundle, park_id, date, storage, day_ahead=True)
+    return RideNowcaster(forecast.index.to_numpy(), forecast.to_numpy(), settings or get_nowcast_config())
+
+def replay_day(bundle, park_id, date, storage=None, settings=None):
+    """
+    Replay a recorded day through the nowcaster, slot by slot, and score it.
+
+    After each slot's readings are applied, every ride is nowcast at each
+    horizon and compared with what was later recorded. The day-ahead
+    forecast alone and the ride's last reading (persistence) are scored on
+    the same rows.
+
+    Returns:
+        dict: Per horizon, MAE of the nowcast, day-ahead forecast and
+            persistence, and the number of rows; plus microseconds per
+            update and per predict call.
+    """
+    storage = storage or get_storage_config()
+    nowcaster = start_nowcaster(bundle, park_id, date, storage, settings)
+    readings = load_queue_data_typed(
+        db_path=storage['db_path'], backend=storage['backend'], parquet_dir=storage['parquet_dir'],
+        park_ids=[park_id], start_date=date, end_date=date
+    )
+    readings = readings[np.isin(readings['ride_id'].to_numpy(), nowcaster.ride_ids)]
+    slots = (readings['minute_of_day'].to_numpy() // SLOT_MINUTES).astype(int)
+
+    actual = np.full(nowcaster.forecast.shape, np.nan)
+    open_readings = ~readings['is_closed'].to_numpy()
+    rows = np.searchsorted(nowcaster.ride_ids, readings['ride_id'].to_numpy())
+    actual[rows[open_readings], slots[open_readings]] = readings['queue_time'].to_numpy()[open_readings]
+
+    errors = {label: {'nowcast': [], 'day_ahead': [], 'persistence': []} for label in HORIZONS}
+    update_s, predict_s, n_updates, n_predicts = 0.0, 0.0, 0, 0
+    by_slot = readings.assign(slot=slots).sort_values('slot').groupby('slot')
+    for slot, group in by_slot:
+        batch = list(zip(group['ride_id'].to_numpy(), group['slot'].to_numpy(), group['queue_time'].to_numpy(), group['is_closed'].to_numpy()))
+        started = time.perf_counter()
+        n_updates += nowcaster.update_many(batch)
+        update_s += time.perf_counter() - started
+
+        started = time.perf_counter()
+        nowcast = nowcaster.predict(slot)
+        predict_s += time.perf_counter() - started
+        n_predicts += 1
+
+        last_value = nowcaster.recent[np.arange(len(nowcaster.ride_ids)), (nowcaster.n_seen - 1) % RECENT_SLOTS]
+        for label, h in HORIZONS.items():
+            if slot + h >= SLOTS_PER_DAY:
+                continue
+            truth = actual[:, slot + h]
+            candidates = {'nowcast': nowcast[label].to_numpy(), 'day_ahead': nowcaster.forecast[:, slot + h], 'persistence': last_value}
+            scored = ~np.isnan(truth) & ~np.isnan(candidates['day_ahead']) & ~np.isnan(candidates['nowcast']) & (nowcaster.n_seen > 0)
+            for name, values in candidates.items():
+                errors[label][name].append(np.abs(values[scored] - truth[scored]))
+
+    results = {}
+    for label, by_method in errors.items():
+        n_rows = sum(len(e) for e in by_method['nowcast'])
+        results[label] = {name: round(float(np.concatenate(e).mean()), 3) if n_rows else None for name, e in by_method.items()}
+        results[label]['rows'] = n_rows
+    results['us_per_update'] = round(update_s / max(n_updates, 1) * 1e6, 2)
+    results['us_per_predict'] = round(predict_s / max(n_predicts, 1) * 1e6, 2)
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Replay a recorded day through the ride queue nowcaster and score it.')
+    parser.add_argument('--park', type=int, required=True)
+    parser.add_argument('--date', required=True, help='YYYY-MM-DD')
+    args = parser.parse_args()
+
+    bundle = load_queue_model(get_train_config()['model_name'])
+    results = replay_day(bundle, args.park, args.date)
+
+    print(f'Nowcast replay for park {args.park} on {args.date} (MAE, minutes):')
+    for label in HORIZONS:
+        scores = results[label]
+        print(f"  {label:>4}: nowcast {scores['nowcast']}  day-ahead {scores['day_ahead']}  persistence {scores['persistence']}  ({scores['rows']} rows)")
+    print(f"  {results['us_per_update']} µs per reading, {results['us_per_predict']} µs per park-wide predict")
@@ -0,0 +1,338 @@
+import argparse
+import json
+import os
+import shutil
+import sys
+from datetime import datetime
+import numpy as np
+import pandas as pd
+import yaml
+
+# The queue model reuses the crowd-level loaders (typed queue_data, storage
+# backends, connection profile), so point Python at that package as the
+# dashboard does. It goes at the end of sys.path so the crowd-level scripts
+# (train.py, inference.py) don't shadow the ones here. Relative paths
+# (config.yml, data/) are from the project root.
+_queues_dir = os.path.dirname(os.path.abspath(__file__))
+_crowd_level_dir = os.path.join(os.path.dirname(_queues_dir), 'crowd-level')
+if _crowd_level_dir not in sys.path:
+    sys.path.append(_crowd_level_dir)
+
+from utils.columnar import get_storage_config, load_park_info_parquet
+from utils.db import get_connection
+from utils.helpers import load_queue_data_typed
+from utils.instrument import pipeline_run, stage
+from preprocessing import (
+    SLOTS_PER_DAY,
+    build_ride_tensor,
+    calendar_features,
+    lag_features,
+    minutes_since_open,
+    park_open_share,
+    park_slot_mean,
+    shift_slots,
+)
+
+DEFAULT_MATRIX_DIR = 'data/queue_matrix'
+DEFAULT_PROFILES_PATH = 'data/ride_profiles.npz'
+
+# Features of the ride's own queue time (see lag_features): lags in slots,
+# means over the preceding slots, and means of the same slot over the
+# preceding days.
+RIDE_LAGS = {'lag_15m': 1, 'lag_30m': 2, 'lag_60m': 4, 'lag_1d': SLOTS_PER_DAY, 'lag_7d': 7 * SLOTS_PER_DAY}
+RIDE_WINDOWS = {'mean_60m': 4, 'mean_180m': 12}
+RIDE_DAY_WINDOWS = {'same_slot_mean_7d': 7, 'same_slot_mean_28d': 28}
+RIDE_LAST_OPEN = ('last_open', 'slots_since_open')
+
+# The same engine over the ride's closed flag: closed at the previous slot,
+# and the share of reporting slots in the last hour that were closed.
+CLOSED_LAGS = {'closed_lag_15m': 1}
+CLOSED_WINDOWS = {'closed_share_60m': 4}
+
+FEATURE_COLUMNS = [
+    *RIDE_LAGS, *RIDE_WINDOWS, *RIDE_DAY_WINDOWS, *RIDE_LAST_OPEN,
+    *CLOSED_LAGS, *CLOSED_WINDOWS,
+    'park_mean_lag_15m',
+    'park_mean_lag_1d',
+    'park_open_share_lag_15m',
+    'slot',
+    'minutes_since_open',
+    'day_of_week',
+    'month',
+    'day_of_year',
+]
+
+# Features that describe the day's own queues so far. A forecast made before
+# the park opens (predict_day with day_ahead=True, as used by nowcast.py and
+# planner.py) doesn't have them, so the day-ahead model trains on
+# DAY_AHEAD_FEATURES only: earlier days' readings and the calendar.
+SAME_DAY_FEATURES = [
+    *RIDE_WINDOWS, *RIDE_LAST_OPEN, *CLOSED_LAGS, *CLOSED_WINDOWS,
+    'lag_15m', 'lag_30m', 'lag_60m',
+    'park_mean_lag_15m',
+    'park_open_share_lag_15m',
+    'minutes_since_open',
+]
+DAY_AHEAD_FEATURES = [column for column in FEATURE_COLUMNS if column not in SAME_DAY_FEATURES]
+
+# One raw file per array in the matrix directory, all with one row per
+# training sample; X has len(FEATURE_COLUMNS) columns.
+ARRAYS = {
+    'X': 'float32',
+    'y': 'float32',
+    'park_id': 'int32',
+    'ride_id': 'int32',
+    'date': 'datetime64[D]',
+    'slot': 'int16',
+}
+
+def get_queue_config(config_path='config.yml'):
+    """
+    Get the queue model settings from the config file.
+
+    Args:
+        config_path (str): Path to the configuration file.
+
+    Returns:
+        dict: 'park_ids' (list[int] | None, falling back to the scraper's parks), 'matrix_dir' and 'profiles_path'.
+    """
+    try:
+        with open(config_path, 'r') as file:
+            config = yaml.safe_load(file) or {}
+    except FileNotFoundError:
+        config = {}
+    queues = (config.get('models', {}) or {}).get('queues', {}) or {}
+    park_ids = queues.get('park_ids')
+    if park_ids is None:
+        park_ids = (config.get('scraper', {}) or {}).get('park_ids')
+    if isinstance(park_ids, int):
+        park_ids = [park_ids]
+    return {
+        'park_ids': [int(p) for p in park_ids] if park_ids is not None else None,
+        'matrix_dir': queues.get('matrix_dir', DEFAULT_MATRIX_DIR),
+        'profiles_path': queues.get('profiles_path', DEFAULT_PROFILES_PATH),
+    }
+
+def list_park_ids(storage):
+    """
+    Every park with rides in park_info, for the configured backend.
+    """
+    if storage['backend'] == 'parquet':
+        park_ids = load_park_info_parquet(storage['parquet_dir'])['park_id']
+    else:
+        park_ids = pd.read_sql_query('SELECT DISTINCT park_id FROM park_info', get_connection(storage['db_path']))['park_id']
+    return sorted(int(p) for p in pd.to_numeric(park_ids, errors='coerce').dropna().unique())
+
+def park_features(tensor):
+    """
+    Yield (name, values) for each of FEATURE_COLUMNS, in order.
+
+    Values broadcast against the (ride, day, slot) tensor: ride-level
+    features are full tensors, park-level ones (day, slot) and calendar
+    ones (day, 1). Every queue-derived feature looks at least one slot back,
+    so no feature sees the reading it is predicting. Features are produced
+    one at a time so only one full-size feature array is held at once.
+
+    Args:
+        tensor (dict): Output of build_ride_tensor.
+
+    Yields:
+        tuple[str, np.ndarray]: Feature name and values.
+    """
+    queue, closed = tensor['queue'], tensor['closed']
+    yield from lag_features(queue, RIDE_LAGS, RIDE_WINDOWS, RIDE_DAY_WINDOWS, RIDE_LAST_OPEN)
+
+    closed_flag = np.where(closed, 1, np.where(np.isnan(queue), np.nan, 0)).astype(np.float32)
+    yield from lag_features(closed_flag, CLOSED_LAGS, CLOSED_WINDOWS)
+    del closed_flag
+
+    park_mean = park_slot_mean(queue)
+    yield 'park_mean_lag_15m', shift_slots(park_mean, 1)
+    yield 'park_mean_lag_1d', shift_slots(park_mean, SLOTS_PER_DAY)
+    yield 'park_open_share_lag_15m', shift_slots(park_open_share(queue, closed), 1)
+
+    yield 'slot', np.arange(SLOTS_PER_DAY, dtype=np.float32)
+    yield 'minutes_since_open', minutes_since_open(queue, closed)
+    for name, values in calendar_features(tensor['dates']).items():
+        yield name, values[:, None]
+
+def day_features(tensor, day_index):
+    """
+    Feature rows for every (ride, slot) of one day of a park tensor.
+
+    Args:
+        tensor (dict): Output of build_ride_tensor.
+        day_index (int): Day position in tensor['dates'].
+
+    Returns:
+        np.ndarray: float32 (n_rides * SLOTS_PER_DAY, len(FEATURE_COLUMNS)), rides outer and slots inner.
+    """
+    shape = tensor['queue'].shape
+    rows = np.empty((shape[0] * SLOTS_PER_DAY, len(FEATURE_COLUMNS)), dtype=np.float32)
+    for column, (_, values) in enumerate(park_features(tensor)):
+        rows[:, column] = np.broadcast_to(values, shape)[:, day_index, :].ravel()
+    return rows
+
+def _array_path(matrix_dir, name):
+    return os.path.join(matrix_dir, f'{name}.bin')
+
+def _append_rows(path, dtype, shape):
+    """
+    Grow a raw array file by shape[0] rows and return a writable memmap over the new rows.
+    """
+    offset = os.path.getsize(path) if os.path.exists(path) else 0
+    with open(path, 'ab') as file:
+        file.truncate(offset + int(np.prod(shape)) * np.dtype(dtype).itemsize)
+    return np.memmap(path, dtype=dtype, mode='r+', offset=offset, shape=shape)
+
+def write_park_rows(matrix_dir, park_id, tensor):
+    """
+    Append one training row per open (ride, day, slot) reading of a park to the matrix files.
+
+    Args:
+        matrix_dir (str): Directory holding the raw array files.
+        park_id (int): Park the tensor belongs to.
+        tensor (dict): Output of build_ride_tensor.
+
+    Returns:
+        int: Number of rows written.
+    """
+    target = ~np.isnan(tensor['queue'])
+    ride_index, day_index, slot_index = np.nonzero(target)
+    n_rows = len(ride_index)
+    if n_rows == 0:
+        return 0
+
+    _append_rows(_array_path(matrix_dir, 'y'), ARRAYS['y'], (n_rows,))[:] = tensor['queue'][target]
+    _append_rows(_array_path(matrix_dir, 'park_id'), ARRAYS['park_id'], (n_rows,))[:] = park_id
+    _append_rows(_array_path(matrix_dir, 'ride_id'), ARRAYS['ride_id'], (n_rows,))[:] = tensor['ride_ids'][ride_index]
+    _append_rows(_array_path(matrix_dir, 'date'), ARRAYS['date'], (n_rows,))[:] = tensor['dates'][day_index]
+    _append_rows(_array_path(matrix_dir, 'slot'), ARRAYS['slot'], (n_rows,))[:] = slot_index
+
+    X = _append_rows(_array_path(matrix_dir, 'X'), ARRAYS['X'], (n_rows, len(FEATURE_COLUMNS)))
+    for column, (name, values) in enumerate(park_features(tensor)):
+        assert name == FEATURE_COLUMNS[column], f'{name} out of order in park_features'
+        X[:, column] = np.broadcast_to(values, target.shape)[target]
+    X.flush()
+    return n_rows
+
+def _source(storage):
+    return {
+        'backend': storage['backend'],
+        'path': storage['parquet_dir'] if storage['backend'] == 'parquet' else storage['db_path'],
+        'active_only': True,
+    }
+
+def build_training_matrix(park_ids=None, matrix_dir=DEFAULT_MATRIX_DIR, storage=None, rebuild=False):
+    """
+    Build the memory-mapped training matrix for the per-ride queue model.
+
+    Parks are streamed one at a time: each park's raw readings are loaded
+    typed, scattered into a (ride, day, slot) tensor, turned into feature
+    columns with array shifts and appended to the matrix files, so memory
+    is bounded by the largest park rather than the whole history. The matrix
+    is built in a side directory and moved into place when complete.
+
+    A matrix already built from the same parks, source and features is
+    reused, so experiments can share it; pass rebuild=True after new data
+    has been scraped. Raw readings already compacted into rollups are not
+    included, nor are readings outside a ride's open lifecycle in ride_info,
+    so retired rides add no rows (or tensor days) past their last opening.
+
+    Args:
+        park_ids (list[int] | None): Parks to include. Every park in park_info if None.
+        matrix_dir (str): Output directory.
+        storage (dict | None): Backend settings from get_storage_config. Read from config.yml if None.
+        rebuild (bool): Rebuild even if a matching matrix exists.
+
+    Returns:
+        dict: The matrix metadata (see load_training_matrix).
+    """
+    storage = storage or get_storage_config()
+    park_ids = sorted(int(p) for p in park_ids) if park_ids is not None else list_park_ids(storage)
+
+    meta_path = os.path.join(matrix_dir, 'meta.json')
+    if not rebuild and os.path.exists(meta_path):
+        with open(meta_path, 'r') as file:
+            meta = json.load(file)
+        if meta['park_ids'] == park_ids and meta['feature_columns'] == FEATURE_COLUMNS and meta['source'] == _source(storage):
+            print(f"Reusing training matrix at {matrix_dir} ({meta['n_rows']} rows)")
+            return meta
+
+    build_dir = f'{matrix_dir}.building'
+    shutil.rmtree(build_dir, ignore_errors=True)
+    os.makedirs(build_dir)
+
+    parks = {}
+    with pipeline_run('queue_matrix'):
+        for park_id in park_ids:
+            with stage('load_park_readings') as record:
+                queue_data = load_queue_data_typed(
+                    db_path=storage['db_path'], backend=storage['backend'],
+                    parquet_dir=storage['parquet_dir'], park_ids=[park_id], active_only=True
+                )
+                record['rows_out'] = len(queue_data)
+            with stage('build_ride_tensor', rows_in=len(queue_data)):
+                tensor = build_ride_tensor(queue_data)
+            del queue_data
+            with stage('write_park_rows') as record:
+                n_rows = write_park_rows(build_dir, park_id, tensor)
+                record['rows_out'] = n_rows
+
+            n_rides, n_days, _ = tensor['queue'].shape
+            parks[str(park_id)] = {'rows': n_rows, 'rides': n_rides, 'days': n_days}
+            print(f'Park {park_id}: {n_rows} training rows from {n_rides} rides over {n_days} days')
+            del tensor
+
+    meta = {
+        'n_rows': sum(p['rows'] for p in parks.values()),
+        'feature_columns': FEATURE_COLUMNS,
+        'arrays': ARRAYS,
+        'park_ids': park_ids,
+        'parks': parks,
+        'source': _source(storage),
+        'built_at': datetime.now().isoformat(timespec='seconds'),
+    }
+    with open(os.path.join(build_dir, 'meta.json'), 'w') as file:
+        json.dump(meta, file, indent=2)
+
+    shutil.rmtree(matrix_dir, ignore_errors=True)
+    os.replace(build_dir, matrix_dir)
+    print(f"Wrote training matrix with {meta['n_rows']} rows x {len(FEATURE_COLUMNS)} features to {matrix_dir}")
+    return meta
+
+def load_training_matrix(matrix_dir=DEFAULT_MATRIX_DIR):
+    """
+    Open a training matrix written by build_training_matrix as read-only memory maps.
+
+    Nothing is read until it is indexed, so batches can be sliced out of
+    matrices larger than memory.
+
+    Args:
+        matrix_dir (str): Matrix directory.
+
+    Returns:
+        dict: 'X' (n_rows x n_features), 'y', 'park_id', 'ride_id', 'date' and
+            'slot' memmaps, plus 'feature_columns' and the full 'meta'.
+    """
+    with open(os.path.join(matrix_dir, 'meta.json'), 'r') as file:
+        meta = json.load(file)
+
+    n_rows = meta['n_rows']
+    matrix = {'feature_columns': meta['feature_columns'], 'meta': meta}
+    for name, dtype in meta['arrays'].items():
+        shape = (n_rows, len(meta['feature_columns'])) if name == 'X' else (n_rows,)
+        # np.memmap can't map an empty file.
+        matrix[name] = np.memmap(_array_path(matrix_dir, name), dtype=dtype, mode='r', shape=shape) if n_rows else np.empty(shape, dtype=dtype)
+    return matrix
+
+if __name__ == "__main__":
+    queue_config = get_queue_config()
+
+    parser = argparse.ArgumentParser(description='Build the per-ride queue model training matrix.')
+    parser.add_argument('--parks', type=int, nargs='+', default=queue_config['park_ids'], help='Park IDs (default: models.queues.park_ids).')
+    parser.add_argument('--matrix-dir', default=queue_config['matrix_dir'])
+    parser.add_argument('--rebuild', action='store_true', help='Rebuild even if a matching matrix exists.')
+    args = parser.parse_args()
+
+    build_training_matrix(args.parks, args.matrix_dir, rebuild=args.rebuild)
@@ -0,0 +1,291 @@
+import argparse
+import time
+import numpy as np
+import pandas as pd
+import yaml
+from inference import load_queue_model, predict_day
+from preprocessing import SLOT_MINUTES, SLOTS_PER_DAY
+from train import get_train_config
+from utils.columnar import get_storage_config
+from utils.helpers import load_ride_info
+
+MINUTES_PER_DAY = SLOTS_PER_DAY * SLOT_MINUTES
+
+def get_planner_config(config_path='config.yml'):
+    """
+    Get the ride order planner settings from the config file.
+
+    Args:
+        config_path (str): Path to the configuration file.
+
+    Returns:
+        dict: walk_same_land and walk_other_land (minutes between rides in
+            the same or different lands, and from the entrance),
+            ride_minutes (time on a ride, from boarding to exit), beam_width
+            and time_budget_ms (see plan_rides).
+    """
+    try:
+        with open(config_path, 'r') as file:
+            config = yaml.safe_load(file) or {}
+    except FileNotFoundError:
+        config = {}
+    planner = ((config.get('models', {}) or {}).get('queues', {}) or {}).get('planner', {}) or {}
+    return {
+        'walk_same_land': planner.get('walk_same_land', 4),
+        'walk_other_land': planner.get('walk_other_land', 10),
+        'ride_minutes': planner.get('ride_minutes', 5),
+        'beam_width': planner.get('beam_width', 256),
+        'time_budget_ms': planner.get('time_budget_ms', 200),
+    }
+
+def walking_times(categories, same_land, other_land):
+    """
+    Walking time estimate between rides from their lands alone.
+
+    The scraper has no ride coordinates, so rides in the same land are
+    same_land minutes apart and any other pair, or the entrance to any ride,
+    other_land minutes.
+
+    Args:
+        categories (list): Each ride's land (ride_info category); None counts as its own land.
+        same_land (float): Minutes between rides in the same land.
+        other_land (float): Minutes between rides in different lands.
+
+    Returns:
+        np.ndarray: (n_rides + 1, n_rides) minutes, from each ride and then the entrance (last row).
+    """
+    categories = pd.Series(list(categories), dtype=object)
+    known = categories.notna().to_numpy()
+    codes = np.where(known, pd.factorize(categories)[0], -1 - np.arange(len(categories)))
+    walk = np.where(codes[:, None] == codes[None, :], float(same_land), float(other_land))
+    np.fill_diagonal(walk, 0.0)
+    return np.vstack([walk, np.full(len(categories), float(other_land))])
+
+def _minute_grid(curves):
+    """
+    Queue minutes and next joinable minute for every ride at every minute of the day.
+
+    Each slot's queue time applies to all of its minutes; NaN slots are
+    closed. One extra column past the end of the day is closed, so lookups
+    beyond it are always infeasible.
+    """
+    waits = np.repeat(np.asarray(curves, dtype=np.float64), SLOT_MINUTES, axis=1)
+    waits = np.hstack([waits, np.full((len(waits), 1), np.nan)])
+    minutes = np.arange(MINUTES_PER_DAY + 1)
+    joinable = np.where(np.isnan(waits), MINUTES_PER_DAY, minutes)
+    next_open = np.minimum.accumulate(joinable[:, ::-1], axis=1)[:, ::-1]
+    return waits, next_open
+
+def _state_keys(visited, last):
+    """
+    One hashable key per state: the set of rides done (packed bits) and the last ride.
+    """
+    packed = np.packbits(visited, axis=1)
+    rows = np.hstack([packed, last.astype('<u2').view(np.uint8).reshape(-1, 2)])
+    rows = np.ascontiguousarray(rows)
+    return rows.view(np.dtype((np.void, rows.shape[1]))).ravel()
+
+def plan_rides(curves, walk, durations, start, end=None, beam_width=256, time_budget_ms=200):
+    """
+    Near-optimal order to ride every ride once, under time-dependent queues.
+
+    The search is a beam search over partial itineraries, one ride per
+    level. Every state in the beam is extended by every ride not yet done
+    in one vectorised step: walk there, wait for the ride to open if it is
+    closed, queue for the predicted time at that minute, then ride. States
+    that have done the same rides and stand at the same ride are
+    interchangeable, so only the earliest finishing one is kept (dynamic
+    programming over (rides done, last ride)). The rest are ranked by
+    finish time plus a lower bound on the rides still to do, the cheapest
+    walk in plus the shortest queue of the day plus the ride, and the best
+    beam_width survive. With an unbounded width this is an exhaustive DP.
+
+    If the levels so far project past time_budget_ms, the width shrinks for
+    the remaining levels, down to 1 (greedy), so a plan is always returned
+    on time. Rides that can't be joined before end are left unplanned,
+    and the plan covering the most rides, then finishing earliest, wins.
+
+    Args:
+        curves (np.ndarray): (n_rides, SLOTS_PER_DAY) predicted queue minutes, NaN where closed.
+        walk (np.ndarray): (n_rides + 1, n_rides) walking minutes, from each ride and then the entrance (last row).
+        durations (np.ndarray | float): Minutes on each ride.
+        start (float): Minute of day the visit starts at the entrance.
+        end (float | None): Last minute of day a queue can be joined. The last open slot if None.
+        beam_width (int): States kept per level.
+        time_budget_ms (float): Target search time.
+
+    Returns:
+        dict: 'order' (ride positions in visiting order), and per step 'arrive',
+            'join' (minute the queue is joined), 'wait' and 'leave' (minute
+            off the ride), as arrays; 'unplanned' (positions never reached), 'finish' and
+            'total_wait' of the whole plan, 'states' (states expanded) and 'elapsed_ms'.
+    """
+    started = time.perf_counter()
+    curves = np.asarray(curves, dtype=np.float64)
+    n_rides = len(curves)
+    durations = np.broadcast_to(np.asarray(durations, dtype=np.float64), (n_rides,))
+    waits, next_open = _minute_grid(curves)
+    if end is None:
+        is_open = ~np.isnan(curves).all(axis=0)
+        end = (SLOTS_PER_DAY - is_open[::-1].argmax()) * SLOT_MINUTES if is_open.any() else 0
+    end = min(float(end), MINUTES_PER_DAY)
+
+    with np.errstate(invalid='ignore'):
+        shortest = np.nanmin(np.where(np.isnan(curves), np.inf, curves), axis=1)
+    shortest = np.where(np.isfinite(shortest), shortest, 0.0)
+    bound = walk.min(axis=0, where=~np.eye(*walk.shape, dtype=bool), initial=np.inf) + shortest + durations
+    bound = np.where(np.isfinite(bound), bound, 0.0)
+
+    rides = np.arange(n_rides)
+    entrance = n_rides
+    beam = {
+        'last': np.array([entrance]), 'time': np.array([float(start)]),
+        'visited': np.zeros((1, n_rides), dtype=bool), 'remaining': np.array([bound.sum()]),
+    }
+    levels, n_states, width = [], 0, beam_width
+    for depth in range(n_rides):
+        arrive = beam['time'][:, None] + walk[beam['last']]
+        minute = np.minimum(np.floor(arrive).astype(np.int64), MINUTES_PER_DAY)
+        opens = next_open[rides, minute]
+        join = np.maximum(arrive, opens)
+        wait = waits[rides, np.minimum(np.floor(join).astype(np.int64), MINUTES_PER_DAY)]
+        finish = join + wait + durations
+        feasible = ~beam['visited'] & (opens < MINUTES_PER_DAY) & (join <= end) & ~np.isnan(wait)
+
+        parent, ride = np.nonzero(feasible)
+        if not len(parent):
+            break
+        n_states += len(parent)
+        finish = finish[parent, ride]
+        remaining = beam['remaining'][parent] - bound[ride]
+        order = np.lexsort((finish, finish + remaining))
+        parent, ride, finish, remaining = parent[order], ride[order], finish[order], remaining[order]
+
+        visited = beam['visited'][parent]
+        visited[np.arange(len(ride)), ride] = True
+        _, first = np.unique(_state_keys(visited, ride), return_index=True)
+        keep = np.sort(first)[:max(int(width), 1)]
+
+        level = {
+            'parent': parent[keep], 'ride': ride[keep], 'arrive': arrive[parent[keep], ride[keep]],
+            'join': join[parent[keep], ride[keep]], 'wait': wait[parent[keep], ride[keep]], 'finish': finish[keep],
+        }
+        levels.append(level)
+        beam = {'last': level['ride'], 'time': level['finish'], 'visited': visited[keep], 'remaining': remaining[keep]}
+
+        elapsed = (time.perf_counter() - started) * 1000
+        left = n_rides - depth - 1
+        if left and width > 1:
+            projected = elapsed / (depth + 1) * left
+            if elapsed + projected > time_budget_ms:
+                width = max(1, int(width * max(time_budget_ms - elapsed, 0) / projected))
+
+    steps = {name: [] for name in ('order', 'arrive', 'join', 'wait', 'leave')}
+    if levels:
+        best = int(np.argmin(levels[-1]['finish']))
+        for level in reversed(levels):
+            steps['order'].append(int(level['ride'][best]))
+            for name in ('arrive', 'join', 'wait'):
+                steps[name].append(float(level[name][best]))
+            steps['leave'].append(float(level['finish'][best]))
+            best = int(level['parent'][best])
+    plan = {name: np.array(values[::-1]) for name, values in steps.items()}
+    plan['order'] = plan['order'].astype(np.int64)
+    plan['unplanned'] = np.setdiff1d(rides, plan['order'])
+    plan['finish'] = float(plan['leave'][-1]) if len(plan['order']) else float(start)
+    plan['total_wait'] = float(plan['wait'].sum())
+    plan['states'] = n_states
+    plan['elapsed_ms'] = (time.perf_counter() - started) * 1000
+    return plan
+
+def clock(minute):
+    """
+    'HH:MM' for a minute of day.
+    """
+    minute = int(round(minute))
+    return f'{minute // 60:02d}:{minute % 60:02d}'
+
+def plan_park_day(bundle, park_id, date, ride_ids=None, start=None, storage=None, settings=None):
+    """
+    Plan a visit to a park from the queue model's day-ahead forecast.
+
+    A day-ahead forecast covers every slot of the day, so each ride is
+    treated as closed outside its typical first and last open minute from
+    ride_info. Walking times come from the rides' lands there too
+    (walking_times). Without ride_info the forecast is used as is and every
+    pair of rides is walk_other_land apart.
+
+    Args:
+        bundle (dict): Output of load_queue_model.
+        park_id (int): Park.
+        date (str): Date in YYYY-MM-DD format.
+        ride_ids (list[int] | None): Rides to visit. Every predicted ride if None.
+        start (str | None): Arrival at the entrance as 'HH:MM'. The first predicted open slot if None.
+        storage (dict | None): Backend settings from get_storage_config.
+        settings (dict | None): Output of get_planner_config. Read from config.yml if None.
+
+    Returns:
+        tuple[pd.DataFrame, dict]: One row per step (ride_id, ride_name, and
+            'arrive', 'join' and 'leave' as 'HH:MM', walk and wait minutes),
+            and the plan from plan_rides.
+    """
+    storage = storage or get_storage_config()
+    settings = settings or get_planner_config()
+    forecast = predict_day(bundle, park_id, date, storage, day_ahead=True)
+    if ride_ids is not None:
+        forecast = forecast[forecast.index.isin([int(r) for r in ride_ids])]
+    curves = forecast.to_numpy(dtype=np.float64)
+
+    ride_info = load_ride_info(storage['db_path'], [park_id], storage['backend'], storage['parquet_dir'])
+    if ride_info is not None:
+        ride_info = ride_info.set_index('ride_id').reindex(forecast.index)
+        categories, names = ride_info['category'].tolist(), ride_info['ride_name'].fillna('').tolist()
+        slot_start = np.arange(SLOTS_PER_DAY) * SLOT_MINUTES
+        opens = ride_info['typical_open_minute'].to_numpy(dtype=np.float64)[:, None]
+        closes = ride_info['typical_close_minute'].to_numpy(dtype=np.float64)[:, None]
+        closed = (slot_start + SLOT_MINUTES <= opens) | (slot_start > closes)
+        curves[closed & ~np.isnan(opens)] = np.nan
+    else:
+        categories, names = [None] * len(forecast), [''] * len(forecast)
+    names = [name or f'Ride {ride_id}' for name, ride_id in zip(names, forecast.index)]
+    walk = walking_times(categories, settings['walk_same_land'], settings['walk_other_land'])
+
+    if start is None:
+        is_open = ~np.isnan(curves).all(axis=0)
+        start_minute = is_open.argmax() * SLOT_MINUTES if is_open.any() else 0
+    else:
+        hours, minutes = start.split(':')
+        start_minute = int(hours) * 60 + int(minutes)
+
+    plan = plan_rides(
+        curves, walk, settings['ride_minutes'], start_minute,
+        beam_width=settings['beam_width'], time_budget_ms=settings['time_budget_ms'],
+    )
+    previous = np.r_[len(forecast), plan['order'][:-1]].astype(np.int64)
+    itinerary = pd.DataFrame({
+        'ride_id': forecast.index.to_numpy()[plan['order']],
+        'ride_name': np.array(names, dtype=object)[plan['order']],
+        'arrive': [clock(m) for m in plan['arrive']],
+        'join': [clock(m) for m in plan['join']],
+        'leave': [clock(m) for m in plan['leave']],
+        'walk': walk[previous, plan['order']],
+        'wait': plan['wait'].round(0),
+    })
+    return itinerary, plan
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Plan a low-wait ride order for a day from the queue model forecast.')
+    parser.add_argument('--park', type=int, required=True)
+    parser.add_argument('--date', required=True, help='YYYY-MM-DD')
+    parser.add_argument('--rides', type=int, nargs='+', default=None, help='Ride IDs to visit (default: every ride).')
+    parser.add_argument('--start', default=None, help='Arrival time HH:MM (default: park opening).')
+    args = parser.parse_args()
+
+    bundle = load_queue_model(get_train_config()['model_name'])
+    itinerary, plan = plan_park_day(bundle, args.park, args.date, args.rides, args.start)
+
+    print(itinerary.to_string(index=False))
+    print(f"Done at {clock(plan['finish'])} with {plan['total_wait']:.0f} minutes queueing; "
+          f"{plan['states']} states searched in {plan['elapsed_ms']:.0f} ms")
+    if len(plan['unplanned']):
+        print(f"Could not fit {len(plan['unplanned'])} rides before closing")
@@ -0,0 +1,294 @@
+import numpy as np
+import pandas as pd
+
+# The scraper aligns readings to 15-minute slots (filter_data_to_intervals),
+# so a day is 96 slots and a ride's history is one row of a dense
+# (ride, day, slot) tensor.
+SLOT_MINUTES = 15
+SLOTS_PER_DAY = 24 * 60 // SLOT_MINUTES
+
+def slot_labels():
+    """
+    'HH:MM' start time of each slot of the day.
+    """
+    return [f'{(s * SLOT_MINUTES) // 60:02d}:{(s * SLOT_MINUTES) % 60:02d}' for s in range(SLOTS_PER_DAY)]
+
+def build_ride_tensor(queue_data, first_date=None, last_date=None):
+    """
+    Scatter one park's typed readings into dense (ride, day, slot) arrays.
+
+    Every index is computed with array arithmetic (searchsorted for rides,
+    day offsets for dates, integer division for slots) and the readings are
+    written with one fancy-indexed assignment, so there is no per-row or
+    per-group pandas work. Days run contiguously from the first to the last
+    reading, so shifting along the day axis means "the same slot N days ago".
+
+    Args:
+        queue_data (pd.DataFrame): Typed readings (see load_queue_data_typed)
+            with ride_id, date, minute_of_day, queue_time and is_closed.
+        first_date: First day of the tensor. Defaults to the first reading's.
+        last_date: Last day of the tensor, e.g. a day to predict with no
+            readings yet. Defaults to the last reading's.
+
+    Returns:
+        dict: 'ride_ids' (int32, n_rides), 'dates' (datetime64[D], n_days),
+            'queue' (float32, n_rides x n_days x SLOTS_PER_DAY; NaN where the
+            ride had no open reading) and 'closed' (bool, same shape; True
+            where the reading says the ride was closed).
+    """
+    ride_id = queue_data['ride_id'].to_numpy()
+    day = queue_data['date'].to_numpy().astype('datetime64[D]')
+    slot = queue_data['minute_of_day'].to_numpy() // SLOT_MINUTES
+    is_closed = queue_data['is_closed'].to_numpy()
+
+    ride_ids = np.unique(ride_id)
+    first_day = np.datetime64(first_date, 'D') if first_date is not None else day.min() if len(day) else np.datetime64('1970-01-01', 'D')
+    last_day = np.datetime64(last_date, 'D') if last_date is not None else day.max() if len(day) else first_day - 1
+    n_days = max(int((last_day - first_day).astype(int)) + 1, 0)
+    keep = (day >= first_day) & (day <= last_day)
+    ride_id, day, slot, is_closed = ride_id[keep], day[keep], slot[keep], is_closed[keep]
+    shape = (len(ride_ids), n_days, SLOTS_PER_DAY)
+
+    index = (
+        np.searchsorted(ride_ids, ride_id).astype(np.int64),
+        (day - first_day).astype(np.int64),
+        slot.astype(np.int64),
+    )
+    queue = np.full(shape, np.nan, dtype=np.float32)
+    closed = np.zeros(shape, dtype=bool)
+    queue[index] = np.where(is_closed, np.nan, queue_data['queue_time'].to_numpy()[keep]).astype(np.float32)
+    closed[index] = is_closed
+
+    return {
+        'ride_ids': ride_ids.astype(np.int32),
+        'dates': first_day + np.arange(n_days),
+        'queue': queue,
+        'closed': closed,
+    }
+
+def _flatten_time(values):
+    """
+    View a (..., day, slot) array as (..., time), one step per slot across midnight.
+    """
+    return values.reshape(values.shape[:-2] + (-1,))
+
+def shift_slots(values, n):
+    """
+    Shift a (..., day, slot) array n slots later in time, across midnight, padding with NaN.
+
+    Day and slot are flattened into one time axis first, so n = SLOTS_PER_DAY
+    is "the same slot yesterday".
+
+    Args:
+        values (np.ndarray): Array whose last two axes are day and slot.
+        n (int): Number of slots to shift by (positive: look back).
+
+    Returns:
+        np.ndarray: float32 array of the same shape.
+    """
+    flat = _flatten_time(values)
+    shifted = np.full(flat.shape, np.nan, dtype=np.float32)
+    if n < flat.shape[-1]:
+        shifted[..., n:] = flat[..., :flat.shape[-1] - n]
+    return shifted.reshape(values.shape)
+
+def _window_sums(values, step):
+    """
+    Exclusive running sums and counts of the non-NaN values, taking every step-th slot.
+
+    Returns float64 (sums, counts) over the flattened time axis, padded to a
+    multiple of step and reshaped to (..., time // step, step), with a leading
+    zero row so that [t] - [t - n] covers the n previous steps before t.
+    """
+    flat = _flatten_time(values)
+    n_time = flat.shape[-1]
+    padded = -(-n_time // step) * step
+    if padded != n_time:
+        pad = np.full(flat.shape[:-1] + (padded - n_time,), np.nan, dtype=flat.dtype)
+        flat = np.concatenate([flat, pad], axis=-1)
+    strided = flat.reshape(flat.shape[:-1] + (padded // step, step))
+
+    valid = ~np.isnan(strided)
+    zero_row = np.zeros(strided.shape[:-2] + (1, step))
+    sums = np.concatenate([zero_row, np.cumsum(np.where(valid, strided, 0), axis=-2, dtype=np.float64)], axis=-2)
+    counts = np.concatenate([zero_row, np.cumsum(valid, axis=-2, dtype=np.float64)], axis=-2)
+    return sums, counts
+
+def _window_mean(sums, counts, n, shape):
+    """
+    Mean over the n steps before each step from _window_sums, NaN where none were valid.
+    """
+    n_steps = sums.shape[-2] - 1
+    end = sums[..., :n_steps, :]
+    start = np.concatenate([np.zeros_like(end[..., :min(n, n_steps), :]), sums[..., :max(n_steps - n, 0), :]], axis=-2)
+    count_end = counts[..., :n_steps, :]
+    count_start = np.concatenate([np.zeros_like(count_end[..., :min(n, n_steps), :]), counts[..., :max(n_steps - n, 0), :]], axis=-2)
+
+    count = count_end - count_start
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = np.where(count > 0, (end - start) / count, np.nan).astype(np.float32)
+    flat = mean.reshape(mean.shape[:-2] + (-1,))
+    n_time = shape[-2] * shape[-1]
+    return flat[..., :n_time].reshape(shape)
+
+def last_open(values):
+    """
+    The most recent open value before each slot, and how many slots ago it was.
+
+    Carries a ride's last reading across closures and unreported slots, so a
+    model still has a recent level when the plain lags are NaN.
+
+    Args:
+        values (np.ndarray): (..., day, slot) array, NaN where closed or unreported.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: float32 last value and slots since it, NaN before the first reading.
+    """
+    flat = _flatten_time(values)
+    n_time = flat.shape[-1]
+    steps = np.arange(n_time)
+    # Index of the latest valid step at or before t, carried forward with a running max.
+    latest = np.maximum.accumulate(np.where(np.isnan(flat), -1, steps), axis=-1)
+    # Exclude the current slot: look at the latest valid step before t.
+    before = np.concatenate([np.full(flat.shape[:-1] + (1,), -1), latest[..., :-1]], axis=-1)
+
+    value = np.take_along_axis(flat, np.maximum(before, 0), axis=-1)
+    found = before >= 0
+    value = np.where(found, value, np.nan).astype(np.float32)
+    age = np.where(found, steps - before, np.nan).astype(np.float32)
+    return value.reshape(values.shape), age.reshape(values.shape)
+
+def lag_features(values, lags=None, windows=None, day_windows=None, last=None):
+    """
+    Lag and rolling-window features of (ride, day, slot) series, all rides at once.
+
+    Each feature only looks at slots before the one it describes. Closed and
+    unreported slots (NaN) are gaps: lags that land on a gap are NaN and
+    rolling means average the valid slots in the window, NaN if none were.
+    Running sums are built once per window step (one for slot windows, one
+    for same-slot-across-days windows), and each window is then a difference
+    of two slices, so the cost doesn't grow with the window length.
+
+    Args:
+        values (np.ndarray): (ride, day, slot) float array, NaN for gaps.
+        lags (dict | None): Name to lag in slots, e.g. {'lag_15m': 1, 'lag_7d': 7 * SLOTS_PER_DAY}.
+        windows (dict | None): Name to window length in slots, for means over the preceding slots.
+        day_windows (dict | None): Name to window length in days, for means of the same slot on the preceding days.
+        last (tuple[str, str] | None): Names for the last open value and the slots since it.
+
+    Yields:
+        tuple[str, np.ndarray]: Feature name and float32 values shaped like values, in argument order.
+    """
+    for name, n in (lags or {}).items():
+        yield name, shift_slots(values, n)
+
+    if windows:
+        sums, counts = _window_sums(values, 1)
+        for name, n in windows.items():
+            yield name, _window_mean(sums, counts, n, values.shape)
+        del sums, counts
+
+    if day_windows:
+        sums, counts = _window_sums(values, SLOTS_PER_DAY)
+        for name, n in day_windows.items():
+            yield name, _window_mean(sums, counts, n, values.shape)
+        del sums, counts
+
+    if last:
+        value, age = last_open(values)
+        yield last[0], value
+        yield last[1], age
+
+def park_slot_mean(queue):
+    """
+    Mean open queue time across a park's rides for every (day, slot), NaN where no ride was open.
+    """
+    is_open = ~np.isnan(queue)
+    total = np.where(is_open, queue, 0).sum(axis=0, dtype=np.float64)
+    count = is_open.sum(axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(count > 0, total / count, np.nan).astype(np.float32)
+
+def park_open_share(queue, closed):
+    """
+    Share of a park's reporting rides that were open for every (day, slot), NaN where none reported.
+    """
+    n_open = (~np.isnan(queue)).sum(axis=0)
+    n_reporting = n_open + closed.sum(axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(n_reporting > 0, n_open / n_reporting, np.nan).astype(np.float32)
+
+def minutes_since_open(queue, closed):
+    """
+    Minutes since the park's first reading of the day for every (day, slot), NaN on days without readings.
+    """
+    reporting = (~np.isnan(queue) | closed).any(axis=0)
+    first_slot = np.where(reporting.any(axis=1), reporting.argmax(axis=1), -1)
+    minutes = (np.arange(SLOTS_PER_DAY)[None, :] - first_slot[:, None]) * SLOT_MINUTES
+    return np.where(first_slot[:, None] >= 0, minutes, np.nan).astype(np.float32)
+
+def calendar_features(dates):
+    """
+    day_of_week (Monday=0), month and day_of_year for each day.
+
+    Args:
+        dates (np.ndarray): datetime64[D] days.
+
+    Returns:
+        dict: Feature name to float32 array, one value per day.
+    """
+    index = pd.DatetimeIndex(dates)
+    return {
+        'day_of_week': index.dayofweek.to_numpy(np.float32),
+        'month': index.month.to_numpy(np.float32),
+        'day_of_year': index.dayofyear.to_numpy(np.float32),
+    }
+
+def fit_bin_edges(X, max_bins=255, sample_rows=200_000, seed=42):
+    """
+    Quantile bin edges for each feature, from a random sample of rows.
+
+    Args:
+        X (np.ndarray): (rows, features) array or memmap. Only sampled rows are read.
+        max_bins (int): Maximum bins per feature (non-missing values).
+        sample_rows (int): Rows to sample.
+        seed (int): Sampling seed.
+
+    Returns:
+        list[np.ndarray]: float32 edges per feature; feature j gets len(edges[j]) + 1 bins.
+    """
+    rng = np.random.default_rng(seed)
+    n_rows = X.shape[0]
+    rows = np.sort(rng.choice(n_rows, size=min(sample_rows, n_rows), replace=False)) if n_rows else np.array([], dtype=int)
+    sample = np.asarray(X[rows], dtype=np.float64)
+
+    edges = []
+    for column in sample.T:
+        column = column[~np.isnan(column)]
+        distinct = np.unique(column)
+        if len(distinct) <= max_bins:
+            # Few enough values for one bin each: split halfway between them.
+            cuts = (distinct[:-1] + distinct[1:]) / 2
+        else:
+            cuts = np.unique(np.quantile(column, np.linspace(0, 1, max_bins + 1)[1:-1]))
+        edges.append(cuts.astype(np.float32))
+    return edges
+
+def bin_features(X, edges):
+    """
+    Replace each feature value with its bin code from fit_bin_edges, keeping NaN.
+
+    Args:
+        X (np.ndarray): (rows, features) array.
+        edges (list[np.ndarray]): Edges per feature.
+
+    Returns:
+        np.ndarray: float32 codes 0..len(edges[j]) per feature, NaN where X is NaN.
+    """
+    X = np.asarray(X, dtype=np.float32)
+    codes = np.empty(X.shape, dtype=np.float32)
+    for j, cuts in enumerate(edges):
+        column = X[:, j]
+        codes[:, j] = np.searchsorted(cuts, column, side='right')
+        codes[np.isnan(column), j] = np.nan
+    return codes
@@ -0,0 +1,255 @@
+import argparse
+import os
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from pipeline import DEFAULT_PROFILES_PATH, get_queue_config, list_park_ids
+from preprocessing import SLOTS_PER_DAY, build_ride_tensor, slot_labels
+from utils.columnar import get_storage_config, load_park_info_parquet
+from utils.db import get_connection
+from utils.helpers import active_mask, load_queue_data_typed
+from utils.instrument import pipeline_run, stage
+from utils.query import park_info_query
+
+# Profile buckets: crowd-level decile, day type and month. Every ride has a
+# full (decile, day type, month, slot) block, so a lookup is one index.
+CROWD_DECILES = 10
+DAY_TYPES = ('weekday', 'weekend')
+MONTHS = 12
+N_BUCKETS = CROWD_DECILES * len(DAY_TYPES) * MONTHS
+
+def crowd_decile(crowd_level):
+    """
+    Decile (0-9) of a 0-100 crowd level.
+    """
+    return np.clip(np.asarray(crowd_level) // 10, 0, CROWD_DECILES - 1).astype(np.int64)
+
+def day_type(dates):
+    """
+    Index into DAY_TYPES for each date: 1 on Saturdays and Sundays, else 0.
+    """
+    return (pd.DatetimeIndex(dates).dayofweek >= 5).astype(np.int64)
+
+def bucket_index(dates, crowd_level):
+    """
+    Flat bucket index (decile, day type, month) for each date, matching the profile layout.
+    """
+    month = pd.DatetimeIndex(dates).month.to_numpy() - 1
+    return (crowd_decile(crowd_level) * len(DAY_TYPES) + day_type(dates)) * MONTHS + month
+
+def daily_crowd_level(queue):
+    """
+    Historical crowd level of each day of a park tensor, as the crowd level model defines it.
+
+    Each ride's mean open queue time for the day, averaged across rides, is
+    ranked against the park's other days as a 0-100 percentile (see
+    utils/preprocess.py in the crowd level model).
+
+    Args:
+        queue (np.ndarray): (ride, day, slot) queue times from build_ride_tensor.
+
+    Returns:
+        np.ndarray: float64 crowd level per day, NaN on days without open readings.
+    """
+    with np.errstate(invalid='ignore', divide='ignore'):
+        is_open = ~np.isnan(queue)
+        ride_mean = np.where(is_open, queue, 0).sum(axis=2, dtype=np.float64) / is_open.sum(axis=2)
+        n_rides = (~np.isnan(ride_mean)).sum(axis=0)
+        park_mean = np.where(n_rides > 0, np.nansum(ride_mean, axis=0) / n_rides, np.nan)
+    return (pd.Series(park_mean).rank(pct=True) * 100).round().to_numpy()
+
+def ride_profiles(tensor):
+    """
+    Mean queue curve of every ride in every bucket, with empty buckets filled from coarser ones.
+
+    Days are sorted by bucket and summed with one reduceat over the day
+    axis. A bucket a ride has no days in falls back to the same decile and
+    day type across all months, then the same decile, then all of the
+    ride's days.
+
+    Args:
+        tensor (dict): Output of build_ride_tensor.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: float32 profiles (ride, decile, day type,
+            month, slot), NaN where the ride never reported open at that slot,
+            and uint16 days behind each bucket before filling (0: filled).
+    """
+    queue = tensor['queue']
+    n_rides = queue.shape[0]
+    level = daily_crowd_level(queue)
+    has_level = ~np.isnan(level)
+    buckets = bucket_index(tensor['dates'][has_level], level[has_level])
+    queue = queue[:, has_level]
+
+    order = np.argsort(buckets, kind='stable')
+    buckets = buckets[order]
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]]) if len(buckets) else np.array([], dtype=np.int64)
+
+    shape = (n_rides, CROWD_DECILES, len(DAY_TYPES), MONTHS, SLOTS_PER_DAY)
+    sums = np.zeros((n_rides, N_BUCKETS, SLOTS_PER_DAY))
+    counts = np.zeros((n_rides, N_BUCKETS, SLOTS_PER_DAY))
+    days = np.zeros((n_rides, N_BUCKETS), dtype=np.uint16)
+    if len(starts):
+        values = queue[:, order]
+        is_open = ~np.isnan(values)
+        sums[:, buckets[starts]] = np.add.reduceat(np.where(is_open, values, 0), starts, axis=1, dtype=np.float64)
+        counts[:, buckets[starts]] = np.add.reduceat(is_open, starts, axis=1, dtype=np.float64)
+        days[:, buckets[starts]] = np.add.reduceat(is_open.any(axis=2).astype(np.uint16), starts, axis=1)
+    sums, counts, days = sums.reshape(shape), counts.reshape(shape), days.reshape(shape[:-1])
+
+    def mean(total, count):
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(count > 0, total / count, np.nan)
+
+    profiles = mean(sums, counts)
+    fallbacks = (
+        mean(sums.sum(axis=3, keepdims=True), counts.sum(axis=3, keepdims=True)),
+        mean(sums.sum(axis=(2, 3), keepdims=True), counts.sum(axis=(2, 3), keepdims=True)),
+        mean(sums.sum(axis=(1, 2, 3), keepdims=True), counts.sum(axis=(1, 2, 3), keepdims=True)),
+    )
+    for fallback in fallbacks:
+        empty = np.isnan(profiles).all(axis=-1, keepdims=True)
+        profiles = np.where(empty, np.broadcast_to(fallback, shape), profiles)
+    return profiles.astype(np.float32), days
+
+def _ride_names(storage, park_ids):
+    if storage['backend'] == 'parquet':
+        park_info = load_park_info_parquet(storage['parquet_dir'])
+        park_info = park_info[park_info['park_id'].astype(str).isin([str(p) for p in park_ids])]
+    else:
+        sql, params = park_info_query(park_ids)
+        park_info = pd.read_sql_query(sql, get_connection(storage['db_path']), params=params)
+    ride_ids = pd.to_numeric(park_info['ride_id'], errors='coerce')
+    return dict(zip(ride_ids[ride_ids.notna()].astype(int), park_info['ride_name'][ride_ids.notna()]))
+
+def build_ride_profiles(park_ids=None, path=DEFAULT_PROFILES_PATH, storage=None):
+    """
+    Build the ride profile index from historical queue_data and save it as a compressed NumPy archive.
+
+    Parks are streamed one at a time as for the training matrix. Profiles
+    are stored as float16, which keeps queue minutes to well under a minute
+    of precision. The archive is written beside the target and moved into
+    place when complete.
+
+    Args:
+        park_ids (list[int] | None): Parks to include. Every park in park_info if None.
+        path (str): Output .npz path.
+        storage (dict | None): Backend settings from get_storage_config. Read from config.yml if None.
+
+    Returns:
+        dict: The arrays written (see load_ride_profiles).
+    """
+    storage = storage or get_storage_config()
+    park_ids = sorted(int(p) for p in park_ids) if park_ids is not None else list_park_ids(storage)
+    names = _ride_names(storage, park_ids)
+
+    parks = {'ride_ids': [], 'park_ids': [], 'first_seen': [], 'last_seen': [], 'profiles': [], 'days': []}
+    with pipeline_run('ride_profiles'):
+        for park_id in park_ids:
+            with stage('load_park_readings') as record:
+                queue_data = load_queue_data_typed(
+                    db_path=storage['db_path'], backend=storage['backend'],
+                    parquet_dir=storage['parquet_dir'], park_ids=[park_id], active_only=True
+                )
+                record['rows_out'] = len(queue_data)
+            with stage('build_ride_tensor', rows_in=len(queue_data)):
+                tensor = build_ride_tensor(queue_data)
+            del queue_data
+            with stage('ride_profiles'):
+                profiles, days = ride_profiles(tensor)
+
+            parks['ride_ids'].append(tensor['ride_ids'])
+            parks['park_ids'].append(np.full(len(tensor['ride_ids']), park_id, dtype=np.int32))
+            open_days = (~np.isnan(tensor['queue'])).any(axis=2)
+            parks['first_seen'].append(tensor['dates'][open_days.argmax(axis=1)])
+            parks['last_seen'].append(tensor['dates'][open_days.shape[1] - 1 - open_days[:, ::-1].argmax(axis=1)])
+            parks['profiles'].append(profiles.astype(np.float16))
+            parks['days'].append(days)
+            print(f"Park {park_id}: profiles for {len(tensor['ride_ids'])} rides over {tensor['queue'].shape[1]} days")
+            del tensor
+
+    shape = (CROWD_DECILES, len(DAY_TYPES), MONTHS)
+    index = {
+        'ride_ids': np.concatenate(parks['ride_ids'] or [np.empty(0, dtype=np.int32)]),
+        'park_ids': np.concatenate(parks['park_ids'] or [np.empty(0, dtype=np.int32)]),
+        'first_seen': np.concatenate(parks['first_seen'] or [np.empty(0, dtype='datetime64[D]')]),
+        'last_seen': np.concatenate(parks['last_seen'] or [np.empty(0, dtype='datetime64[D]')]),
+        'profiles': np.concatenate(parks['profiles'] or [np.empty((0, *shape, SLOTS_PER_DAY), dtype=np.float16)]),
+        'days': np.concatenate(parks['days'] or [np.empty((0, *shape), dtype=np.uint16)]),
+    }
+    index['ride_names'] = np.array([names.get(int(r), f'Ride {r}') for r in index['ride_ids']], dtype=str)
+
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    building = f'{path}.building'
+    with open(building, 'wb') as file:
+        np.savez_compressed(file, built_at=np.array(datetime.now().isoformat(timespec='seconds')), **index)
+    os.replace(building, path)
+    print(f"Wrote profiles for {len(index['ride_ids'])} rides to {path} ({os.path.getsize(path) / 1e6:.2f} MB)")
+    return index
+
+def load_ride_profiles(path=DEFAULT_PROFILES_PATH):
+    """
+    Load a ride profile index written by build_ride_profiles.
+
+    Args:
+        path (str): .npz path.
+
+    Returns:
+        dict | None: 'ride_ids', 'park_ids', 'ride_names', 'first_seen' and
+            'last_seen' (first and last open day), 'profiles' (ride, decile,
+            day type, month, slot), 'days' and 'built_at',
+            plus 'parks' mapping each park ID to its slice of rides. None if
+            the file doesn't exist.
+    """
+    if not os.path.exists(path):
+        return None
+    with np.load(path) as archive:
+        index = {name: archive[name] for name in archive.files}
+    index['built_at'] = str(index['built_at'])
+
+    park_ids, starts = np.unique(index['park_ids'], return_index=True)
+    ends = np.r_[starts[1:], len(index['park_ids'])]
+    index['parks'] = {int(p): slice(int(s), int(e)) for p, s, e in zip(park_ids, starts, ends)}
+    return index
+
+def lookup_ride_profiles(index, park_id, date, crowd_level):
+    """
+    Expected queue curve of every ride in a park active on a date, for a given crowd level.
+
+    Rides are active by the rule of load_active_rides, applied to the open
+    days the profiles were built from.
+
+    Args:
+        index (dict): Output of load_ride_profiles.
+        park_id (int): Park.
+        date: Date (anything pd.Timestamp accepts).
+        crowd_level (float): Predicted 0-100 crowd level for the date.
+
+    Returns:
+        pd.DataFrame: Queue minutes, one row per ride_id and one column per
+            'HH:MM' slot, with a 'ride_name' column first. Empty if the park
+            has no profiles.
+    """
+    rides = index['parks'].get(int(park_id))
+    if rides is None:
+        return pd.DataFrame(columns=['ride_name', *slot_labels()])
+
+    date = pd.Timestamp(date)
+    decile = int(crowd_decile(crowd_level))
+    curves = index['profiles'][rides, decile, int(date.dayofweek >= 5), date.month - 1].astype(np.float32)
+    active = active_mask(index['park_ids'][rides], index['first_seen'][rides], index['last_seen'][rides], date)
+
+    profile = pd.DataFrame(curves[active], index=pd.Index(index['ride_ids'][rides][active], name='ride_id'), columns=slot_labels())
+    profile.insert(0, 'ride_name', index['ride_names'][rides][active])
+    return profile
+
+if __name__ == "__main__":
+    queue_config = get_queue_config()
+
+    parser = argparse.ArgumentParser(description='Build the ride profile index used for per-ride waits on the dashboard.')
+    parser.add_argument('--parks', type=int, nargs='+', default=queue_config['park_ids'], help='Park IDs (default: models.queues.park_ids).')
+    parser.add_argument('--output', default=queue_config['profiles_path'])
+    args = parser.parse_args()
+
+    build_ride_profiles(args.parks, args.output)
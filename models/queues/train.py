@@ -0,0 +1,348 @@
+import argparse
+import json
+import os
+import time
+import joblib
+import numpy as np
+import yaml
+from sklearn.ensemble import HistGradientBoostingRegressor
+from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+from pipeline import DAY_AHEAD_FEATURES, SAME_DAY_FEATURES, build_training_matrix, get_queue_config, load_training_matrix
+from preprocessing import bin_features, fit_bin_edges
+
+# Rows are read in contiguous blocks of this size, and batches are built
+# from blocks in shuffled order, so reads stay sequential on disk while each
+# batch still mixes parks, rides and seasons.
+BLOCK_ROWS = 16_384
+
+# HistGradientBoosting caps bins (and categories) at 255 per feature, and
+# finds each fit's bins from at most 200,000 rows. Batches stay below that so
+# the anchor rows (see _anchor_rows) are always among the rows it looks at.
+MAX_BINS = 255
+BIN_SUBSAMPLE_ROWS = 200_000
+
+# 'day_ahead' trains on DAY_AHEAD_FEATURES only, for forecasts made before
+# the park opens; 'same_day' also uses the day's readings so far.
+HORIZONS = ('day_ahead', 'same_day')
+
+def get_train_config(config_path='config.yml'):
+    """
+    Get the queue model training settings from the config file.
+
+    Args:
+        config_path (str): Path to the configuration file.
+
+    Returns:
+        dict: model_name, horizon, batch_rows, trees_per_batch, passes,
+            learning_rate, max_leaf_nodes, l2_regularization and holdout_days.
+    """
+    try:
+        with open(config_path, 'r') as file:
+            config = yaml.safe_load(file) or {}
+    except FileNotFoundError:
+        config = {}
+    train = ((config.get('models', {}) or {}).get('queues', {}) or {}).get('train', {}) or {}
+    horizon = train.get('horizon', 'day_ahead')
+    if horizon not in HORIZONS:
+        raise ValueError(f'Unknown queue model horizon: {horizon} (expected one of {HORIZONS})')
+    return {
+        'model_name': train.get('model_name', 'queue-model'),
+        'horizon': horizon,
+        'batch_rows': train.get('batch_rows', 150_000),
+        'trees_per_batch': train.get('trees_per_batch', 25),
+        'passes': train.get('passes', 1),
+        'learning_rate': train.get('learning_rate', 0.1),
+        'max_leaf_nodes': train.get('max_leaf_nodes', 63),
+        'l2_regularization': train.get('l2_regularization', 0.0),
+        'holdout_days': train.get('holdout_days', 28),
+    }
+
+def select_features(X, feature_columns, matrix_columns):
+    """
+    The columns of feature rows a model was trained on.
+
+    Args:
+        X (np.ndarray): (rows, features) in matrix_columns order.
+        feature_columns (list[str]): The model's feature columns, ending with 'ride'.
+        matrix_columns (list[str]): Columns of X, e.g. FEATURE_COLUMNS.
+
+    Returns:
+        np.ndarray: (rows, len(feature_columns) - 1).
+    """
+    return X[:, [matrix_columns.index(column) for column in feature_columns[:-1]]]
+
+def encode_features(X, ride_ids, bin_edges, all_ride_ids):
+    """
+    Model inputs for feature rows: bin codes plus the ride category code.
+
+    Args:
+        X (np.ndarray): (rows, features) in the model's feature column order (see select_features).
+        ride_ids (np.ndarray): Ride of each row; must be in all_ride_ids.
+        bin_edges (list[np.ndarray]): Edges from fit_bin_edges.
+        all_ride_ids (np.ndarray): Sorted ride IDs the model was trained with.
+
+    Returns:
+        np.ndarray: float32 (rows, features + 1).
+    """
+    rides = np.searchsorted(all_ride_ids, ride_ids).astype(np.float32)
+    return np.column_stack([bin_features(X, bin_edges), rides])
+
+def _anchor_rows(bin_edges, n_rides):
+    """
+    One row per bin code (and per ride) for every feature, to pin the estimator's own binning.
+
+    HistGradientBoosting re-bins the data on every fit() call, but a warm
+    start replays the earlier trees on the new batch's bins. The features
+    are already bin codes, so if every code appears in the rows it bins the
+    estimator maps code k to bin k on every call and the earlier trees stay
+    valid. These rows guarantee that; they carry zero sample weight, so
+    they don't affect the fit.
+    """
+    n_codes = [len(cuts) + 1 for cuts in bin_edges] + [n_rides]
+    n_rows = max(n_codes)
+    steps = np.arange(n_rows)[:, None]
+    return np.minimum(steps, np.array(n_codes)[None, :] - 1).astype(np.float32)
+
+def _blocks(n_rows, rng=None):
+    """
+    (start, stop) row ranges of BLOCK_ROWS, shuffled if rng is given.
+    """
+    starts = np.arange(0, n_rows, BLOCK_ROWS)
+    if rng is not None:
+        starts = rng.permutation(starts)
+    return [(int(start), int(min(start + BLOCK_ROWS, n_rows))) for start in starts]
+
+def iter_batches(matrix, row_filter, batch_rows, feature_columns, bin_edges, all_ride_ids, rng=None):
+    """
+    Yield (X, y) batches of binned features plus the ride category column.
+
+    Args:
+        matrix (dict): Output of load_training_matrix.
+        feature_columns (list[str]): The model's feature columns, ending with 'ride'.
+        row_filter (callable): Takes a block's dates and returns a boolean mask of rows to keep.
+        batch_rows (int): Rows per batch (the last batch may be smaller).
+        bin_edges (list[np.ndarray]): Edges from fit_bin_edges.
+        all_ride_ids (np.ndarray): Sorted ride IDs, for the category codes.
+        rng (np.random.Generator | None): Shuffle block order if given; matrix order otherwise.
+
+    Yields:
+        tuple[np.ndarray, np.ndarray]: float32 X (rows, features + 1) and y.
+    """
+    X_parts, y_parts, n_buffered = [], [], 0
+    for start, stop in _blocks(matrix['meta']['n_rows'], rng):
+        keep = row_filter(matrix['date'][start:stop])
+        if not keep.any():
+            continue
+        X = select_features(matrix['X'][start:stop][keep], feature_columns, matrix['feature_columns'])
+        X_parts.append(encode_features(X, matrix['ride_id'][start:stop][keep], bin_edges, all_ride_ids))
+        y_parts.append(np.asarray(matrix['y'][start:stop][keep]))
+        n_buffered += int(keep.sum())
+        if n_buffered >= batch_rows:
+            X, y = np.concatenate(X_parts), np.concatenate(y_parts)
+            while len(y) >= batch_rows:
+                yield X[:batch_rows], y[:batch_rows]
+                X, y = X[batch_rows:], y[batch_rows:]
+            X_parts, y_parts, n_buffered = [X], [y], len(y)
+    if n_buffered:
+        yield np.concatenate(X_parts), np.concatenate(y_parts)
+
+def train_queue_model(matrix, settings, seed=42):
+    """
+    Train a HistGradientBoostingRegressor on the training matrix, one batch at a time.
+
+    Features are binned once with edges from a sample of the matrix and
+    held as float32 codes, and ride_id is a native categorical feature
+    instead of hundreds of one-hot columns. Batches of settings['batch_rows']
+    rows (capped below BIN_SUBSAMPLE_ROWS) are streamed from the memory-mapped
+    matrix, and each adds settings['trees_per_batch'] boosting rounds with
+    warm_start, so the full matrix never has to fit in memory. The last
+    holdout_days of dates are kept out for evaluation. A 'day_ahead' model
+    (settings['horizon']) only uses the matrix's DAY_AHEAD_FEATURES columns.
+
+    Args:
+        matrix (dict): Output of load_training_matrix.
+        settings (dict): Training settings from get_train_config.
+        seed (int): Seed for sampling, batch order and the estimator.
+
+    Returns:
+        dict: 'model', 'feature_columns', 'bin_edges', 'ride_ids', 'horizon',
+            'cutoff' (first holdout date) and 'metrics'.
+    """
+    rng = np.random.default_rng(seed)
+    all_ride_ids = np.unique(np.asarray(matrix['ride_id']))
+    if len(all_ride_ids) > MAX_BINS:
+        raise ValueError(
+            f'{len(all_ride_ids)} rides exceed the {MAX_BINS} categories HistGradientBoosting supports; '
+            'train on fewer parks at a time.'
+        )
+
+    last_date = max((matrix['date'][start:stop].max() for start, stop in _blocks(matrix['meta']['n_rows'])), default=None)
+    if last_date is None:
+        raise ValueError('The training matrix is empty.')
+    cutoff = last_date - np.timedelta64(settings['holdout_days'] - 1, 'D')
+
+    columns = DAY_AHEAD_FEATURES if settings['horizon'] == 'day_ahead' else matrix['feature_columns']
+    feature_columns = [column for column in matrix['feature_columns'] if column in columns] + ['ride']
+
+    print(f"Fitting bin edges for a {settings['horizon']} model...")
+    bin_edges = fit_bin_edges(matrix['X'], max_bins=MAX_BINS, seed=seed)
+    bin_edges = [bin_edges[matrix['feature_columns'].index(column)] for column in feature_columns[:-1]]
+    anchors = _anchor_rows(bin_edges, len(all_ride_ids))
+
+    model = HistGradientBoostingRegressor(
+        max_iter=0,
+        learning_rate=settings['learning_rate'],
+        max_leaf_nodes=settings['max_leaf_nodes'],
+        l2_regularization=settings['l2_regularization'],
+        max_bins=MAX_BINS,
+        categorical_features=[len(feature_columns) - 1],
+        early_stopping=False,
+        warm_start=True,
+        random_state=seed,
+    )
+
+    batch_rows = min(settings['batch_rows'], BIN_SUBSAMPLE_ROWS - len(anchors))
+    print(f'Training on dates before {cutoff} in batches of {batch_rows} rows...')
+    rows_seen, fit_s, started = 0, 0.0, time.perf_counter()
+    for _ in range(settings['passes']):
+        for X, y in iter_batches(matrix, lambda dates: dates < cutoff, batch_rows, feature_columns, bin_edges, all_ride_ids, rng):
+            weights = np.concatenate([np.ones(len(y), dtype=np.float32), np.zeros(len(anchors), dtype=np.float32)])
+            # A short final batch gets proportionally fewer rounds.
+            model.max_iter += max(1, round(settings['trees_per_batch'] * len(y) / batch_rows))
+            fit_start = time.perf_counter()
+            model.fit(np.concatenate([X, anchors]), np.concatenate([y, np.zeros(len(anchors), dtype=np.float32)]), sample_weight=weights)
+            fit_s += time.perf_counter() - fit_start
+            rows_seen += len(y)
+            print(f'  {model.n_iter_} trees, {rows_seen} rows')
+    wall_s = time.perf_counter() - started
+
+    bundle = {
+        'model': model,
+        'feature_columns': feature_columns,
+        'bin_edges': bin_edges,
+        'ride_ids': all_ride_ids,
+        'horizon': settings['horizon'],
+        'cutoff': str(cutoff),
+    }
+    bundle['metrics'] = {
+        'rows_trained': rows_seen,
+        'trees': int(model.n_iter_),
+        'train_wall_s': round(wall_s, 2),
+        'fit_s': round(fit_s, 2),
+        'rows_per_s': round(rows_seen / wall_s) if wall_s else None,
+        **evaluate_model(bundle, matrix, cutoff),
+    }
+    return bundle
+
+def evaluate_model(bundle, matrix, cutoff):
+    """
+    Evaluate the model on the holdout dates (on or after cutoff).
+
+    Besides scoring the holdout rows as they are, the model is scored
+    day-ahead: with every SAME_DAY_FEATURES column missing, as
+    predict_day(day_ahead=True) sees them. For a 'day_ahead' model the two
+    are the same. The day-ahead error is compared with the same-slot-last-week
+    baseline on the rows where that is available.
+
+    Returns:
+        dict: Holdout row count, MAE, RMSE and R², the day-ahead MAE, and
+            the day-ahead and lag_7d baseline MAE on the rows with a lag_7d value.
+    """
+    matrix_columns = matrix['feature_columns']
+    lag_column = matrix_columns.index('lag_7d')
+    same_day = [matrix_columns.index(column) for column in SAME_DAY_FEATURES]
+
+    def predict(X, ride_ids):
+        return bundle['model'].predict(encode_features(
+            select_features(X, bundle['feature_columns'], matrix_columns), ride_ids, bundle['bin_edges'], bundle['ride_ids']
+        ))
+
+    y_true, y_pred, y_day_ahead, has_lag, lag_pred = [], [], [], [], []
+    for start, stop in _blocks(matrix['meta']['n_rows']):
+        keep = matrix['date'][start:stop] >= cutoff
+        if not keep.any():
+            continue
+        X = np.array(matrix['X'][start:stop][keep])
+        ride_ids = matrix['ride_id'][start:stop][keep]
+        y_true.append(np.asarray(matrix['y'][start:stop][keep]))
+        y_pred.append(predict(X, ride_ids))
+        X[:, same_day] = np.nan
+        y_day_ahead.append(predict(X, ride_ids))
+        has_lag.append(~np.isnan(X[:, lag_column]))
+        lag_pred.append(X[:, lag_column])
+
+    if not y_true:
+        print('No holdout rows to evaluate.')
+        return {'holdout_rows': 0}
+    y_true, y_pred, y_day_ahead = np.concatenate(y_true), np.concatenate(y_pred), np.concatenate(y_day_ahead)
+    has_lag, lag_pred = np.concatenate(has_lag), np.concatenate(lag_pred)
+    metrics = {
+        'holdout_rows': len(y_true),
+        'mae': round(float(mean_absolute_error(y_true, y_pred)), 4),
+        'rmse': round(float(np.sqrt(mean_squared_error(y_true, y_pred))), 4),
+        'r2': round(float(r2_score(y_true, y_pred)), 4),
+        'day_ahead_mae': round(float(mean_absolute_error(y_true, y_day_ahead)), 4),
+        'baseline_rows': int(has_lag.sum()),
+        'day_ahead_mae_vs_baseline': None,
+        'lag_7d_mae': None,
+    }
+    if has_lag.any():
+        metrics['day_ahead_mae_vs_baseline'] = round(float(mean_absolute_error(y_true[has_lag], y_day_ahead[has_lag])), 4)
+        metrics['lag_7d_mae'] = round(float(mean_absolute_error(y_true[has_lag], lag_pred[has_lag])), 4)
+
+    print(f"\nQueue model ({bundle['horizon']}) holdout metrics:")
+    print(f"MAE: {metrics['mae']:.4f}")
+    print(f"RMSE: {metrics['rmse']:.4f}")
+    print(f"R²: {metrics['r2']:.4f}")
+    print(f"Day-ahead MAE: {metrics['day_ahead_mae']:.4f}; on the {metrics['baseline_rows']} rows with a value "
+          f"last week {metrics['day_ahead_mae_vs_baseline']} vs {metrics['lag_7d_mae']} for the same slot last week")
+    return metrics
+
+def save_model(bundle, model_name):
+    """
+    Save the trained model to the model-exports folder.
+
+    Alongside the estimator, saves the feature columns, the bin edges and
+    ride categories the inputs must be encoded with, and the training
+    metrics, including throughput and the model's size on disk.
+
+    Args:
+        bundle (dict): Output of train_queue_model.
+        model_name (str): File name stem.
+    """
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    models_dir = os.path.join(current_dir, 'model-exports')
+    os.makedirs(models_dir, exist_ok=True)
+
+    model_path = os.path.join(models_dir, f'{model_name}.pkl')
+    if os.path.exists(model_path):
+        print(f'Model {model_name}.pkl already exists. Overwriting...')
+    else:
+        print(f'Saving model as {model_name}.pkl in model-exports folder...')
+    joblib.dump(bundle['model'], model_path)
+    joblib.dump(bundle['feature_columns'], os.path.join(models_dir, f'{model_name}_columns.pkl'))
+    joblib.dump(
+        {'bin_edges': bundle['bin_edges'], 'ride_ids': bundle['ride_ids'], 'horizon': bundle['horizon'], 'cutoff': bundle['cutoff']},
+        os.path.join(models_dir, f'{model_name}_encoding.pkl')
+    )
+
+    bundle['metrics']['model_size_mb'] = round(os.path.getsize(model_path) / 1e6, 2)
+    with open(os.path.join(models_dir, f'{model_name}_metrics.json'), 'w') as file:
+        json.dump(bundle['metrics'], file, indent=2)
+    metrics = bundle['metrics']
+    print(f"Trained {metrics['trees']} trees on {metrics['rows_trained']} rows at {metrics['rows_per_s']} rows/s; "
+          f"model is {metrics['model_size_mb']} MB")
+
+if __name__ == "__main__":
+    queue_config = get_queue_config()
+    settings = get_train_config()
+
+    parser = argparse.ArgumentParser(description='Train the per-ride queue time model.')
+    parser.add_argument('--parks', type=int, nargs='+', default=queue_config['park_ids'], help='Park IDs (default: models.queues.park_ids).')
+    parser.add_argument('--rebuild', action='store_true', help='Rebuild the training matrix first.')
+    args = parser.parse_args()
+
+    build_training_matrix(args.parks, queue_config['matrix_dir'], rebuild=args.rebuild)
+    matrix = load_training_matrix(queue_config['matrix_dir'])
+    bundle = train_queue_model(matrix, settings)
+    save_model(bundle, settings['model_name'])
@@ -0,0 +1,185 @@
+import argparse
+import logging
+import os
+from datetime import datetime, timedelta
+import yaml
+from database import DB_PATH, connect, create_rollup_tables
+from parquet_export import rows_to_table, write_park_table
+
+DEFAULT_ARCHIVE_DIR = 'data/queue_archive'
+
+# Rollup statistics for one group of raw readings; column order matches
+# ROLLUP_COLUMNS in database.py.
+ROLLUP_SELECT = """
+    COUNT(*),
+    SUM(is_closed = 0),
+    COALESCE(SUM(CASE WHEN is_closed = 0 THEN queue_time END), 0),
+    MAX(CASE WHEN is_closed = 0 THEN queue_time END),
+    MIN(time_of_day),
+    MAX(time_of_day)
+"""
+
+# Adds a second pass over the same ride-day (or hour) to the existing row.
+ROLLUP_UPSERT = """
+    n_readings = n_readings + excluded.n_readings,
+    n_open = n_open + excluded.n_open,
+    sum_queue_time = sum_queue_time + excluded.sum_queue_time,
+    max_queue_time = CASE
+        WHEN max_queue_time IS NULL OR excluded.max_queue_time > max_queue_time THEN excluded.max_queue_time
+        ELSE max_queue_time
+    END,
+    first_time_of_day = MIN(first_time_of_day, excluded.first_time_of_day),
+    last_time_of_day = MAX(last_time_of_day, excluded.last_time_of_day)
+"""
+
+def get_retention_config(config_path):
+    """
+    Get the retention settings from the config file.
+
+    Args:
+        config_path (str): Path to config.yml
+
+    Returns:
+        dict: raw_max_age_days, archive and archive_dir
+    """
+    try:
+        with open(config_path, 'r') as file:
+            config = yaml.safe_load(file) or {}
+    except FileNotFoundError:
+        config = {}
+    retention = config.get('retention', {}) or {}
+    return {
+        'raw_max_age_days': retention.get('raw_max_age_days', 730),
+        'archive': retention.get('archive', True),
+        'archive_dir': retention.get('archive_dir', DEFAULT_ARCHIVE_DIR),
+    }
+
+def _month_ranges(conn, cutoff):
+    """
+    (start, end) date bounds of each month holding raw rows older than cutoff, end exclusive.
+    """
+    months = [row[0] for row in conn.execute(
+        "SELECT DISTINCT substr(date, 1, 7) FROM queue_data WHERE date < ? ORDER BY 1", (cutoff,)
+    )]
+    ranges = []
+    for month in months:
+        year, month_number = int(month[:4]), int(month[5:7])
+        next_month = f'{year + month_number // 12}/{month_number % 12 + 1:02d}/01'
+        ranges.append((f'{month}/01', min(next_month, cutoff)))
+    return ranges
+
+def archive_raw_rows(conn, start, end, archive_dir, logger):
+    """
+    Append raw readings in [start, end) to the compressed Parquet archive.
+
+    The archive uses the Parquet export's layout, one dataset partitioned by
+    park and month, so it can be read with the parquet backend. Readings
+    already archived are replaced rather than duplicated, so an interrupted
+    compaction can be rerun.
+
+    Returns:
+        int: Number of rows archived
+    """
+    rows = conn.execute("""
+        SELECT
+            COALESCE((SELECT MIN(pi.park_id) FROM park_info pi WHERE pi.ride_id = qd.ride_id), 0),
+            CAST(qd.ride_id AS INTEGER), qd.date, qd.time_of_day, qd.queue_time, qd.is_closed
+        FROM queue_data qd
+        WHERE qd.date >= ? AND qd.date < ?
+    """, (start, end)).fetchall()
+
+    rows_by_park = {}
+    for park_id, *row in rows:
+        rows_by_park.setdefault(park_id, []).append(row)
+    for park_id, park_rows in rows_by_park.items():
+        write_park_table(rows_to_table(park_rows), archive_dir, park_id, merge=True)
+
+    logger.debug(f"Archived {len(rows)} rows from {start} to {end}")
+    return len(rows)
+
+def compact_range(conn, start, end):
+    """
+    Roll raw readings in [start, end) into queue_hourly and queue_daily, then delete them, in one transaction.
+
+    Returns:
+        int: Number of raw rows removed
+    """
+    where = "WHERE date >= ? AND date < ?"
+    try:
+        conn.execute(f"""
+            INSERT INTO queue_hourly
+            SELECT ride_id, date, CAST(substr(time_of_day, 1, 2) AS INTEGER) AS hour, {ROLLUP_SELECT}
+            FROM queue_data {where}
+            GROUP BY ride_id, date, hour
+            ON CONFLICT (ride_id, date, hour) DO UPDATE SET {ROLLUP_UPSERT}
+        """, (start, end))
+        conn.execute(f"""
+            INSERT INTO queue_daily
+            SELECT ride_id, date, {ROLLUP_SELECT}
+            FROM queue_data {where}
+            GROUP BY ride_id, date
+            ON CONFLICT (ride_id, date) DO UPDATE SET {ROLLUP_UPSERT}
+        """, (start, end))
+        n_rows = conn.execute(f"DELETE FROM queue_data {where}", (start, end)).rowcount
+        conn.commit()
+        return n_rows
+    except Exception:
+        conn.rollback()
+        raise
+
+def compact_database(db_path, raw_max_age_days, logger, archive_dir=None, vacuum=False, today=None):
+    """
+    Move raw readings older than raw_max_age_days into the hourly and daily rollup tiers.
+
+    Works one month at a time, so each month is archived (if archive_dir is
+    set) and then rolled up and deleted in its own transaction.
+
+    Args:
+        db_path (str): Path to the SQLite database
+        raw_max_age_days (int): Raw readings on dates at least this many days old are compacted
+        logger: Logger instance for logging actions
+        archive_dir (str | None): Parquet archive root for the raw rows. Not archived if None.
+        vacuum (bool): VACUUM afterwards so the file shrinks on disk
+        today (datetime | None): Reference date, defaults to now
+
+    Returns:
+        int: Number of raw rows compacted
+    """
+    cutoff = ((today or datetime.now()) - timedelta(days=raw_max_age_days)).strftime('%Y/%m/%d')
+    conn = connect(db_path)
+    try:
+        create_rollup_tables(conn.cursor())
+        conn.commit()
+
+        n_rows = 0
+        for start, end in _month_ranges(conn, cutoff):
+            if archive_dir:
+                archive_raw_rows(conn, start, end, archive_dir, logger)
+            n_month = compact_range(conn, start, end)
+            n_rows += n_month
+            logger.info(f"Compacted {n_month} raw rows from {start} to {end}")
+
+        if vacuum and n_rows:
+            logger.info("Vacuuming database")
+            conn.execute("VACUUM")
+        logger.info(f"Compacted {n_rows} raw rows older than {cutoff}")
+        return n_rows
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    config_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'config.yml')
+    retention = get_retention_config(config_path)
+
+    arg_parser = argparse.ArgumentParser(description='Roll old raw queue readings into hourly and daily rollup tables.')
+    arg_parser.add_argument('--db-path', default=DB_PATH)
+    arg_parser.add_argument('--max-age-days', type=int, default=retention['raw_max_age_days'])
+    arg_parser.add_argument('--archive-dir', default=retention['archive_dir'])
+    arg_parser.add_argument('--no-archive', action='store_true', help='Delete compacted raw rows without archiving them.')
+    arg_parser.add_argument('--vacuum', action='store_true', help='VACUUM afterwards to return the space to the filesystem.')
+    args = arg_parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    logger = logging.getLogger('QueueScraper')
+    archive_dir = None if args.no_archive or not retention['archive'] else args.archive_dir
+    compact_database(args.db_path, args.max_age_days, logger, archive_dir, args.vacuum)
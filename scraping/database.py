@@ -1,12 +1,50 @@
+import importlib.util
 import sqlite3
 import os
 
-def setup_database(logger):
+DB_PATH = 'data/queue_data.db'
+
+def _load_db_profile():
+    """
+    models/crowd-level/utils/db.py, which owns the connection profile (PRAGMAS).
+
+    Loaded by path under a private name, as this folder's utils.py would
+    otherwise shadow the crowd-level utils package.
+    """
+    path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                        'models', 'crowd-level', 'utils', 'db.py')
+    spec = importlib.util.spec_from_file_location('crowd_level_db', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+# One connection profile for every process touching the database: WAL lets
+# the crowd-level model and dashboard read while the scraper writes, and the
+# busy timeout makes a second writer (live ingest, compaction) wait for the
+# lock rather than fail with "database is locked".
+_db_profile = _load_db_profile()
+BUSY_TIMEOUT_S = _db_profile.BUSY_TIMEOUT_S
+PRAGMAS = _db_profile.PRAGMAS
+
+def connect(db_path=DB_PATH):
+    """
+    Opens a connection to the SQLite database with the PRAGMAS profile applied.
+    
+    Args:
+        db_path (str): Path to the database file
+    
+    Returns:
+        sqlite3.Connection: Connection to the database
+    """
+    return _db_profile.apply_profile(sqlite3.connect(db_path, timeout=BUSY_TIMEOUT_S))
+
+def setup_database(logger, db_path=DB_PATH):
     """
     Sets up the SQLite database and creates the queue_data and park_info tables if they don't exist.
     
     Args:
         logger: Logger instance for logging actions
+        db_path (str): Path to the database file
     
     Returns:
         sqlite3.Connection: Connection to the database
@@ -14,8 +52,8 @@ def setup_database(logger):
     logger.debug("Setting up database")
     try:
         # Create folder if not exists
-        os.makedirs('data', exist_ok=True)
-        conn = sqlite3.connect('data/queue_data.db')
+        os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+        conn = connect(db_path)
         cursor = conn.cursor()
         
         # Create queue_data table
@@ -40,16 +78,280 @@ def setup_database(logger):
             )
         """)
         
+        create_rollup_tables(cursor)
+        create_ride_info_table(cursor)
+        create_indexes(cursor)
         conn.commit()
+
+        # Databases scraped before ride_info existed get it from their history once.
+        if (cursor.execute("SELECT 1 FROM ride_info LIMIT 1").fetchone() is None
+                and cursor.execute("SELECT 1 FROM park_info LIMIT 1").fetchone() is not None):
+            rebuild_ride_info(conn, logger)
+
         logger.info("Database setup completed successfully")
         return conn
     except Exception as e:
         logger.error(f"Failed to setup database: {e}")
         raise
 
+# Rollup tiers written by compact.py when raw readings pass the retention
+# age. Sums and counts rather than means, so a ride-day compacted in two
+# passes (or spread over raw and rolled-up rows) still combines exactly.
+# queue_time statistics cover open readings only; the first/last times
+# cover every reading, as the opening-hours lookup uses them.
+ROLLUP_COLUMNS = """
+    n_readings INTEGER,
+    n_open INTEGER,
+    sum_queue_time INTEGER,
+    max_queue_time INTEGER,
+    first_time_of_day TEXT,
+    last_time_of_day TEXT
+"""
+
+def create_rollup_tables(cursor):
+    """
+    Creates the queue_hourly and queue_daily rollup tables if they don't exist.
+
+    Args:
+        cursor: SQLite cursor
+    """
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS queue_hourly (
+            ride_id TEXT,
+            date TEXT,
+            hour INTEGER,
+            {ROLLUP_COLUMNS},
+            PRIMARY KEY (ride_id, date, hour)
+        )
+    """)
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS queue_daily (
+            ride_id TEXT,
+            date TEXT,
+            {ROLLUP_COLUMNS},
+            PRIMARY KEY (ride_id, date)
+        )
+    """)
+
+# Ride dimension, kept up to date by store_data. A ride is "seen" on a date
+# with at least one open reading, so rides the feed still lists but reports
+# closed every day stop advancing last_seen. Typical hours are the mean first
+# and last open time of day over active days: totals cover the days before
+# last_seen, and last_seen's own times are kept apart because live ingest
+# writes the current day a slot at a time.
+RIDE_INFO_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS ride_info (
+        ride_id TEXT PRIMARY KEY,
+        park_id TEXT,
+        ride_name TEXT,
+        category TEXT,              -- land from the live feed, NULL if only scraped
+        first_seen TEXT,            -- first date with an open reading
+        last_seen TEXT,             -- last date with an open reading
+        last_reported TEXT,         -- last date with any reading, open or closed
+        active_days INTEGER,        -- dates with an open reading
+        open_minute_total INTEGER,  -- first open minute of day, summed over active days before last_seen
+        close_minute_total INTEGER, -- last open minute of day, likewise
+        last_day_open_minute INTEGER,
+        last_day_close_minute INTEGER
+    )
+"""
+
+def create_ride_info_table(cursor):
+    """
+    Creates the ride_info table if it doesn't exist.
+
+    Args:
+        cursor: SQLite cursor
+    """
+    cursor.execute(RIDE_INFO_SCHEMA)
+
+# One upsert per ride per stored date. In the SET clause bare column names
+# are the stored row and excluded.* the new date's summary; the new date can
+# be later than last_seen (a new day), the same (more slots of the current
+# day) or earlier (backfilled history). Only dates outside first_seen..last_seen
+# are counted as new active days, so re-storing a date that is already counted
+# leaves the totals alone; rebuild_ride_info recomputes them exactly, e.g.
+# after backfilling a gap inside the range.
+UPSERT_RIDE_INFO = """
+    INSERT INTO ride_info (
+        ride_id, park_id, ride_name, category, first_seen, last_seen, last_reported, active_days,
+        open_minute_total, close_minute_total, last_day_open_minute, last_day_close_minute
+    )
+    VALUES (:ride_id, :park_id, :ride_name, :category, :open_date, :open_date, :date, :open_date IS NOT NULL,
+            0, 0, :open_minute, :close_minute)
+    ON CONFLICT (ride_id) DO UPDATE SET
+        park_id = excluded.park_id,
+        ride_name = excluded.ride_name,
+        category = COALESCE(excluded.category, category),
+        last_reported = MAX(last_reported, excluded.last_reported),
+        first_seen = COALESCE(MIN(first_seen, excluded.first_seen), first_seen, excluded.first_seen),
+        last_seen = COALESCE(MAX(last_seen, excluded.last_seen), last_seen, excluded.last_seen),
+        active_days = active_days + (excluded.last_seen IS NOT NULL AND (
+            last_seen IS NULL OR excluded.last_seen > last_seen OR excluded.last_seen < first_seen)),
+        open_minute_total = open_minute_total + CASE
+            WHEN excluded.last_seen IS NULL OR last_seen IS NULL THEN 0
+            WHEN excluded.last_seen > last_seen THEN last_day_open_minute
+            WHEN excluded.last_seen < first_seen THEN excluded.last_day_open_minute
+            ELSE 0
+        END,
+        close_minute_total = close_minute_total + CASE
+            WHEN excluded.last_seen IS NULL OR last_seen IS NULL THEN 0
+            WHEN excluded.last_seen > last_seen THEN last_day_close_minute
+            WHEN excluded.last_seen < first_seen THEN excluded.last_day_close_minute
+            ELSE 0
+        END,
+        last_day_open_minute = CASE
+            WHEN excluded.last_seen IS NULL OR excluded.last_seen < last_seen THEN last_day_open_minute
+            WHEN excluded.last_seen = last_seen THEN MIN(last_day_open_minute, excluded.last_day_open_minute)
+            ELSE excluded.last_day_open_minute
+        END,
+        last_day_close_minute = CASE
+            WHEN excluded.last_seen IS NULL OR excluded.last_seen < last_seen THEN last_day_close_minute
+            WHEN excluded.last_seen = last_seen THEN MAX(last_day_close_minute, excluded.last_day_close_minute)
+            ELSE excluded.last_day_close_minute
+        END
+"""
+
+def _minute_of_day(time_of_day):
+    return int(time_of_day[:2]) * 60 + int(time_of_day[3:5])
+
+def update_ride_info(cursor, date, data):
+    """
+    Fold one date's readings into ride_info, one upsert per ride.
+
+    Args:
+        cursor: SQLite cursor
+        date (str): Date in 'YYYY/MM/DD' format
+        data (list): Ride data dictionaries as passed to store_data
+    """
+    rows = []
+    for ride in data:
+        open_minutes = [_minute_of_day(p['time_of_day']) for p in ride['data_points'] if not p['is_closed']]
+        rows.append({
+            'ride_id': ride['ride_id'],
+            'park_id': ride.get('park_id'),
+            'ride_name': ride.get('ride_name', 'Unknown'),
+            'category': ride.get('category'),
+            'date': date,
+            'open_date': date if open_minutes else None,
+            'open_minute': min(open_minutes) if open_minutes else None,
+            'close_minute': max(open_minutes) if open_minutes else None,
+        })
+    cursor.executemany(UPSERT_RIDE_INFO, rows)
+
+def rebuild_ride_info(conn, logger):
+    """
+    Recomputes ride_info from the full history in queue_data and queue_daily.
+
+    Used once for databases scraped before ride_info existed; categories
+    already stored are kept. Compacted days only keep the first and last
+    reading of the day, open or not, so their typical hours are approximate.
+
+    Args:
+        conn: SQLite connection object
+        logger: Logger instance for logging actions
+    """
+    logger.info("Building ride_info from existing history")
+    cursor = conn.cursor()
+    has_daily = cursor.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'queue_daily'"
+    ).fetchone()
+    daily_union = """
+        UNION ALL
+        SELECT ride_id, date,
+               CASE WHEN n_open > 0 THEN first_time_of_day END,
+               CASE WHEN n_open > 0 THEN last_time_of_day END
+        FROM queue_daily
+    """ if has_daily else ""
+    try:
+        cursor.execute(f"""
+            WITH days AS (
+                SELECT ride_id, date, MIN(open_time) AS open_time, MAX(close_time) AS close_time
+                FROM (
+                    SELECT ride_id, date,
+                           MIN(CASE WHEN is_closed = 0 THEN time_of_day END) AS open_time,
+                           MAX(CASE WHEN is_closed = 0 THEN time_of_day END) AS close_time
+                    FROM queue_data
+                    GROUP BY ride_id, date
+                    {daily_union}
+                )
+                GROUP BY ride_id, date
+            ),
+            open_days AS (
+                SELECT ride_id, date,
+                       CAST(substr(open_time, 1, 2) AS INTEGER) * 60 + CAST(substr(open_time, 4, 2) AS INTEGER) AS open_minute,
+                       CAST(substr(close_time, 1, 2) AS INTEGER) * 60 + CAST(substr(close_time, 4, 2) AS INTEGER) AS close_minute,
+                       ROW_NUMBER() OVER (PARTITION BY ride_id ORDER BY date DESC) AS from_last
+                FROM days
+                WHERE open_time IS NOT NULL
+            ),
+            lifecycle AS (
+                SELECT ride_id, MIN(date) AS first_seen, MAX(date) AS last_seen, COUNT(*) AS active_days,
+                       SUM(CASE WHEN from_last > 1 THEN open_minute ELSE 0 END) AS open_minute_total,
+                       SUM(CASE WHEN from_last > 1 THEN close_minute ELSE 0 END) AS close_minute_total,
+                       MAX(CASE WHEN from_last = 1 THEN open_minute END) AS last_day_open_minute,
+                       MAX(CASE WHEN from_last = 1 THEN close_minute END) AS last_day_close_minute
+                FROM open_days
+                GROUP BY ride_id
+            ),
+            reported AS (
+                SELECT ride_id, MAX(date) AS last_reported FROM days GROUP BY ride_id
+            )
+            INSERT INTO ride_info (
+                ride_id, park_id, ride_name, first_seen, last_seen, last_reported, active_days,
+                open_minute_total, close_minute_total, last_day_open_minute, last_day_close_minute
+            )
+            SELECT pi.ride_id, pi.park_id, pi.ride_name, l.first_seen, l.last_seen, r.last_reported,
+                   COALESCE(l.active_days, 0), COALESCE(l.open_minute_total, 0), COALESCE(l.close_minute_total, 0),
+                   l.last_day_open_minute, l.last_day_close_minute
+            FROM park_info pi
+            JOIN reported r ON r.ride_id = pi.ride_id
+            LEFT JOIN lifecycle l ON l.ride_id = pi.ride_id
+            WHERE true
+            ON CONFLICT (ride_id) DO UPDATE SET
+                park_id = excluded.park_id,
+                ride_name = excluded.ride_name,
+                first_seen = excluded.first_seen,
+                last_seen = excluded.last_seen,
+                last_reported = excluded.last_reported,
+                active_days = excluded.active_days,
+                open_minute_total = excluded.open_minute_total,
+                close_minute_total = excluded.close_minute_total,
+                last_day_open_minute = excluded.last_day_open_minute,
+                last_day_close_minute = excluded.last_day_close_minute
+        """)
+        conn.commit()
+        logger.info(f"Built ride_info for {cursor.rowcount} rides")
+    except Exception as e:
+        logger.error(f"Failed to build ride_info: {e}")
+        conn.rollback()
+        raise
+
+# Indexes behind the model's parameterised queries (utils/query.py): a park
+# filter joins park_info to queue_data on ride_id and then ranges over date,
+# and date-only ranges (compaction, a training window) use the date index.
+# Active-ride lookups range over ride_info by park and last_seen.
+INDEXES = {
+    'idx_queue_data_ride_date': 'queue_data (ride_id, date)',
+    'idx_queue_data_date': 'queue_data (date)',
+    'idx_park_info_park': 'park_info (park_id)',
+    'idx_ride_info_park_seen': 'ride_info (park_id, last_seen, first_seen)',
+}
+
+def create_indexes(cursor):
+    """
+    Creates the INDEXES if they don't exist. The first run on a large existing
+    database builds them, which takes a while; later runs are instant.
+
+    Args:
+        cursor: SQLite cursor
+    """
+    for name, target in INDEXES.items():
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {target}")
+
 def store_data(conn, date, data, logger):
     """
-    Stores the extracted queue time data into the SQLite database.
+    Stores the extracted queue time data into the SQLite database and updates ride_info.
     
     Args:
         conn: SQLite connection object
@@ -60,14 +362,17 @@ def store_data(conn, date, data, logger):
     logger.info(f"Storing queue data for date {date}")
     cursor = conn.cursor()
     try:
-        for ride in data:
-            ride_id = ride['ride_id']
-            for point in ride['data_points']:
-                cursor.execute("""
-                    INSERT INTO queue_data (date, ride_id, time_of_day, queue_time, is_closed)
-                    VALUES (?, ?, ?, ?, ?)
-                """, (date, ride_id, point['time_of_day'], point['queue_time'], point['is_closed']))
-                logger.debug(f"Inserted queue data point for ride {ride_id} at {point['time_of_day']}")
+        rows = [
+            (date, ride['ride_id'], point['time_of_day'], point['queue_time'], point['is_closed'])
+            for ride in data
+            for point in ride['data_points']
+        ]
+        cursor.executemany("""
+            INSERT INTO queue_data (date, ride_id, time_of_day, queue_time, is_closed)
+            VALUES (?, ?, ?, ?, ?)
+        """, rows)
+        update_ride_info(cursor, date, data)
+        logger.debug(f"Inserted {len(rows)} queue data points for {date}")
         conn.commit()
         logger.info(f"Successfully stored {len(data)} rides' queue data for {date}")
     except Exception as e:
@@ -118,9 +423,14 @@ def get_last_scraped_date(conn, park_id, logger):
     logger.debug(f"Retrieving the last scraped date for park {park_id}")
     cursor = conn.cursor()
     try:
-        cursor.execute("""
+        # Compacted days only remain in queue_daily, so look there too.
+        has_daily = cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'queue_daily'"
+        ).fetchone()
+        daily_union = "UNION ALL SELECT date, ride_id FROM queue_daily" if has_daily else ""
+        cursor.execute(f"""
             SELECT MAX(qd.date)
-            FROM queue_data qd
+            FROM (SELECT date, ride_id FROM queue_data {daily_union}) qd
             JOIN park_info pi ON qd.ride_id = pi.ride_id
             WHERE pi.park_id = ?
         """, (park_id,))
@@ -0,0 +1,106 @@
+import json
+import os
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Shared with the crowd-level pipeline instrumentation: PIPELINE_PROFILE=cprofile
+# dumps a profile next to the report, PIPELINE_REPORT_DIR sets where reports go.
+PROFILE_ENV = 'PIPELINE_PROFILE'
+REPORT_DIR_ENV = 'PIPELINE_REPORT_DIR'
+DEFAULT_REPORT_DIR = 'data/perf'
+
+def _peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is kilobytes on Linux but bytes on macOS.
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+class ScrapeInstrumentation:
+    """
+    Aggregates wall time, CPU time, peak RSS growth, row counts and external
+    calls per scraper phase (navigate, extract, filter, store) across a run.
+    """
+    def __init__(self, logger, run_name='scrape'):
+        self.logger = logger
+        self.run_name = run_name
+        self.started_at = datetime.now()
+        self.wall_start = time.perf_counter()
+        self.cpu_start = time.process_time()
+        self.phases: dict = {}
+        self.profiler = None
+        if os.environ.get(PROFILE_ENV, '').lower() == 'cprofile':
+            import cProfile
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+
+    @contextmanager
+    def phase(self, name, rows_in=None, external_calls=0):
+        """
+        Time one execution of a phase and add it to the phase totals.
+
+        Args:
+            name (str): Phase name.
+            rows_in (int | None): Input row count, if known.
+            external_calls (int): Requests to queue-times.com made by this phase.
+
+        Yields:
+            dict: Set record['rows_out'] to report output rows.
+        """
+        record = {'rows_out': None}
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        peak_rss_start = _peak_rss_mb()
+        try:
+            yield record
+        finally:
+            totals = self.phases.setdefault(name, {
+                'count': 0, 'wall_s': 0.0, 'cpu_s': 0.0, 'peak_rss_delta_mb': 0.0,
+                'rows_in': 0, 'rows_out': 0, 'external_calls': 0,
+            })
+            peak_rss = _peak_rss_mb()
+            totals['count'] += 1
+            totals['wall_s'] += time.perf_counter() - wall_start
+            totals['cpu_s'] += time.process_time() - cpu_start
+            if peak_rss is not None:
+                totals['peak_rss_delta_mb'] += peak_rss - peak_rss_start
+            totals['rows_in'] += rows_in or 0
+            totals['rows_out'] += record['rows_out'] or 0
+            totals['external_calls'] += external_calls
+
+    def write_report(self):
+        """
+        Write the aggregated phase report (and profile, if enabled) to the report directory.
+        """
+        report_dir = os.environ.get(REPORT_DIR_ENV, DEFAULT_REPORT_DIR)
+        if not report_dir:
+            return
+        os.makedirs(report_dir, exist_ok=True)
+        base_path = os.path.join(report_dir, f"{self.run_name}-{self.started_at.strftime('%Y%m%d-%H%M%S')}")
+
+        if self.profiler is not None:
+            self.profiler.disable()
+            self.profiler.dump_stats(f'{base_path}.prof')
+            self.logger.info(f"Wrote cProfile dump to {base_path}.prof")
+
+        report = {
+            'run': self.run_name,
+            'started_at': self.started_at.isoformat(timespec='seconds'),
+            'wall_s': round(time.perf_counter() - self.wall_start, 4),
+            'cpu_s': round(time.process_time() - self.cpu_start, 4),
+            'peak_rss_mb': round(_peak_rss_mb(), 1) if resource is not None else None,
+            'phases': {
+                name: {k: round(v, 4) if isinstance(v, float) else v for k, v in totals.items()}
+                for name, totals in self.phases.items()
+            },
+        }
+        with open(f'{base_path}.json', 'w') as file:
+            json.dump(report, file, indent=2)
+        self.logger.info(f"Wrote {self.run_name} timing report to {base_path}.json")
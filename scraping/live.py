@@ -0,0 +1,356 @@
+import argparse
+import asyncio
+import os
+import random
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+import httpx
+import yaml
+from logger import setup_logging
+from database import DB_PATH, setup_database, store_data, store_park_info
+from utils import filter_data_to_intervals
+from instrument import ScrapeInstrumentation
+from parquet_export import DEFAULT_PARQUET_DIR, export_day, export_park_info
+
+# Live ingest: polls the public queue_times.json feed for each park and
+# appends readings to queue_data in the same 15-minute slots the calendar
+# backfill produces. A slot is written once the poll clock is more than half
+# a slot past it, after which no later reading could be closer to it.
+DEFAULT_QUEUE_TIMES_URL = 'https://queue-times.com'
+SOURCE_BASE_URL_ENV = 'SOURCE_BASE_URL'
+SLOT = timedelta(minutes=15)
+HALF_SLOT = SLOT / 2
+
+def get_live_settings(config):
+    """
+    Get the live ingest settings from the parsed config.
+
+    Args:
+        config (dict): Parsed config.yml
+
+    Returns:
+        dict: base_url, poll_interval_s, retry_base_s, max_backoff_s and timeout_s
+    """
+    live = config.get('live', {}) or {}
+    base_url = os.environ.get(SOURCE_BASE_URL_ENV)
+    if base_url:
+        # Same convention as the model side's endpoints: one prefix per source.
+        base_url = f"{base_url.rstrip('/')}/queue-times"
+    else:
+        base_url = (config.get('endpoints', {}) or {}).get('queue-times') or DEFAULT_QUEUE_TIMES_URL
+    return {
+        'base_url': base_url.rstrip('/'),
+        'poll_interval_s': live.get('poll_interval_s', 300),
+        'retry_base_s': live.get('retry_base_s', 30),
+        'max_backoff_s': live.get('max_backoff_s', 1800),
+        'timeout_s': live.get('timeout_s', 20),
+    }
+
+def backoff_delay(failures, retry_base_s, max_backoff_s):
+    """
+    Delay before the next poll after consecutive failures: doubling from retry_base_s, capped, with ±20% jitter.
+    """
+    return min(max_backoff_s, retry_base_s * 2 ** (failures - 1)) * random.uniform(0.8, 1.2)
+
+def parse_live_rides(payload, park_id, tz):
+    """
+    Flatten a queue_times.json payload into readings in park-local time.
+
+    Args:
+        payload (dict): Feed payload with rides under 'lands' and/or top-level 'rides'
+        park_id (str): ID of the park
+        tz (ZoneInfo): Park timezone; last_updated is UTC in the feed
+
+    Returns:
+        list: Ride dictionaries with ride_id, park_id, ride_name, category (the
+            land's name, None for rides outside a land) and one data point each
+    """
+    rides = [(land.get('name'), ride) for land in payload.get('lands', []) for ride in land.get('rides', [])]
+    rides += [(None, ride) for ride in payload.get('rides', [])]
+
+    readings = []
+    for category, ride in rides:
+        try:
+            updated = datetime.fromisoformat(ride['last_updated'].replace('Z', '+00:00'))
+        except (KeyError, TypeError, ValueError):
+            continue
+        readings.append({
+            'ride_id': str(ride['id']),
+            'park_id': str(park_id),
+            'ride_name': ride.get('name', 'Unknown'),
+            'category': category,
+            'data_points': [{
+                'time_of_day': updated.astimezone(tz).replace(tzinfo=None),
+                'queue_time': int(ride.get('wait_time') or 0),
+                'is_closed': int(not ride.get('is_open', False)),
+            }],
+        })
+    return readings
+
+class LiveParkState:
+    """
+    Raw readings per ride that are not yet written, plus the last slot written for each ride.
+    """
+    def __init__(self, park_id, tz, since=None):
+        self.park_id = str(park_id)
+        self.tz = tz
+        self.since = since
+        self.ride_names: dict = {}
+        self.ride_categories: dict = {}
+        self.points: dict = {}
+        self.last_written: dict = {}
+        self.known_rides: set = set()
+        self.failures = 0
+
+    def add(self, readings):
+        """
+        Buffer new readings, skipping repeats of an unchanged last_updated and anything already covered.
+
+        Returns:
+            int: Number of readings added
+        """
+        added = 0
+        for ride in readings:
+            ride_id = ride['ride_id']
+            self.ride_names[ride_id] = ride['ride_name']
+            self.ride_categories[ride_id] = ride.get('category')
+            points = self.points.setdefault(ride_id, [])
+            for point in ride['data_points']:
+                dt = point['time_of_day']
+                if self.since is not None and dt < self.since:
+                    continue
+                last = self.last_written.get(ride_id)
+                if last is not None and dt < last + HALF_SLOT:
+                    continue
+                if points and points[-1]['time_of_day'] == dt:
+                    continue
+                points.append(point)
+                added += 1
+        return added
+
+    def take_final_slots(self, now, logger):
+        """
+        Align buffered readings to 15-minute slots and remove the slots that can no longer change.
+
+        Args:
+            now (datetime): Current park-local time (naive)
+            logger: Logger instance for logging actions
+
+        Returns:
+            dict: Date ('YYYY/MM/DD') to filtered ride data, as store_data expects
+        """
+        by_date = {}
+        for ride_id, points in self.points.items():
+            for point in points:
+                day = point['time_of_day'].strftime('%Y/%m/%d')
+                rides = by_date.setdefault(day, {})
+                rides.setdefault(ride_id, []).append(point)
+
+        final = {}
+        cutoff = now - HALF_SLOT
+        for day, rides in by_date.items():
+            data = [
+                {
+                    'ride_id': ride_id, 'park_id': self.park_id, 'ride_name': self.ride_names.get(ride_id, 'Unknown'),
+                    'category': self.ride_categories.get(ride_id), 'data_points': points,
+                }
+                for ride_id, points in rides.items()
+            ]
+            for ride in filter_data_to_intervals(data, day, logger):
+                ride_id = ride['ride_id']
+                last = self.last_written.get(ride_id)
+                keep = []
+                for point in ride['data_points']:
+                    slot = datetime.strptime(f"{day} {point['time_of_day']}", '%Y/%m/%d %H:%M')
+                    if slot <= cutoff and (last is None or slot > last):
+                        keep.append(point)
+                if keep:
+                    final.setdefault(day, []).append({**ride, 'data_points': keep})
+                    self.last_written[ride_id] = datetime.strptime(f"{day} {keep[-1]['time_of_day']}", '%Y/%m/%d %H:%M')
+
+        # Readings more than half a slot before a ride's last written slot can only match written slots.
+        for ride_id, points in self.points.items():
+            last = self.last_written.get(ride_id)
+            if last is not None:
+                points[:] = [p for p in points if p['time_of_day'] >= last + HALF_SLOT]
+        return final
+
+def load_park_state(conn, park_id, tz, logger):
+    """
+    Start a park's state from the database: its known rides and today's last stored slot per ride.
+
+    Restarting the daemon therefore never writes a slot twice. Stale readings
+    from before today are ignored, as those days belong to the calendar backfill.
+    """
+    midnight = datetime.now(tz).replace(tzinfo=None, hour=0, minute=0, second=0, microsecond=0)
+    state = LiveParkState(park_id, tz, since=midnight)
+    today = midnight.strftime('%Y/%m/%d')
+    cursor = conn.cursor()
+    cursor.execute("SELECT ride_id FROM park_info WHERE park_id = ?", (str(park_id),))
+    state.known_rides = {str(row[0]) for row in cursor.fetchall()}
+    cursor.execute("""
+        SELECT qd.ride_id, MAX(qd.time_of_day)
+        FROM queue_data qd
+        JOIN park_info pi ON qd.ride_id = pi.ride_id
+        WHERE pi.park_id = ? AND qd.date = ?
+        GROUP BY qd.ride_id
+    """, (str(park_id), today))
+    for ride_id, time_of_day in cursor.fetchall():
+        state.last_written[str(ride_id)] = datetime.strptime(f'{today} {time_of_day}', '%Y/%m/%d %H:%M')
+    logger.debug(f"Park {park_id}: {len(state.known_rides)} known rides, {len(state.last_written)} with slots stored today")
+    return state
+
+async def get_park_timezones(client, base_url, park_ids, logger):
+    """
+    Look up each park's timezone in parks.json; the live feed reports UTC timestamps.
+
+    Returns:
+        dict: park_id to ZoneInfo (UTC when the park or its timezone is unknown)
+    """
+    timezones = {}
+    try:
+        response = await client.get(f'{base_url}/parks.json')
+        response.raise_for_status()
+        for group in response.json():
+            for park in group.get('parks', []):
+                if park.get('timezone'):
+                    timezones[str(park['id'])] = park['timezone']
+    except (httpx.HTTPError, ValueError) as e:
+        logger.warning(f"Could not load park timezones from parks.json: {e}")
+
+    zones = {}
+    for park_id in park_ids:
+        try:
+            zones[park_id] = ZoneInfo(timezones[str(park_id)])
+        except (KeyError, ZoneInfoNotFoundError):
+            logger.warning(f"No timezone for park {park_id}, using UTC")
+            zones[park_id] = timezone.utc
+    return zones
+
+def store_slots(conn, state, slots, logger, export_parquet=False, parquet_dir=DEFAULT_PARQUET_DIR):
+    """
+    Write finalised slots with one bulk insert per date.
+
+    Returns:
+        int: Number of rows stored
+    """
+    n_rows = 0
+    for date, data in slots.items():
+        for ride in data:
+            if ride['ride_id'] not in state.known_rides:
+                store_park_info(conn, ride['ride_id'], ride['park_id'], ride['ride_name'], logger)
+                state.known_rides.add(ride['ride_id'])
+        store_data(conn, date, data, logger)
+        if export_parquet:
+            export_day(date, data, logger, parquet_dir, replace=False)
+        n_rows += sum(len(ride['data_points']) for ride in data)
+    return n_rows
+
+async def poll_park(client, conn, state, settings, logger, instrumentation, stop, storage):
+    """
+    Poll one park until stop is set, writing slots as they become final.
+
+    Failed polls back off exponentially for this park only; other parks keep their schedule.
+    """
+    url = f"{settings['base_url']}/parks/{state.park_id}/queue_times.json"
+    while not stop.is_set():
+        try:
+            with instrumentation.phase('fetch', external_calls=1) as record:
+                response = await client.get(url)
+                response.raise_for_status()
+                readings = parse_live_rides(response.json(), state.park_id, state.tz)
+                record['rows_out'] = len(readings)
+            if state.failures:
+                logger.info(f"Park {state.park_id}: feed recovered after {state.failures} failed polls")
+            state.failures = 0
+            delay = settings['poll_interval_s']
+        except (httpx.HTTPError, ValueError) as e:
+            state.failures += 1
+            delay = backoff_delay(state.failures, settings['retry_base_s'], settings['max_backoff_s'])
+            logger.warning(f"Park {state.park_id}: poll failed ({e}), retrying in {delay:.0f}s")
+            readings = []
+
+        if readings:
+            with instrumentation.phase('filter', rows_in=len(readings)) as record:
+                state.add(readings)
+                slots = state.take_final_slots(datetime.now(state.tz).replace(tzinfo=None), logger)
+                record['rows_out'] = sum(len(ride['data_points']) for data in slots.values() for ride in data)
+            if slots:
+                try:
+                    with instrumentation.phase('store', rows_in=record['rows_out']):
+                        n_rows = store_slots(conn, state, slots, logger, **storage)
+                    logger.info(f"Park {state.park_id}: stored {n_rows} readings")
+                except Exception as e:
+                    logger.error(f"Park {state.park_id}: failed to store readings: {e}")
+
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=delay)
+        except asyncio.TimeoutError:
+            pass
+
+async def run_live(park_ids, settings, logger, duration_s=None, storage=None):
+    """
+    Poll every park concurrently until interrupted, or for duration_s seconds.
+
+    Args:
+        park_ids (list): Park IDs to poll
+        settings (dict): From get_live_settings
+        logger: Logger instance for logging actions
+        duration_s (float | None): Stop after this many seconds; run forever if None
+        storage (dict | None): db_path, export_parquet and parquet_dir
+    """
+    storage = dict(storage or {})
+    conn = setup_database(logger, storage.pop('db_path', DB_PATH))
+    instrumentation = ScrapeInstrumentation(logger, run_name='live')
+    stop = asyncio.Event()
+
+    try:
+        async with httpx.AsyncClient(timeout=settings['timeout_s']) as client:
+            zones = await get_park_timezones(client, settings['base_url'], park_ids, logger)
+            states = [load_park_state(conn, park_id, zones[park_id], logger) for park_id in park_ids]
+            logger.info(f"Polling {len(states)} parks every {settings['poll_interval_s']}s from {settings['base_url']}")
+
+            tasks = [
+                asyncio.create_task(poll_park(client, conn, state, settings, logger, instrumentation, stop, storage))
+                for state in states
+            ]
+            try:
+                await asyncio.wait_for(asyncio.gather(*tasks), timeout=duration_s)
+            except asyncio.TimeoutError:
+                pass
+            finally:
+                stop.set()
+                await asyncio.gather(*tasks, return_exceptions=True)
+    finally:
+        if storage.get('export_parquet'):
+            export_park_info(conn, logger, storage.get('parquet_dir', DEFAULT_PARQUET_DIR))
+        instrumentation.write_report()
+        conn.close()
+        logger.info("Live ingest stopped")
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description='Poll the live queue-times.com feed and append 15-minute readings.')
+    arg_parser.add_argument('--parks', type=int, nargs='+', default=None, help='Park IDs to poll (default: scraper.park_ids).')
+    arg_parser.add_argument('--poll-interval', type=float, default=None, help='Seconds between polls per park.')
+    arg_parser.add_argument('--duration', type=float, default=None, help='Stop after this many seconds.')
+    args = arg_parser.parse_args()
+
+    logger = setup_logging()
+    config_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'config.yml')
+    with open(config_path, 'r') as file:
+        config = yaml.safe_load(file) or {}
+
+    settings = get_live_settings(config)
+    if args.poll_interval is not None:
+        settings['poll_interval_s'] = args.poll_interval
+    park_ids = args.parks or config.get('scraper', {}).get('park_ids', [])
+    storage = config.get('storage', {}) or {}
+
+    try:
+        asyncio.run(run_live(park_ids, settings, logger, args.duration, {
+            'db_path': storage.get('db_path', DB_PATH),
+            'export_parquet': storage.get('export_parquet', False),
+            'parquet_dir': storage.get('parquet_dir', DEFAULT_PARQUET_DIR),
+        }))
+    except KeyboardInterrupt:
+        pass
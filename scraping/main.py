@@ -4,9 +4,11 @@ import os
 from playwright.async_api import async_playwright, TimeoutError as PlaywrightTimeoutError
 from config import load_credentials
 from logger import setup_logging
-from database import setup_database, store_data, store_park_info, get_last_scraped_date
+from database import DB_PATH, setup_database, store_data, store_park_info, get_last_scraped_date
 from scraper import login, extract_data
 from utils import filter_data_to_intervals, generate_date_range
+from instrument import ScrapeInstrumentation
+from parquet_export import DEFAULT_PARQUET_DIR, export_day, export_park_info
 import random
 from datetime import datetime, timedelta
 
@@ -29,6 +31,10 @@ async def main():
         end_date = config['scraper'].get('end_date')
         exclude_months = config['scraper'].get('exclude_months', [])
         park_ids = config['scraper'].get('park_ids', [])
+        storage = config.get('storage', {}) or {}
+        export_parquet = storage.get('export_parquet', False)
+        parquet_dir = storage.get('parquet_dir', DEFAULT_PARQUET_DIR)
+        db_path = storage.get('db_path', DB_PATH)
         
         if not start_date or not end_date or not park_ids:
             raise ValueError("config.yml missing required fields: start_date, end_date, or park_ids")
@@ -51,12 +57,13 @@ async def main():
         return
     
     try:
-        conn = setup_database(logger)
+        conn = setup_database(logger, db_path)
     except Exception as e:
         logger.critical(f"Database setup failed, exiting")
         logger.critical(e)
         return
     
+    instrumentation = ScrapeInstrumentation(logger)
     
     async with async_playwright() as p:
         logger.debug("Launching browser")
@@ -101,30 +108,39 @@ async def main():
                 url = f'https://queue-times.com/parks/{park_id}/calendar/{date}'
                 logger.info(f"Processing URL: {url}")
                 try:
-                    logger.debug(f"Navigating to {url}")
-                    await page.goto(url)
-                    delay = random.uniform(0.5, 1.5)
-                    logger.debug(f"Waiting {delay:.2f}s after page load")
-                    await asyncio.sleep(delay)
-                    
-                    logger.debug("Waiting for panels to load")
-                    await page.wait_for_selector('.panel', timeout=5000)
-                    panels = await page.query_selector_all('.panel')
+                    with instrumentation.phase('navigate', external_calls=1) as record:
+                        logger.debug(f"Navigating to {url}")
+                        await page.goto(url)
+                        delay = random.uniform(0.5, 1.5)
+                        logger.debug(f"Waiting {delay:.2f}s after page load")
+                        await asyncio.sleep(delay)
+                        
+                        logger.debug("Waiting for panels to load")
+                        await page.wait_for_selector('.panel', timeout=5000)
+                        panels = await page.query_selector_all('.panel')
+                        record['rows_out'] = len(panels)
                     if not panels:
                         logger.warning(f"No panels found for park {park_id} on {date}")
                         continue
                     
                     logger.debug("Starting data extraction")
-                    data = await extract_data(page, date, park_id, logger)
+                    with instrumentation.phase('extract') as record:
+                        data = await extract_data(page, date, park_id, logger)
+                        record['rows_out'] = sum(len(ride['data_points']) for ride in data)
                     if data:
                         logger.debug("Filtering data to 15-minute intervals")
                         try:
-                            filtered_data = filter_data_to_intervals(data, date, logger)
+                            with instrumentation.phase('filter', rows_in=sum(len(ride['data_points']) for ride in data)) as record:
+                                filtered_data = filter_data_to_intervals(data, date, logger)
+                                record['rows_out'] = sum(len(ride['data_points']) for ride in filtered_data)
                             if filtered_data:
                                 logger.debug("Starting data storage")
-                                for ride in filtered_data:
-                                    store_park_info(conn, ride['ride_id'], ride['park_id'], ride.get('ride_name', 'Unknown'), logger)
-                                store_data(conn, date, filtered_data, logger)
+                                with instrumentation.phase('store', rows_in=sum(len(ride['data_points']) for ride in filtered_data)):
+                                    for ride in filtered_data:
+                                        store_park_info(conn, ride['ride_id'], ride['park_id'], ride.get('ride_name', 'Unknown'), logger)
+                                    store_data(conn, date, filtered_data, logger)
+                                    if export_parquet:
+                                        export_day(date, filtered_data, logger, parquet_dir)
                                 logger.info(f"Completed processing for park {park_id} on {date}")
                             else:
                                 logger.warning(f"No valid data after filtering for park {park_id} on {date}")
@@ -144,6 +160,11 @@ async def main():
         await browser.close()
         logger.info("Browser closed")
     
+    if export_parquet:
+        export_park_info(conn, logger, parquet_dir)
+
+    instrumentation.write_report()
+
     logger.debug("Closing database connection")
     conn.close()
     logger.info("Database connection closed")
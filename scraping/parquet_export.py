@@ -0,0 +1,248 @@
+import argparse
+import logging
+import os
+from datetime import datetime
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+from database import DB_PATH, connect
+
+DEFAULT_PARQUET_DIR = 'data/queue_parquet'
+# Underscore-prefixed so dataset discovery skips it.
+PARK_INFO_FILE = '_park_info.parquet'
+RIDE_INFO_FILE = '_ride_info.parquet'
+
+# Columns of each partition file. park_id, year and month live in the
+# directory names (park_id=2/year=2024/month=6/part.parquet), so readers
+# can skip whole parks and months without opening a file.
+QUEUE_SCHEMA = pa.schema([
+    ('ride_id', pa.int32()),
+    ('date', pa.date32()),
+    ('minute_of_day', pa.int16()),
+    ('queue_time', pa.int16()),
+    ('is_closed', pa.bool_()),
+])
+
+def partition_path(root, park_id, year, month):
+    return os.path.join(root, f'park_id={int(park_id)}', f'year={int(year)}', f'month={int(month)}', 'part.parquet')
+
+def _write_atomic(table, path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Dot-prefixed, so dataset readers never pick up a half-written file.
+    tmp_path = os.path.join(os.path.dirname(path), f'.{os.path.basename(path)}.tmp')
+    pq.write_table(table, tmp_path, compression='zstd')
+    os.replace(tmp_path, path)
+
+def _reading_keys(table):
+    # One int64 per (date, ride, minute): days << 40 | ride_id << 11 | minute_of_day.
+    days = table['date'].to_numpy().astype('datetime64[D]').astype(np.int64)
+    return (days << 40) | (table['ride_id'].to_numpy().astype(np.int64) << 11) | table['minute_of_day'].to_numpy().astype(np.int64)
+
+def _merge_into_partition(path, new_table, dates=None):
+    """
+    Add new_table's rows to a month partition file.
+
+    With dates, those dates' previous rows are dropped first, so re-exporting
+    a day is idempotent. Without, only existing readings for the same ride,
+    date and minute are replaced.
+    """
+    if os.path.exists(path):
+        existing = pq.read_table(path, schema=QUEUE_SCHEMA)
+        if dates is None:
+            keep = ~np.isin(_reading_keys(existing), _reading_keys(new_table))
+        else:
+            keep = ~np.isin(existing['date'].to_numpy(), np.asarray(dates, dtype='datetime64[D]'))
+        new_table = pa.concat_tables([existing.filter(pa.array(keep)), new_table])
+    order = np.lexsort((
+        new_table['minute_of_day'].to_numpy(),
+        new_table['ride_id'].to_numpy(),
+        new_table['date'].to_numpy(),
+    ))
+    _write_atomic(new_table.take(pa.array(order)), path)
+
+def export_day(date, data, logger, root=DEFAULT_PARQUET_DIR, replace=True):
+    """
+    Add one scraped day to the partitioned Parquet dataset.
+
+    Called after store_data with the same filtered rides, so the dataset
+    stays in step with the SQLite table without re-reading it. The live
+    ingest daemon passes replace=False to append new slots to a day that
+    already has rows.
+
+    Args:
+        date (str): Date in 'YYYY/MM/DD' format
+        data (list): Filtered ride data dictionaries, as passed to store_data
+        logger: Logger instance for logging actions
+        root (str): Root directory of the Parquet dataset
+        replace (bool): Drop the day's existing rows first, rather than appending
+
+    Returns:
+        int: Number of rows exported
+    """
+    day = datetime.strptime(date, '%Y/%m/%d')
+    rows_by_park = {}
+    for ride in data:
+        rows = rows_by_park.setdefault(int(ride['park_id']), ([], [], [], []))
+        for point in ride['data_points']:
+            hour, minute = point['time_of_day'].split(':')
+            rows[0].append(int(ride['ride_id']))
+            rows[1].append(int(hour) * 60 + int(minute))
+            rows[2].append(point['queue_time'])
+            rows[3].append(bool(point['is_closed']))
+
+    n_rows = 0
+    for park_id, (ride_ids, minutes, queue_times, closed) in rows_by_park.items():
+        table = pa.table({
+            'ride_id': pa.array(ride_ids, pa.int32()),
+            'date': pa.array([day.date()] * len(ride_ids), pa.date32()),
+            'minute_of_day': pa.array(minutes, pa.int16()),
+            'queue_time': pa.array(queue_times, pa.int16()),
+            'is_closed': pa.array(closed, pa.bool_()),
+        }, schema=QUEUE_SCHEMA)
+        _merge_into_partition(partition_path(root, park_id, day.year, day.month), table, [day.date()] if replace else None)
+        n_rows += len(table)
+
+    logger.debug(f"Exported {n_rows} rows for {date} to {root}")
+    return n_rows
+
+def export_park_info(conn, logger, root=DEFAULT_PARQUET_DIR):
+    """
+    Write snapshots of the park_info and ride_info tables alongside the queue partitions.
+
+    The ride_info snapshot is typed like the partitions (int IDs, date32
+    dates) with the typical first and last open minute of day already averaged.
+
+    Args:
+        conn: SQLite connection object
+        logger: Logger instance for logging actions
+        root (str): Root directory of the Parquet dataset
+    """
+    rows = conn.execute("SELECT ride_id, park_id, ride_name FROM park_info").fetchall()
+    table = pa.table({
+        'ride_id': pa.array([str(r[0]) for r in rows], pa.string()),
+        'park_id': pa.array([str(r[1]) for r in rows], pa.string()),
+        'ride_name': pa.array([r[2] for r in rows], pa.string()),
+    })
+    _write_atomic(table, os.path.join(root, PARK_INFO_FILE))
+    logger.debug(f"Exported {len(rows)} park_info rows to {root}")
+
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'ride_info'").fetchone() is None:
+        return
+    rows = conn.execute("""
+        SELECT CAST(ride_id AS INTEGER), CAST(park_id AS INTEGER), ride_name, category,
+               first_seen, last_seen, last_reported, active_days,
+               CAST(ROUND((open_minute_total + last_day_open_minute) * 1.0 / active_days) AS INTEGER),
+               CAST(ROUND((close_minute_total + last_day_close_minute) * 1.0 / active_days) AS INTEGER)
+        FROM ride_info
+    """).fetchall()
+    to_date = lambda d: datetime.strptime(d, '%Y/%m/%d').date() if d else None
+    table = pa.table({
+        'ride_id': pa.array([r[0] for r in rows], pa.int32()),
+        'park_id': pa.array([r[1] for r in rows], pa.int32()),
+        'ride_name': pa.array([r[2] for r in rows], pa.string()),
+        'category': pa.array([r[3] for r in rows], pa.string()),
+        'first_seen': pa.array([to_date(r[4]) for r in rows], pa.date32()),
+        'last_seen': pa.array([to_date(r[5]) for r in rows], pa.date32()),
+        'last_reported': pa.array([to_date(r[6]) for r in rows], pa.date32()),
+        'active_days': pa.array([r[7] for r in rows], pa.int32()),
+        'typical_open_minute': pa.array([r[8] for r in rows], pa.int16()),
+        'typical_close_minute': pa.array([r[9] for r in rows], pa.int16()),
+    })
+    _write_atomic(table, os.path.join(root, RIDE_INFO_FILE))
+    logger.debug(f"Exported {len(rows)} ride_info rows to {root}")
+
+def rows_to_table(rows):
+    """
+    Convert queue_data rows to a QUEUE_SCHEMA table.
+
+    Args:
+        rows (list): (ride_id, 'YYYY/MM/DD' date, 'HH:MM' time_of_day, queue_time, is_closed) tuples
+
+    Returns:
+        pa.Table: Typed table, in row order
+    """
+    ride_ids, dates, times, queue_times, closed = zip(*rows)
+    # Dates and times repeat heavily; parse each distinct value once.
+    date_values, date_codes = np.unique(np.array(dates), return_inverse=True)
+    parsed_dates = np.array([np.datetime64(d.replace('/', '-'), 'D') for d in date_values])[date_codes]
+    time_values, time_codes = np.unique(np.array(times), return_inverse=True)
+    minutes = np.array([int(t[:2]) * 60 + int(t[3:5]) for t in time_values], dtype=np.int16)[time_codes]
+
+    return pa.table({
+        'ride_id': pa.array(np.array(ride_ids, dtype=np.int32)),
+        'date': pa.array(parsed_dates, pa.date32()),
+        'minute_of_day': pa.array(minutes),
+        'queue_time': pa.array(np.array(queue_times, dtype=np.int16)),
+        'is_closed': pa.array(np.array(closed).astype(bool)),
+    }, schema=QUEUE_SCHEMA)
+
+def write_park_table(table, root, park_id, merge=False):
+    """
+    Write one park's rows into its month partitions.
+
+    Args:
+        table (pa.Table): QUEUE_SCHEMA rows for the park
+        root (str): Root directory of the Parquet dataset
+        park_id: ID of the park
+        merge (bool): Add to existing partition files, replacing only readings
+            with the same ride, date and minute, rather than rewriting each month in full
+    """
+    months = table['date'].to_numpy().astype('datetime64[M]')
+    for month in np.unique(months):
+        year, month_number = int(str(month)[:4]), int(str(month)[5:7])
+        part = table.filter(pa.array(months == month))
+        path = partition_path(root, park_id, year, month_number)
+        if merge:
+            _merge_into_partition(path, part)
+        else:
+            order = np.lexsort((part['minute_of_day'].to_numpy(), part['ride_id'].to_numpy(), part['date'].to_numpy()))
+            _write_atomic(part.take(pa.array(order)), path)
+
+def export_database(db_path, logger, root=DEFAULT_PARQUET_DIR):
+    """
+    Export the whole queue_data table, e.g. to build the dataset for an existing database.
+
+    Reads one park at a time and rewrites each month partition in full.
+
+    Args:
+        db_path (str): Path to the SQLite database
+        logger: Logger instance for logging actions
+        root (str): Root directory of the Parquet dataset
+
+    Returns:
+        int: Number of rows exported
+    """
+    conn = connect(db_path)
+    try:
+        park_ids = [row[0] for row in conn.execute("SELECT DISTINCT park_id FROM park_info")]
+        n_rows = 0
+        for park_id in park_ids:
+            rows = conn.execute("""
+                SELECT CAST(qd.ride_id AS INTEGER), qd.date, qd.time_of_day, qd.queue_time, qd.is_closed
+                FROM queue_data qd
+                JOIN park_info pi ON qd.ride_id = pi.ride_id
+                WHERE pi.park_id = ?
+            """, (park_id,)).fetchall()
+            if not rows:
+                continue
+
+            table = rows_to_table(rows)
+            write_park_table(table, root, park_id)
+            n_rows += len(table)
+            logger.info(f"Exported {len(table)} rows for park {park_id}")
+
+        export_park_info(conn, logger, root)
+        return n_rows
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description='Export the SQLite queue_data table to a partitioned Parquet dataset.')
+    arg_parser.add_argument('--db-path', default=DB_PATH)
+    arg_parser.add_argument('--output', default=DEFAULT_PARQUET_DIR)
+    args = arg_parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    logger = logging.getLogger('QueueScraper')
+    n_rows = export_database(args.db_path, logger, args.output)
+    logger.info(f"Exported {n_rows} rows to {args.output}")
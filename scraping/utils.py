@@ -63,7 +63,7 @@ def filter_data_to_intervals(data, date, logger):
         # Round end time up to the nearest 15-minute interval
         end_minutes = ((end_dt.minute + 14) // 15) * 15
         if end_minutes >= 60:
-            end_interval = end_dt.replace(hour=end_dt.hour + 1, minute=0, second=0, microsecond=0)
+            end_interval = end_dt.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
         else:
             end_interval = end_dt.replace(minute=end_minutes, second=0, microsecond=0)
         
@@ -93,6 +93,7 @@ def filter_data_to_intervals(data, date, logger):
                 'ride_id': ride_id,
                 'park_id': park_id,
                 'ride_name': ride_name,
+                'category': ride.get('category'),
                 'data_points': filtered_points
             })
     